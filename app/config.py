@@ -33,6 +33,21 @@ MAX_UPLOAD_SIZE_MB = 50
 ALLOWED_EXCEL_EXTENSIONS = (".xlsx", ".xlsm", ".xls")
 ALLOWED_PPT_EXTENSIONS = (".pptx", ".ppt")
 
+# Batch generation (/api/generate-batch)
+BATCH_MAX_WORKERS = 4  # decks assembled in parallel
+
+# Idempotent generate: completed results kept for identical repeat requests
+RESULT_CACHE_MAX_ENTRIES = 256
+
+# Background jobs (/api/jobs)
+JOB_MAX_WORKERS = 2  # submitted jobs run concurrently
+JOB_HISTORY_MAX = 200  # finished jobs kept for status queries
+JOB_EVENT_KEEPALIVE = 15.0  # seconds; an idle event stream repeats the current state
+
+# Streaming download (/api/generate with "stream": true)
+STREAM_CHUNK_SIZE = 256 * 1024  # bytes per response chunk
+STREAM_QUEUE_DEPTH = 16  # chunks buffered ahead of the client
+
 # File cleanup settings (seconds)
 FILE_CLEANUP_MAX_AGE = 24 * 60 * 60  # 24 hours
 
@@ -59,10 +74,72 @@ DEFAULT_IMAGE_LAYOUT = {
     "height": 5.6,
 }
 
+# Several charts of one worksheet on a slide (mappings with "charts")
+MULTI_CHART_GAP = 0.3  # inches between neighbouring charts
+
 # ── COM automation settings ──────────────────────────────────────────
 COM_MAX_RETRIES = 3
 COM_RETRY_DELAY = 0.3  # seconds
 COM_CLIPBOARD_DELAY = 0.2  # seconds
+COM_PROXY_ENABLED = True  # count and time every COM member access (see app/utils/com_proxy.py)
+# "win32" drives real Office; "fake" uses the COM-free simulator in
+# app/services/fake_com.py (benchmarks, load tests, non-Windows development)
+COM_BACKEND = os.environ.get("EXCEL2PPT_COM_BACKEND", "win32")
+# Multiplier on the fake backend's simulated Office latencies (0 = no delay)
+FAKE_COM_LATENCY_SCALE = float(os.environ.get("EXCEL2PPT_FAKE_COM_LATENCY", "0"))
 IMAGE_MIN_SIZE_BYTES = 500
 IMAGE_MIN_UNIQUE_COLORS = 10
 IMAGE_MIN_STDEV = 5.0
+IMAGE_VALIDATE_MAX_PIXELS = 512 * 512  # larger captures are subsampled before analysis
+CAPTURE_MMAP_THRESHOLD_BYTES = 32 * 1024 * 1024  # larger captures are memory-mapped
+
+# ── Learned capture-strategy order ───────────────────────────────────
+# Which capture path works is remembered per workbook template fingerprint
+DATA_DIR = Path(os.environ.get("EXCEL2PPT_DATA_DIR", BASE_DIR / "data"))
+STRATEGY_STATS_FILE = DATA_DIR / "capture_strategies.json"
+STRATEGY_HISTORY_MAX = 50  # attempts kept per strategy before old history is halved
+STRATEGY_EXPLORE_EVERY = 10  # every Nth reordered capture tries the demoted strategy first again
+
+# ── CLI capture cache (report_cli) ───────────────────────────────────
+# Captures persist across CLI runs, keyed by workbook content and item
+CAPTURE_CACHE_DIR = DATA_DIR / "capture_cache"
+CAPTURE_CACHE_MAX_MB = 512  # least recently used captures are evicted above this
+
+# ── Dry-run planning (/api/plan) ─────────────────────────────────────
+# Rough per-step costs (milliseconds) used to estimate job duration.
+PLAN_COST_MS = {
+    "excel_start": 3000,
+    "powerpoint_start": 4000,
+    "workbook_open": 1500,
+    "template_load": 200,
+    "capture_chartsheet": 500,
+    "capture_worksheet_chart": 800,
+    "capture_worksheet_range": 1500,
+    "embedded_paste": 1800,
+    "optimize": 150,
+    "insert": 50,
+    "save": 500,
+}
+
+# ── Post-capture image optimization ──────────────────────────────────
+IMAGE_TARGET_DPI = 200  # resample captures to this DPI for their placement box
+IMAGE_PALETTE_MAX_COLORS = 256  # images with at most this many colors are palettized
+IMAGE_OPTIMIZE_WORKERS = 4
+
+# ── On-demand profiling ("profile": true) ───────────────────────────
+PROFILE_SAMPLE_INTERVAL = 0.005  # seconds between stack samples
+
+# ── Per-job memory accounting ("memory": true) ───────────────────────
+MEMORY_TOP_N = 10  # allocation sites reported from the tracemalloc snapshot diff
+MEMORY_TRACE_FRAMES = 1  # traceback depth kept by tracemalloc (higher = slower)
+
+# ── Trace spans (JSONL, OTLP/JSON shape) ────────────────────────────
+LOG_DIR = BASE_DIR / "logs"
+TRACE_ENABLED = True
+TRACE_FILE = LOG_DIR / "trace.jsonl"
+TRACE_MAX_BYTES = 20 * 1024 * 1024  # rotate after this size
+TRACE_BACKUP_COUNT = 5
+
+# ── Metrics (/api/metrics) ───────────────────────────────────────────
+# Histogram bucket bounds, in seconds, for stage and job durations
+METRICS_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
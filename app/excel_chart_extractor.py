@@ -1,38 +1,39 @@
 """
 Excel Chart Extractor using Windows COM Automation
 Captures charts from Excel files as images
+
+Excel is started through ``ExcelCOM``, so the COM-free simulator
+(``EXCEL2PPT_COM_BACKEND=fake``) can stand in for it.
 """
 import os
+import queue
 import tempfile
-import pythoncom
-import win32com.client as win32
+import threading
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import List, Dict, Iterable, Iterator, Optional, Tuple
 import shutil
 
+from app.config import logger
+from app.services.excel_service import ExcelCOM
+
 
 class ExcelChartExtractor:
     """Extract charts from Excel files using Windows COM automation"""
     
     def __init__(self):
         self.excel_app = None
+        self._com = None
         
     def __enter__(self):
         """Initialize Excel application"""
-        pythoncom.CoInitialize()
-        self.excel_app = win32.DispatchEx('Excel.Application')
-        self.excel_app.Visible = False
-        self.excel_app.DisplayAlerts = False
+        self._com = ExcelCOM()
+        self.excel_app, _ = self._com.__enter__()
         return self
     
     def __exit__(self, exc_type, exc_val, exc_tb):
         """Clean up Excel application"""
-        if self.excel_app:
-            try:
-                self.excel_app.Quit()
-            except:
-                pass
-        pythoncom.CoUninitialize()
+        if self._com:
+            self._com.__exit__(exc_type, exc_val, exc_tb)
     
     def extract_charts_from_file(
         self, 
@@ -51,21 +52,39 @@ class ExcelChartExtractor:
         Returns:
             List of dicts with chart info: {name, sheet, image_path}
         """
+        return list(self.iter_charts_from_file(excel_path, output_dir, sheet_names))
+    
+    def iter_charts_from_file(
+        self,
+        excel_path: str,
+        output_dir: str,
+        sheet_names: Optional[List[str]] = None
+    ) -> Iterator[Dict]:
+        """
+        Yield each chart of an Excel file as soon as it is exported
+        
+        With *sheet_names*, other sheets are skipped by name before any of
+        their charts are touched; sheets keep their workbook order.  The
+        workbook is closed when the generator is exhausted or closed early.
+        
+        Args:
+            excel_path: Path to the Excel file
+            output_dir: Directory to save chart images
+            sheet_names: Optional list of specific sheet names to process
+            
+        Yields:
+            Dicts with chart info: {name, sheet, image_path, type}
+        """
         excel_path = os.path.abspath(excel_path)
         output_dir = os.path.abspath(output_dir)
         os.makedirs(output_dir, exist_ok=True)
         
-        extracted_charts = []
         workbook = None
         
         try:
             workbook = self.excel_app.Workbooks.Open(excel_path)
             
-            for sheet in workbook.Worksheets:
-                # Skip if specific sheets requested and this isn't one
-                if sheet_names and sheet.Name not in sheet_names:
-                    continue
-                
+            for sheet in self._selected_sheets(workbook.Worksheets, sheet_names):
                 # Extract embedded charts (ChartObjects)
                 for i, chart_obj in enumerate(sheet.ChartObjects(), 1):
                     chart_name = chart_obj.Name or f"Chart_{i}"
@@ -75,35 +94,38 @@ class ExcelChartExtractor:
                     # Export chart as image
                     chart_obj.Chart.Export(image_path, "PNG")
                     
-                    extracted_charts.append({
+                    yield {
                         'name': chart_name,
                         'sheet': sheet.Name,
                         'image_path': image_path,
                         'type': 'embedded'
-                    })
+                    }
                 
             # Also check for chart sheets (entire sheet is a chart)
-            for sheet in workbook.Charts:
-                if sheet_names and sheet.Name not in sheet_names:
-                    continue
-                    
+            for sheet in self._selected_sheets(workbook.Charts, sheet_names):
                 safe_name = self._safe_filename(f"ChartSheet_{sheet.Name}")
                 image_path = os.path.join(output_dir, f"{safe_name}.png")
                 
                 sheet.Export(image_path, "PNG")
                 
-                extracted_charts.append({
+                yield {
                     'name': sheet.Name,
                     'sheet': sheet.Name,
                     'image_path': image_path,
                     'type': 'chart_sheet'
-                })
+                }
                 
         finally:
             if workbook:
                 workbook.Close(SaveChanges=False)
-        
-        return extracted_charts
+    
+    @staticmethod
+    def _selected_sheets(collection, sheet_names: Optional[List[str]]) -> Iterator:
+        """Sheets of *collection* in workbook order, only the named ones if given"""
+        wanted = set(sheet_names) if sheet_names else None
+        for sheet in collection:
+            if wanted is None or sheet.Name in wanted:
+                yield sheet
     
     def capture_sheet_as_image(
         self,
@@ -210,30 +232,125 @@ class ExcelChartExtractor:
         return name
 
 
-def extract_all_charts(excel_files: List[str], output_dir: str) -> Dict[str, List[Dict]]:
+def extract_all_charts(
+    excel_files: List[str],
+    output_dir: str,
+    max_workers: int = 1
+) -> Dict[str, List[Dict]]:
     """
     Extract charts from multiple Excel files
     
     Args:
         excel_files: List of Excel file paths
         output_dir: Directory to save extracted chart images
+        max_workers: Excel instances working in parallel (see iter_all_charts)
         
     Returns:
         Dict mapping filename to list of extracted chart info
     """
-    results = {}
+    results = {os.path.basename(excel_file): [] for excel_file in excel_files}
     
-    with ExcelChartExtractor() as extractor:
-        for excel_file in excel_files:
-            filename = os.path.basename(excel_file)
-            file_output_dir = os.path.join(output_dir, Path(filename).stem)
-            
-            try:
-                charts = extractor.extract_charts_from_file(excel_file, file_output_dir)
-                results[filename] = charts
-            except Exception as e:
-                results[filename] = {'error': str(e)}
+    for filename, chart in iter_all_charts(excel_files, output_dir, max_workers=max_workers):
+        if 'error' in chart:
+            results[filename] = chart
+        else:
+            results[filename].append(chart)
     
     return results
 
 
+_WORKER_DONE = object()
+
+
+def iter_all_charts(
+    excel_files: Iterable[str],
+    output_dir: str,
+    sheet_names: Optional[List[str]] = None,
+    max_workers: int = 2
+) -> Iterator[Tuple[str, Dict]]:
+    """
+    Yield (filename, chart info) for every chart of several Excel files
+    as soon as it is exported
+    
+    Each worker thread runs its own Excel instance and takes the next file
+    when it finishes one, so results of different files interleave.  A file
+    that fails yields (filename, {'error': message}) after any charts it
+    already produced.  Closing the generator early stops the workers after
+    their current chart.
+    
+    Args:
+        excel_files: Excel file paths
+        output_dir: Directory to save chart images (one subfolder per file)
+        sheet_names: Optional list of specific sheet names to process
+        max_workers: Excel instances working in parallel
+        
+    Yields:
+        (filename, chart info) tuples, chart info as in iter_charts_from_file
+    """
+    pending = queue.Queue()
+    files = list(excel_files)
+    for excel_file in files:
+        pending.put(excel_file)
+    results = queue.Queue()
+    started = set()
+    startup_errors = []
+    stop = threading.Event()
+    
+    def worker():
+        extractor = ExcelChartExtractor()
+        try:
+            extractor.__enter__()
+        except Exception as e:
+            # Other workers take the files; reported per file if none can start
+            logger.error("Excel failed to start for chart extraction: %s", e, exc_info=True)
+            startup_errors.append(e)
+            extractor.__exit__(type(e), e, e.__traceback__)
+            results.put(_WORKER_DONE)
+            return
+        try:
+            while not stop.is_set():
+                try:
+                    excel_file = pending.get_nowait()
+                except queue.Empty:
+                    break
+                started.add(excel_file)
+                filename = os.path.basename(excel_file)
+                file_output_dir = os.path.join(output_dir, Path(filename).stem)
+                charts = extractor.iter_charts_from_file(excel_file, file_output_dir, sheet_names)
+                try:
+                    for chart in charts:
+                        results.put((filename, chart))
+                        if stop.is_set():
+                            break
+                except Exception as e:
+                    results.put((filename, {'error': str(e)}))
+                finally:
+                    charts.close()
+        finally:
+            extractor.__exit__(None, None, None)
+            results.put(_WORKER_DONE)
+    
+    workers = [
+        threading.Thread(target=worker, name=f"chart-extract-{i}")
+        for i in range(max(1, min(max_workers, len(files))))
+    ] if files else []
+    for thread in workers:
+        thread.start()
+    
+    try:
+        remaining = len(workers)
+        while remaining:
+            item = results.get()
+            if item is _WORKER_DONE:
+                remaining -= 1
+            else:
+                yield item
+        
+        # Files no worker could open because Excel failed to start
+        for excel_file in files:
+            if excel_file not in started:
+                yield os.path.basename(excel_file), {
+                    'error': f'Excel could not be started: {startup_errors[-1]}'
+                }
+    finally:
+        stop.set()
@@ -1,20 +1,60 @@
 """
 Pydantic data models for API request/response schemas.
 """
-from typing import List, Optional, Dict
-from pydantic import BaseModel, Field
+from typing import List, Optional, Dict, Union
+from pydantic import BaseModel, Field, field_validator
+
+from app.utils.chart_layout import LAYOUTS, normalize_charts
 
 
 class ChartMapping(BaseModel):
-    """A single mapping from an Excel item to a PPT slide."""
+    """A single mapping from an Excel item to a PPT slide.
+
+    ``name`` and ``page`` may also be selectors (``glob:``, ``re:``,
+    ``@chartsheets``, ``title~...``); see :mod:`app.services.mapping_resolver`.
+    ``charts`` selects several embedded charts of a worksheet, placed on
+    the slide by ``layout``; see :mod:`app.utils.chart_layout`.
+    """
     excel_id: str = Field(..., description="Uploaded Excel file ID")
-    name: str = Field(..., description="Sheet/Chart name in Excel")
-    page: int = Field(..., ge=1, description="Target PPT page number (1-based)")
-    type: str = Field(..., description="'worksheet' or 'chartsheet'")
+    name: str = Field(..., description="Sheet/Chart name in Excel, or a name selector")
+    page: Union[int, str] = Field(
+        ..., description="Target PPT page number (1-based), or a title selector"
+    )
+    type: str = Field(..., description="'worksheet', 'chartsheet' or, for patterns, 'any'")
     chart_mode: str = Field(
         default="image",
         description="'image' for static PNG or 'embedded' for editable chart",
     )
+    charts: Optional[Union[int, str, List[Union[int, str]]]] = Field(
+        default=None,
+        description="Worksheet charts to capture: 'all', a 1-based index, a chart "
+                    "name or a list of these (default: the first chart)",
+    )
+    layout: str = Field(
+        default="grid",
+        description="Arrangement of several charts: 'grid', 'horizontal' or 'vertical'",
+    )
+
+    @field_validator("page")
+    @classmethod
+    def _check_page(cls, v):
+        if isinstance(v, str) and v.strip().isdigit():
+            v = int(v)
+        if isinstance(v, int) and v < 1:
+            raise ValueError("page must be >= 1")
+        return v
+
+    @field_validator("charts")
+    @classmethod
+    def _check_charts(cls, v):
+        return normalize_charts(v)
+
+    @field_validator("layout")
+    @classmethod
+    def _check_layout(cls, v):
+        if v not in LAYOUTS:
+            raise ValueError(f"layout must be one of {', '.join(LAYOUTS)}")
+        return v
 
 
 class GenerateRequest(BaseModel):
@@ -27,6 +67,52 @@ class GenerateRequest(BaseModel):
     img_top: float = 1.4
     img_width: float = 12.0
     img_height: float = 5.6
+    optimize_images: bool = Field(
+        default=True,
+        description="Downscale and re-encode captures for their placement box",
+    )
+    stream: bool = Field(
+        default=False,
+        description="Return the .pptx directly in the response body",
+    )
+    keep_copy: bool = Field(
+        default=True,
+        description="When streaming, also keep a copy on disk for re-download",
+    )
+    profile: bool = Field(
+        default=False,
+        description="Run under a sampling profiler and return a flamegraph report",
+    )
+    memory: bool = Field(
+        default=False,
+        description="Track allocations and RSS for this job and return a memory report",
+    )
+
+
+class BatchOutputSpec(BaseModel):
+    """One output deck inside a /api/generate-batch request."""
+    output_name: str
+    mappings: List[ChartMapping]
+    chart_mode: str = "image"
+    img_left: float = 0.423
+    img_top: float = 1.4
+    img_width: float = 12.0
+    img_height: float = 5.6
+
+
+class GenerateBatchRequest(BaseModel):
+    """Request body for the /api/generate-batch endpoint."""
+    template_id: str
+    outputs: List[BatchOutputSpec] = Field(..., min_length=1)
+    archive: bool = Field(
+        default=False,
+        description="Bundle all decks into a single zip download",
+    )
+    optimize_images: bool = True
+    profile: bool = Field(
+        default=False,
+        description="Run under a sampling profiler and return a flamegraph report",
+    )
 
 
 class FileInfo(BaseModel):
@@ -71,6 +157,7 @@ class GenerateResponse(BaseModel):
     results: List[Dict]
     output_file: str
     mode: str
+    cached: bool = False
 
 
 class HealthResponse(BaseModel):
@@ -78,3 +165,4 @@ class HealthResponse(BaseModel):
     version: str
     uploads_count: int
     outputs_dir_size_mb: float
+    stale_captures: dict = {}
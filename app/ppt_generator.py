@@ -7,6 +7,8 @@ from typing import List, Dict, Optional, Tuple
 from pptx import Presentation
 from pptx.util import Inches, Pt
 
+PLACEHOLDER_PREFIX = "{{CHART_"
+
 
 class PPTGenerator:
     """Generate PowerPoint presentations with chart images"""
@@ -18,9 +20,13 @@ class PPTGenerator:
         Args:
             template_path: Path to PowerPoint template (.pptx)
         """
+        # placeholder prefix -> {key: [(slide, shape element, left, top, width, height)]}
+        self._placeholder_index: Dict[str, Dict[str, list]] = {}
+        
         if template_path and os.path.exists(template_path):
             self.prs = Presentation(template_path)
             self.template_path = template_path
+            self._placeholders(PLACEHOLDER_PREFIX)
         else:
             self.prs = Presentation()
             self.template_path = None
@@ -183,41 +189,67 @@ class PPTGenerator:
                 positions.append((left, top, item_width, item_height))
             return positions
     
+    def _placeholders(self, placeholder_prefix: str) -> Dict[str, list]:
+        """
+        Index the template's chart placeholders by key, in one pass
+        
+        Built once per prefix (for the default prefix when the template
+        loads) and kept with the presentation; filled placeholders are
+        dropped from it.
+        
+        Returns:
+            Dict mapping placeholder key to (slide, shape element, left, top,
+            width, height) entries, in slide order
+        """
+        index = self._placeholder_index.get(placeholder_prefix)
+        if index is None:
+            index = {}
+            for slide in self.prs.slides:
+                for shape in slide.shapes:
+                    if shape.name and placeholder_prefix in shape.name:
+                        key = shape.name.replace(placeholder_prefix, "").replace("}}", "")
+                        index.setdefault(key, []).append(
+                            (slide, shape._element, shape.left, shape.top, shape.width, shape.height)
+                        )
+            self._placeholder_index[placeholder_prefix] = index
+        return index
+    
     def fill_template_placeholders(
         self,
         chart_mapping: Dict[str, str],
-        placeholder_prefix: str = "{{CHART_"
-    ) -> None:
+        placeholder_prefix: str = PLACEHOLDER_PREFIX
+    ) -> int:
         """
         Fill placeholder images in template with actual charts
         
+        Placeholders are looked up in the template's placeholder index, so
+        the cost is proportional to the number of placeholders filled, not
+        to the size of the deck.  Each chart is placed at the placeholder's
+        position and width, keeping the image's own aspect ratio.
+        
         Args:
             chart_mapping: Dict mapping placeholder name to chart image path
             placeholder_prefix: Prefix used to identify chart placeholders
+            
+        Returns:
+            Number of placeholders replaced
         """
-        for slide in self.prs.slides:
-            for shape in slide.shapes:
-                # Check if shape name matches a placeholder
-                if shape.name and placeholder_prefix in shape.name:
-                    # Extract placeholder key
-                    key = shape.name.replace(placeholder_prefix, "").replace("}}", "")
-                    
-                    if key in chart_mapping and os.path.exists(chart_mapping[key]):
-                        # Get position of placeholder
-                        left = shape.left
-                        top = shape.top
-                        width = shape.width
-                        height = shape.height
-                        
-                        # Remove placeholder
-                        sp = shape._element
-                        sp.getparent().remove(sp)
-                        
-                        # Add chart image in same position
-                        slide.shapes.add_picture(
-                            chart_mapping[key],
-                            left, top, width=width
-                        )
+        index = self._placeholders(placeholder_prefix)
+        filled = 0
+        
+        for key, image_path in chart_mapping.items():
+            if key not in index or not os.path.exists(image_path):
+                continue
+            
+            for slide, element, left, top, width, _height in index.pop(key):
+                # Remove placeholder
+                element.getparent().remove(element)
+                
+                # Add chart image in same position
+                slide.shapes.add_picture(image_path, left, top, width=width)
+                filled += 1
+        
+        return filled
     
     def generate_from_charts(
         self,
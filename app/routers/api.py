@@ -1,12 +1,18 @@
 """
 API router — all REST endpoints for the Excel-to-PPT application.
 """
+import contextvars
+import json
 import uuid
 import shutil
+import hashlib
+from contextlib import nullcontext
 from pathlib import Path
+from urllib.parse import quote
 
 from fastapi import APIRouter, UploadFile, File, HTTPException
-from fastapi.responses import FileResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
 
 from app.config import (
     logger,
@@ -15,16 +21,33 @@ from app.config import (
     APP_VERSION,
     ALLOWED_EXCEL_EXTENSIONS,
     ALLOWED_PPT_EXTENSIONS,
+    JOB_EVENT_KEEPALIVE,
 )
-from app.models.schemas import GenerateRequest, HealthResponse
+from app.models.schemas import GenerateRequest, GenerateBatchRequest, HealthResponse
 from app.services.excel_service import get_excel_info
 from app.services.ppt_service import (
     get_ppt_info,
     get_ppt_slide_titles,
     process_image_mappings,
     process_embedded_mappings,
+    output_filename,
 )
+from app.services.plan_service import plan_generate
+from app.services.mapping_resolver import resolve_chart_mappings
+from app.services.batch_service import generate_batch, write_batch_archive
 from app.services.file_manager import file_manager, get_directory_size_mb
+from app.services.job_registry import job_registry
+from app.services.result_cache import result_cache, request_fingerprint
+from app.utils.metrics import (
+    JOBS, RESULT_CACHE, UPLOAD_BYTES, job_timings, record_decks, record_results, registry,
+    stage_timer,
+)
+from app.utils.memory import MEMORY_FILENAME, MemoryTracker, note_package
+from app.utils.phash import stale_capture_stats
+from app.utils.profiler import PROFILE_FILENAME, SamplingProfiler
+from app.utils.progress import report
+from app.utils.tracing import span
+from app.utils.pptx_stream import iter_presentation
 
 from pptx import Presentation
 
@@ -43,13 +66,17 @@ async def upload_excel(file: UploadFile = File(...)):
     file_id = uuid.uuid4().hex[:8]
     file_path = UPLOAD_DIR / f"{file_id}_{file.filename}"
 
-    with open(file_path, "wb") as f:
-        content = await file.read()
-        f.write(content)
+    content = await file.read()
+    digest = await run_in_threadpool(_save_upload, file_path, content)
+    UPLOAD_BYTES.inc(len(content), kind="excel")
 
     try:
-        info = get_excel_info(str(file_path))
-        file_manager.register(file_id, "excel", str(file_path), file.filename)
+        # COM work blocks for seconds: keep it off the event loop
+        info = await run_in_threadpool(get_excel_info, str(file_path))
+        file_manager.register(
+            file_id, "excel", str(file_path), file.filename,
+            metadata=info, sha256=digest,
+        )
 
         return {
             "status": "success",
@@ -65,6 +92,13 @@ async def upload_excel(file: UploadFile = File(...)):
         raise HTTPException(500, f"讀取 Excel 失敗: {e}")
 
 
+def _save_upload(file_path: Path, content: bytes) -> str:
+    """Write an upload to disk and return its SHA-256 (runs in the thread pool)."""
+    with open(file_path, "wb") as f:
+        f.write(content)
+    return hashlib.sha256(content).hexdigest()
+
+
 # ============================================================
 # Upload PPT
 # ============================================================
@@ -77,13 +111,16 @@ async def upload_ppt(file: UploadFile = File(...)):
     file_id = uuid.uuid4().hex[:8]
     file_path = UPLOAD_DIR / f"{file_id}_{file.filename}"
 
-    with open(file_path, "wb") as f:
-        content = await file.read()
-        f.write(content)
+    content = await file.read()
+    digest = await run_in_threadpool(_save_upload, file_path, content)
+    UPLOAD_BYTES.inc(len(content), kind="ppt")
 
     try:
-        info = get_ppt_info(str(file_path))
-        file_manager.register(file_id, "ppt", str(file_path), file.filename)
+        info = await run_in_threadpool(get_ppt_info, str(file_path))
+        file_manager.register(
+            file_id, "ppt", str(file_path), file.filename,
+            metadata=info, sha256=digest,
+        )
 
         return {"status": "success", "file_id": file_id, "filename": file.filename, **info}
     except Exception as e:
@@ -104,6 +141,61 @@ async def remove_file(file_id: str):
     raise HTTPException(404, "檔案不存在")
 
 
+# ============================================================
+# Find an earlier upload by content hash
+# ============================================================
+@router.get("/files/by-hash/{sha256}")
+async def find_upload(sha256: str, kind: str):
+    """Return an upload of *kind* (``excel`` / ``ppt``) with this SHA-256.
+
+    Lets clients skip uploading a file the server already has: the response
+    has the same shape as the upload endpoints'.  404 if there is none.
+    """
+    found = file_manager.find_by_hash(sha256.lower(), kind)
+    if not found:
+        raise HTTPException(404, "找不到相同內容的檔案")
+    file_id, info = found
+    return {
+        "status": "success",
+        "file_id": file_id,
+        "filename": info["filename"],
+        **(info.get("metadata") or {}),
+    }
+
+
+# ============================================================
+# Dry-run plan
+# ============================================================
+@router.post("/plan")
+async def plan_ppt(request: GenerateRequest):
+    """Validate a generate request against cached metadata, without COM.
+
+    Returns the execution plan (per-mapping strategy, layout and estimated
+    cost in milliseconds) plus any errors that would make mappings fail.
+    """
+    template_info = file_manager.get(request.template_id)
+    uploaded_files = {m.excel_id: file_manager.get(m.excel_id) for m in request.mappings}
+    resolution = resolve_chart_mappings(
+        request.mappings, (template_info or {}).get("metadata"), uploaded_files
+    )
+    request.mappings = resolution["mappings"]
+    plan = plan_generate(request, template_info, uploaded_files)
+    plan["errors"] = resolution["errors"] + plan["errors"]
+    plan["warnings"] = resolution["warnings"] + plan["warnings"]
+    plan["valid"] = plan["valid"] and not resolution["errors"]
+    return {"status": "success", **plan}
+
+
+def _resolve_mappings(mappings: list, template_info: dict, uploaded_files: dict) -> list:
+    """Expand pattern mappings against cached metadata (400 if a rule is invalid)."""
+    resolution = resolve_chart_mappings(mappings, template_info.get("metadata"), uploaded_files)
+    if resolution["errors"]:
+        raise HTTPException(400, "；".join(resolution["errors"]))
+    for warning in resolution["warnings"]:
+        logger.warning("[Mappings] %s", warning)
+    return resolution["mappings"]
+
+
 # ============================================================
 # Generate PPT  (sync — FastAPI runs it in a thread pool)
 # ============================================================
@@ -114,11 +206,36 @@ def generate_ppt(request: GenerateRequest):
     NOTE: This is intentionally a **sync** function (``def``, not ``async def``)
     so that FastAPI automatically runs it in a thread pool, preventing the
     long-running COM operations from blocking the event loop.
+
+    With ``stream`` set, the deck itself is the response body; image-only
+    jobs are serialized straight into the response without a disk round
+    trip (a copy is still kept for re-download unless ``keep_copy`` is off).
+
+    Non-streaming calls are idempotent: a request identical to a completed
+    or in-flight one (same settings, same input *content*) returns that
+    job's result with ``"cached": true`` instead of running again.
+
+    With ``profile`` set, the job always runs, under a sampling profiler;
+    the folded-stack report is saved in the job directory and linked as
+    ``profile_url`` (``X-Profile-Url`` when streaming).
+
+    With ``memory`` set, the job always runs with allocation tracking and
+    returns a ``memory`` report (saved as ``memory.json`` and linked as
+    ``X-Memory-Url`` when streaming, once the deck has been sent).
+    """
+    template_info, uploaded_files = _generate_inputs(request)
+    return _generate_cached(request, template_info, uploaded_files)
+
+
+def _generate_inputs(request: GenerateRequest):
+    """Look up a generate request's uploads and expand its pattern mappings.
+
+    Returns:
+        ``(template_info, uploaded_files)``; raises 404 / 400 ``HTTPException``.
     """
     template_info = file_manager.get(request.template_id)
     if not template_info:
         raise HTTPException(404, "PPT 模板不存在，請重新上傳")
-    template_path = template_info["path"]
 
     # Build a lookup for uploaded files needed by mappings
     uploaded_files: dict = {}
@@ -127,13 +244,136 @@ def generate_ppt(request: GenerateRequest):
         if not info:
             raise HTTPException(404, f"Excel 檔案不存在: {m.excel_id}")
         uploaded_files[m.excel_id] = info
+    request.mappings = _resolve_mappings(request.mappings, template_info, uploaded_files)
+    return template_info, uploaded_files
+
+
+def _generate_cached(request: GenerateRequest, template_info: dict, uploaded_files: dict):
+    """Run a generate job, or reuse an identical completed / in-flight one."""
+    # Identical request + identical input content => reuse the same job
+    hashes = {
+        fid: file_manager.content_hash(fid)
+        for fid in {request.template_id, *uploaded_files}
+    }
+    if request.stream or request.profile or request.memory or None in hashes.values():
+        RESULT_CACHE.inc(outcome="bypass")
+        return _run_generate(request, template_info, uploaded_files)
+
+    result, reused = result_cache.run(
+        request_fingerprint(request, hashes),
+        lambda: _run_generate(request, template_info, uploaded_files),
+        is_valid=lambda r: Path(r["output_file"]).exists(),
+        should_store=lambda r: all(x["status"] == "success" for x in r["results"]),
+    )
+    RESULT_CACHE.inc(outcome="hit" if reused else "miss")
+    if reused:
+        logger.info("[Generate] Reusing job %s for identical request", result["job_id"])
+    return {**result, "cached": reused}
+
+
+def _run_generate(request: GenerateRequest, template_info: dict, uploaded_files: dict):
+    """Run one generate job, recording its stage timings and outcome.
+
+    The job runs in a context of its own so that a streamed deck can be
+    finished from the response body: its outcome, total time and memory /
+    profile reports are only taken once the last chunk has been sent.
+    """
+    context = contextvars.copy_context()
+    job = _generate_steps(request, template_info, uploaded_files)
+    result = context.run(next, job)
+    if isinstance(result, StreamingResponse):
+        result.body_iterator = _finish_with_body(result.body_iterator, context, job)
+    return result
+
 
+async def _finish_with_body(body, context: contextvars.Context, job):
+    """Relay *body*, then resume *job* (or throw the stream's error into it)."""
+    try:
+        async for chunk in body:
+            yield chunk
+    except BaseException as e:
+        # Inline, as a cancelled stream cannot await the thread pool; the job
+        # records the failure and re-raises *e*
+        context.run(job.throw, e)
+    await run_in_threadpool(context.run, next, job, None)
+
+
+def _generate_steps(request: GenerateRequest, template_info: dict, uploaded_files: dict):
+    """Generator running one job; yields its result.
+
+    A streaming response is yielded while the job is still open, and the job
+    finishes when it is resumed after the body.  Any other result is yielded
+    once the job has finished.
+    """
     job_id = uuid.uuid4().hex[:8]
     job_dir = OUTPUT_DIR / job_id
     job_dir.mkdir(exist_ok=True)
 
+    profiler = SamplingProfiler() if request.profile else nullcontext()
+    memory = MemoryTracker("generate") if request.memory else nullcontext()
+    attributes = {
+        "job.id": job_id,
+        "template.file": template_info["filename"],
+        "mappings.count": len(request.mappings),
+    }
+    streamed = False
+    with span("generate", attributes) as root, job_timings("generate") as timings, \
+            profiler, memory:
+        try:
+            result = _generate_job(
+                request, template_info, uploaded_files, job_id, job_dir, timings
+            )
+            if isinstance(result, dict):
+                result["trace_id"] = root.trace_id
+            else:
+                # Reports of a response are written when the job finishes
+                result.headers["X-Trace-Id"] = root.trace_id
+                if request.memory:
+                    result.headers["X-Memory-Url"] = f"/api/download/{job_id}/{MEMORY_FILENAME}"
+                if request.profile:
+                    result.headers["X-Profile-Url"] = f"/api/download/{job_id}/{PROFILE_FILENAME}"
+            if isinstance(result, StreamingResponse):
+                streamed = True
+                yield result
+        except BaseException:
+            JOBS.inc(endpoint="generate", status="error")
+            raise
+    JOBS.inc(endpoint="generate", status="success")
+
+    if request.memory:
+        report = memory.as_dict()
+        logger.info(
+            "[Generate] Job %s memory: traced peak %.1f MB, RSS %s -> %s bytes",
+            job_id, report["traced_peak_bytes"] / 1024 / 1024,
+            report["rss_start_bytes"], report["rss_end_bytes"],
+        )
+        if isinstance(result, dict):
+            result["memory"] = report
+        else:
+            (job_dir / MEMORY_FILENAME).write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+    if request.profile:
+        profiler.write_folded(job_dir / PROFILE_FILENAME)
+        if isinstance(result, dict):
+            result["profile_url"] = f"/api/download/{job_id}/{PROFILE_FILENAME}"
+    if not streamed:
+        yield result
+
+
+def _generate_job(
+    request: GenerateRequest,
+    template_info: dict,
+    uploaded_files: dict,
+    job_id: str,
+    job_dir: Path,
+    timings,
+):
+    """Run one generate job into *job_dir*."""
+    template_path = template_info["path"]
+
     try:
-        slide_titles = get_ppt_slide_titles(template_path)
+        with stage_timer("template_load"):
+            slide_titles = get_ppt_slide_titles(template_path)
 
         image_mappings = [m for m in request.mappings if m.chart_mode == "image"]
         embedded_mappings = [m for m in request.mappings if m.chart_mode == "embedded"]
@@ -144,24 +384,32 @@ def generate_ppt(request: GenerateRequest):
             len(embedded_mappings),
         )
 
-        output_filename = (
-            f"{request.output_name}.pptx"
-            if not request.output_name.endswith(".pptx")
-            else request.output_name
-        )
-        output_path = job_dir / output_filename
+        filename = output_filename(request.output_name)
+        output_path = job_dir / filename
 
         all_results = []
 
         # Step 1: image mode (python-pptx)
         if image_mappings:
             logger.info("[Generate] Processing image mode mappings...")
-            prs = Presentation(template_path)
+            with stage_timer("template_load"):
+                prs = Presentation(template_path)
             image_results = process_image_mappings(
                 image_mappings, prs, request, job_dir, slide_titles, uploaded_files
             )
             all_results.extend(image_results)
-            prs.save(str(output_path))
+            note_package(prs)
+
+            if request.stream and not embedded_mappings:
+                record_results(all_results)
+                return _stream_presentation(
+                    prs, job_id, filename,
+                    output_path if request.keep_copy else None,
+                    all_results, timings,
+                )
+            report("save", filename)
+            with stage_timer("save"):
+                prs.save(str(output_path))
         else:
             shutil.copy(template_path, str(output_path))
 
@@ -177,6 +425,16 @@ def generate_ppt(request: GenerateRequest):
             )
             all_results.extend(embedded_results)
 
+        record_results(all_results)
+        if request.stream:
+            # Embedded mode needs the file on disk anyway; stream it from there
+            return FileResponse(
+                output_path,
+                media_type=_DOWNLOAD_MEDIA_TYPES[".pptx"],
+                filename=filename,
+                headers=_result_headers(job_id, filename, all_results, timings),
+            )
+
         # Determine mode string
         if image_mappings and embedded_mappings:
             mode_str = "mixed"
@@ -188,10 +446,11 @@ def generate_ppt(request: GenerateRequest):
         return {
             "status": "success",
             "job_id": job_id,
-            "download_url": f"/api/download/{job_id}/{output_filename}",
+            "download_url": f"/api/download/{job_id}/{filename}",
             "results": all_results,
             "output_file": str(output_path),
             "mode": mode_str,
+            "timings": timings.as_dict(),
         }
 
     except Exception as e:
@@ -199,9 +458,189 @@ def generate_ppt(request: GenerateRequest):
         raise HTTPException(500, f"產生 PPT 失敗: {e}")
 
 
+def _stream_presentation(prs, job_id: str, filename: str, keep_path, results, timings):
+    """Return *prs* as a StreamingResponse serialized on the fly."""
+    headers = _result_headers(job_id, filename if keep_path else None, results, timings)
+    headers["Content-Disposition"] = f"attachment; filename*=utf-8''{quote(filename)}"
+    return StreamingResponse(
+        iter_presentation(prs, tee_path=keep_path),
+        media_type=_DOWNLOAD_MEDIA_TYPES[".pptx"],
+        headers=headers,
+    )
+
+
+def _result_headers(job_id: str, filename, results, timings) -> dict:
+    """Summarise a generate call in response headers (streaming mode)."""
+    headers = {
+        "X-Job-Id": job_id,
+        "X-Results-Success": str(sum(1 for r in results if r["status"] == "success")),
+        "X-Results-Failed": str(sum(1 for r in results if r["status"] != "success")),
+        "Server-Timing": timings.server_timing(),
+    }
+    if filename:
+        headers["X-Download-Url"] = quote(f"/api/download/{job_id}/{filename}")
+    return headers
+
+
+# ============================================================
+# Generate many decks in one call
+# ============================================================
+@router.post("/generate-batch")
+def generate_ppt_batch(request: GenerateBatchRequest):
+    """Generate one deck per output spec from a shared template.
+
+    Distinct (workbook, item) pairs are captured once for the whole batch and
+    the decks are assembled in parallel.  Sync for the same reason as
+    :func:`generate_ppt`.
+
+    ``status`` is ``partial`` when some decks failed and ``failed`` when all
+    did; the failed entries in ``outputs`` carry a ``code`` (``deck_failed``
+    or ``embedded_failed``).
+    """
+    template_info = file_manager.get(request.template_id)
+    if not template_info:
+        raise HTTPException(404, "PPT 模板不存在，請重新上傳")
+
+    filenames = [output_filename(spec.output_name) for spec in request.outputs]
+    if len(set(filenames)) != len(filenames):
+        raise HTTPException(400, "輸出檔名重複")
+
+    uploaded_files: dict = {}
+    for spec in request.outputs:
+        for m in spec.mappings:
+            info = file_manager.get(m.excel_id)
+            if not info:
+                raise HTTPException(404, f"Excel 檔案不存在: {m.excel_id}")
+            uploaded_files[m.excel_id] = info
+    for spec in request.outputs:
+        spec.mappings = _resolve_mappings(spec.mappings, template_info, uploaded_files)
+
+    job_id = uuid.uuid4().hex[:8]
+    job_dir = OUTPUT_DIR / job_id
+    job_dir.mkdir(exist_ok=True)
+
+    attributes = {
+        "job.id": job_id,
+        "template.file": template_info["filename"],
+        "decks.count": len(request.outputs),
+    }
+    profiler = SamplingProfiler() if request.profile else nullcontext()
+    with span("generate_batch", attributes) as root, job_timings("generate_batch") as timings, \
+            profiler:
+        try:
+            outputs = generate_batch(request, template_info["path"], uploaded_files, job_dir)
+        except Exception as e:
+            JOBS.inc(endpoint="generate_batch", status="error")
+            logger.error("Batch generate failed: %s", e, exc_info=True)
+            raise HTTPException(500, f"批次產生 PPT 失敗: {e}")
+
+    for out in outputs:
+        record_results(out["results"])
+        if out["status"] == "success":
+            out["download_url"] = f"/api/download/{job_id}/{out.pop('filename')}"
+    record_decks(outputs)
+    status = _batch_status(outputs)
+    JOBS.inc(endpoint="generate_batch", status=status)
+
+    response = {
+        "status": status,
+        "job_id": job_id,
+        "outputs": outputs,
+        "mode": "batch",
+        "timings": timings.as_dict(),
+        "trace_id": root.trace_id,
+    }
+    if request.archive:
+        archive = write_batch_archive(outputs, job_dir / f"batch_{job_id}.zip")
+        response["download_url"] = f"/api/download/{job_id}/{archive.name}"
+    if request.profile:
+        profiler.write_folded(job_dir / PROFILE_FILENAME)
+        response["profile_url"] = f"/api/download/{job_id}/{PROFILE_FILENAME}"
+    return response
+
+
+def _batch_status(outputs: list) -> str:
+    """``success`` when every deck was built, ``failed`` when none was, else ``partial``."""
+    failed = sum(1 for out in outputs if out["status"] != "success")
+    if not failed:
+        return "success"
+    return "failed" if failed == len(outputs) else "partial"
+
+
+# ============================================================
+# Background jobs (submit, then poll or follow progress)
+# ============================================================
+@router.post("/jobs")
+def submit_job(request: GenerateRequest):
+    """Queue a generate job and return its id at once.
+
+    The job runs like :func:`generate_ppt` — identical requests reuse the
+    result cache — except that ``stream`` is ignored.  Missing uploads and
+    invalid rules are rejected here, before anything is queued.  Follow the
+    job with ``GET /api/jobs/{id}`` or the ``/events`` progress stream.
+    """
+    request.stream = False
+    template_info, uploaded_files = _generate_inputs(request)
+    job = job_registry.submit(lambda: _generate_cached(request, template_info, uploaded_files))
+    logger.info("[Jobs] Queued job %s (%d mappings)", job.id, len(request.mappings))
+    return {
+        "status": "success",
+        "id": job.id,
+        "status_url": f"/api/jobs/{job.id}",
+        "events_url": f"/api/jobs/{job.id}/events",
+    }
+
+
+def _get_job(job_id: str):
+    job = job_registry.get(job_id)
+    if job is None:
+        raise HTTPException(404, "工作不存在或已過期")
+    return job
+
+
+@router.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    """Return a job's current state; finished jobs include ``result`` or ``error``."""
+    return _get_job(job_id).snapshot()
+
+
+@router.get("/jobs/{job_id}/events")
+def job_events(job_id: str, after: int = 0):
+    """Stream a job's progress events as NDJSON, one snapshot per line.
+
+    Events with ``seq`` greater than *after* are sent as they happen; the
+    stream ends after the final ``success`` / ``error`` event.  While the
+    job is idle the current state is repeated every
+    ``JOB_EVENT_KEEPALIVE`` seconds.
+    """
+    job = _get_job(job_id)
+
+    def lines():
+        seq = after
+        while True:
+            events = job.wait(seq, timeout=JOB_EVENT_KEEPALIVE)
+            if not events:
+                events = [] if job.finished else [job.snapshot()]
+            for event in events:
+                yield json.dumps(event, ensure_ascii=False) + "\n"
+            seq = max([seq] + [e["seq"] for e in events])
+            if job.finished and seq >= job.snapshot()["seq"]:
+                return
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
 # ============================================================
 # Download
 # ============================================================
+_DOWNLOAD_MEDIA_TYPES = {
+    ".pptx": "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+    ".zip": "application/zip",
+    ".folded": "text/plain; charset=utf-8",
+    ".json": "application/json",
+}
+
+
 @router.get("/download/{job_id}/{filename}")
 async def download_file(job_id: str, filename: str):
     """Download a generated file."""
@@ -210,11 +649,24 @@ async def download_file(job_id: str, filename: str):
         raise HTTPException(404, "檔案不存在或已過期")
     return FileResponse(
         file_path,
-        media_type="application/vnd.openxmlformats-officedocument.presentationml.presentation",
+        media_type=_DOWNLOAD_MEDIA_TYPES.get(
+            file_path.suffix.lower(), "application/octet-stream"
+        ),
         filename=filename,
     )
 
 
+# ============================================================
+# Metrics
+# ============================================================
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Expose stage latencies and job counters in Prometheus text format."""
+    return PlainTextResponse(
+        registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
 # ============================================================
 # Health check
 # ============================================================
@@ -225,5 +677,6 @@ async def health():
         status="ok",
         version=APP_VERSION,
         uploads_count=file_manager.count,
-        outputs_dir_size_mb=round(get_directory_size_mb(OUTPUT_DIR), 2),
+        outputs_dir_size_mb=round(await run_in_threadpool(get_directory_size_mb, OUTPUT_DIR), 2),
+        stale_captures=stale_capture_stats.snapshot(),
     )
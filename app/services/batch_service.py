@@ -0,0 +1,186 @@
+"""
+Batch generation service.
+
+Builds many decks from one template and a shared set of captures: every
+distinct (workbook, item) is captured once, the template is read and its
+slide titles parsed once, and the decks are assembled in parallel.
+"""
+import io
+import zipfile
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from pptx import Presentation
+
+from app.config import logger, BATCH_MAX_WORKERS
+from app.models.schemas import BatchOutputSpec, GenerateBatchRequest, GenerateRequest
+from app.services.ppt_service import (
+    get_slide_title,
+    capture_image_mappings,
+    collect_placement_boxes,
+    insert_image_mappings,
+    process_embedded_mappings,
+    output_filename,
+    release_captures,
+)
+from app.utils.capture_result import CaptureResult
+from app.utils.image_optimizer import optimize_images
+from app.utils.metrics import stage_timer
+from app.utils.profiler import sampled_thread
+from app.utils.tracing import span
+
+
+def generate_batch(
+    request: GenerateBatchRequest,
+    template_path: str,
+    uploaded_files: dict,
+    job_dir: Path,
+) -> List[dict]:
+    """Generate every deck in *request* into *job_dir*.
+
+    Returns:
+        One result dict per output spec, in request order.
+    """
+    template_bytes = Path(template_path).read_bytes()
+    prs = Presentation(io.BytesIO(template_bytes))
+    slide_titles = {idx + 1: get_slide_title(s) for idx, s in enumerate(prs.slides)}
+    del prs
+
+    # Step 1: capture the union of all image mappings once
+    image_mappings = [
+        m for spec in request.outputs for m in spec.mappings if m.chart_mode == "image"
+    ]
+    logger.info(
+        "[Batch] %d deck(s), %d image mapping(s)", len(request.outputs), len(image_mappings)
+    )
+    extracted = capture_image_mappings(image_mappings, job_dir, uploaded_files)
+    try:
+        return _assemble(request, template_bytes, extracted, slide_titles, uploaded_files, job_dir)
+    finally:
+        release_captures(extracted)
+
+
+def _assemble(
+    request: GenerateBatchRequest,
+    template_bytes: bytes,
+    extracted: Dict[str, CaptureResult],
+    slide_titles: Dict[int, str],
+    uploaded_files: dict,
+    job_dir: Path,
+) -> List[dict]:
+    """Optimize the shared captures, then build and finish every deck."""
+    if request.optimize_images:
+        boxes: Dict[str, Tuple[float, float]] = {}
+        for spec in request.outputs:
+            collect_placement_boxes(
+                spec.mappings, _deck_request(request.template_id, spec),
+                extracted, slide_titles, boxes,
+            )
+        with stage_timer("optimize"):
+            optimize_images((extracted[k], w, h) for k, (w, h) in boxes.items())
+
+    # Step 2: assemble decks in parallel (python-pptx only, no COM)
+    def build(spec: BatchOutputSpec) -> dict:
+        try:
+            with sampled_thread(), span("build_deck", {"deck.name": spec.output_name}):
+                return _build_deck(
+                    spec, request.template_id, template_bytes, extracted,
+                    slide_titles, uploaded_files, job_dir,
+                )
+        except Exception as e:
+            logger.error("[Batch] Deck '%s' failed: %s", spec.output_name, e, exc_info=True)
+            return {
+                "output_name": spec.output_name,
+                "status": "failed",
+                "code": "deck_failed",
+                "reason": str(e),
+                "results": [],
+            }
+
+    workers = max(1, min(BATCH_MAX_WORKERS, len(request.outputs)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # Each deck runs in a copy of this context so its stages count toward the job
+        futures = [
+            pool.submit(contextvars.copy_context().run, build, spec)
+            for spec in request.outputs
+        ]
+        outputs = [f.result() for f in futures]
+
+    # Step 3: embedded mode needs COM and the saved file, so it runs serially
+    for spec, out in zip(request.outputs, outputs):
+        embedded = [m for m in spec.mappings if m.chart_mode == "embedded"]
+        if not embedded or out["status"] != "success":
+            continue
+        try:
+            out["results"].extend(
+                process_embedded_mappings(
+                    embedded,
+                    str(Path(out["output_file"]).resolve()),
+                    _deck_request(request.template_id, spec),
+                    slide_titles,
+                    uploaded_files,
+                )
+            )
+        except Exception as e:
+            logger.error("[Batch] Embedded step for '%s' failed: %s", spec.output_name, e)
+            out["status"] = "failed"
+            out["code"] = "embedded_failed"
+            out["reason"] = f"可編輯圖表處理失敗: {e}"
+
+    return outputs
+
+
+def write_batch_archive(outputs: List[dict], archive_path: Path) -> Path:
+    """Bundle every successfully generated deck into a zip at *archive_path*."""
+    # .pptx is already deflated; storing avoids recompressing 100+ MB decks
+    with zipfile.ZipFile(archive_path, "w", compression=zipfile.ZIP_STORED) as zf:
+        for out in outputs:
+            if out["status"] == "success":
+                zf.write(out["output_file"], arcname=Path(out["output_file"]).name)
+    return archive_path
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+def _deck_request(template_id: str, spec: BatchOutputSpec) -> GenerateRequest:
+    """Project a batch output spec onto a single-deck request."""
+    return GenerateRequest(template_id=template_id, **spec.model_dump())
+
+
+def _build_deck(
+    spec: BatchOutputSpec,
+    template_id: str,
+    template_bytes: bytes,
+    extracted: Dict[str, CaptureResult],
+    slide_titles: Dict[int, str],
+    uploaded_files: dict,
+    job_dir: Path,
+) -> dict:
+    """Insert the pre-captured images for one spec and save the deck."""
+    filename = output_filename(spec.output_name)
+    output_path = job_dir / filename
+    image_mappings = [m for m in spec.mappings if m.chart_mode == "image"]
+
+    results: List[dict] = []
+    if image_mappings:
+        with stage_timer("template_load"):
+            prs = Presentation(io.BytesIO(template_bytes))
+        results = insert_image_mappings(
+            image_mappings, prs, _deck_request(template_id, spec),
+            extracted, slide_titles, uploaded_files,
+        )
+        with stage_timer("save"):
+            prs.save(str(output_path))
+    else:
+        output_path.write_bytes(template_bytes)
+
+    return {
+        "output_name": spec.output_name,
+        "status": "success",
+        "filename": filename,
+        "output_file": str(output_path),
+        "results": results,
+    }
@@ -0,0 +1,103 @@
+"""
+Persistent capture cache for the CLI.
+
+Captured PNGs are stored under a key derived from the workbook's content
+hash and the item's type and name, so a rerun against an unchanged
+workbook (for example while tuning ``--img-*`` layout) skips Excel for
+every item it has seen.  The directory is capped in size: the least
+recently used captures are evicted first, recency being the file mtime,
+which a hit refreshes.
+
+Entries are written to a temporary file and renamed into place, so
+several CLI processes (batch workers) can share one directory.
+"""
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+from app.config import logger, CAPTURE_CACHE_DIR, CAPTURE_CACHE_MAX_MB
+from app.utils.capture_result import CaptureResult
+
+# Bump when the capture output changes so old entries stop matching
+_FORMAT_VERSION = 1
+_SUFFIX = ".png"
+
+
+class CaptureCache:
+    """Size-capped on-disk store of captured images."""
+
+    def __init__(self, directory=None, max_mb: float = None):
+        self.directory = Path(directory or CAPTURE_CACHE_DIR)
+        if max_mb is None:
+            max_mb = CAPTURE_CACHE_MAX_MB
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(workbook_hash: str, name: str, item_type: str) -> str:
+        """Return the cache key of one item of the workbook with content *workbook_hash*."""
+        raw = f"{_FORMAT_VERSION}|{workbook_hash}|{item_type}|{name}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}{_SUFFIX}"
+
+    def get(self, workbook_hash: str, name: str, item_type: str) -> Optional[CaptureResult]:
+        """Return the cached capture of an item, or ``None``."""
+        path = self._path(self.key(workbook_hash, name, item_type))
+        try:
+            capture = CaptureResult.from_file(str(path))
+            os.utime(path)  # mark as recently used
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return capture
+
+    def put(self, workbook_hash: str, name: str, item_type: str, capture: CaptureResult):
+        """Store *capture* for an item (failures are logged, not raised)."""
+        path = self._path(self.key(workbook_hash, name, item_type))
+        try:
+            fd, temp = tempfile.mkstemp(suffix=".tmp", dir=self.directory)
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(capture.data)
+                os.replace(temp, path)
+            except BaseException:
+                os.remove(temp)
+                raise
+        except OSError as e:
+            logger.warning("Cannot cache capture of %s: %s", name, e)
+
+    def trim(self) -> int:
+        """Evict least recently used captures until the cache fits its size cap.
+
+        Returns:
+            The number of captures removed.
+        """
+        entries = []
+        for path in self.directory.glob(f"*{_SUFFIX}"):
+            try:
+                st = path.stat()
+            except OSError:
+                continue  # removed by another process
+            entries.append((st.st_mtime_ns, st.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue  # in use or already gone
+            total -= size
+            removed += 1
+        if removed:
+            logger.info("Capture cache: evicted %d capture(s), %.1f MB kept", removed, total / 1024 / 1024)
+        return removed
@@ -0,0 +1,173 @@
+"""
+Learned capture-strategy ordering.
+
+Chart sheets and worksheet charts can be captured several ways (direct
+``Export``, ``CopyPicture`` + paste, ``UsedRange`` fallback).  For some
+workbooks the default first choice fails every time and only wastes
+seconds.  The learner records which strategy succeeded per
+(workbook template fingerprint, sheet kind) and orders the strategies of
+later captures by their observed success rate, so jobs go straight to the
+one that works.  History is persisted as JSON across restarts.
+
+Only the strategies that capture the chart itself are ranked.  The
+``UsedRange`` fallback always stays last: a picture of the whole sheet
+passes image validation even though it is not the chart, so promoting it
+would silently replace every chart of a template with a sheet
+screenshot.  A demoted strategy is tried first again every
+``STRATEGY_EXPLORE_EVERY`` captures, so one that failed transiently can
+recover.
+"""
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from app.config import logger, STRATEGY_STATS_FILE, STRATEGY_HISTORY_MAX, STRATEGY_EXPLORE_EVERY
+from app.utils.metrics import registry
+
+# Default order per sheet kind (used as-is until there is history)
+DEFAULT_STRATEGIES: Dict[str, List[str]] = {
+    "chartsheet": ["export", "copypicture"],
+    "worksheet_chart": ["export", "copypicture", "usedrange"],
+    "worksheet_range": ["usedrange"],
+}
+# Fallbacks are never ranked; they keep their default place at the end
+FALLBACK_STRATEGIES = ("usedrange",)
+
+STRATEGY_ATTEMPTS = registry.counter(
+    "excel2ppt_capture_strategy_total",
+    "Capture strategy attempts by sheet kind, strategy and outcome.",
+    ["kind", "strategy", "outcome"],
+)
+STRATEGY_REORDERED = registry.counter(
+    "excel2ppt_capture_strategy_reordered_total",
+    "Captures that used a learned (non-default) strategy order.",
+    ["kind"],
+)
+STRATEGY_EXPLORED = registry.counter(
+    "excel2ppt_capture_strategy_explored_total",
+    "Captures that tried a demoted strategy first to check whether it recovered.",
+    ["kind"],
+)
+
+
+def workbook_fingerprint(metadata: Optional[dict]) -> Optional[str]:
+    """Fingerprint a workbook's *structure* (sheet names and kinds), not its data.
+
+    Reports generated from the same template share a fingerprint even though
+    their numbers differ.
+
+    Args:
+        metadata: The ``get_excel_info`` result cached at upload.
+    """
+    if not metadata:
+        return None
+    parts = sorted(
+        [f"ws:{s['name']}:{int(bool(s.get('has_charts')))}" for s in metadata.get("worksheets", [])]
+        + [f"cs:{s['name']}" for s in metadata.get("chartsheets", [])]
+    )
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+class StrategyLearner:
+    """Thread-safe success/failure history per (fingerprint, kind, strategy)."""
+
+    def __init__(self, path: Path = None, history_max: int = None, explore_every: int = None):
+        self._path = Path(path) if path is not None else Path(STRATEGY_STATS_FILE)
+        self._history_max = history_max if history_max is not None else STRATEGY_HISTORY_MAX
+        self._explore_every = explore_every if explore_every is not None else STRATEGY_EXPLORE_EVERY
+        self._lock = threading.Lock()
+        self._stats: Optional[Dict[str, Dict[str, List[int]]]] = None  # key -> strategy -> [ok, fail]
+        self._reordered: Dict[str, int] = {}  # key -> learned orders handed out (not persisted)
+        self._dirty = False
+
+    @staticmethod
+    def _key(fingerprint: str, kind: str) -> str:
+        return f"{fingerprint}|{kind}"
+
+    def _load(self):
+        if self._stats is not None:
+            return
+        self._stats = {}
+        try:
+            with open(self._path, "r", encoding="utf-8") as f:
+                self._stats = json.load(f)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable capture strategy history %s: %s", self._path, e)
+
+    def order(self, fingerprint: Optional[str], kind: str) -> List[str]:
+        """Return the strategies for *kind*, best observed success rate first.
+
+        Fallback strategies stay last in their default order.  When the
+        learned order differs from the default, every ``explore_every``-th
+        call puts the lowest-ranked strategy first instead.
+        """
+        default = DEFAULT_STRATEGIES[kind]
+        ranked = [s for s in default if s not in FALLBACK_STRATEGIES]
+        fallbacks = [s for s in default if s in FALLBACK_STRATEGIES]
+        if fingerprint is None or len(ranked) < 2:
+            return list(default)
+        key = self._key(fingerprint, kind)
+        with self._lock:
+            self._load()
+            history = dict(self._stats.get(key, {}))
+
+        def score(strategy: str) -> float:
+            ok, fail = history.get(strategy, (0, 0))
+            return (ok + 1) / (ok + fail + 2)  # Laplace-smoothed success rate
+
+        ordered = sorted(ranked, key=score, reverse=True)  # stable: ties keep default order
+        if ordered != ranked:
+            with self._lock:
+                self._reordered[key] = calls = self._reordered.get(key, 0) + 1
+            if self._explore_every and calls % self._explore_every == 0:
+                ordered.insert(0, ordered.pop())
+                STRATEGY_EXPLORED.inc(kind=kind)
+            else:
+                STRATEGY_REORDERED.inc(kind=kind)
+        return ordered + fallbacks
+
+    def record(self, fingerprint: Optional[str], kind: str, strategy: str, ok: bool):
+        """Record one attempt of *strategy*."""
+        STRATEGY_ATTEMPTS.inc(kind=kind, strategy=strategy, outcome="success" if ok else "failure")
+        if fingerprint is None:
+            return
+        with self._lock:
+            self._load()
+            entry = self._stats.setdefault(self._key(fingerprint, kind), {}).setdefault(
+                strategy, [0, 0]
+            )
+            entry[0 if ok else 1] += 1
+            if sum(entry) > self._history_max:
+                # Halve old history so a workbook whose behaviour changes is relearned
+                entry[0] //= 2
+                entry[1] //= 2
+            self._dirty = True
+
+    def save(self):
+        """Persist the history if it changed (atomic replace)."""
+        with self._lock:
+            if not self._dirty:
+                return
+            snapshot = json.dumps(self._stats, sort_keys=True)
+            self._dirty = False
+        try:
+            self._path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self._path.with_name(self._path.name + ".tmp")
+            tmp.write_text(snapshot, encoding="utf-8")
+            os.replace(tmp, self._path)
+        except OSError as e:
+            logger.warning("Failed to save capture strategy history: %s", e)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            self._load()
+            return json.loads(json.dumps(self._stats))
+
+
+# Singleton instance
+strategy_learner = StrategyLearner()
@@ -6,18 +6,50 @@ chart/worksheet capture, and info extraction.
 """
 import os
 import time
-from typing import Dict, List, Optional
-
-from app.config import logger, COM_MAX_RETRIES, COM_RETRY_DELAY, COM_CLIPBOARD_DELAY
-from app.utils.image_validator import validate_image
+from typing import Callable, Dict, List, Optional
+
+from app.config import (
+    logger, COM_BACKEND, COM_MAX_RETRIES, COM_RETRY_DELAY, COM_CLIPBOARD_DELAY,
+)
+from app.services.capture_strategy import strategy_learner
+from app.utils.image_validator import validate_capture
+from app.utils.capture_result import CaptureResult
+from app.utils.phash import CaptureIndex, stale_capture_stats
 from app.utils.clipboard import clear_clipboard
+from app.utils.com_proxy import instrument, stats_of
+from app.utils.metrics import stage_timer
+from app.utils.tracing import span
 
 
 # ---------------------------------------------------------------------------
 # Lazy imports for COM — only available on Windows
 # ---------------------------------------------------------------------------
+COM_BACKENDS = ("win32", "fake")
+_com_backend = COM_BACKEND
+
+
+def use_com_backend(name: str):
+    """Switch between real Office (``"win32"``) and the COM-free simulator (``"fake"``)."""
+    global _com_backend
+    if name not in COM_BACKENDS:
+        raise ValueError(f"Unknown COM backend {name!r}; expected one of {COM_BACKENDS}")
+    _com_backend = name
+
+
+def com_backend() -> str:
+    return _com_backend
+
+
 def _init_com():
-    """Import and initialise COM libraries (Windows only)."""
+    """Import and initialise COM libraries (Windows only).
+
+    Returns ``(pythoncom, win32com.client)``, or the
+    :mod:`app.services.fake_com` module for both when the fake backend is
+    selected.
+    """
+    if _com_backend == "fake":
+        from app.services import fake_com
+        return fake_com, fake_com
     import pythoncom
     import win32com.client as win32
     return pythoncom, win32
@@ -34,6 +66,9 @@ class ExcelCOM:
         with ExcelCOM() as (excel_app, pythoncom_mod):
             wb = excel_app.Workbooks.Open(path)
             ...
+
+    The application object is wrapped by :func:`app.utils.com_proxy.instrument`,
+    so every COM call made through it is counted and timed.
     """
 
     def __init__(self, visible: bool = False):
@@ -42,11 +77,12 @@ class ExcelCOM:
         self._pythoncom = None
 
     def __enter__(self):
-        self._pythoncom, win32 = _init_com()
-        self._pythoncom.CoInitialize()
-        self._excel_app = win32.DispatchEx("Excel.Application")
-        self._excel_app.Visible = self._visible
-        self._excel_app.DisplayAlerts = False
+        with stage_timer("excel_start"):
+            self._pythoncom, win32 = _init_com()
+            self._pythoncom.CoInitialize()
+            self._excel_app = instrument(win32.DispatchEx("Excel.Application"), "Excel")
+            self._excel_app.Visible = self._visible
+            self._excel_app.DisplayAlerts = False
         logger.info("Excel COM started (visible=%s)", self._visible)
         return self._excel_app, self._pythoncom
 
@@ -57,6 +93,7 @@ class ExcelCOM:
                 logger.info("Excel COM quit successfully")
             except Exception as e:
                 logger.warning("Failed to quit Excel COM: %s", e)
+            log_com_summary("Excel", self._excel_app)
         if self._pythoncom:
             try:
                 self._pythoncom.CoUninitialize()
@@ -77,10 +114,11 @@ class PowerPointCOM:
         self._pythoncom = None
 
     def __enter__(self):
-        self._pythoncom, win32 = _init_com()
-        self._pythoncom.CoInitialize()
-        self._ppt_app = win32.DispatchEx("PowerPoint.Application")
-        self._ppt_app.Visible = self._visible
+        with stage_timer("powerpoint_start"):
+            self._pythoncom, win32 = _init_com()
+            self._pythoncom.CoInitialize()
+            self._ppt_app = instrument(win32.DispatchEx("PowerPoint.Application"), "PowerPoint")
+            self._ppt_app.Visible = self._visible
         logger.info("PowerPoint COM started (visible=%s)", self._visible)
         return self._ppt_app, self._pythoncom
 
@@ -91,6 +129,7 @@ class PowerPointCOM:
                 logger.info("PowerPoint COM quit successfully")
             except Exception as e:
                 logger.warning("Failed to quit PowerPoint COM: %s", e)
+            log_com_summary("PowerPoint", self._ppt_app)
         if self._pythoncom:
             try:
                 self._pythoncom.CoUninitialize()
@@ -99,26 +138,38 @@ class PowerPointCOM:
         return False
 
 
+def log_com_summary(label: str, app_obj, top: int = 5):
+    """Log the call count and the most expensive members of an instrumented app."""
+    stats = stats_of(app_obj)
+    if stats is None or not stats.total_calls:
+        return
+    busiest = ", ".join(f"{m} x{n} ({s * 1000:.0f} ms)" for m, n, s in stats.top(top))
+    logger.info("%s COM: %d calls; top: %s", label, stats.total_calls, busiest)
+
+
 # ---------------------------------------------------------------------------
 # Excel info extraction
 # ---------------------------------------------------------------------------
 def get_excel_info(excel_path: str) -> dict:
     """Return worksheet and chart sheet metadata from an Excel file."""
     with ExcelCOM() as (excel_app, _pythoncom):
-        workbook = excel_app.Workbooks.Open(excel_path)
+        with stage_timer("workbook_open"):
+            workbook = excel_app.Workbooks.Open(excel_path)
 
         worksheets = []
         for sheet in workbook.Worksheets:
-            chart_count = 0
+            charts = []
             try:
-                chart_count = sheet.ChartObjects().Count
+                chart_objects = sheet.ChartObjects()
+                charts = [chart_objects(i).Name for i in range(1, chart_objects.Count + 1)]
             except Exception:
                 pass
             worksheets.append({
                 "name": sheet.Name,
                 "type": "worksheet",
-                "has_charts": chart_count > 0,
-                "chart_count": chart_count,
+                "has_charts": bool(charts),
+                "chart_count": len(charts),
+                "charts": charts,
             })
 
         chartsheets = []
@@ -184,57 +235,266 @@ def capture_item(
     Returns:
         ``True`` if capture succeeded, ``False`` otherwise.
     """
+    result = capture_item_result(
+        excel_app, workbook, name, item_type, output_path, max_retries
+    )
+    if result is None:
+        return False
+    result.close()
+    return True
+
+
+def capture_item_result(
+    excel_app,
+    workbook,
+    name: str,
+    item_type: str,
+    output_path: str,
+    max_retries: int = None,
+    index: CaptureIndex = None,
+    key: str = None,
+    fingerprint: str = None,
+    chart=None,
+) -> Optional[CaptureResult]:
+    """Like :func:`capture_item`, but return the validated capture in memory.
+
+    The PNG that COM exports to *output_path* is read exactly once; the
+    returned :class:`CaptureResult` carries the encoded bytes and the stats
+    decoded during validation, so optimization and insertion do not touch
+    the filesystem again.
+
+    Args:
+        index: The job's perceptual-hash index.  A clipboard capture that
+            matches an earlier, different item is treated as a stale paste
+            and retried; if it stays stale it is returned with
+            ``stale_of`` set.
+        key: Identity of this item in *index* (defaults to *name*).
+        fingerprint: Workbook template fingerprint
+            (:func:`app.services.capture_strategy.workbook_fingerprint`); when
+            given, capture strategies are tried in the order that has worked
+            for this template before.
+        chart: For a worksheet, the embedded chart to capture (1-based
+            index or name); by default the first chart, or the used range
+            of a sheet without charts.
+
+    Returns:
+        The capture, or ``None`` if every method failed.
+    """
     if max_retries is None:
         max_retries = COM_MAX_RETRIES
+    if key is None:
+        key = name
+
+    attributes = {"mapping.name": name, "mapping.type": item_type, "mapping.key": key}
+    if chart is not None:
+        attributes["mapping.chart"] = str(chart)
+    with span("capture_item", attributes) as item_span:
+        result = _capture_checked(
+            excel_app, workbook, name, item_type, output_path, max_retries,
+            index, key, fingerprint, chart,
+        )
+        item_span.set_attribute("capture.ok", result is not None)
+        if result is not None:
+            item_span.set_attribute("capture.method", result.method)
+            item_span.set_attribute("capture.strategy", result.strategy)
+            item_span.set_attribute("capture.bytes", result.size)
+            if result.stale_of:
+                item_span.set_attribute("capture.stale_of", result.stale_of)
+        return result
+
+
+def _capture_checked(
+    excel_app, workbook, name, item_type, output_path, max_retries, index, key, fingerprint,
+    chart=None,
+) -> Optional[CaptureResult]:
+    """Capture one item, checking clipboard captures against *index* for stale pastes."""
+    settle = None
+    if index is not None:
+        def settle(result, repaste):
+            return _settle_stale(result, repaste, index, key, name, max_retries)
 
     try:
         if item_type == "chartsheet":
-            return _capture_chartsheet(excel_app, workbook, name, output_path, max_retries)
-        else:
-            return _capture_worksheet(excel_app, workbook, name, output_path, max_retries)
+            return _capture_chartsheet(
+                excel_app, workbook, name, output_path, max_retries,
+                fingerprint=fingerprint, settle=settle,
+            )
+        return _capture_worksheet(
+            excel_app, workbook, name, output_path, max_retries,
+            fingerprint=fingerprint, chart=chart, settle=settle,
+        )
     except Exception as e:
         logger.error("Capturing '%s' failed: %s", name, e, exc_info=True)
-        return False
+        return None
+
+
+def _settle_stale(
+    result: CaptureResult,
+    repaste: Callable[[], Optional[CaptureResult]],
+    index: CaptureIndex,
+    key: str,
+    name: str,
+    max_retries: int,
+) -> Optional[CaptureResult]:
+    """Check a capture against the job's index; re-paste clipboard captures that look stale.
+
+    Only the clipboard step that produced *result* is repeated (*repaste*),
+    not the item's whole strategy chain.
+
+    Returns:
+        The capture (with ``stale_of`` set if it stayed stale), or ``None``
+        if a re-paste gave no valid image.
+    """
+    if result.method != "clipboard":
+        index.add(key, result.phash())
+        return result
+
+    stale_of = None
+    for attempt in range(max_retries):
+        value = result.phash()
+        stale_of = index.conflict(key, value)
+        stale_capture_stats.record(checked=1, stale=int(stale_of is not None))
+        if stale_of is None:
+            index.add(key, value)
+            if attempt:
+                stale_capture_stats.record(recovered=1)
+                logger.info("  [Stale] '%s' recovered on attempt %d", name, attempt + 1)
+            return result
+
+        logger.warning(
+            "  [Stale] Capture of '%s' matches earlier item '%s' (attempt %d/%d)",
+            name, stale_of, attempt + 1, max_retries,
+        )
+        if attempt + 1 == max_retries:
+            break
+        result.close()
+        clear_clipboard()
+        time.sleep(COM_RETRY_DELAY * (attempt + 1))
+        result = repaste()
+        if result is None:
+            return None
+
+    stale_capture_stats.record(unresolved=1)
+    result.stale_of = stale_of
+    return result
+
+
+def _load_valid(output_path: str, min_size: int = None) -> Optional[CaptureResult]:
+    """Read an exported PNG into memory and validate it.
+
+    Returns:
+        The capture if it is valid, otherwise ``None``.
+    """
+    if not os.path.exists(output_path):
+        logger.warning("Validate: file does not exist: %s", output_path)
+        return None
+    with stage_timer("validate"):
+        result = CaptureResult.from_file(output_path)
+        valid = validate_capture(result, min_size=min_size)
+    if valid:
+        return result
+    result.close()
+    return None
+
+
+def _run_strategies(
+    kind: str,
+    fingerprint: Optional[str],
+    strategies: Dict[str, Callable[[], Optional[CaptureResult]]],
+    name: str,
+    output_path: str,
+    settle: Optional[Callable] = None,
+) -> Optional[CaptureResult]:
+    """Try *strategies* in learned order until one yields a valid capture.
+
+    Args:
+        settle: ``settle(result, repaste)`` stale-paste check (see
+            :func:`_settle_stale`); a capture that stays stale ends the chain
+            but is recorded as a failure of its strategy.
+    """
+    def attempt(strategy: str) -> Optional[CaptureResult]:
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        try:
+            return strategies[strategy]()
+        except Exception as e:
+            logger.warning("  [%s] Strategy '%s' failed for '%s': %s", kind, strategy, name, e)
+            return None
+
+    for strategy in strategy_learner.order(fingerprint, kind):
+        if strategy not in strategies:
+            continue  # not applicable to this item
+        result = attempt(strategy)
+        if result is not None and settle is not None:
+            result = settle(result, lambda: attempt(strategy))
+        ok = result is not None and not result.stale_of
+        strategy_learner.record(fingerprint, kind, strategy, ok)
+        if result is not None:
+            result.strategy = strategy
+            return result
+        logger.info("  [%s] Strategy '%s' gave no valid image for '%s'", kind, strategy, name)
+
+    logger.warning("  [%s] All methods failed for '%s'", kind, name)
+    return None
 
 
 def _capture_chartsheet(
-    excel_app, workbook, name: str, output_path: str, max_retries: int
-) -> bool:
+    excel_app, workbook, name: str, output_path: str, max_retries: int,
+    fingerprint: Optional[str] = None, settle: Optional[Callable] = None,
+) -> Optional[CaptureResult]:
     """Handle chart-sheet capture with fallback."""
-    logger.info("  [ChartSheet] Exporting '%s' directly...", name)
     chart_sheet = workbook.Charts(name)
-    chart_sheet.Export(output_path, "PNG")
 
-    if validate_image(output_path):
-        return True
+    def export():
+        logger.info("  [ChartSheet] Exporting '%s' directly...", name)
+        with stage_timer("capture_export"):
+            chart_sheet.Export(output_path, "PNG")
+        return _load_valid(output_path)
 
-    logger.info("  [ChartSheet] Direct export invalid, trying CopyPicture fallback...")
-    if os.path.exists(output_path):
-        os.remove(output_path)
-
-    chart_sheet.ChartArea.CopyPicture(Appearance=1, Format=2)
-    time.sleep(COM_CLIPBOARD_DELAY)
-    temp_chart_sheet = workbook.Charts.Add()
-    try:
-        temp_chart_sheet.Paste()
-        time.sleep(COM_CLIPBOARD_DELAY)
-        temp_chart_sheet.Export(output_path, "PNG")
-    finally:
-        excel_app.DisplayAlerts = False
-        temp_chart_sheet.Delete()
+    def copypicture():
+        logger.info("  [ChartSheet] Trying CopyPicture for '%s'...", name)
+        with stage_timer("capture_copypicture"):
+            chart_sheet.ChartArea.CopyPicture(Appearance=1, Format=2)
+            time.sleep(COM_CLIPBOARD_DELAY)
+            temp_chart_sheet = workbook.Charts.Add()
+            try:
+                temp_chart_sheet.Paste()
+                time.sleep(COM_CLIPBOARD_DELAY)
+                temp_chart_sheet.Export(output_path, "PNG")
+            finally:
+                excel_app.DisplayAlerts = False
+                temp_chart_sheet.Delete()
 
-    if validate_image(output_path):
-        return True
+        result = _load_valid(output_path)
+        if result:
+            result.method = "clipboard"
+        return result
 
-    logger.warning("  [ChartSheet] All methods failed for '%s'", name)
-    return False
+    return _run_strategies(
+        "chartsheet", fingerprint,
+        {"export": export, "copypicture": copypicture},
+        name, output_path, settle,
+    )
 
 
 def _capture_worksheet(
-    excel_app, workbook, name: str, output_path: str, max_retries: int
-) -> bool:
+    excel_app, workbook, name: str, output_path: str, max_retries: int,
+    fingerprint: Optional[str] = None, chart=None, settle: Optional[Callable] = None,
+) -> Optional[CaptureResult]:
     """Handle worksheet capture (with or without embedded charts)."""
     sheet = workbook.Worksheets(name)
+    if chart is not None:
+        try:
+            chart_obj = sheet.ChartObjects(chart)
+        except Exception:
+            logger.warning("  [Worksheet] '%s' has no chart %r", name, chart)
+            return None
+        logger.info("  [Worksheet] '%s' chart %r ('%s')", name, chart, chart_obj.Name)
+        return _capture_worksheet_chart(
+            excel_app, workbook, sheet, name, output_path, max_retries, fingerprint, chart_obj,
+            settle,
+        )
+
     chart_count = 0
     try:
         chart_count = sheet.ChartObjects().Count
@@ -245,83 +505,101 @@ def _capture_worksheet(
 
     if chart_count > 0:
         return _capture_worksheet_chart(
-            excel_app, workbook, sheet, name, output_path, max_retries
+            excel_app, workbook, sheet, name, output_path, max_retries, fingerprint,
+            settle=settle,
         )
-    else:
+
+    def used_range():
         return _capture_worksheet_range(
             excel_app, workbook, sheet, name, output_path, max_retries
         )
 
+    return _run_strategies(
+        "worksheet_range", fingerprint, {"usedrange": used_range}, name, output_path, settle
+    )
 
-def _capture_worksheet_chart(
-    excel_app, workbook, sheet, name: str, output_path: str, max_retries: int
-) -> bool:
-    """Capture the first embedded chart from a worksheet."""
-    chart_obj = sheet.ChartObjects(1)
-
-    # Try 1: direct export
-    logger.info("  [Worksheet] Trying direct Chart.Export()...")
-    chart_obj.Chart.Export(output_path, "PNG")
-    if validate_image(output_path):
-        return True
-
-    logger.info("  [Worksheet] Direct export invalid, trying CopyPicture on ChartObject...")
-    if os.path.exists(output_path):
-        os.remove(output_path)
-
-    # Try 2: CopyPicture on the chart object
-    for attempt in range(max_retries):
-        try:
-            clear_clipboard()
-            time.sleep(COM_CLIPBOARD_DELAY / 2)
-
-            chart_obj.CopyPicture(Appearance=1, Format=2)
-            time.sleep(COM_CLIPBOARD_DELAY)
 
-            temp_chart_sheet = workbook.Charts.Add()
-            time.sleep(0.1)
+def _capture_worksheet_chart(
+    excel_app, workbook, sheet, name: str, output_path: str, max_retries: int,
+    fingerprint: Optional[str] = None, chart_obj=None, settle: Optional[Callable] = None,
+) -> Optional[CaptureResult]:
+    """Capture an embedded chart (by default the first) from a worksheet.
+
+    The used-range fallback only applies to the default chart: for an
+    explicitly selected chart a picture of the whole sheet is not that
+    chart (and would repeat for every selected chart of the sheet).
+    """
+    default_chart = chart_obj is None
+    if default_chart:
+        chart_obj = sheet.ChartObjects(1)
+
+    def export():
+        logger.info("  [Worksheet] Trying direct Chart.Export()...")
+        with stage_timer("capture_export"):
+            chart_obj.Chart.Export(output_path, "PNG")
+        return _load_valid(output_path)
+
+    def copypicture():
+        logger.info("  [Worksheet] Trying CopyPicture on ChartObject...")
+        for attempt in range(max_retries):
             try:
-                temp_chart_sheet.Paste()
-                time.sleep(COM_CLIPBOARD_DELAY)
-                temp_chart_sheet.Export(output_path, "PNG")
-            finally:
-                excel_app.DisplayAlerts = False
-                temp_chart_sheet.Delete()
+                clear_clipboard()
+                time.sleep(COM_CLIPBOARD_DELAY / 2)
+
+                with stage_timer("capture_copypicture"):
+                    chart_obj.CopyPicture(Appearance=1, Format=2)
+                    time.sleep(COM_CLIPBOARD_DELAY)
+
+                    temp_chart_sheet = workbook.Charts.Add()
+                    time.sleep(0.1)
+                    try:
+                        temp_chart_sheet.Paste()
+                        time.sleep(COM_CLIPBOARD_DELAY)
+                        temp_chart_sheet.Export(output_path, "PNG")
+                    finally:
+                        excel_app.DisplayAlerts = False
+                        temp_chart_sheet.Delete()
+
+                result = _load_valid(output_path, min_size=500)
+                if result:
+                    result.method = "clipboard"
+                    logger.info(
+                        "  [Worksheet] CopyPicture succeeded on attempt %d", attempt + 1
+                    )
+                    return result
 
-            if validate_image(output_path, min_size=500):
                 logger.info(
-                    "  [Worksheet] CopyPicture succeeded on attempt %d", attempt + 1
+                    "  [Worksheet] Attempt %d: CopyPicture validation failed", attempt + 1
                 )
-                return True
-
-            logger.info(
-                "  [Worksheet] Attempt %d: CopyPicture validation failed", attempt + 1
-            )
-            if os.path.exists(output_path):
-                os.remove(output_path)
-
-        except Exception as e:
-            logger.warning("  [Worksheet] Attempt %d CopyPicture failed: %s", attempt + 1, e)
-            time.sleep(COM_RETRY_DELAY)
-
-    # Try 3: UsedRange fallback
-    logger.info("  [Worksheet] Trying UsedRange CopyPicture as last resort...")
-    try:
-        used_range = sheet.UsedRange
-        if _export_via_copypicture(workbook, excel_app, used_range, output_path):
-            if validate_image(output_path, min_size=500):
-                logger.info("  [Worksheet] UsedRange fallback succeeded")
-                return True
-    except Exception as e:
-        logger.warning("  [Worksheet] UsedRange fallback failed: %s", e)
+                if os.path.exists(output_path):
+                    os.remove(output_path)
 
-    logger.warning("  [Worksheet] All methods failed for '%s'", name)
-    return False
+            except Exception as e:
+                logger.warning("  [Worksheet] Attempt %d CopyPicture failed: %s", attempt + 1, e)
+                time.sleep(COM_RETRY_DELAY)
+        return None
+
+    def used_range():
+        logger.info("  [Worksheet] Trying UsedRange CopyPicture...")
+        with stage_timer("capture_usedrange"):
+            exported = _export_via_copypicture(workbook, excel_app, sheet.UsedRange, output_path)
+        if not exported:
+            return None
+        result = _load_valid(output_path, min_size=500)
+        if result:
+            result.method = "clipboard"
+            logger.info("  [Worksheet] UsedRange fallback succeeded")
+        return result
+
+    strategies = {"export": export, "copypicture": copypicture}
+    if default_chart:
+        strategies["usedrange"] = used_range
+    return _run_strategies("worksheet_chart", fingerprint, strategies, name, output_path, settle)
 
 
 def _capture_worksheet_range(
     excel_app, workbook, sheet, name: str, output_path: str, max_retries: int
-) -> bool:
+) -> Optional[CaptureResult]:
     """Capture the UsedRange of a worksheet without charts."""
     logger.info("  [Worksheet] No charts found, capturing UsedRange...")
 
@@ -331,32 +609,35 @@ def _capture_worksheet_range(
             time.sleep(COM_CLIPBOARD_DELAY / 2)
 
             used_range = sheet.UsedRange
-            if used_range.Rows.Count == 0 or used_range.Columns.Count == 0:
+            rows = used_range.Rows.Count
+            cols = used_range.Columns.Count
+            if rows == 0 or cols == 0:
                 logger.warning("  [Worksheet] Sheet '%s' appears empty", name)
-                return False
+                return None
 
             logger.info(
                 "  [Worksheet] Attempt %d: UsedRange = %d rows x %d cols",
-                attempt + 1,
-                used_range.Rows.Count,
-                used_range.Columns.Count,
+                attempt + 1, rows, cols,
             )
 
-            used_range.CopyPicture(Appearance=1, Format=2)
-            time.sleep(COM_CLIPBOARD_DELAY)
-
-            temp_chart_sheet = workbook.Charts.Add()
-            time.sleep(0.1)
-            try:
-                temp_chart_sheet.Paste()
+            with stage_timer("capture_usedrange"):
+                used_range.CopyPicture(Appearance=1, Format=2)
                 time.sleep(COM_CLIPBOARD_DELAY)
-                temp_chart_sheet.Export(output_path, "PNG")
-            finally:
-                excel_app.DisplayAlerts = False
-                temp_chart_sheet.Delete()
 
-            if validate_image(output_path, min_size=500):
-                return True
+                temp_chart_sheet = workbook.Charts.Add()
+                time.sleep(0.1)
+                try:
+                    temp_chart_sheet.Paste()
+                    time.sleep(COM_CLIPBOARD_DELAY)
+                    temp_chart_sheet.Export(output_path, "PNG")
+                finally:
+                    excel_app.DisplayAlerts = False
+                    temp_chart_sheet.Delete()
+
+            result = _load_valid(output_path, min_size=500)
+            if result:
+                result.method = "clipboard"
+                return result
 
             logger.info("  [Worksheet] Attempt %d: validation failed", attempt + 1)
             if os.path.exists(output_path):
@@ -369,4 +650,4 @@ def _capture_worksheet_range(
     logger.warning(
         "  [Worksheet] Failed to capture '%s' after %d attempts", name, max_retries
     )
-    return False
+    return None
@@ -0,0 +1,438 @@
+"""
+COM-free stand-in for Excel and PowerPoint automation.
+
+Selected with ``COM_BACKEND = "fake"`` (environment variable
+``EXCEL2PPT_COM_BACKEND=fake``) or :func:`app.services.excel_service.use_com_backend`.
+It mirrors the slice of the Excel / PowerPoint object model this service
+drives: workbook structure is read from the real ``.xlsx`` file (see
+:mod:`app.utils.xlsx_inventory`), and ``Export`` renders a deterministic
+chart-like PNG per item, so captures validate, hash and insert like real
+ones.  Office round-trip costs can be simulated with
+``FAKE_COM_LATENCY_SCALE``.
+
+Used by the benchmarks, load tests and for development off Windows; it is
+not a renderer — images only resemble charts.
+"""
+import os
+import threading
+import time
+import zipfile
+import zlib
+from random import Random
+from typing import Callable, List, Optional
+
+from PIL import Image, ImageDraw
+
+from app.config import FAKE_COM_LATENCY_SCALE
+from app.utils.xlsx_inventory import range_shape, read_inventory
+
+# Approximate local Office costs in seconds, multiplied by the latency scale
+_LATENCY = {
+    "start": 1.5,
+    "open": 0.4,
+    "export": 0.12,
+    "copy": 0.05,
+    "paste": 0.08,
+    "save": 0.3,
+}
+_latency_scale = FAKE_COM_LATENCY_SCALE
+
+CHART_SIZE = (960, 540)
+CHARTSHEET_SIZE = (1200, 800)
+_CELL_SIZE = (64, 20)
+_MAX_RANGE_SIZE = (2000, 2000)
+
+
+class FakeComError(Exception):
+    """Raised where Office would raise ``pywintypes.com_error``."""
+
+
+def configure(latency_scale: float = None):
+    """Change the simulated latency multiplier (``0`` disables delays)."""
+    global _latency_scale
+    if latency_scale is not None:
+        _latency_scale = latency_scale
+
+
+def _delay(op: str):
+    if _latency_scale > 0:
+        time.sleep(_LATENCY[op] * _latency_scale)
+
+
+# ---------------------------------------------------------------------------
+# pythoncom / win32com.client surface
+# ---------------------------------------------------------------------------
+def CoInitialize():
+    pass
+
+
+def CoUninitialize():
+    pass
+
+
+def DispatchEx(progid: str):
+    """Start a fake ``Excel.Application`` or ``PowerPoint.Application``."""
+    _delay("start")
+    if progid == "Excel.Application":
+        return FakeExcel()
+    if progid == "PowerPoint.Application":
+        return FakePowerPoint()
+    raise FakeComError(f"Invalid class string: {progid}")
+
+
+# ---------------------------------------------------------------------------
+# Rendering
+# ---------------------------------------------------------------------------
+def _edge(color: tuple, weight: float = 0.5) -> tuple:
+    """*color* blended into white by *weight*, like an anti-aliased edge."""
+    return tuple(round(c + (255 - c) * weight) for c in color)
+
+
+def render_chart(path: str, seed: int, chart_type: str = "bar", size=CHART_SIZE):
+    """Write a deterministic chart-like PNG for *seed* to *path*."""
+    rng = Random(seed)
+    w, h = size
+    img = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(img)
+    left, top, right, bottom = int(w * 0.08), int(h * 0.12), int(w * 0.96), int(h * 0.9)
+    palette = [(rng.randrange(20, 230), rng.randrange(20, 230), rng.randrange(20, 230))
+               for _ in range(12)]
+
+    # Title and legend swatches
+    draw.rectangle([left, int(h * 0.03), left + int(w * 0.3), int(h * 0.07)], fill=(64, 64, 64))
+    for i, color in enumerate(palette[:6]):
+        x = right - (6 - i) * int(w * 0.04)
+        draw.rectangle([x, int(h * 0.03), x + int(w * 0.025), int(h * 0.07)], fill=color)
+    for i in range(1, 5):
+        y = bottom - (bottom - top) * i // 5
+        draw.line([left, y, right, y], fill=(217, 217, 217))
+
+    if chart_type == "pie":
+        box = [w // 2 - h // 3, h // 2 - h // 3 + 20, w // 2 + h // 3, h // 2 + h // 3 + 20]
+        weights = [rng.random() + 0.2 for _ in palette]
+        start = 0.0
+        for color, weight in zip(palette, weights):
+            extent = 360 * weight / sum(weights)
+            draw.pieslice(box, start, start + extent, fill=color)
+            start += extent
+    elif chart_type in ("line", "scatter"):
+        for s in range(3):
+            points = [
+                (left + (right - left) * i // 19, rng.randrange(top, bottom)) for i in range(20)
+            ]
+            if chart_type == "line":
+                draw.line(points, fill=_edge(palette[s], 0.75), width=7)
+                draw.line(points, fill=_edge(palette[s]), width=5)
+                draw.line(points, fill=palette[s], width=3)
+            else:
+                for x, y in points:
+                    draw.ellipse([x - 5, y - 5, x + 5, y + 5], fill=_edge(palette[s], 0.75))
+                    draw.ellipse([x - 4, y - 4, x + 4, y + 4], fill=palette[s], outline=_edge(palette[s]))
+    else:
+        bars = 12
+        slot = (right - left) // bars
+        for i in range(bars):
+            bar_h = rng.randrange((bottom - top) // 10, bottom - top)
+            x0 = left + i * slot + slot // 6
+            draw.rectangle([x0, bottom - bar_h, x0 + slot * 2 // 3, bottom], fill=palette[i])
+
+    draw.line([left, top, left, bottom], fill="black", width=2)
+    draw.line([left, bottom, right, bottom], fill="black", width=2)
+    img.save(path, "PNG")
+
+
+def render_range(path: str, seed: int, rows: int, cols: int):
+    """Write a spreadsheet-grid PNG for a ``rows`` x ``cols`` range."""
+    rng = Random(seed)
+    cw, ch = _CELL_SIZE
+    w = max(cw, min(cols * cw, _MAX_RANGE_SIZE[0]))
+    h = max(ch, min(rows * ch, _MAX_RANGE_SIZE[1]))
+    img = Image.new("RGB", (w, h), "white")
+    draw = ImageDraw.Draw(img)
+    draw.rectangle([0, 0, w, ch], fill=(221, 235, 247))
+    for r in range(h // ch + 1):
+        for c in range(w // cw + 1):
+            x, y = c * cw, r * ch
+            shade = rng.randrange(40, 160)
+            draw.rectangle([x + 6, y + 6, x + 6 + rng.randrange(12, cw - 12), y + ch - 6],
+                           fill=(shade, shade, shade))
+    for x in range(0, w, cw):
+        draw.line([x, 0, x, h], fill=(208, 208, 208))
+    for y in range(0, h, ch):
+        draw.line([0, y, w, y], fill=(208, 208, 208))
+    img.save(path, "PNG")
+
+
+def _seed(*parts) -> int:
+    return zlib.crc32("|".join(str(p) for p in parts).encode("utf-8"))
+
+
+# Process-wide clipboard, like the Windows one: holds a render callable
+_clipboard_lock = threading.Lock()
+_clipboard: Optional[Callable[[str], None]] = None
+
+
+def _set_clipboard(render: Optional[Callable[[str], None]]):
+    global _clipboard
+    with _clipboard_lock:
+        _clipboard = render
+
+
+def clear_clipboard():
+    _set_clipboard(None)
+
+
+# ---------------------------------------------------------------------------
+# Object model
+# ---------------------------------------------------------------------------
+class _ComObject:
+    """Plain attribute bag that :mod:`app.utils.com_proxy` treats as a COM object."""
+
+    _oleobj_ = None
+
+    def __init__(self, **attrs):
+        self.__dict__.update(attrs)
+
+
+class _Collection(_ComObject):
+    """1-based, name-indexable collection (``Worksheets(1)``, ``Charts("Sales")``)."""
+
+    def __init__(self, items: List = None):
+        super().__init__()
+        self._items = list(items or [])
+
+    @property
+    def Count(self) -> int:
+        return len(self._items)
+
+    def __call__(self, index):
+        if isinstance(index, int):
+            if 1 <= index <= len(self._items):
+                return self._items[index - 1]
+        else:
+            for item in self._items:
+                if getattr(item, "Name", None) == index:
+                    return item
+        raise FakeComError(f"Subscript out of range: {index!r}")
+
+    Item = __call__
+
+    def __iter__(self):
+        return iter(list(self._items))
+
+
+class _Chart(_ComObject):
+    """A chart sheet, an embedded chart, or a temporary paste target."""
+
+    def __init__(self, workbook, name: str, render: Callable[[str], None] = None):
+        super().__init__(Name=name)
+        self._workbook = workbook
+        self._render = render
+        self.ChartArea = _ComObject(CopyPicture=self._copy, Copy=self._copy)
+
+    def _copy(self, Appearance=1, Format=2):
+        _delay("copy")
+        _set_clipboard(self._render)
+
+    CopyPicture = _copy
+
+    def Export(self, path: str, FilterName: str = "PNG"):
+        _delay("export")
+        if self._render is None:
+            Image.new("RGB", CHART_SIZE, "white").save(path, "PNG")  # empty chart
+        else:
+            self._render(path)
+        return True
+
+    def Paste(self):
+        _delay("paste")
+        with _clipboard_lock:
+            render = _clipboard
+        if render is None:
+            raise FakeComError("Clipboard is empty")
+        self._render = render
+
+    def Activate(self):
+        pass
+
+    def Delete(self):
+        self._workbook.Charts._items.remove(self)
+
+
+class _Charts(_Collection):
+    def __init__(self, workbook, items):
+        super().__init__(items)
+        self._workbook = workbook
+
+    def Add(self):
+        chart = _Chart(self._workbook, f"Chart{len(self._items) + 1}")
+        self._items.append(chart)
+        return chart
+
+
+class _Range(_ComObject):
+    def __init__(self, rows: int, cols: int, render: Callable[[str], None]):
+        super().__init__(Rows=_ComObject(Count=rows), Columns=_ComObject(Count=cols))
+        self._render = render
+
+    def CopyPicture(self, Appearance=1, Format=2):
+        _delay("copy")
+        _set_clipboard(self._render)
+
+
+class _ChartObject(_ComObject):
+    def __init__(self, chart: _Chart, size=None):
+        width, height = size or (CHART_SIZE[0] * 0.75, CHART_SIZE[1] * 0.75)  # points
+        super().__init__(Name=chart.Name, Chart=chart, Width=width, Height=height)
+
+    def CopyPicture(self, Appearance=1, Format=2):
+        self.Chart.CopyPicture(Appearance, Format)
+
+    def Select(self):
+        pass
+
+
+class _Worksheet(_ComObject):
+    def __init__(self, workbook, info: dict):
+        visible = {"hidden": 0, "veryHidden": 2}.get(info.get("state"), -1)  # xlSheetVisible = -1
+        super().__init__(Name=info["name"], Visible=visible)
+        key = (workbook.Name, info["name"])
+        rows, cols = range_shape(info.get("dimension"))
+        self.UsedRange = _Range(
+            rows, cols, lambda path: render_range(path, _seed(*key, "range"), rows, cols)
+        )
+        self._chart_objects = _Collection([
+            _ChartObject(_Chart(
+                workbook, chart["name"] or f"Chart {i + 1}",
+                _chart_renderer(_seed(*key, i), chart["type"], CHART_SIZE),
+            ), chart.get("size"))
+            for i, chart in enumerate(info["charts"])
+        ])
+
+    def ChartObjects(self, index=None):
+        if index is None:
+            return self._chart_objects
+        return self._chart_objects(index)
+
+    def Activate(self):
+        pass
+
+
+def _chart_renderer(seed: int, chart_type: str, size) -> Callable[[str], None]:
+    return lambda path: render_chart(path, seed, chart_type, size)
+
+
+class _Workbook(_ComObject):
+    def __init__(self, app, path: str):
+        super().__init__(Name=os.path.basename(path), FullName=os.path.abspath(path))
+        self._app = app
+        inventory = read_inventory(path)
+        self.Worksheets = _Collection([_Worksheet(self, ws) for ws in inventory["worksheets"]])
+        chartsheets = []
+        for cs in inventory["chartsheets"]:
+            chart_type = cs["chart"]["type"] if cs["chart"] else "bar"
+            chartsheets.append(_Chart(
+                self, cs["name"],
+                _chart_renderer(_seed(self.Name, cs["name"]), chart_type, CHARTSHEET_SIZE),
+            ))
+        self.Charts = _Charts(self, chartsheets)
+
+    def Close(self, SaveChanges=False):
+        self._app.Workbooks._items.remove(self)
+
+
+class _Workbooks(_Collection):
+    def __init__(self, app):
+        super().__init__()
+        self._app = app
+
+    def Open(self, path: str, *args, **kwargs):
+        _delay("open")
+        if not os.path.exists(path):
+            raise FakeComError(f"Sorry, we couldn't find {path}")
+        try:
+            workbook = _Workbook(self._app, path)
+        except ValueError as e:
+            raise FakeComError(str(e)) from e
+        self._items.append(workbook)
+        return workbook
+
+
+class FakeExcel(_ComObject):
+    """``Excel.Application``."""
+
+    def __init__(self):
+        super().__init__(Visible=False, DisplayAlerts=True)
+        self.Workbooks = _Workbooks(self)
+
+    def Quit(self):
+        self.Workbooks._items.clear()
+
+
+# PowerPoint -----------------------------------------------------------------
+class _Shape(_ComObject):
+    def __init__(self):
+        super().__init__(
+            Left=0.0, Top=0.0, Width=480.0, Height=270.0,
+            Line=_ComObject(Visible=0, Weight=0.75, ForeColor=_ComObject(RGB=0)),
+        )
+
+
+class _Shapes(_Collection):
+    def Paste(self):
+        _delay("paste")
+        with _clipboard_lock:
+            if _clipboard is None:
+                raise FakeComError("Clipboard is empty")
+        shape = _Shape()
+        self._items.append(shape)
+        return _Collection([shape])  # ShapeRange
+
+
+class _Slide(_ComObject):
+    def __init__(self, index: int):
+        super().__init__(SlideIndex=index, Shapes=_Shapes())
+
+
+class _Presentation(_ComObject):
+    def __init__(self, app, path: str):
+        super().__init__(Name=os.path.basename(path), FullName=os.path.abspath(path))
+        self._app = app
+        with zipfile.ZipFile(path) as zf:
+            count = sum(
+                1 for n in zf.namelist()
+                if n.startswith("ppt/slides/slide") and n.endswith(".xml")
+            )
+        self.Slides = _Collection([_Slide(i + 1) for i in range(count)])
+
+    def Save(self):
+        _delay("save")
+
+    def Close(self):
+        if self in self._app.Presentations._items:
+            self._app.Presentations._items.remove(self)
+
+
+class _Presentations(_Collection):
+    def __init__(self, app):
+        super().__init__()
+        self._app = app
+
+    def Open(self, path: str, *args, **kwargs):
+        _delay("open")
+        if not os.path.exists(path):
+            raise FakeComError(f"PowerPoint could not open {path}")
+        presentation = _Presentation(self._app, path)
+        self._items.append(presentation)
+        return presentation
+
+
+class FakePowerPoint(_ComObject):
+    """``PowerPoint.Application``."""
+
+    def __init__(self):
+        super().__init__(Visible=True)
+        self.Presentations = _Presentations(self)
+
+    def Quit(self):
+        self.Presentations._items.clear()
@@ -3,9 +3,10 @@ File management service — upload tracking and cleanup.
 """
 import os
 import time
+import hashlib
 import threading
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, Optional, Tuple
 
 from app.config import logger, UPLOAD_DIR, OUTPUT_DIR, FILE_CLEANUP_MAX_AGE
 
@@ -22,13 +23,30 @@ class FileManager:
 
     # -- CRUD ---------------------------------------------------------------
 
-    def register(self, file_id: str, file_type: str, path: str, filename: str):
+    def register(
+        self,
+        file_id: str,
+        file_type: str,
+        path: str,
+        filename: str,
+        metadata: Optional[dict] = None,
+        sha256: Optional[str] = None,
+    ):
+        """Track an uploaded file.
+
+        *metadata* is the info parsed at upload time (``get_excel_info`` /
+        ``get_ppt_info``); it is cached so later requests can be checked
+        without reopening the file.  *sha256* is the content hash, if the
+        caller already computed it (see :meth:`content_hash`).
+        """
         with self._lock:
             self._files[file_id] = {
                 "type": file_type,
                 "path": path,
                 "filename": filename,
                 "created_at": time.time(),
+                "metadata": metadata,
+                "sha256": sha256,
             }
 
     def get(self, file_id: str) -> Optional[dict]:
@@ -46,6 +64,45 @@ class FileManager:
             return True
         return False
 
+    def content_hash(self, file_id: str) -> Optional[str]:
+        """Return the SHA-256 of a tracked file, hashing it on first use.
+
+        Returns ``None`` if the file is unknown or unreadable.
+        """
+        with self._lock:
+            info = self._files.get(file_id)
+            if info is None:
+                return None
+            if info.get("sha256"):
+                return info["sha256"]
+            path = info["path"]
+
+        try:
+            digest = sha256_file(path)
+        except OSError as e:
+            logger.warning("Cannot hash %s: %s", path, e)
+            return None
+        with self._lock:
+            if file_id in self._files:
+                self._files[file_id]["sha256"] = digest
+        return digest
+
+    def find_by_hash(self, sha256: str, file_type: str) -> Optional[Tuple[str, dict]]:
+        """Return ``(file_id, info)`` of a tracked *file_type* upload whose
+        content hash is *sha256* and whose file is still on disk, or ``None``.
+
+        Only hashes already known are compared; nothing is read from disk.
+        """
+        with self._lock:
+            candidates = [
+                (file_id, info) for file_id, info in self._files.items()
+                if info["type"] == file_type and info.get("sha256") == sha256
+            ]
+        for file_id, info in reversed(candidates):  # newest first
+            if Path(info["path"]).exists():
+                return file_id, info
+        return None
+
     @property
     def count(self) -> int:
         with self._lock:
@@ -99,6 +156,15 @@ file_manager = FileManager()
 # ---------------------------------------------------------------------------
 # Utility
 # ---------------------------------------------------------------------------
+def sha256_file(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Return the hex SHA-256 of a file's content."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
 def get_directory_size_mb(path: Path) -> float:
     """Return total size of a directory in megabytes."""
     total = 0
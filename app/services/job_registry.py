@@ -0,0 +1,74 @@
+"""
+Background job registry — generate jobs submitted through ``/api/jobs``.
+
+Jobs run on a small worker pool; each one's :class:`JobProgress` stays
+queryable until it falls out of the finished-job history.
+"""
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from app.config import logger, JOB_MAX_WORKERS, JOB_HISTORY_MAX
+from app.utils.progress import JobProgress, track
+
+
+class JobRegistry:
+    """Thread-safe store of submitted jobs plus the pool that runs them."""
+
+    def __init__(self, max_workers: int = None, history: int = None):
+        self._max_workers = max_workers or JOB_MAX_WORKERS
+        self._history = history if history is not None else JOB_HISTORY_MAX
+        self._jobs: "OrderedDict[str, JobProgress]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+    def submit(self, fn: Callable[[], dict]) -> JobProgress:
+        """Queue *fn* and return its progress object at once.
+
+        *fn* returns the job's result dict; an exception marks the job
+        failed, with an ``HTTPException``'s ``detail`` as the error text.
+        """
+        job = JobProgress(uuid.uuid4().hex[:8])
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(self._max_workers, thread_name_prefix="job")
+            pool = self._pool
+        job.update(state="queued")
+        pool.submit(self._run, job, fn)
+        return job
+
+    def get(self, job_id: str) -> Optional[JobProgress]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    @property
+    def count(self) -> int:
+        with self._lock:
+            return len(self._jobs)
+
+    def _run(self, job: JobProgress, fn: Callable[[], dict]):
+        job.update(state="running", phase="start")
+        try:
+            with track(job):
+                result = fn()
+        except Exception as e:
+            error = str(getattr(e, "detail", None) or e)
+            logger.error("[Jobs] Job %s failed: %s", job.id, error)
+            job.update(state="error", phase="done", item=None, error=error)
+        else:
+            job.update(state="success", phase="done", item=None, result=result)
+
+    def _prune(self):
+        """Drop the oldest finished jobs beyond the history limit (lock held)."""
+        excess = len(self._jobs) - self._history
+        if excess <= 0:
+            return
+        for job_id in [j.id for j in self._jobs.values() if j.finished][:excess]:
+            del self._jobs[job_id]
+
+
+job_registry = JobRegistry()
@@ -0,0 +1,284 @@
+"""
+Pattern-based mappings.
+
+A mapping's ``name`` may select several workbook items and its ``page``
+may select slides by title.  :func:`resolve_mappings` expands such rules
+into concrete ``{name, type, page}`` mappings from indexed workbook and
+template metadata (the ``get_excel_info`` / ``get_ppt_info`` dicts
+cached at upload time), so no Office application is involved.  Group
+selectors are answered from per-kind name lists built once per workbook;
+each distinct ``glob:`` / ``re:`` pattern is matched once against the
+names of the kind it selects and then cached, so the cost grows with the
+number of distinct patterns times sheets, not with the number of rules.
+
+Name selectors:
+
+* ``Metric DUT vs REF#1`` — the item with exactly this name (as before)
+* ``glob:Metric DUT*`` — shell-style wildcard
+* ``re:^BI \\d+$`` — regular expression (``re.search``)
+* ``@chartsheets``, ``@worksheets``, ``@charts`` (worksheets with embedded
+  charts) or ``@all``
+
+For ``glob:`` and ``re:`` rules, ``type`` limits the match to worksheets
+or chart sheets; ``any`` matches both.
+
+Page selectors:
+
+* ``8`` — that page; a rule matching several items fills consecutive
+  pages starting there
+* ``title~Mesh Backhaul`` — slides whose title contains the text
+* ``title=Summary`` — slides whose title is the text
+
+Title matching ignores case.  A title selector containing ``{name}`` is
+evaluated per item (the first matching slide wins); otherwise matched
+items and matching slides are paired in order.
+
+``"charts": "all"`` on a worksheet mapping becomes the explicit list of
+the sheet's chart indices (chart sheets drop the selector).  Mappings
+with an exact name, a numeric page and no ``"all"`` pass through
+untouched and need no metadata.
+"""
+import fnmatch
+import functools
+import re
+from typing import Dict, List, Optional, Tuple
+
+from app.utils.chart_layout import ALL_CHARTS
+
+ANY_TYPE = "any"
+GROUPS = ("@worksheets", "@chartsheets", "@charts", "@all")
+_PATTERN_PREFIXES = ("glob:", "re:")
+_TITLE_RE = re.compile(r"^title([~=])(.+)$", re.S)
+
+
+@functools.lru_cache(maxsize=1024)
+def _compile(kind: str, pattern: str):
+    if kind == "glob":
+        return re.compile(fnmatch.translate(pattern)).match
+    return re.compile(pattern).search
+
+
+def page_value(page):
+    """Return *page* as an ``int`` when it is numeric, else unchanged."""
+    if isinstance(page, str) and page.strip().isdigit():
+        return int(page)
+    return page
+
+
+def is_rule(mapping: dict) -> bool:
+    """True if *mapping* needs expanding (pattern name, title page or all charts)."""
+    name = mapping.get("name", "")
+    return (
+        name.startswith(_PATTERN_PREFIXES)
+        or name in GROUPS
+        or not isinstance(page_value(mapping.get("page")), int)
+        or mapping.get("charts") == ALL_CHARTS
+    )
+
+
+class WorkbookIndex:
+    """Sheet names of one workbook, in workbook order, by kind."""
+
+    def __init__(self, info: dict):
+        worksheets = info.get("worksheets", [])
+        self.items: List[Tuple[str, str]] = (
+            [(ws["name"], "worksheet") for ws in worksheets]
+            + [(cs["name"], "chartsheet") for cs in info.get("chartsheets", [])]
+        )
+        self.with_charts = {ws["name"] for ws in worksheets if ws.get("has_charts")}
+        # Candidate items per selector kind / type, built once
+        self._by_type: Dict[str, List[Tuple[str, str]]] = {
+            ANY_TYPE: self.items,
+            "worksheet": [i for i in self.items if i[1] == "worksheet"],
+            "chartsheet": [i for i in self.items if i[1] == "chartsheet"],
+        }
+        self._groups: Dict[str, List[Tuple[str, str]]] = {
+            "@all": self.items,
+            "@worksheets": self._by_type["worksheet"],
+            "@chartsheets": self._by_type["chartsheet"],
+            "@charts": [i for i in self._by_type["worksheet"] if i[0] in self.with_charts],
+        }
+        self._cache: Dict[Tuple[str, str], List[Tuple[str, str]]] = {}
+        # Excel resolves sheet names case-insensitively
+        self.chart_counts = {
+            ws["name"].casefold(): ws.get("chart_count", len(ws.get("charts", [])))
+            for ws in worksheets
+        }
+
+    def select(self, selector: str, item_type: str) -> List[Tuple[str, str]]:
+        """Return the ``(name, type)`` items matched by *selector*.
+
+        Raises:
+            re.error: *selector* is an invalid ``re:`` pattern.
+        """
+        if selector in self._groups:
+            return list(self._groups[selector])
+
+        key = (selector, item_type)
+        selected = self._cache.get(key)
+        if selected is None:
+            kind, pattern = selector.split(":", 1)
+            match = _compile(kind, pattern)
+            candidates = self._by_type.get(item_type, [])
+            selected = self._cache[key] = [item for item in candidates if match(item[0])]
+        return list(selected)
+
+
+class TemplateIndex:
+    """Slide titles of one template, for title selectors."""
+
+    def __init__(self, info: dict):
+        self.total_slides = info.get("total_slides", 0)
+        self._titles = [
+            (s["page"], (s.get("title") or "").strip().casefold()) for s in info.get("slides", [])
+        ]
+        self._exact: Dict[str, List[int]] = {}
+        for page, title in self._titles:
+            self._exact.setdefault(title, []).append(page)
+        self._cache: Dict[Tuple[str, str], List[int]] = {}
+
+    def pages(self, op: str, text: str) -> List[int]:
+        """Pages whose title contains (``~``) or equals (``=``) *text*."""
+        key = (op, text.strip().casefold())
+        pages = self._cache.get(key)
+        if pages is None:
+            if op == "=":
+                pages = self._exact.get(key[1], [])
+            else:
+                pages = [page for page, title in self._titles if key[1] in title]
+            self._cache[key] = pages
+        return pages
+
+
+def resolve_mappings(
+    mappings: List[dict],
+    workbooks: Dict[Optional[str], Optional[WorkbookIndex]],
+    template: Optional[TemplateIndex],
+    workbook_key: str = "excel_id",
+) -> dict:
+    """Expand pattern rules in *mappings* into concrete mappings.
+
+    Args:
+        mappings: Mapping dicts with ``name``, ``page`` and ``type``; any
+            other keys are copied onto every mapping a rule expands to.
+        workbooks: Index of each workbook, keyed by the mapping's
+            *workbook_key* value (``None`` for single-workbook callers).
+        template: Index of the target template (needed by title selectors).
+
+    Returns:
+        ``{"mappings": [...], "warnings": [...], "errors": [...]}``; a rule
+        that matches nothing is a warning, a rule that cannot be evaluated
+        is an error.
+    """
+    resolved, warnings, errors = [], [], []
+    for n, mapping in enumerate(mappings, 1):
+        page = page_value(mapping.get("page"))
+        if not is_rule(mapping):
+            resolved.append({**mapping, "page": page})
+            continue
+
+        name = mapping.get("name", "")
+        label = f"規則 {n} ({name})"
+        workbook = workbooks.get(mapping.get(workbook_key))
+
+        # Items
+        if name.startswith(_PATTERN_PREFIXES) or name in GROUPS:
+            if workbook is None:
+                errors.append(f"{label}: 缺少 Excel 中繼資料，無法展開")
+                continue
+            try:
+                items = workbook.select(name, mapping.get("type", ANY_TYPE))
+            except re.error as e:
+                errors.append(f"{label}: 無效的正規表示式: {e}")
+                continue
+            if not items:
+                warnings.append(f"{label}: 沒有符合的項目")
+                continue
+        else:
+            items = [(name, mapping.get("type"))]
+
+        # Pages
+        if isinstance(page, int):
+            pairs = [(item, page + i) for i, item in enumerate(items)]
+        else:
+            m = _TITLE_RE.match(str(page).strip())
+            if not m:
+                errors.append(f"{label}: 無法解析頁面 '{page}'")
+                continue
+            if template is None:
+                errors.append(f"{label}: 缺少 PPT 模板中繼資料，無法比對標題")
+                continue
+            op, text = m.groups()
+            if "{name}" in text:
+                pairs = []
+                for item in items:
+                    title = text.replace("{name}", item[0])
+                    pages = template.pages(op, title)
+                    if pages:
+                        pairs.append((item, pages[0]))
+                    else:
+                        warnings.append(f"{label}: 找不到標題符合 '{title}' 的投影片")
+            else:
+                pages = template.pages(op, text)
+                if not pages:
+                    warnings.append(f"{label}: 找不到標題符合 '{text}' 的投影片")
+                    continue
+                pairs = list(zip(items, pages))
+                if len(items) > len(pages):
+                    warnings.append(
+                        f"{label}: {len(items) - len(pages)} 個項目沒有對應的投影片"
+                    )
+
+        # Charts
+        if mapping.get("charts") == ALL_CHARTS:
+            if workbook is None:
+                errors.append(f"{label}: 缺少 Excel 中繼資料，無法列出圖表")
+                continue
+            charts = {}
+            for (item_name, item_type), _ in pairs:
+                count = workbook.chart_counts.get(item_name.casefold(), 0)
+                if item_type == "chartsheet":
+                    charts[item_name] = None
+                elif count:
+                    charts[item_name] = list(range(1, count + 1))
+                else:
+                    warnings.append(f"{label}: 工作表 '{item_name}' 沒有圖表")
+            pairs = [p for p in pairs if p[0][0] in charts]
+
+        for (item_name, item_type), item_page in pairs:
+            expanded = {**mapping, "name": item_name, "type": item_type, "page": item_page}
+            if mapping.get("charts") == ALL_CHARTS:
+                expanded["charts"] = charts[item_name]
+            resolved.append(expanded)
+
+    return {"mappings": resolved, "warnings": warnings, "errors": errors}
+
+
+def resolve_chart_mappings(
+    mappings: list,
+    template_meta: Optional[dict],
+    uploaded_files: Dict[str, Optional[dict]],
+) -> dict:
+    """:func:`resolve_mappings` for API ``ChartMapping`` lists.
+
+    Args:
+        template_meta: The template's cached ``get_ppt_info`` metadata.
+        uploaded_files: ``{excel_id: file_manager entry or None}``.
+
+    Returns:
+        Like :func:`resolve_mappings`, with ``ChartMapping`` objects.
+    """
+    from app.models.schemas import ChartMapping
+
+    dicts = [m.model_dump() for m in mappings]
+    if not any(is_rule(d) for d in dicts):
+        return {"mappings": list(mappings), "warnings": [], "errors": []}
+
+    workbooks = {
+        excel_id: WorkbookIndex(info["metadata"]) if info and info.get("metadata") else None
+        for excel_id, info in uploaded_files.items()
+    }
+    template = TemplateIndex(template_meta) if template_meta else None
+    result = resolve_mappings(dicts, workbooks, template)
+    result["mappings"] = [ChartMapping(**d) for d in result["mappings"]]
+    return result
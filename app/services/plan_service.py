@@ -0,0 +1,293 @@
+"""
+Dry-run planning for generate requests.
+
+Checks a ``GenerateRequest`` against the workbook and template metadata
+cached at upload time — no Excel or PowerPoint is started — and returns
+the execution plan with a rough cost estimate per step.
+"""
+from typing import Dict, List, Optional, Tuple
+
+from app.config import PLAN_COST_MS
+from app.models.schemas import ChartMapping, GenerateRequest
+from app.services.ppt_service import capture_units, get_effective_layout
+
+VALID_TYPES = ("worksheet", "chartsheet")
+VALID_CHART_MODES = ("image", "embedded")
+
+
+def plan_generate(
+    request: GenerateRequest,
+    template_info: Optional[dict],
+    uploaded_files: Dict[str, Optional[dict]],
+) -> dict:
+    """Validate *request* and build its execution plan.
+
+    Args:
+        request: The generate request to check.
+        template_info: ``file_manager`` entry for the template, or ``None``.
+        uploaded_files: ``{excel_id: file_manager entry or None}`` for every
+            Excel file referenced by the mappings.
+
+    Returns:
+        A plan dict with ``valid``, ``errors``, ``warnings``, per-mapping
+        entries (``mappings``), ordered ``steps`` and ``estimated_total_ms``.
+    """
+    errors: List[str] = []
+    warnings: List[str] = []
+
+    template_meta = (template_info or {}).get("metadata")
+    if not template_info:
+        errors.append("PPT 模板不存在，請重新上傳")
+    elif not template_meta:
+        warnings.append("PPT 模板缺少中繼資料，無法檢查頁碼與版面")
+
+    entries = []
+    captured = set()
+    for idx, mapping in enumerate(request.mappings):
+        entry = _plan_mapping(
+            idx, mapping, request, template_meta, uploaded_files.get(mapping.excel_id)
+        )
+        keys = {key for key, _ in capture_units(mapping)}
+        if entry["chart_mode"] == "image" and not entry["errors"]:
+            if keys <= captured:
+                # capture_image_mappings captures each item only once
+                entry["strategy"] = "reuse"
+                entry["estimated_ms"] = PLAN_COST_MS["insert"] * len(keys)
+            captured |= keys
+        entries.append(entry)
+
+    if template_meta:
+        warnings.extend(_overlap_warnings(entries))
+
+    steps = _plan_steps(request, entries, uploaded_files)
+    total = sum(step["estimated_ms"] for step in steps)
+
+    return {
+        "valid": not errors and all(not e["errors"] for e in entries),
+        "errors": errors,
+        "warnings": warnings,
+        "mode": _mode(entries),
+        "mappings": entries,
+        "steps": steps,
+        "estimated_total_ms": total,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Per-mapping checks
+# ---------------------------------------------------------------------------
+def _plan_mapping(
+    idx: int,
+    mapping: ChartMapping,
+    request: GenerateRequest,
+    template_meta: Optional[dict],
+    excel_info: Optional[dict],
+) -> dict:
+    errors: List[str] = []
+    warnings: List[str] = []
+    strategy = None
+
+    if mapping.chart_mode not in VALID_CHART_MODES:
+        errors.append(f"未知的圖表模式: {mapping.chart_mode}")
+    if mapping.type not in VALID_TYPES:
+        errors.append(f"未知的類型: {mapping.type}")
+    if mapping.charts is not None:
+        if mapping.type == "chartsheet":
+            errors.append("圖表工作表不能選擇圖表 (charts)")
+        elif mapping.chart_mode == "embedded":
+            errors.append("選擇多個圖表 (charts) 僅支援圖片模式")
+
+    # Page range and placement box
+    layout = None
+    slide_title = ""
+    if template_meta:
+        total_slides = template_meta.get("total_slides", 0)
+        if mapping.page > total_slides:
+            errors.append(f"第 {mapping.page} 頁不存在")
+        else:
+            slide_title = template_meta["slides"][mapping.page - 1].get("title", "")
+        layout = get_effective_layout(request, slide_title)
+        if (
+            layout["left"] < 0
+            or layout["top"] < 0
+            or layout["left"] + layout["width"] > template_meta["width"] + 1e-6
+            or layout["top"] + layout["height"] > template_meta["height"] + 1e-6
+        ):
+            warnings.append("圖片超出投影片範圍")
+
+    # Item existence and chart presence
+    excel_name = excel_info["filename"] if excel_info else None
+    if not excel_info:
+        errors.append(f"Excel 檔案不存在: {mapping.excel_id}")
+    elif not excel_info.get("metadata"):
+        warnings.append("Excel 檔案缺少中繼資料，無法檢查項目")
+    elif mapping.type in VALID_TYPES:
+        item, actual_type = _find_item(excel_info["metadata"], mapping.name)
+        if item is None:
+            errors.append(f"找不到項目: {mapping.name}")
+        elif actual_type != mapping.type:
+            errors.append(f"'{mapping.name}' 的類型是 {actual_type}，不是 {mapping.type}")
+        elif mapping.type == "chartsheet":
+            strategy = "capture_chartsheet"
+        elif isinstance(mapping.charts, list):
+            errors.extend(_chart_errors(mapping.name, mapping.charts, item))
+            strategy = "capture_worksheet_chart"
+        elif item.get("chart_count", 0) > 0:
+            strategy = "capture_worksheet_chart"
+        elif mapping.chart_mode == "embedded":
+            errors.append("工作表中沒有圖表")
+        else:
+            strategy = "capture_worksheet_range"
+
+    if mapping.chart_mode == "embedded" and not errors:
+        strategy = "embedded_paste"
+
+    estimated = 0
+    if not errors:
+        estimated = PLAN_COST_MS.get(strategy, PLAN_COST_MS["capture_worksheet_chart"])
+        if mapping.chart_mode == "image":
+            estimated += PLAN_COST_MS["insert"]
+            if request.optimize_images:
+                estimated += PLAN_COST_MS["optimize"]
+            estimated *= len(capture_units(mapping))
+
+    return {
+        "index": idx,
+        "excel_id": mapping.excel_id,
+        "excel": excel_name,
+        "name": mapping.name,
+        "type": mapping.type,
+        "page": mapping.page,
+        "slide_title": slide_title,
+        "chart_mode": mapping.chart_mode,
+        "strategy": strategy,
+        "layout": layout,
+        "estimated_ms": estimated,
+        "errors": errors,
+        "warnings": warnings,
+    }
+
+
+def _chart_errors(sheet: str, charts: list, item: dict) -> List[str]:
+    """Check a worksheet mapping's chart indices and names against cached metadata."""
+    count = item.get("chart_count", 0)
+    if not count:
+        return [f"工作表 '{sheet}' 中沒有圖表"]
+    names = {n.casefold() for n in item.get("charts", [])}
+    errors = []
+    for chart in charts:
+        if isinstance(chart, int) and chart > count:
+            errors.append(f"工作表 '{sheet}' 只有 {count} 個圖表，沒有第 {chart} 個")
+        elif isinstance(chart, str) and names and chart.casefold() not in names:
+            errors.append(f"工作表 '{sheet}' 中找不到圖表: {chart}")
+    return errors
+
+
+def _find_item(metadata: dict, name: str) -> Tuple[Optional[dict], Optional[str]]:
+    """Look up *name* in cached workbook metadata.
+
+    Excel resolves ``Worksheets(name)`` / ``Charts(name)`` case-insensitively,
+    so the lookup does too.
+    """
+    wanted = name.casefold()
+    for item in metadata.get("worksheets", []):
+        if item["name"].casefold() == wanted:
+            return item, "worksheet"
+    for item in metadata.get("chartsheets", []):
+        if item["name"].casefold() == wanted:
+            return item, "chartsheet"
+    return None, None
+
+
+def _overlap_warnings(entries: List[dict]) -> List[str]:
+    """Warn about mappings whose placement boxes overlap on the same slide."""
+    warnings = []
+    by_page: Dict[int, List[dict]] = {}
+    for e in entries:
+        if e["layout"] and not e["errors"]:
+            by_page.setdefault(e["page"], []).append(e)
+
+    for page, items in sorted(by_page.items()):
+        for i, a in enumerate(items):
+            for b in items[i + 1:]:
+                if _boxes_overlap(a["layout"], b["layout"]):
+                    msg = f"第 {page} 頁: '{a['name']}' 與 '{b['name']}' 版面重疊"
+                    a["warnings"].append(msg)
+                    b["warnings"].append(msg)
+                    warnings.append(msg)
+    return warnings
+
+
+def _boxes_overlap(a: dict, b: dict) -> bool:
+    return (
+        a["left"] < b["left"] + b["width"]
+        and b["left"] < a["left"] + a["width"]
+        and a["top"] < b["top"] + b["height"]
+        and b["top"] < a["top"] + a["height"]
+    )
+
+
+# ---------------------------------------------------------------------------
+# Execution steps
+# ---------------------------------------------------------------------------
+def _plan_steps(
+    request: GenerateRequest,
+    entries: List[dict],
+    uploaded_files: Dict[str, Optional[dict]],
+) -> List[dict]:
+    """Mirror the order of work in ``/api/generate``."""
+    runnable = [e for e in entries if not e["errors"]]
+    image = [e for e in runnable if e["chart_mode"] == "image"]
+    embedded = [e for e in runnable if e["chart_mode"] == "embedded"]
+
+    steps = [{"step": "template_load", "estimated_ms": PLAN_COST_MS["template_load"]}]
+
+    if image:
+        steps.append({"step": "excel_start", "estimated_ms": PLAN_COST_MS["excel_start"]})
+        for excel_id in dict.fromkeys(e["excel_id"] for e in image):
+            steps.append(_open_step(excel_id, uploaded_files))
+        for e in image:
+            steps.append(_mapping_step(e))
+
+    steps.append({"step": "save", "estimated_ms": PLAN_COST_MS["save"]})
+
+    if embedded:
+        steps.append({"step": "excel_start", "estimated_ms": PLAN_COST_MS["excel_start"]})
+        steps.append({
+            "step": "powerpoint_start", "estimated_ms": PLAN_COST_MS["powerpoint_start"],
+        })
+        for excel_id in dict.fromkeys(e["excel_id"] for e in embedded):
+            steps.append(_open_step(excel_id, uploaded_files))
+        for e in embedded:
+            steps.append(_mapping_step(e))
+        steps.append({"step": "save", "estimated_ms": PLAN_COST_MS["save"]})
+
+    return steps
+
+
+def _open_step(excel_id: str, uploaded_files: Dict[str, Optional[dict]]) -> dict:
+    return {
+        "step": "workbook_open",
+        "excel_id": excel_id,
+        "excel": uploaded_files[excel_id]["filename"],
+        "estimated_ms": PLAN_COST_MS["workbook_open"],
+    }
+
+
+def _mapping_step(entry: dict) -> dict:
+    return {
+        "step": entry["strategy"],
+        "mapping": entry["index"],
+        "name": entry["name"],
+        "page": entry["page"],
+        "estimated_ms": entry["estimated_ms"],
+    }
+
+
+def _mode(entries: List[dict]) -> str:
+    modes = {e["chart_mode"] for e in entries}
+    if {"image", "embedded"} <= modes:
+        return "mixed"
+    if "embedded" in modes:
+        return "embedded"
+    return "image"
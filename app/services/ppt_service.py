@@ -7,7 +7,7 @@ import os
 import time
 import shutil
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
 from pptx import Presentation
 from pptx.util import Inches
@@ -19,8 +19,18 @@ from app.config import (
     COM_CLIPBOARD_DELAY,
 )
 from app.models.schemas import ChartMapping, GenerateRequest
-from app.services.excel_service import ExcelCOM, PowerPointCOM, capture_item
+from app.services.excel_service import (
+    ExcelCOM, PowerPointCOM, _init_com, capture_item_result, log_com_summary,
+)
+from app.services.capture_strategy import strategy_learner, workbook_fingerprint
+from app.utils.com_proxy import instrument
 from app.utils.clipboard import clear_clipboard
+from app.utils.capture_result import CaptureResult
+from app.utils.chart_layout import Box, ChartRef, chart_key, fit_in, layout_positions
+from app.utils.phash import CaptureIndex
+from app.utils.metrics import stage_timer
+from app.utils.progress import report
+from app.utils.image_optimizer import optimize_images
 
 
 # ---------------------------------------------------------------------------
@@ -106,90 +116,192 @@ def process_image_mappings(
     uploaded_files: dict,
 ) -> List[dict]:
     """Insert charts as static PNG images into a python-pptx Presentation."""
-    results: List[dict] = []
+    extracted = capture_image_mappings(mappings, job_dir, uploaded_files)
+    try:
+        if request.optimize_images:
+            boxes = collect_placement_boxes(mappings, request, extracted, slide_titles)
+            with stage_timer("optimize"):
+                optimize_images((extracted[k], w, h) for k, (w, h) in boxes.items())
+        return insert_image_mappings(
+            mappings, prs, request, extracted, slide_titles, uploaded_files
+        )
+    finally:
+        release_captures(extracted)
 
-    # Group by Excel file
-    excel_files: Dict[str, dict] = {}
-    for m in mappings:
-        if m.excel_id not in excel_files:
-            excel_files[m.excel_id] = {
-                "path": uploaded_files[m.excel_id]["path"],
-                "filename": uploaded_files[m.excel_id]["filename"],
-                "mappings": [],
-            }
-        excel_files[m.excel_id]["mappings"].append(m)
 
-    # Extract images
-    extracted: Dict[str, str] = {}
+def capture_image_mappings(
+    mappings: List[ChartMapping],
+    job_dir: Path,
+    uploaded_files: dict,
+) -> Dict[str, CaptureResult]:
+    """Capture every distinct (workbook, item) in *mappings* as a PNG.
+
+    Each workbook is opened once; an item referenced by several mappings is
+    captured only once.  Clipboard captures are checked against a per-job
+    perceptual-hash index to catch stale pastes of an earlier item.
+
+    Returns:
+        A ``{"<excel_id>|<name>": CaptureResult}`` dict of successful
+        captures.  Call :func:`release_captures` when done with it.
+    """
+    extracted: Dict[str, CaptureResult] = {}
+    excel_files = _group_by_excel(mappings, uploaded_files)
+    if not excel_files:
+        return extracted
+
+    index = CaptureIndex()
+    total = sum(
+        len({key for m in info["mappings"] for key, _ in capture_units(m)})
+        for info in excel_files.values()
+    )
+    attempted = 0
     with ExcelCOM() as (excel_app, _):
         for excel_id, info in excel_files.items():
             logger.info("[Image Mode] Opening: %s", info["filename"])
-            workbook = excel_app.Workbooks.Open(info["path"])
-
-            for mapping in info["mappings"]:
-                key = f"{excel_id}|{mapping.name}"
-                safe_name = _safe_filename(f"{excel_id}_{mapping.name}")
+            report("workbook_open", info["filename"], done=attempted, total=total)
+            with stage_timer("workbook_open", {"excel.file": info["filename"]}):
+                workbook = excel_app.Workbooks.Open(info["path"])
+            fingerprint = workbook_fingerprint(uploaded_files[excel_id].get("metadata"))
+
+            for mapping, key, chart in (
+                (m, key, chart) for m in info["mappings"] for key, chart in capture_units(m)
+            ):
+                if key in extracted:
+                    continue
+                label = mapping.name if chart is None else f"{mapping.name} [{chart}]"
+                safe_name = _safe_filename(f"{excel_id}_{label}")
                 out_path = str(job_dir / f"{safe_name}.png")
 
-                logger.info("  Capturing: %s (type: %s)", mapping.name, mapping.type)
-                if capture_item(excel_app, workbook, mapping.name, mapping.type, out_path):
-                    extracted[key] = out_path
-                    logger.info("  [OK] Extracted: %s (%d bytes)", mapping.name, os.path.getsize(out_path))
+                logger.info("  Capturing: %s (type: %s)", label, mapping.type)
+                report("capture", label)
+                capture = capture_item_result(
+                    excel_app, workbook, mapping.name, mapping.type, out_path,
+                    index=index, key=key, fingerprint=fingerprint, chart=chart,
+                )
+                attempted += 1
+                report("capture", label, done=attempted)
+                if capture is not None:
+                    extracted[key] = capture
+                    logger.info("  [OK] Extracted: %s (%d bytes)", label, capture.size)
                 else:
-                    logger.warning("  [FAIL] Failed to extract: %s", mapping.name)
+                    logger.warning("  [FAIL] Failed to extract: %s", label)
 
             workbook.Close(SaveChanges=False)
 
-    # Insert into PPT
+    strategy_learner.save()
+    return extracted
+
+
+def release_captures(extracted: Dict[str, CaptureResult]):
+    """Release any memory maps held by captured images."""
+    for capture in extracted.values():
+        capture.close()
+
+
+def collect_placement_boxes(
+    mappings: List[ChartMapping],
+    request: GenerateRequest,
+    extracted: Dict[str, CaptureResult],
+    slide_titles: Dict[int, str],
+    boxes: Optional[Dict[str, Tuple[float, float]]] = None,
+) -> Dict[str, Tuple[float, float]]:
+    """Return the largest ``(width, height)`` box, in inches, each capture is placed in.
+
+    Pass *boxes* to accumulate across several requests sharing the same
+    captures (batch generation).
+    """
+    if boxes is None:
+        boxes = {}
     for mapping in mappings:
-        key = f"{mapping.excel_id}|{mapping.name}"
-        excel_filename = uploaded_files[mapping.excel_id]["filename"]
+        layout = get_effective_layout(request, slide_titles.get(mapping.page, ""))
+        for key, _, (_, _, width, height) in placement_slots(mapping, layout):
+            if key not in extracted:
+                continue
+            w, h = boxes.get(key, (0.0, 0.0))
+            boxes[key] = (max(w, width), max(h, height))
+    return boxes
 
-        if key not in extracted:
-            results.append({"name": mapping.name, "excel": excel_filename, "status": "failed", "reason": "擷取失敗"})
-            continue
-
-        slide_idx = mapping.page - 1
-        if slide_idx >= len(prs.slides):
-            results.append({"name": mapping.name, "excel": excel_filename, "status": "failed", "reason": f"第 {mapping.page} 頁不存在"})
-            continue
-
-        image_path = extracted[key]
-        if not os.path.exists(image_path):
-            results.append({"name": mapping.name, "excel": excel_filename, "status": "failed", "reason": "圖片檔案不存在"})
-            continue
-
-        image_size = os.path.getsize(image_path)
-        if image_size < 500:
-            results.append({"name": mapping.name, "excel": excel_filename, "status": "failed", "reason": f"圖片檔案可能損壞 (大小: {image_size} bytes)"})
-            continue
-
-        try:
-            slide = prs.slides[slide_idx]
-            slide_title = slide_titles.get(mapping.page, "")
-            layout = get_effective_layout(request, slide_title)
-            slide.shapes.add_picture(
-                image_path,
-                Inches(layout["left"]),
-                Inches(layout["top"]),
-                width=Inches(layout["width"]),
-                height=Inches(layout["height"]),
+
+def insert_image_mappings(
+    mappings: List[ChartMapping],
+    prs: Presentation,
+    request: GenerateRequest,
+    extracted: Dict[str, CaptureResult],
+    slide_titles: Dict[int, str],
+    uploaded_files: dict,
+) -> List[dict]:
+    """Insert previously captured images (see :func:`capture_image_mappings`)."""
+    results: List[dict] = []
+    report("insert")
+
+    for mapping in mappings:
+        excel_filename = uploaded_files[mapping.excel_id]["filename"]
+        slide_title = slide_titles.get(mapping.page, "")
+        layout = get_effective_layout(request, slide_title)
+        for key, chart, box in placement_slots(mapping, layout):
+            result = _insert_capture(
+                prs, mapping, extracted.get(key), chart, box, excel_filename, slide_title
             )
-            results.append({
-                "name": mapping.name,
-                "excel": excel_filename,
-                "status": "success",
-                "page": mapping.page,
-                "mode": "image",
-                "mesh_layout": is_mesh_slide_title(slide_title),
-            })
-        except Exception as e:
-            logger.error("Error adding image to slide: %s", e)
-            results.append({"name": mapping.name, "excel": excel_filename, "status": "failed", "reason": f"無法插入圖片: {e}"})
+            if chart is not None:
+                result["chart"] = chart
+            results.append(result)
 
     return results
 
 
+def _insert_capture(
+    prs: Presentation,
+    mapping: ChartMapping,
+    capture: Optional[CaptureResult],
+    chart: Optional[ChartRef],
+    box: Box,
+    excel_filename: str,
+    slide_title: str,
+) -> dict:
+    """Place one capture of *mapping* in *box* on its slide; return its result.
+
+    A single default capture fills the box; a selected chart is fitted
+    into its cell with its aspect ratio kept.
+    """
+    if capture is None:
+        return {"name": mapping.name, "excel": excel_filename, "status": "failed", "code": "capture_failed", "reason": "擷取失敗"}
+
+    slide_idx = mapping.page - 1
+    if slide_idx >= len(prs.slides):
+        return {"name": mapping.name, "excel": excel_filename, "status": "failed", "code": "page_missing", "reason": f"第 {mapping.page} 頁不存在"}
+
+    if capture.stale_of:
+        stale_name = capture.stale_of.split("|", 1)[-1]
+        return {"name": mapping.name, "excel": excel_filename, "status": "failed", "code": "stale_capture", "reason": f"擷取結果與「{stale_name}」相同，疑似剪貼簿殘留"}
+
+    image_size = capture.size
+    if image_size < 500:
+        return {"name": mapping.name, "excel": excel_filename, "status": "failed", "code": "corrupt_image", "reason": f"圖片檔案可能損壞 (大小: {image_size} bytes)"}
+
+    try:
+        slide = prs.slides[slide_idx]
+        left, top, width, height = box if chart is None else fit_in(box, capture.stats()[:2])
+        with stage_timer("add_picture", {"mapping.name": mapping.name, "slide.page": mapping.page}):
+            slide.shapes.add_picture(
+                capture.open(),
+                Inches(left),
+                Inches(top),
+                width=Inches(width),
+                height=Inches(height),
+            )
+        return {
+            "name": mapping.name,
+            "excel": excel_filename,
+            "status": "success",
+            "page": mapping.page,
+            "mode": "image",
+            "mesh_layout": is_mesh_slide_title(slide_title),
+        }
+    except Exception as e:
+        logger.error("Error adding image to slide: %s", e)
+        return {"name": mapping.name, "excel": excel_filename, "status": "failed", "code": "insert_failed", "reason": f"無法插入圖片: {e}"}
+
+
 # ---------------------------------------------------------------------------
 # Embedded-mode processing
 # ---------------------------------------------------------------------------
@@ -202,22 +314,10 @@ def process_embedded_mappings(
 ) -> List[dict]:
     """Insert charts as editable objects using COM copy-paste."""
     results: List[dict] = []
-
-    # Group by Excel file
-    excel_files: Dict[str, dict] = {}
-    for m in mappings:
-        if m.excel_id not in excel_files:
-            excel_files[m.excel_id] = {
-                "path": uploaded_files[m.excel_id]["path"],
-                "filename": uploaded_files[m.excel_id]["filename"],
-                "mappings": [],
-            }
-        excel_files[m.excel_id]["mappings"].append(m)
+    excel_files = _group_by_excel(mappings, uploaded_files)
 
     # We need both Excel and PowerPoint COM, both visible
-    import pythoncom
-    import win32com.client as win32
-
+    pythoncom, win32 = _init_com()
     pythoncom.CoInitialize()
     excel_app = None
     ppt_app = None
@@ -225,28 +325,33 @@ def process_embedded_mappings(
 
     try:
         logger.info("[Embedded Mode] Starting Excel...")
-        excel_app = win32.DispatchEx("Excel.Application")
-        excel_app.Visible = True
-        excel_app.DisplayAlerts = False
+        with stage_timer("excel_start"):
+            excel_app = instrument(win32.DispatchEx("Excel.Application"), "Excel")
+            excel_app.Visible = True
+            excel_app.DisplayAlerts = False
 
         logger.info("[Embedded Mode] Starting PowerPoint...")
-        ppt_app = win32.DispatchEx("PowerPoint.Application")
-        ppt_app.Visible = True
+        with stage_timer("powerpoint_start"):
+            ppt_app = instrument(win32.DispatchEx("PowerPoint.Application"), "PowerPoint")
+            ppt_app.Visible = True
 
-        presentation = ppt_app.Presentations.Open(ppt_path)
+        with stage_timer("presentation_open"):
+            presentation = ppt_app.Presentations.Open(ppt_path)
         time.sleep(0.5)
 
         for excel_id, info in excel_files.items():
             logger.info("[Embedded Mode] Opening: %s", info["filename"])
-            workbook = excel_app.Workbooks.Open(os.path.abspath(info["path"]))
+            with stage_timer("workbook_open", {"excel.file": info["filename"]}):
+                workbook = excel_app.Workbooks.Open(os.path.abspath(info["path"]))
             time.sleep(0.3)
 
             for mapping in info["mappings"]:
                 excel_filename = info["filename"]
                 logger.info("  [Embedded] Processing: %s -> Page %d", mapping.name, mapping.page)
+                report("embed", mapping.name, done=len(results), total=len(mappings))
 
                 if mapping.page > presentation.Slides.Count:
-                    results.append({"name": mapping.name, "excel": excel_filename, "status": "failed", "reason": f"第 {mapping.page} 頁不存在"})
+                    results.append({"name": mapping.name, "excel": excel_filename, "status": "failed", "code": "page_missing", "reason": f"第 {mapping.page} 頁不存在"})
                     continue
 
                 try:
@@ -277,15 +382,16 @@ def process_embedded_mappings(
                             chart_obj.Chart.ChartArea.Copy()
                         else:
                             logger.info("    [Embedded] No chart found, skipping")
-                            results.append({"name": mapping.name, "excel": excel_filename, "status": "failed", "reason": "工作表中沒有圖表"})
+                            results.append({"name": mapping.name, "excel": excel_filename, "status": "failed", "code": "no_chart", "reason": "工作表中沒有圖表"})
                             continue
 
                     time.sleep(0.5)
 
                     slide = presentation.Slides(mapping.page)
                     try:
-                        shape = slide.Shapes.Paste()
-                        time.sleep(0.3)
+                        with stage_timer("ppt_paste", {"mapping.name": mapping.name, "slide.page": mapping.page}):
+                            shape = slide.Shapes.Paste()
+                            time.sleep(0.3)
                         if hasattr(shape, "Item"):
                             shape = shape.Item(1)
 
@@ -312,15 +418,16 @@ def process_embedded_mappings(
 
                     except Exception as paste_error:
                         logger.warning("    [FAIL] Paste failed: %s", paste_error)
-                        results.append({"name": mapping.name, "excel": excel_filename, "status": "failed", "reason": f"貼上失敗: {paste_error}"})
+                        results.append({"name": mapping.name, "excel": excel_filename, "status": "failed", "code": "paste_failed", "reason": f"貼上失敗: {paste_error}"})
 
                 except Exception as e:
                     logger.error("    [ERROR] Processing %s: %s", mapping.name, e)
-                    results.append({"name": mapping.name, "excel": excel_filename, "status": "failed", "reason": str(e)})
+                    results.append({"name": mapping.name, "excel": excel_filename, "status": "failed", "code": "embedded_error", "reason": str(e)})
 
             workbook.Close(SaveChanges=False)
 
-        presentation.Save()
+        with stage_timer("save"):
+            presentation.Save()
         presentation.Close()
         presentation = None
 
@@ -338,11 +445,13 @@ def process_embedded_mappings(
                 excel_app.Quit()
             except Exception:
                 pass
+            log_com_summary("[Embedded Mode] Excel", excel_app)
         if ppt_app:
             try:
                 ppt_app.Quit()
             except Exception:
                 pass
+            log_com_summary("[Embedded Mode] PowerPoint", ppt_app)
         pythoncom.CoUninitialize()
 
     return results
@@ -351,6 +460,56 @@ def process_embedded_mappings(
 # ---------------------------------------------------------------------------
 # Helpers
 # ---------------------------------------------------------------------------
+def mapping_key(mapping: ChartMapping) -> str:
+    """Return the capture cache key for a mapping."""
+    return f"{mapping.excel_id}|{mapping.name}"
+
+
+def capture_units(mapping: ChartMapping) -> List[Tuple[str, Optional[ChartRef]]]:
+    """Return ``(capture key, chart)`` for every image *mapping* places.
+
+    ``chart`` is ``None`` for the default capture of the item; a worksheet
+    mapping with a resolved ``charts`` list has one unit per chart.
+    """
+    if mapping.type != "worksheet" or not isinstance(mapping.charts, list):
+        return [(mapping_key(mapping), None)]
+    base = mapping_key(mapping)
+    return [(chart_key(base, chart), chart) for chart in mapping.charts]
+
+
+def placement_slots(mapping: ChartMapping, layout: Dict[str, float]) -> List[Tuple[str, Optional[ChartRef], Box]]:
+    """Return ``(capture key, chart, box)`` for every image *mapping* places in *layout*.
+
+    Several charts split the box by ``mapping.layout``; the cell math is
+    cached per (count, layout, box).
+    """
+    units = capture_units(mapping)
+    box = (layout["left"], layout["top"], layout["width"], layout["height"])
+    if units[0][1] is None:
+        return [(units[0][0], None, box)]
+    cells = layout_positions(len(units), mapping.layout, box)
+    return [(key, chart, cell) for (key, chart), cell in zip(units, cells)]
+
+
+def output_filename(output_name: str) -> str:
+    """Return *output_name* with a ``.pptx`` suffix."""
+    return output_name if output_name.endswith(".pptx") else f"{output_name}.pptx"
+
+
+def _group_by_excel(mappings: List[ChartMapping], uploaded_files: dict) -> Dict[str, dict]:
+    """Group mappings by their source Excel file."""
+    excel_files: Dict[str, dict] = {}
+    for m in mappings:
+        if m.excel_id not in excel_files:
+            excel_files[m.excel_id] = {
+                "path": uploaded_files[m.excel_id]["path"],
+                "filename": uploaded_files[m.excel_id]["filename"],
+                "mappings": [],
+            }
+        excel_files[m.excel_id]["mappings"].append(m)
+    return excel_files
+
+
 def _safe_filename(name: str) -> str:
     """Sanitise a string for use as a file name."""
     for char in '<>:"/\\|?*# ':
@@ -0,0 +1,127 @@
+"""
+Idempotent generate — request-hash result cache with single-flight.
+
+Double-clicked "Generate" buttons and client retries submit the same
+request against the same uploads.  The request is reduced to a canonical
+hash over its settings and the *content* hashes of its inputs; completed
+results are stored under that hash, and concurrent identical requests wait
+for the one job already in flight instead of starting their own.
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Tuple
+
+from app.config import logger, RESULT_CACHE_MAX_ENTRIES
+from app.models.schemas import GenerateRequest
+
+# Fields that change how a result is delivered, not what is generated
+_DELIVERY_FIELDS = {"stream", "keep_copy", "profile", "memory"}
+
+
+def request_fingerprint(request: GenerateRequest, content_hashes: Dict[str, str]) -> str:
+    """Return a canonical hash of *request* with file IDs replaced by content hashes.
+
+    Args:
+        request: The generate request.
+        content_hashes: ``{file_id: sha256}`` for the template and every Excel
+            file referenced by the mappings.
+    """
+    body = request.model_dump(exclude=_DELIVERY_FIELDS)
+    body["template_id"] = content_hashes[request.template_id]
+    for mapping in body["mappings"]:
+        mapping["excel_id"] = content_hashes[mapping["excel_id"]]
+    canonical = json.dumps(body, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class _Flight:
+    """A job in progress that identical requests can wait on."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class ResultCache:
+    """Thread-safe store of completed results plus in-flight jobs."""
+
+    def __init__(self, max_entries: int = None):
+        if max_entries is None:
+            max_entries = RESULT_CACHE_MAX_ENTRIES
+        self._max_entries = max_entries
+        self._done: "OrderedDict[str, dict]" = OrderedDict()
+        self._inflight: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+
+    def run(
+        self,
+        key: str,
+        fn: Callable[[], dict],
+        is_valid: Callable[[dict], bool] = lambda r: True,
+        should_store: Callable[[dict], bool] = lambda r: True,
+    ) -> Tuple[dict, bool]:
+        """Return the result for *key*, running *fn* at most once concurrently.
+
+        Args:
+            key: Request fingerprint.
+            fn: Produces the result on a miss.
+            is_valid: Rejects a stored result that can no longer be served
+                (e.g. its output file was cleaned up).
+            should_store: Decides whether a fresh result is kept for repeats.
+
+        Returns:
+            ``(result, reused)`` — *reused* is ``True`` when the result came
+            from the store or from another caller's in-flight job.
+        """
+        with self._lock:
+            stored = self._done.get(key)
+            if stored is not None:
+                if is_valid(stored):
+                    self._done.move_to_end(key)
+                    return stored, True
+                del self._done[key]
+
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+
+        if not leader:
+            logger.info("[ResultCache] Waiting on in-flight job %s", key[:12])
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+
+        try:
+            result = fn()
+            flight.result = result
+            if should_store(result):
+                with self._lock:
+                    self._done[key] = result
+                    while len(self._done) > self._max_entries:
+                        self._done.popitem(last=False)
+            return result, False
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.event.set()
+
+    def clear(self):
+        with self._lock:
+            self._done.clear()
+
+    @property
+    def count(self) -> int:
+        with self._lock:
+            return len(self._done)
+
+
+# Singleton instance
+result_cache = ResultCache()
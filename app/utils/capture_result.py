@@ -0,0 +1,148 @@
+"""
+In-memory capture buffers.
+
+COM can only export a chart to a file path, but everything after that —
+validation, optimization and python-pptx insertion — works from a single
+read of that file.  Large images are memory-mapped instead of copied.
+"""
+import io
+import mmap
+from typing import Optional, Tuple, Union
+
+from PIL import Image
+
+from app.config import CAPTURE_MMAP_THRESHOLD_BYTES
+from app.utils.image_validator import analyze_image
+from app.utils.phash import dhash
+
+Buffer = Union[bytes, memoryview, mmap.mmap]
+
+
+class _BufferReader(io.RawIOBase):
+    """Zero-copy, independently positioned reader over a memoryview."""
+
+    def __init__(self, view: memoryview):
+        self._view = view
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        chunk = self._view[self._pos:self._pos + len(b)]
+        n = len(chunk)
+        b[:n] = chunk
+        self._pos += n
+        return n
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        self._pos = max(0, offset)
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+    def close(self):
+        self._view.release()
+        super().close()
+
+
+class CaptureResult:
+    """An encoded capture plus its decoded stats, held in memory.
+
+    Attributes:
+        data: Encoded image bytes (``bytes`` or a read-only ``mmap``).
+        source_path: File the capture was read from, if any.
+        method: ``"export"`` for a direct ``Chart.Export``; ``"clipboard"``
+            when the image went through ``CopyPicture`` + ``Paste``.
+        strategy: Name of the capture strategy that produced the image
+            (``"export"``, ``"copypicture"`` or ``"usedrange"``).
+        stale_of: Set when the image matches an earlier, different item's
+            capture (see :mod:`app.utils.phash`).
+    """
+
+    def __init__(self, data: Buffer, source_path: Optional[str] = None):
+        self.data = data
+        self.source_path = source_path
+        self.method = "export"
+        self.strategy = ""
+        self.stale_of: Optional[str] = None
+        self._stats: Optional[Tuple[int, int, int, float]] = None
+        self._phash: Optional[int] = None
+
+    @classmethod
+    def from_file(cls, path: str, mmap_threshold: int = None) -> "CaptureResult":
+        """Read *path* once; files above *mmap_threshold* bytes are memory-mapped."""
+        if mmap_threshold is None:
+            mmap_threshold = CAPTURE_MMAP_THRESHOLD_BYTES
+        with open(path, "rb") as f:
+            f.seek(0, io.SEEK_END)
+            size = f.tell()
+            f.seek(0)
+            if mmap_threshold and size >= mmap_threshold:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                data = f.read()
+        return cls(data, source_path=path)
+
+    # -- Accessors ----------------------------------------------------------
+
+    @property
+    def size(self) -> int:
+        """Encoded size in bytes."""
+        return len(self.data)
+
+    def stats(self) -> Tuple[int, int, int, float]:
+        """Return ``(width, height, unique_gray_levels, stdev)``, decoding once."""
+        if self._stats is None:
+            with Image.open(self.open()) as img:
+                unique_colors, stdev = analyze_image(img)
+                self._stats = (img.width, img.height, unique_colors, stdev)
+        return self._stats
+
+    def phash(self) -> int:
+        """Return the perceptual (difference) hash of the image, decoding once."""
+        if self._phash is None:
+            with Image.open(self.open()) as img:
+                self._phash = dhash(img)
+        return self._phash
+
+    def open(self):
+        """Return a new readable, seekable stream over the encoded bytes.
+
+        Suitable for ``PIL.Image.open`` and ``slide.shapes.add_picture``.
+        Each call gets its own position, so several decks can read the same
+        capture concurrently.
+        """
+        if isinstance(self.data, mmap.mmap):
+            return _BufferReader(memoryview(self.data))
+        return io.BytesIO(self.data)
+
+    # -- Mutation -----------------------------------------------------------
+
+    def replace(self, data: Buffer):
+        """Swap in re-encoded bytes (e.g. after optimization)."""
+        if data is self.data:
+            return
+        self.close()
+        self.data = data
+        self._stats = None
+        self._phash = None
+
+    def close(self):
+        """Release a memory map, if one is held."""
+        if isinstance(self.data, mmap.mmap) and not self.data.closed:
+            try:
+                self.data.close()
+            except BufferError:
+                pass  # a reader still holds a view; the map is freed with it
+
+    def __repr__(self):
+        return f"CaptureResult(size={self.size}, source_path={self.source_path!r})"
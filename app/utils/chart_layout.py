@@ -0,0 +1,90 @@
+"""
+Several charts of one worksheet on a slide.
+
+A worksheet mapping may select more than one of the sheet's embedded
+charts (``charts``: ``"all"``, 1-based indices and/or chart names).  Each
+selected chart is captured on its own and the captures share the
+mapping's placement box, arranged in a grid, a row (``horizontal``) or a
+column (``vertical``) — the arrangements of
+``PPTGenerator._calculate_positions``, fitted to the box instead of the
+whole slide.
+"""
+import functools
+from typing import List, Optional, Tuple, Union
+
+from app.config import MULTI_CHART_GAP
+
+ALL_CHARTS = "all"
+LAYOUTS = ("grid", "horizontal", "vertical")
+
+ChartRef = Union[int, str]
+Box = Tuple[float, float, float, float]  # left, top, width, height (inches)
+
+
+def normalize_charts(charts) -> Optional[Union[str, List[ChartRef]]]:
+    """Return a ``charts`` selector as ``None``, ``"all"`` or a list.
+
+    A single index or name becomes a one-item list; numeric strings become
+    indices.
+
+    Raises:
+        ValueError: The selector is empty or has an index below 1.
+    """
+    if charts is None:
+        return None
+    if isinstance(charts, str) and charts.strip().casefold() == ALL_CHARTS:
+        return ALL_CHARTS
+    selected = []
+    for chart in charts if isinstance(charts, list) else [charts]:
+        if isinstance(chart, str) and chart.strip().isdigit():
+            chart = int(chart)
+        if isinstance(chart, bool) or (isinstance(chart, int) and chart < 1):
+            raise ValueError(f"chart index must be >= 1: {chart!r}")
+        selected.append(chart)
+    if not selected:
+        raise ValueError("charts must select at least one chart")
+    return selected
+
+
+def chart_key(base: str, chart: ChartRef) -> str:
+    """Capture key of one selected chart of the item with key *base*."""
+    return f"{base}#{chart}"
+
+
+@functools.lru_cache(maxsize=256)
+def layout_positions(count: int, layout: str, box: Box, gap: float = MULTI_CHART_GAP) -> Tuple[Box, ...]:
+    """Split *box* into *count* cells for the given layout.
+
+    Computed once per (count, layout, box) — i.e. once per slide layout,
+    however many decks or mappings use it.
+
+    Grids use 2 columns for up to 4 charts and 3 beyond, filled row by row.
+    """
+    left, top, width, height = box
+    if count <= 1:
+        return (box,)
+    if layout == "horizontal":
+        cols, rows = count, 1
+    elif layout == "vertical":
+        cols, rows = 1, count
+    else:
+        cols = 2 if count <= 4 else 3
+        rows = -(-count // cols)
+
+    cell_w = (width - (cols - 1) * gap) / cols
+    cell_h = (height - (rows - 1) * gap) / rows
+    return tuple(
+        (left + (i % cols) * (cell_w + gap), top + (i // cols) * (cell_h + gap), cell_w, cell_h)
+        for i in range(count)
+    )
+
+
+def fit_in(cell: Box, size: Tuple[int, int]) -> Box:
+    """Return the largest box with the aspect ratio of *size* centred in *cell*."""
+    left, top, width, height = cell
+    img_w, img_h = size
+    if not img_w or not img_h:
+        return cell
+    scale = min(width / img_w, height / img_h)
+    w, h = img_w * scale, img_h * scale
+    return (left + (width - w) / 2, top + (height - h) / 2, w, h)
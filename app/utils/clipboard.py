@@ -6,6 +6,11 @@ from app.config import logger
 
 def clear_clipboard():
     """Clear the Windows clipboard to avoid stale data issues."""
+    from app.services.excel_service import com_backend
+    if com_backend() == "fake":
+        from app.services import fake_com
+        fake_com.clear_clipboard()
+        return
     try:
         import win32clipboard
         win32clipboard.OpenClipboard()
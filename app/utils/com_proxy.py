@@ -0,0 +1,170 @@
+"""
+Instrumented proxy for Excel / PowerPoint COM objects.
+
+Every property get, property put and method call on a COM object is a
+cross-process round trip.  :func:`instrument` wraps an application object
+so that each of those is counted and timed per *member* — e.g.
+``Workbooks.Open``, ``UsedRange.Rows`` or ``Rows.Count`` — and every COM
+object reached through it is wrapped the same way.
+
+Calls are recorded in the proxy's own :class:`ComCallStats`, in the
+process-wide ``excel2ppt_com_calls_total`` metrics and in the current job's
+``timings``, so chatty call sites can be found and cut.
+"""
+import threading
+import time
+from typing import Dict, List, Tuple
+
+from app.config import COM_PROXY_ENABLED
+from app.utils.metrics import record_com_call
+
+# Object kind produced by a call, where the member name alone is misleading
+_CALL_RESULT_KINDS = {
+    "Workbooks.Open": "Workbook",
+    "Presentations.Open": "Presentation",
+    "Charts.Add": "Chart",
+    "Shapes.Paste": "ShapeRange",
+}
+
+
+def _is_com_object(value) -> bool:
+    return hasattr(value, "_oleobj_")
+
+
+def _unwrap(value):
+    return object.__getattribute__(value, "_obj") if isinstance(value, ComProxy) else value
+
+
+def _call_kind(member: str, indexed: bool) -> str:
+    """``Worksheets(name)`` yields a ``Worksheet``; ``ChartObjects()`` the collection."""
+    if member in _CALL_RESULT_KINDS:
+        return _CALL_RESULT_KINDS[member]
+    name = member.rsplit(".", 1)[-1]
+    return name[:-1] if indexed and name.endswith("s") else name
+
+
+class ComCallStats:
+    """Thread-safe per-member call counts and latency."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._members: Dict[str, List[float]] = {}  # member -> [count, seconds]
+
+    def record(self, member: str, seconds: float):
+        with self._lock:
+            entry = self._members.setdefault(member, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+        record_com_call(member, seconds)
+
+    @property
+    def total_calls(self) -> int:
+        with self._lock:
+            return int(sum(count for count, _ in self._members.values()))
+
+    def count(self, member: str) -> int:
+        with self._lock:
+            return int(self._members.get(member, (0, 0.0))[0])
+
+    def top(self, n: int = 10) -> List[Tuple[str, int, float]]:
+        """Return the *n* members with the most time, as ``(member, calls, seconds)``."""
+        with self._lock:
+            items = [(m, int(c), s) for m, (c, s) in self._members.items()]
+        return sorted(items, key=lambda item: item[2], reverse=True)[:n]
+
+
+class ComProxy:
+    """Transparent wrapper that times every member access on a COM object."""
+
+    __slots__ = ("_obj", "_kind", "_stats")
+
+    def __init__(self, obj, kind: str, stats: ComCallStats):
+        object.__setattr__(self, "_obj", obj)
+        object.__setattr__(self, "_kind", kind)
+        object.__setattr__(self, "_stats", stats)
+
+    def _wrap(self, value, kind: str):
+        if _is_com_object(value):
+            return ComProxy(value, kind, self._stats)
+        return value
+
+    def _timed(self, member: str, fn, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            self._stats.record(member, time.perf_counter() - start)
+
+    def __getattr__(self, name: str):
+        member = f"{self._kind}.{name}"
+        start = time.perf_counter()
+        value = getattr(self._obj, name)
+        if callable(value) and not _is_com_object(value):
+            # Method lookup is local; the round trip happens when it is called
+            return _MethodProxy(self, member, value)
+        self._stats.record(member, time.perf_counter() - start)
+        return self._wrap(value, name)
+
+    def __setattr__(self, name: str, value):
+        self._timed(f"{self._kind}.{name}=", setattr, self._obj, name, _unwrap(value))
+
+    def __call__(self, *args, **kwargs):
+        member = f"{self._kind}()"
+        args = [_unwrap(a) for a in args]
+        kwargs = {k: _unwrap(v) for k, v in kwargs.items()}
+        value = self._timed(member, self._obj, *args, **kwargs)
+        return self._wrap(value, _call_kind(self._kind, bool(args or kwargs)))
+
+    def __iter__(self):
+        member = f"{self._kind}[iter]"
+        iterator = self._timed(member, iter, self._obj)
+        kind = _call_kind(self._kind, indexed=True)
+        while True:
+            try:
+                item = self._timed(member, next, iterator)
+            except StopIteration:
+                return
+            yield self._wrap(item, kind)
+
+    def __bool__(self):
+        return True
+
+    def __repr__(self):
+        return f"<ComProxy {self._kind} {self._obj!r}>"
+
+
+class _MethodProxy:
+    """A bound COM method; calling it is one timed round trip."""
+
+    __slots__ = ("_owner", "_member", "_fn")
+
+    def __init__(self, owner: ComProxy, member: str, fn):
+        self._owner = owner
+        self._member = member
+        self._fn = fn
+
+    def __call__(self, *args, **kwargs):
+        args = [_unwrap(a) for a in args]
+        kwargs = {k: _unwrap(v) for k, v in kwargs.items()}
+        value = self._owner._timed(self._member, self._fn, *args, **kwargs)
+        return self._owner._wrap(value, _call_kind(self._member, bool(args or kwargs)))
+
+
+def instrument(obj, kind: str, stats: ComCallStats = None):
+    """Wrap a COM application object (no-op when ``COM_PROXY_ENABLED`` is off).
+
+    Args:
+        obj: The object returned by ``DispatchEx``.
+        kind: Root label, e.g. ``"Excel"`` or ``"PowerPoint"``.
+        stats: Collector to record into; a new one is created if omitted.
+    """
+    if not COM_PROXY_ENABLED:
+        return obj
+    return ComProxy(obj, kind, stats or ComCallStats())
+
+
+def stats_of(obj) -> ComCallStats:
+    """Return the collector of an instrumented object (``None`` if plain)."""
+    if isinstance(obj, ComProxy):
+        return object.__getattribute__(obj, "_stats")
+    return None
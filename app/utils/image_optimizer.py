@@ -0,0 +1,141 @@
+"""
+Post-capture image optimization.
+
+``Chart.Export`` / ``CopyPicture`` PNGs are usually far larger than the box
+they are placed in needs.  This stage resamples each image to a target DPI
+for its placement box, palette-quantizes flat chart images and re-encodes
+them as optimized PNG.
+"""
+import contextvars
+import io
+import math
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Tuple
+
+from PIL import Image
+
+from app.utils.capture_result import Buffer, CaptureResult
+from app.utils.profiler import sampled_thread
+from app.config import (
+    logger,
+    IMAGE_MIN_SIZE_BYTES,
+    IMAGE_TARGET_DPI,
+    IMAGE_PALETTE_MAX_COLORS,
+    IMAGE_OPTIMIZE_WORKERS,
+)
+
+
+def optimize_image_bytes(
+    data: Buffer,
+    box_width_in: float,
+    box_height_in: float,
+    target_dpi: int = None,
+) -> bytes:
+    """Return a re-encoded PNG sized for a ``box_width_in`` x ``box_height_in`` box.
+
+    The image is only ever scaled down, and never below the pixel count the
+    box needs at *target_dpi* in either dimension.  If the result is not
+    smaller than *data* (or would be under the corrupt-capture threshold),
+    *data* is returned unchanged.
+    """
+    if target_dpi is None:
+        target_dpi = IMAGE_TARGET_DPI
+
+    with Image.open(io.BytesIO(data)) as src:
+        img = src.copy()
+
+    if img.mode in ("RGBA", "LA") and img.getextrema()[-1][0] == 255:
+        img = img.convert("RGB")  # fully opaque — drop the alpha channel
+    elif img.mode not in ("RGB", "RGBA", "L", "P"):
+        img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+
+    # Decide flatness before resampling: anti-aliasing adds in-between colors.
+    is_flat = img.mode == "P" or img.getcolors(IMAGE_PALETTE_MAX_COLORS) is not None
+
+    need_w = math.ceil(box_width_in * target_dpi)
+    need_h = math.ceil(box_height_in * target_dpi)
+    scale = max(need_w / img.width, need_h / img.height)
+    if scale < 1:
+        if img.mode == "P":
+            img = img.convert("RGBA" if "transparency" in img.info else "RGB")
+        size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+        img = img.resize(size, Image.Resampling.LANCZOS)
+
+    if is_flat and img.mode in ("RGB", "RGBA"):
+        method = (
+            Image.Quantize.FASTOCTREE if img.mode == "RGBA" else Image.Quantize.MEDIANCUT
+        )
+        img = img.quantize(
+            colors=IMAGE_PALETTE_MAX_COLORS, method=method, dither=Image.Dither.NONE
+        )
+
+    out = io.BytesIO()
+    img.save(out, format="PNG", optimize=True)
+    encoded = out.getvalue()
+    # Insertion treats PNGs under IMAGE_MIN_SIZE_BYTES as corrupt captures
+    if len(encoded) < IMAGE_MIN_SIZE_BYTES or len(encoded) >= len(data):
+        return data
+    return encoded
+
+
+def optimize_image_file(
+    path: str, box_width_in: float, box_height_in: float, target_dpi: int = None
+) -> Tuple[int, int]:
+    """Optimize the PNG at *path* in place.
+
+    Returns:
+        ``(bytes_before, bytes_after)``.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    optimized = optimize_image_bytes(data, box_width_in, box_height_in, target_dpi)
+    if optimized is not data:
+        with open(path, "wb") as f:
+            f.write(optimized)
+    return len(data), len(optimized)
+
+
+def optimize_images(
+    items: Iterable[Tuple[CaptureResult, float, float]],
+    target_dpi: int = None,
+    max_workers: int = None,
+) -> List[Tuple[int, int]]:
+    """Optimize many ``(capture, box_width_in, box_height_in)`` items in a thread pool.
+
+    Each ``CaptureResult`` is updated in memory.  Pillow releases the GIL
+    while resampling and compressing, so the work parallelises across
+    cores.  An image that fails to optimize is left untouched.
+
+    Returns:
+        ``(bytes_before, bytes_after)`` for every optimized image.
+    """
+    items = list(items)
+    if not items:
+        return []
+    if max_workers is None:
+        max_workers = IMAGE_OPTIMIZE_WORKERS
+
+    def work(item):
+        capture, w, h = item
+        try:
+            with sampled_thread():
+                before = capture.size
+                capture.replace(optimize_image_bytes(capture.data, w, h, target_dpi))
+                return before, capture.size
+        except Exception as e:
+            logger.warning("Optimize: skipped %r (%s)", capture, e)
+            return None
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items)))) as pool:
+        # Each item runs in a copy of the caller's context so a job profile covers it
+        futures = [pool.submit(contextvars.copy_context().run, work, item) for item in items]
+        results = [sizes for sizes in (f.result() for f in futures) if sizes is not None]
+
+    before = sum(b for b, _ in results)
+    after = sum(a for _, a in results)
+    if before:
+        logger.info(
+            "Optimize: %d image(s) %.1f KB -> %.1f KB (%.0f%%)",
+            len(results), before / 1024, after / 1024, 100.0 * after / before,
+        )
+    return results
@@ -1,17 +1,55 @@
 """
 Image validation utilities for verifying captured chart images.
 """
+import math
 import os
-import statistics
+from typing import Tuple
+
 from PIL import Image
 from app.config import (
     logger,
     IMAGE_MIN_SIZE_BYTES,
     IMAGE_MIN_UNIQUE_COLORS,
     IMAGE_MIN_STDEV,
+    IMAGE_VALIDATE_MAX_PIXELS,
 )
 
 
+def analyze_image(img: Image.Image, max_pixels: int = None) -> Tuple[int, float]:
+    """Return ``(unique_gray_levels, stdev)`` of an image's luminance.
+
+    Both figures come from the 256-bin grayscale histogram, so the work after
+    decoding is constant rather than one Python object per pixel.  Images
+    larger than *max_pixels* are first subsampled (nearest neighbour keeps
+    the pixel value distribution unbiased).
+
+    Args:
+        img: Decoded PIL image.
+        max_pixels: Subsampling threshold (defaults to config value);
+            ``0`` disables subsampling.
+    """
+    if max_pixels is None:
+        max_pixels = IMAGE_VALIDATE_MAX_PIXELS
+
+    pixels = img.width * img.height
+    if max_pixels and pixels > max_pixels:
+        scale = math.sqrt(max_pixels / pixels)
+        size = (max(1, int(img.width * scale)), max(1, int(img.height * scale)))
+        img = img.resize(size, Image.Resampling.NEAREST)
+
+    hist = img.convert("L").histogram()
+    n = sum(hist)
+    unique_colors = sum(1 for count in hist if count)
+    if n < 2:
+        return unique_colors, 0.0
+
+    total = sum(level * count for level, count in enumerate(hist))
+    total_sq = sum(level * level * count for level, count in enumerate(hist))
+    mean = total / n
+    variance = max(0.0, (total_sq - n * mean * mean) / (n - 1))  # sample variance
+    return unique_colors, math.sqrt(variance)
+
+
 def validate_image(path: str, min_size: int = None) -> bool:
     """Check if an image file exists, has reasonable size, and has actual content.
 
@@ -36,34 +74,51 @@ def validate_image(path: str, min_size: int = None) -> bool:
 
     # Check image content using PIL
     try:
-        img = Image.open(path)
-        gray = img.convert("L")
-        pixels = list(gray.getdata())
-
-        unique_colors = len(set(pixels))
-        if unique_colors < IMAGE_MIN_UNIQUE_COLORS:
-            logger.warning(
-                "Validate: image appears blank — only %d unique colors", unique_colors
-            )
-            img.close()
-            return False
-
-        try:
-            stdev = statistics.stdev(pixels)
-            if stdev < IMAGE_MIN_STDEV:
-                logger.warning(
-                    "Validate: image has very low variance (stdev=%.2f), likely blank",
-                    stdev,
-                )
-                img.close()
-                return False
-        except statistics.StatisticsError:
-            pass  # Not enough data points
-
-        logger.debug("Validate: OK — %d bytes, %d colors", size, unique_colors)
-        img.close()
-
+        with Image.open(path) as img:
+            unique_colors, stdev = analyze_image(img)
     except Exception as e:
         logger.warning("Validate: PIL check failed (%s), relying on file size only", e)
+        return True
+
+    return _check_content(size, unique_colors, stdev)
+
+
+def validate_capture(capture, min_size: int = None) -> bool:
+    """Like :func:`validate_image`, for an in-memory ``CaptureResult``.
+
+    The capture's stats are decoded once and cached on the object, so later
+    stages can reuse them.
+    """
+    if min_size is None:
+        min_size = IMAGE_MIN_SIZE_BYTES
+
+    if capture.size < min_size:
+        logger.warning("Validate: capture too small: %d bytes (min: %d)", capture.size, min_size)
+        return False
+
+    try:
+        _w, _h, unique_colors, stdev = capture.stats()
+    except Exception as e:
+        logger.warning("Validate: PIL check failed (%s), relying on size only", e)
+        return True
+
+    return _check_content(capture.size, unique_colors, stdev)
+
+
+def _check_content(size: int, unique_colors: int, stdev: float) -> bool:
+    """Apply the blank-image thresholds to decoded stats."""
+    if unique_colors < IMAGE_MIN_UNIQUE_COLORS:
+        logger.warning(
+            "Validate: image appears blank — only %d unique colors", unique_colors
+        )
+        return False
+
+    if stdev < IMAGE_MIN_STDEV:
+        logger.warning(
+            "Validate: image has very low variance (stdev=%.2f), likely blank",
+            stdev,
+        )
+        return False
 
+    logger.debug("Validate: OK — %d bytes, %d colors", size, unique_colors)
     return True
@@ -0,0 +1,256 @@
+"""
+Opt-in per-job memory accounting.
+
+:class:`MemoryTracker` wraps a job and reports:
+
+* the top allocation sites by growth, from a ``tracemalloc`` snapshot diff
+  taken before and after the job;
+* the peak traced Python allocation during the job;
+* resident set size at start / end and the process's peak RSS;
+* the in-memory size of the python-pptx package being built
+  (:func:`note_package`), split into media and XML parts.
+
+``tracemalloc`` slows allocation-heavy code noticeably, so it only runs
+while at least one tracker is active.  It is process-wide: when jobs
+overlap, each one's figures include the others' allocations.
+
+Process RSS is also exported on ``/api/metrics`` at all times.
+"""
+import contextvars
+import gc
+import os
+import sys
+import threading
+import tracemalloc
+from typing import List, Optional
+
+from app.config import MEMORY_TOP_N, MEMORY_TRACE_FRAMES
+from app.utils.metrics import registry
+
+MEMORY_FILENAME = "memory.json"
+
+_MB = 1024 * 1024
+_BYTE_BUCKETS = tuple(n * _MB for n in (1, 4, 16, 64, 128, 256, 512, 1024, 2048, 4096))
+
+JOB_MEMORY_PEAK = registry.histogram(
+    "excel2ppt_job_traced_memory_peak_bytes",
+    "Peak traced Python allocations of memory-tracked jobs.",
+    ["endpoint"],
+    buckets=_BYTE_BUCKETS,
+)
+PPTX_PACKAGE_BYTES = registry.histogram(
+    "excel2ppt_pptx_package_bytes",
+    "In-memory size of python-pptx packages of memory-tracked jobs.",
+    buckets=_BYTE_BUCKETS,
+)
+
+# Allocation sites that are bookkeeping, not the job
+_SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+# ---------------------------------------------------------------------------
+# Resident set size
+# ---------------------------------------------------------------------------
+def _windows_memory_counters():
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [
+            ("cb", wintypes.DWORD),
+            ("PageFaultCount", wintypes.DWORD),
+            ("PeakWorkingSetSize", ctypes.c_size_t),
+            ("WorkingSetSize", ctypes.c_size_t),
+            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+            ("PagefileUsage", ctypes.c_size_t),
+            ("PeakPagefileUsage", ctypes.c_size_t),
+        ]
+
+    kernel32 = ctypes.WinDLL("kernel32")
+    psapi = ctypes.WinDLL("psapi")
+    kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+    psapi.GetProcessMemoryInfo.argtypes = [
+        wintypes.HANDLE, ctypes.POINTER(PROCESS_MEMORY_COUNTERS), wintypes.DWORD,
+    ]
+    counters = PROCESS_MEMORY_COUNTERS()
+    counters.cb = ctypes.sizeof(counters)
+    if not psapi.GetProcessMemoryInfo(
+        kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb
+    ):
+        return None
+    return counters
+
+
+def rss_bytes() -> Optional[int]:
+    """Current resident set size of this process (``None`` if unknown)."""
+    if sys.platform == "win32":
+        counters = _windows_memory_counters()
+        return int(counters.WorkingSetSize) if counters else None
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """High-water resident set size of this process (``None`` if unknown)."""
+    if sys.platform == "win32":
+        counters = _windows_memory_counters()
+        return int(counters.PeakWorkingSetSize) if counters else None
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # macOS reports bytes, Linux KiB
+
+
+def _process_memory_lines() -> List[str]:
+    lines = []
+    for name, doc, value in (
+        ("excel2ppt_process_resident_memory_bytes", "Resident set size.", rss_bytes()),
+        ("excel2ppt_process_peak_resident_memory_bytes", "Peak resident set size.", peak_rss_bytes()),
+    ):
+        if value is not None:
+            lines += [f"# HELP {name} {doc}", f"# TYPE {name} gauge", f"{name} {value}"]
+    return lines
+
+
+registry.add_collector(_process_memory_lines)
+
+
+# ---------------------------------------------------------------------------
+# python-pptx package size
+# ---------------------------------------------------------------------------
+def package_size(prs) -> dict:
+    """Return the serialized size of every part in *prs*'s package.
+
+    XML parts are measured by serializing them, so this costs about as
+    much as a save without the zip step.
+    """
+    parts = media = xml = 0
+    for part in prs.part.package.iter_parts():
+        size = len(part.blob)
+        parts += 1
+        if part.content_type.endswith("+xml") or part.content_type.endswith("/xml"):
+            xml += size
+        else:
+            media += size
+    return {"parts": parts, "bytes": media + xml, "media_bytes": media, "xml_bytes": xml}
+
+
+# ---------------------------------------------------------------------------
+# Tracker
+# ---------------------------------------------------------------------------
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+_started_tracing = False
+
+_current_tracker: contextvars.ContextVar[Optional["MemoryTracker"]] = contextvars.ContextVar(
+    "excel2ppt_memory_tracker", default=None
+)
+
+
+def _acquire_tracing(frames: int):
+    global _tracing_users, _started_tracing
+    with _tracing_lock:
+        if _tracing_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+            _started_tracing = True
+        _tracing_users += 1
+
+
+def _release_tracing():
+    global _tracing_users, _started_tracing
+    with _tracing_lock:
+        _tracing_users -= 1
+        if _tracing_users == 0 and _started_tracing:
+            tracemalloc.stop()
+            _started_tracing = False
+
+
+def _site(frame) -> str:
+    parts = frame.filename.replace("\\", "/").split("/")
+    return f"{'/'.join(parts[-2:])}:{frame.lineno}"
+
+
+class MemoryTracker:
+    """Context manager measuring the memory behaviour of one job.
+
+    Args:
+        endpoint: Label for the ``excel2ppt_job_traced_memory_peak_bytes``
+            histogram.
+        top: Allocation sites to report (defaults to ``MEMORY_TOP_N``).
+    """
+
+    def __init__(self, endpoint: str = "generate", top: int = None, frames: int = None):
+        self.endpoint = endpoint
+        self.top = top if top is not None else MEMORY_TOP_N
+        self._frames = frames if frames is not None else MEMORY_TRACE_FRAMES
+        self._token = None
+        self._before = None
+        self._traced_start = 0
+        self.report: dict = {}
+        self.package: Optional[dict] = None
+
+    def __enter__(self):
+        _acquire_tracing(self._frames)
+        gc.collect()
+        self._before = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+        self._traced_start = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        self.report = {"rss_start_bytes": rss_bytes()}
+        self._token = _current_tracker.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        _current_tracker.reset(self._token)
+        try:
+            traced_end, traced_peak = tracemalloc.get_traced_memory()
+            after = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+            growth = [
+                s for s in after.compare_to(self._before, "lineno") if s.size_diff > 0
+            ][: self.top]
+        finally:
+            self._before = None
+            _release_tracing()
+
+        self.report.update({
+            "rss_end_bytes": rss_bytes(),
+            "peak_rss_bytes": peak_rss_bytes(),
+            "traced_peak_bytes": traced_peak,
+            "traced_delta_bytes": traced_end - self._traced_start,
+            "top_allocations": [
+                {
+                    "site": _site(stat.traceback[0]),
+                    "size_diff_kb": round(stat.size_diff / 1024, 1),
+                    "count_diff": stat.count_diff,
+                }
+                for stat in growth
+            ],
+        })
+        if self.package is not None:
+            self.report["pptx_package"] = self.package
+        JOB_MEMORY_PEAK.observe(traced_peak, endpoint=self.endpoint)
+        return False
+
+    def as_dict(self) -> dict:
+        return dict(self.report)
+
+
+def note_package(prs):
+    """Record *prs*'s package size in the active tracker (no-op if none)."""
+    tracker = _current_tracker.get()
+    if tracker is None:
+        return
+    tracker.package = package_size(prs)
+    PPTX_PACKAGE_BYTES.observe(tracker.package["bytes"])
@@ -0,0 +1,341 @@
+"""
+Per-stage timing instrumentation and Prometheus-format metrics.
+
+``stage_timer("name")`` wraps one step of a job (COM startup, a capture
+attempt, ``add_picture`` ...).  Each timed stage is recorded as a trace span
+(see :mod:`app.utils.tracing`), observed into the process-wide
+``excel2ppt_stage_seconds`` histogram and, while a
+:func:`job_timings` block is active, added to that job's own breakdown,
+which the generate endpoints return as ``timings``.
+
+The job breakdown lives in a context variable, so it follows the request's
+thread; work handed to a pool must run under ``contextvars.copy_context()``
+to be included.
+"""
+import contextvars
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from app.config import METRICS_LATENCY_BUCKETS
+from app.utils.phash import stale_capture_stats
+from app.utils.tracing import span
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+# ---------------------------------------------------------------------------
+# Metric types
+# ---------------------------------------------------------------------------
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """A monotonically increasing value per label set."""
+
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}"
+            for k, v in items
+        ]
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram per label set."""
+
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        bounds = sorted(buckets if buckets is not None else METRICS_LATENCY_BUCKETS)
+        if not bounds or bounds[-1] != math.inf:
+            bounds.append(math.inf)
+        self._bounds = tuple(bounds)
+        self._series: Dict[LabelValues, List[float]] = {}  # [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self._bounds) + 2)
+            for i, bound in enumerate(self._bounds):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            return int(series[-1]) if series else 0
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        lines = []
+        bucket_names = self.labelnames + ("le",)
+        for key, series in items:
+            cumulative = 0
+            for bound, n in zip(self._bounds, series):
+                cumulative += n
+                labels = _format_labels(bucket_names, key + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_count{labels} {int(series[-1])}")
+        return lines
+
+
+class MetricsRegistry:
+    """Holds metrics and renders them in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], List[str]]] = []
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(
+        self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets=None
+    ) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets=buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, fn: Callable[[], List[str]]):
+        """Register a callable returning extra exposition lines at render time."""
+        self._collectors.append(fn)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for fn in self._collectors:
+            lines.extend(fn())
+        return "\n".join(lines) + "\n"
+
+
+# Singleton registry and the service's metrics
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.histogram(
+    "excel2ppt_stage_seconds", "Duration of individual job stages.", ["stage"]
+)
+JOB_SECONDS = registry.histogram(
+    "excel2ppt_job_seconds", "End-to-end duration of generate jobs.", ["endpoint"]
+)
+JOBS = registry.counter(
+    "excel2ppt_jobs_total", "Generate jobs by endpoint and outcome.", ["endpoint", "status"]
+)
+MAPPING_FAILURES = registry.counter(
+    "excel2ppt_mapping_failures_total", "Failed mappings by reason code.", ["reason"]
+)
+BATCH_DECKS = registry.counter(
+    "excel2ppt_batch_decks_total",
+    "Decks built by generate-batch, by outcome (success or the failure code).",
+    ["outcome"],
+)
+UPLOAD_BYTES = registry.counter(
+    "excel2ppt_upload_bytes_total", "Bytes received by the upload endpoints.", ["kind"]
+)
+RESULT_CACHE = registry.counter(
+    "excel2ppt_result_cache_total", "Generate result-cache lookups by outcome.", ["outcome"]
+)
+COM_CALLS = registry.counter(
+    "excel2ppt_com_calls_total", "Cross-process COM calls by member.", ["member"]
+)
+COM_CALL_SECONDS = registry.counter(
+    "excel2ppt_com_call_seconds_total", "Time spent in COM calls by member.", ["member"]
+)
+
+
+def _stale_capture_lines() -> List[str]:
+    stats = stale_capture_stats.snapshot()
+    name = "excel2ppt_stale_captures_total"
+    lines = [
+        f"# HELP {name} Clipboard captures checked for stale pastes, by outcome.",
+        f"# TYPE {name} counter",
+    ]
+    for outcome in ("checked", "stale", "recovered", "unresolved"):
+        lines.append(f'{name}{{outcome="{outcome}"}} {stats[outcome]}')
+    return lines
+
+
+registry.add_collector(_stale_capture_lines)
+
+
+# ---------------------------------------------------------------------------
+# Per-job timings
+# ---------------------------------------------------------------------------
+class JobTimings:
+    """Thread-safe per-stage totals for one job."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self._stages: Dict[str, List[float]] = {}  # stage -> [count, seconds]
+        self._com_calls: Dict[str, List[float]] = {}  # member -> [count, seconds]
+
+    def add(self, stage: str, seconds: float):
+        with self._lock:
+            entry = self._stages.setdefault(stage, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+    def add_com_call(self, member: str, seconds: float):
+        with self._lock:
+            entry = self._com_calls.setdefault(member, [0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._start
+
+    def as_dict(self) -> dict:
+        """Return ``{"total_ms": ..., "stages": {stage: {"count", "total_ms"}}}``.
+
+        Jobs that made COM calls also get a ``com_calls`` block with the
+        call count and time, in total and per member.
+        """
+        with self._lock:
+            stages = _summarize(self._stages)
+            members = _summarize(self._com_calls)
+        result = {"total_ms": round(self.elapsed * 1000, 1), "stages": stages}
+        if members:
+            result["com_calls"] = {
+                "count": sum(m["count"] for m in members.values()),
+                "total_ms": round(sum(m["total_ms"] for m in members.values()), 1),
+                "members": members,
+            }
+        return result
+
+    def server_timing(self) -> str:
+        """Render the stages as a ``Server-Timing`` header value."""
+        with self._lock:
+            items = list(self._stages.items())
+        return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, (_n, seconds) in items)
+
+
+def _summarize(entries: Dict[str, List[float]]) -> dict:
+    return {
+        name: {"count": count, "total_ms": round(seconds * 1000, 1)}
+        for name, (count, seconds) in entries.items()
+    }
+
+
+_current_job: contextvars.ContextVar[Optional[JobTimings]] = contextvars.ContextVar(
+    "excel2ppt_job_timings", default=None
+)
+
+
+@contextmanager
+def job_timings(endpoint: str) -> Iterator[JobTimings]:
+    """Collect stage timings for one job and observe its total duration."""
+    timings = JobTimings()
+    token = _current_job.set(timings)
+    try:
+        yield timings
+    finally:
+        _current_job.reset(token)
+        JOB_SECONDS.observe(timings.elapsed, endpoint=endpoint)
+
+
+@contextmanager
+def stage_timer(stage: str, attributes: dict = None) -> Iterator[None]:
+    """Time a block as *stage* (histogram, current job's breakdown and a trace span)."""
+    start = time.perf_counter()
+    try:
+        with span(stage, attributes):
+            yield
+    finally:
+        seconds = time.perf_counter() - start
+        STAGE_SECONDS.observe(seconds, stage=stage)
+        timings = _current_job.get()
+        if timings is not None:
+            timings.add(stage, seconds)
+
+
+def record_com_call(member: str, seconds: float):
+    """Count one COM call (process-wide and in the current job)."""
+    COM_CALLS.inc(member=member)
+    COM_CALL_SECONDS.inc(seconds, member=member)
+    timings = _current_job.get()
+    if timings is not None:
+        timings.add_com_call(member, seconds)
+
+
+def record_results(results: List[dict]):
+    """Count failed mappings in *results* by their ``code``."""
+    for r in results:
+        if r.get("status") != "success":
+            MAPPING_FAILURES.inc(reason=r.get("code", "unknown"))
+
+
+def record_decks(outputs: List[dict]):
+    """Count the decks of a batch: ``success``, or a failed deck's ``code``."""
+    for out in outputs:
+        BATCH_DECKS.inc(outcome="success" if out["status"] == "success" else out.get("code", "unknown"))
@@ -0,0 +1,82 @@
+"""
+Perceptual hashing of captured images.
+
+A slow clipboard can make ``CopyPicture`` + ``Paste`` hand back the
+*previous* item's picture.  That image is not blank, so it passes
+validation.  Each job keeps a :class:`CaptureIndex` of difference hashes
+(dHash) so a capture identical to an earlier, different item is caught by a
+single dict lookup.
+"""
+import threading
+from typing import Dict, Optional
+
+from PIL import Image
+
+DHASH_SIZE = 8  # 8x8 gradient bits -> 64-bit hash
+
+
+def dhash(img: Image.Image, hash_size: int = DHASH_SIZE) -> int:
+    """Return the difference hash of *img* as an integer.
+
+    The image is reduced to ``(hash_size + 1) x hash_size`` grayscale and
+    each bit records whether a pixel is brighter than its right neighbour,
+    so re-encoding and small scaling differences do not change the hash.
+    """
+    small = img.convert("L").resize((hash_size + 1, hash_size), Image.Resampling.LANCZOS)
+    pixels = small.tobytes()
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+class CaptureIndex:
+    """Per-job map of perceptual hash -> the item that produced it."""
+
+    def __init__(self):
+        self._owners: Dict[int, str] = {}
+
+    def conflict(self, key: str, value: int) -> Optional[str]:
+        """Return the earlier, *different* item whose capture hashed to *value*."""
+        owner = self._owners.get(value)
+        return owner if owner is not None and owner != key else None
+
+    def add(self, key: str, value: int):
+        self._owners.setdefault(value, key)
+
+    def __len__(self):
+        return len(self._owners)
+
+
+class StaleCaptureStats:
+    """Process-wide counters for stale clipboard captures."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checked = 0
+        self.stale = 0
+        self.recovered = 0
+        self.unresolved = 0
+
+    def record(self, checked: int = 0, stale: int = 0, recovered: int = 0, unresolved: int = 0):
+        with self._lock:
+            self.checked += checked
+            self.stale += stale
+            self.recovered += recovered
+            self.unresolved += unresolved
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "checked": self.checked,
+                "stale": self.stale,
+                "recovered": self.recovered,
+                "unresolved": self.unresolved,
+                "stale_rate": round(self.stale / self.checked, 4) if self.checked else 0.0,
+            }
+
+
+# Singleton instance
+stale_capture_stats = StaleCaptureStats()
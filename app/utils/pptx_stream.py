@@ -0,0 +1,150 @@
+"""
+Stream a python-pptx Presentation as it is serialized.
+
+``Presentation.save`` accepts any writable file-like object.  The zip writer
+falls back to data descriptors when the target is not seekable, so the
+package can be handed to an HTTP response chunk by chunk while the later
+zip entries are still being compressed.
+"""
+import contextvars
+import os
+import queue
+import threading
+from pathlib import Path
+from typing import Iterator, Optional
+
+from app.config import logger, STREAM_CHUNK_SIZE, STREAM_QUEUE_DEPTH
+from app.utils.metrics import stage_timer
+from app.utils.profiler import sampled_thread
+
+_DONE = object()
+
+
+class _StreamCancelled(Exception):
+    """Raised inside the writer thread when the consumer went away."""
+
+
+class _QueueWriter:
+    """Write-only, non-seekable file object that feeds a bounded queue."""
+
+    def __init__(self, q: queue.Queue, cancelled: threading.Event, chunk_size: int, tee=None):
+        self._q = q
+        self._cancelled = cancelled
+        self._chunk_size = chunk_size
+        self._buf = bytearray()
+        self._tee = tee
+
+    def write(self, data) -> int:
+        if self._cancelled.is_set():
+            raise _StreamCancelled()
+        self._buf += data
+        if self._tee is not None:
+            self._tee.write(data)
+        if len(self._buf) >= self._chunk_size:
+            self._put(bytes(self._buf))
+            self._buf.clear()
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        if self._buf:
+            self._put(bytes(self._buf))
+            self._buf.clear()
+
+    def _put(self, item):
+        # Bounded queue gives back-pressure; poll so a cancelled stream
+        # does not leave this thread blocked forever.
+        while True:
+            if self._cancelled.is_set():
+                raise _StreamCancelled()
+            try:
+                self._q.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+
+def iter_presentation(
+    prs,
+    tee_path: Optional[Path] = None,
+    chunk_size: int = None,
+) -> Iterator[bytes]:
+    """Stream the serialized bytes of *prs* while it is being saved.
+
+    Args:
+        prs: python-pptx ``Presentation`` to serialize.
+        tee_path: If given, also keep a disk copy here (for re-download).
+            The copy is written to a temp name and only renamed into place
+            once the package is complete.
+        chunk_size: Approximate size of each yielded chunk.
+
+    Returns:
+        Iterator of ``bytes`` chunks of the .pptx package, in order.  The
+        save runs under a copy of the caller's context, so its stage time
+        and profile samples land in the job that created the stream even
+        though the response consumes it later, from another thread.
+    """
+    if chunk_size is None:
+        chunk_size = STREAM_CHUNK_SIZE
+    return _iter_chunks(prs, tee_path, chunk_size, contextvars.copy_context())
+
+
+def _iter_chunks(prs, tee_path, chunk_size: int, context: contextvars.Context) -> Iterator[bytes]:
+    q: queue.Queue = queue.Queue(maxsize=STREAM_QUEUE_DEPTH)
+    cancelled = threading.Event()
+    tee_tmp = Path(f"{tee_path}.part") if tee_path else None
+
+    def produce():
+        tee = open(tee_tmp, "wb") if tee_tmp else None
+        try:
+            writer = _QueueWriter(q, cancelled, chunk_size, tee)
+            # Includes time blocked on a slow client, hence its own stage
+            with sampled_thread(), stage_timer("save_stream"):
+                prs.save(writer)
+            writer.close()
+            if tee is not None:
+                tee.close()
+                tee = None
+                os.replace(tee_tmp, tee_path)
+            writer._put(_DONE)
+        except _StreamCancelled:
+            logger.info("PPTX stream cancelled by consumer")
+        except Exception as e:
+            logger.error("PPTX stream failed: %s", e, exc_info=True)
+            _put_nowait_final(q, e)
+        finally:
+            if tee is not None:
+                tee.close()
+            if tee_tmp is not None and tee_tmp.exists():
+                tee_tmp.unlink()
+
+    worker = threading.Thread(
+        target=context.run, args=(produce,), name="pptx-stream", daemon=True
+    )
+    worker.start()
+
+    try:
+        while True:
+            item = q.get()
+            if item is _DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        cancelled.set()
+
+
+def _put_nowait_final(q: queue.Queue, item):
+    """Deliver a terminal item, dropping buffered chunks if the queue is full."""
+    while True:
+        try:
+            q.put_nowait(item)
+            return
+        except queue.Full:
+            try:
+                q.get_nowait()
+            except queue.Empty:
+                pass
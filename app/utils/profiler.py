@@ -0,0 +1,131 @@
+"""
+Opt-in sampling profiler for a single job.
+
+A background thread samples the job thread's Python stack every few
+milliseconds via ``sys._current_frames()`` and counts identical stacks.
+Pool workers doing the job's work (image optimization, batch deck
+building) are sampled too while they run inside :func:`sampled_thread`
+under a copy of the job's context; their stacks (rooted at the thread
+bootstrap) are merged into the same report.  The result is written in
+the "folded stacks" format (``a;b;c 42``) that flamegraph.pl, speedscope
+and most flamegraph viewers read directly.
+
+Nothing is started unless a profiler is entered, so jobs that do not ask
+for a profile pay nothing.
+"""
+import contextlib
+import contextvars
+import os
+import sys
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+
+from app.config import logger, PROFILE_SAMPLE_INTERVAL
+
+PROFILE_FILENAME = "profile.folded"
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+_current_profiler: contextvars.ContextVar[Optional["SamplingProfiler"]] = contextvars.ContextVar(
+    "excel2ppt_profiler", default=None
+)
+
+
+class SamplingProfiler:
+    """Context manager that samples a job's threads while active.
+
+    Args:
+        interval: Seconds between samples (defaults to config value).
+        thread_id: Thread to sample; defaults to the thread entering the
+            context.  Worker threads join through :func:`sampled_thread`.
+    """
+
+    def __init__(self, interval: float = None, thread_id: Optional[int] = None):
+        self.interval = interval if interval is not None else PROFILE_SAMPLE_INTERVAL
+        self._thread_id = thread_id
+        self._threads: Counter = Counter()  # thread id -> active registrations
+        self._lock = threading.Lock()
+        self._stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self._token = None
+
+    def __enter__(self):
+        if self._thread_id is None:
+            self._thread_id = threading.get_ident()
+        self.add_thread(self._thread_id)
+        self._token = _current_profiler.set(self)
+        self._sampler = threading.Thread(target=self._run, name="job-profiler", daemon=True)
+        self._sampler.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        _current_profiler.reset(self._token)
+        self._stop.set()
+        self._sampler.join()
+        self.remove_thread(self._thread_id)
+        return False
+
+    def add_thread(self, thread_id: int):
+        with self._lock:
+            self._threads[thread_id] += 1
+
+    def remove_thread(self, thread_id: int):
+        with self._lock:
+            self._threads[thread_id] -= 1
+            if self._threads[thread_id] <= 0:
+                del self._threads[thread_id]
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            with self._lock:
+                thread_ids = list(self._threads)
+            for thread_id in thread_ids:
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                self._stacks[";".join(reversed(stack))] += 1
+
+    @property
+    def samples(self) -> int:
+        return sum(self._stacks.values())
+
+    def write_folded(self, path: Path) -> Path:
+        """Write the collected stacks in folded format to *path*."""
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self._stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        logger.info("Profile written: %s (%d samples)", path, self.samples)
+        return Path(path)
+
+
+@contextlib.contextmanager
+def sampled_thread():
+    """Sample the calling thread as part of the current job's profile.
+
+    A no-op unless a :class:`SamplingProfiler` is active in this context,
+    i.e. in pool work submitted under ``contextvars.copy_context()`` from a
+    profiled job.
+    """
+    profiler = _current_profiler.get()
+    if profiler is None:
+        yield
+        return
+    thread_id = threading.get_ident()
+    profiler.add_thread(thread_id)
+    try:
+        yield
+    finally:
+        profiler.remove_thread(thread_id)
@@ -0,0 +1,115 @@
+"""
+Progress of background jobs.
+
+A :class:`JobProgress` holds a job's state plus an append-only list of
+progress events that clients follow (``/api/jobs/{id}/events``).  Code
+deep inside a job reports through :func:`report`, which goes to the
+progress object installed by :func:`track` for the current context and is
+a no-op otherwise, so the same capture code serves plain ``/api/generate``
+calls unchanged.
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Optional
+
+FINAL_STATES = ("success", "error")
+
+_current_progress: contextvars.ContextVar = contextvars.ContextVar(
+    "excel2ppt_job_progress", default=None
+)
+
+
+class JobProgress:
+    """State and progress events of one background job.
+
+    Every :meth:`update` appends a snapshot event numbered by ``seq``
+    (starting at 1); :meth:`wait` blocks until there are events past a
+    given ``seq`` or the job has finished.
+    """
+
+    def __init__(self, job_id: str):
+        self.id = job_id
+        self.state = "queued"
+        self.phase = "queued"
+        self.item: Optional[str] = None
+        self.done = 0
+        self.total = 0
+        self.result: Optional[dict] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self._events: List[dict] = []
+        self._cond = threading.Condition()
+
+    @property
+    def finished(self) -> bool:
+        return self.state in FINAL_STATES
+
+    def update(self, **fields):
+        """Set any of ``state``, ``phase``, ``item``, ``done``, ``total``,
+        ``result``, ``error`` and record the new snapshot as an event."""
+        with self._cond:
+            for name, value in fields.items():
+                setattr(self, name, value)
+            self._events.append(self._snapshot(len(self._events) + 1))
+            self._cond.notify_all()
+
+    def snapshot(self) -> dict:
+        """Return the current state (the latest event)."""
+        with self._cond:
+            return self._snapshot(len(self._events))
+
+    def wait(self, after: int, timeout: Optional[float] = None) -> List[dict]:
+        """Return the events with ``seq > after``, blocking up to *timeout*
+        seconds for one to arrive unless the job has already finished."""
+        with self._cond:
+            self._cond.wait_for(lambda: len(self._events) > after or self.finished, timeout)
+            return self._events[after:]
+
+    def _snapshot(self, seq: int) -> dict:
+        event = {
+            "id": self.id,
+            "seq": seq,
+            "state": self.state,
+            "phase": self.phase,
+            "item": self.item,
+            "done": self.done,
+            "total": self.total,
+            "elapsed_ms": round((time.time() - self.created_at) * 1000, 1),
+        }
+        if self.result is not None:
+            event["result"] = self.result
+        if self.error is not None:
+            event["error"] = self.error
+        return event
+
+
+@contextmanager
+def track(progress: JobProgress):
+    """Send :func:`report` calls in this context to *progress*."""
+    token = _current_progress.set(progress)
+    try:
+        yield progress
+    finally:
+        _current_progress.reset(token)
+
+
+def report(phase: str, item: Optional[str] = None, done: Optional[int] = None, total: Optional[int] = None):
+    """Report that the current job entered *phase* (a no-op outside :func:`track`).
+
+    Args:
+        phase: Stage name, e.g. ``"capture"`` or ``"save"``.
+        item: What is being worked on (a sheet name, a file name).
+        done: Units of the phase completed so far.
+        total: Units in the phase.
+    """
+    progress = _current_progress.get()
+    if progress is None:
+        return
+    fields = {"phase": phase, "item": item}
+    if done is not None:
+        fields["done"] = done
+    if total is not None:
+        fields["total"] = total
+    progress.update(**fields)
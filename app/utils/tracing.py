@@ -0,0 +1,192 @@
+"""
+Structured per-job trace spans.
+
+``span("name", {...})`` opens a nested span; the innermost open span is kept
+in a context variable, so spans opened further down the call stack (or in
+work submitted under ``contextvars.copy_context()``) become its children.
+A span with no parent starts a new trace.  Every span carries the ``job.id``
+of its root, so concurrent jobs can be told apart.
+
+Finished spans are appended to a rotating JSONL file, one OTLP/JSON
+``ExportTraceServiceRequest`` per line — the shape the OpenTelemetry
+Collector's ``otlpjsonfile`` receiver reads — so any OTel-aware viewer can
+show a job's waterfall.
+"""
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from typing import Iterator, Optional
+
+from app.config import (
+    APP_VERSION,
+    TRACE_ENABLED,
+    TRACE_FILE,
+    TRACE_MAX_BYTES,
+    TRACE_BACKUP_COUNT,
+)
+
+_SCOPE = {"name": "excel-to-ppt", "version": APP_VERSION}
+_RESOURCE = {"attributes": [
+    {"key": "service.name", "value": {"stringValue": "excel-to-ppt"}},
+    {"key": "service.version", "value": {"stringValue": APP_VERSION}},
+]}
+_SPAN_KIND_INTERNAL = 1
+_STATUS_OK = 1
+_STATUS_ERROR = 2
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class Span:
+    """One timed operation inside a trace."""
+
+    def __init__(self, name: str, parent: Optional["Span"], attributes: Optional[dict]):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent else ""
+        self.attributes = {}
+        if parent is not None and "job.id" in parent.attributes:
+            self.attributes["job.id"] = parent.attributes["job.id"]
+        self.attributes.update(attributes or {})
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.error: Optional[str] = None
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def to_otlp(self) -> dict:
+        status = {"code": _STATUS_OK}
+        if self.error is not None:
+            status = {"code": _STATUS_ERROR, "message": self.error}
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id,
+            "name": self.name,
+            "kind": _SPAN_KIND_INTERNAL,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [
+                {"key": k, "value": _otlp_value(v)} for k, v in self.attributes.items()
+            ],
+            "status": status,
+        }
+
+
+class _NoopSpan:
+    """Stand-in yielded when tracing is disabled."""
+
+    trace_id = ""
+    span_id = ""
+
+    def set_attribute(self, key: str, value):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar(
+    "excel2ppt_span", default=None
+)
+
+
+# ---------------------------------------------------------------------------
+# Exporter
+# ---------------------------------------------------------------------------
+class _Exporter:
+    def __init__(self):
+        self.enabled = TRACE_ENABLED
+        self._path = Path(TRACE_FILE)
+        self._logger: Optional[logging.Logger] = None
+        self._lock = threading.Lock()
+
+    def configure(self, path: Path = None, enabled: bool = None):
+        with self._lock:
+            if self._logger is not None:
+                for handler in list(self._logger.handlers):
+                    self._logger.removeHandler(handler)
+                    handler.close()
+                self._logger = None
+            if path is not None:
+                self._path = Path(path)
+            if enabled is not None:
+                self.enabled = enabled
+
+    def _trace_logger(self) -> logging.Logger:
+        # Jobs finish spans on many threads; attach exactly one handler
+        trace_logger = self._logger
+        if trace_logger is not None:
+            return trace_logger
+        with self._lock:
+            if self._logger is None:
+                self._path.parent.mkdir(parents=True, exist_ok=True)
+                handler = RotatingFileHandler(
+                    self._path, maxBytes=TRACE_MAX_BYTES,
+                    backupCount=TRACE_BACKUP_COUNT, encoding="utf-8",
+                )
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                trace_logger = logging.getLogger("excel-to-ppt.trace")
+                trace_logger.propagate = False
+                trace_logger.setLevel(logging.INFO)
+                trace_logger.addHandler(handler)
+                self._logger = trace_logger
+            return self._logger
+
+    def export(self, span: Span):
+        line = {"resourceSpans": [{
+            "resource": _RESOURCE,
+            "scopeSpans": [{"scope": _SCOPE, "spans": [span.to_otlp()]}],
+        }]}
+        self._trace_logger().info(json.dumps(line, ensure_ascii=False, separators=(",", ":")))
+
+
+_exporter = _Exporter()
+
+
+def configure(path: Path = None, enabled: bool = None):
+    """Redirect the trace file and/or switch tracing on or off."""
+    _exporter.configure(path, enabled)
+
+
+# ---------------------------------------------------------------------------
+# Public API
+# ---------------------------------------------------------------------------
+@contextmanager
+def span(name: str, attributes: dict = None) -> Iterator[Span]:
+    """Open a span as a child of the current one (or a new trace's root)."""
+    if not _exporter.enabled:
+        yield _NOOP_SPAN
+        return
+
+    current = Span(name, _current_span.get(), attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end_ns = time.time_ns()
+        _exporter.export(current)
+
+
+def current_trace_id() -> str:
+    """Return the active trace ID, or ``""`` outside a span."""
+    current = _current_span.get()
+    return current.trace_id if current else ""
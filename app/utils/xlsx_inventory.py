@@ -0,0 +1,379 @@
+"""
+COM-free inventory of an .xlsx / .xlsm workbook.
+
+Reads the OOXML package directly (``zipfile`` + ``ElementTree``): sheet
+names, kinds and visibility, and for each sheet the charts in its drawing
+with their names, chart types, anchors and sizes.  This is enough to list
+items and plan captures without starting Excel.  :func:`sheet_digests` fingerprints the parts
+each sheet renders from, so a watcher can tell which sheets a save touched.
+Legacy binary ``.xls`` files are not supported.
+"""
+import hashlib
+import posixpath
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+from typing import Dict, List, Optional
+
+_NS = {
+    "main": "http://schemas.openxmlformats.org/spreadsheetml/2006/main",
+    "r": "http://schemas.openxmlformats.org/officeDocument/2006/relationships",
+    "rel": "http://schemas.openxmlformats.org/package/2006/relationships",
+    "xdr": "http://schemas.openxmlformats.org/drawingml/2006/spreadsheetDrawing",
+    "a": "http://schemas.openxmlformats.org/drawingml/2006/main",
+    "c": "http://schemas.openxmlformats.org/drawingml/2006/chart",
+}
+_R_ID = f"{{{_NS['r']}}}id"
+_CHART_SUFFIX = "Chart"  # plot elements are c:barChart, c:lineChart, ...
+_CELL_RE = re.compile(r"([A-Z]+)(\d+)")
+
+# Relationships followed from a sheet to the parts its picture depends on
+_RENDER_RELS = frozenset({
+    "drawing", "chart", "chartUserShapes", "image", "table",
+    "chartStyle", "chartColorStyle", "themeOverride",
+})
+# Sheet geometry defaults (Calibri 11: 7 px maximum digit width)
+_MAX_DIGIT_WIDTH_PX = 7
+_DEFAULT_BASE_COL_WIDTH = 8  # characters
+_DEFAULT_ROW_HEIGHT_PT = 15.0
+_EMU_PER_PT = 12700
+
+# Workbook-wide parts a chart-less sheet's cell range is drawn from
+_RANGE_SHARED_PARTS = ("xl/sharedStrings.xml", "xl/styles.xml")
+
+
+def _rels_path(part: str) -> str:
+    directory, name = posixpath.split(part)
+    return posixpath.join(directory, "_rels", f"{name}.rels")
+
+
+def _read_rels(zf: zipfile.ZipFile, part: str) -> Dict[str, dict]:
+    """Return ``{rId: {"type": ..., "target": <absolute part name>}}`` for *part*."""
+    try:
+        root = ET.fromstring(zf.read(_rels_path(part)))
+    except KeyError:
+        return {}
+    base = posixpath.dirname(part)
+    rels = {}
+    for rel in root.findall("rel:Relationship", _NS):
+        if rel.get("TargetMode") == "External":
+            continue
+        target = rel.get("Target", "")
+        if target.startswith("/"):
+            target = target.lstrip("/")
+        else:
+            target = posixpath.normpath(posixpath.join(base, target))
+        rels[rel.get("Id")] = {"type": rel.get("Type", "").rsplit("/", 1)[-1], "target": target}
+    return rels
+
+
+def _chart_type(zf: zipfile.ZipFile, chart_part: str) -> str:
+    try:
+        root = ET.fromstring(zf.read(chart_part))
+    except KeyError:
+        return "unknown"
+    plot_area = root.find("c:chart/c:plotArea", _NS)
+    if plot_area is None:
+        return "unknown"
+    for child in plot_area:
+        tag = child.tag.rsplit("}", 1)[-1]
+        if tag.endswith(_CHART_SUFFIX):
+            return tag[: -len(_CHART_SUFFIX)]
+    return "unknown"
+
+
+def _anchor_box(anchor) -> Optional[dict]:
+    """Cell span of a two-cell anchor, or the EMU extent of other anchors.
+
+    Cells are zero-based ``(col, row)``; ``*_offset_emu`` is the position
+    inside that cell.
+    """
+    start, end = anchor.find("xdr:from", _NS), anchor.find("xdr:to", _NS)
+    if start is not None and end is not None:
+        def cell(el):
+            return int(el.findtext("xdr:col", "0", _NS)), int(el.findtext("xdr:row", "0", _NS))
+
+        def offset(el):
+            return int(el.findtext("xdr:colOff", "0", _NS)), int(el.findtext("xdr:rowOff", "0", _NS))
+        return {"from": cell(start), "to": cell(end),
+                "from_offset_emu": offset(start), "to_offset_emu": offset(end)}
+    ext = anchor.find("xdr:ext", _NS)
+    if ext is not None:
+        return {"ext_emu": (int(ext.get("cx", 0)), int(ext.get("cy", 0)))}
+    return None
+
+
+def _drawing_charts(zf: zipfile.ZipFile, drawing_part: str) -> List[dict]:
+    """Return the charts in a drawing part, in document order."""
+    try:
+        root = ET.fromstring(zf.read(drawing_part))
+    except KeyError:
+        return []
+    rels = _read_rels(zf, drawing_part)
+    charts = []
+    for anchor in root:
+        frame = anchor.find("xdr:graphicFrame", _NS)
+        if frame is None:
+            continue
+        chart_ref = frame.find("a:graphic/a:graphicData/c:chart", _NS)
+        if chart_ref is None:
+            continue
+        rel = rels.get(chart_ref.get(_R_ID))
+        if rel is None:
+            continue
+        props = frame.find("xdr:nvGraphicFramePr/xdr:cNvPr", _NS)
+        charts.append({
+            "name": props.get("name", "") if props is not None else "",
+            "type": _chart_type(zf, rel["target"]),
+            "part": rel["target"],
+            "anchor": _anchor_box(anchor),
+        })
+    return charts
+
+
+def _sheet_dimension(zf: zipfile.ZipFile, sheet_part: str) -> Optional[str]:
+    """Return the ``<dimension ref>`` of a worksheet (read from the part's head only)."""
+    try:
+        with zf.open(sheet_part) as f:
+            for _event, el in ET.iterparse(f, events=("start",)):
+                tag = el.tag.rsplit("}", 1)[-1]
+                if tag == "dimension":
+                    return el.get("ref")
+                if tag == "sheetData":
+                    break
+    except (KeyError, ET.ParseError):
+        pass
+    return None
+
+
+def _column_points(width_chars: float) -> float:
+    """Rendered width in points of a column *width_chars* characters wide."""
+    pixels = int(((256 * width_chars + int(128 / _MAX_DIGIT_WIDTH_PX)) / 256) * _MAX_DIGIT_WIDTH_PX)
+    return pixels * 0.75
+
+
+def _sheet_geometry(zf: zipfile.ZipFile, sheet_part: str, max_row: int) -> dict:
+    """Column widths and row heights (points) of a worksheet, rows up to *max_row*.
+
+    Returns:
+        ``{"col_width", "row_height", "cols": {index: pt}, "rows": {index: pt}}``
+        with zero-based indexes and the sheet defaults.
+    """
+    geometry = {"col_width": None, "row_height": _DEFAULT_ROW_HEIGHT_PT, "cols": {}, "rows": {}}
+    base_width = _DEFAULT_BASE_COL_WIDTH
+    try:
+        with zf.open(sheet_part) as f:
+            for _event, el in ET.iterparse(f, events=("end",)):
+                tag = el.tag.rsplit("}", 1)[-1]
+                if tag == "sheetFormatPr":
+                    base_width = int(el.get("baseColWidth", base_width))
+                    if el.get("defaultColWidth"):
+                        geometry["col_width"] = _column_points(float(el.get("defaultColWidth")))
+                    if el.get("defaultRowHeight"):
+                        geometry["row_height"] = float(el.get("defaultRowHeight"))
+                elif tag == "col" and el.get("width"):
+                    points = 0.0 if el.get("hidden") in ("1", "true") else _column_points(float(el.get("width")))
+                    for index in range(int(el.get("min", 1)) - 1, int(el.get("max", 1))):
+                        geometry["cols"][index] = points
+                elif tag == "row":
+                    index = int(el.get("r", 0)) - 1
+                    if index > max_row:
+                        break
+                    if el.get("hidden") in ("1", "true"):
+                        geometry["rows"][index] = 0.0
+                    elif el.get("customHeight") in ("1", "true") and el.get("ht"):
+                        geometry["rows"][index] = float(el.get("ht"))
+                    el.clear()
+    except (KeyError, ET.ParseError):
+        pass
+    if geometry["col_width"] is None:
+        # Base width plus 5 px of cell padding, rounded up to a multiple of 8 px
+        pixels = base_width * _MAX_DIGIT_WIDTH_PX + 5
+        geometry["col_width"] = -(-pixels // 8) * 8 * 0.75
+    return geometry
+
+
+def _anchor_size(box: Optional[dict], geometry: Optional[dict]) -> Optional[tuple]:
+    """``(width_pt, height_pt)`` of an anchor box on a sheet of *geometry*."""
+    if not box:
+        return None
+    if "ext_emu" in box:
+        cx, cy = box["ext_emu"]
+        if not cx or not cy:  # chart sheets: sized to the page
+            return None
+        return round(cx / _EMU_PER_PT, 1), round(cy / _EMU_PER_PT, 1)
+    if geometry is None:
+        return None
+    (c0, r0), (c1, r1) = box["from"], box["to"]
+    (cx0, ry0), (cx1, ry1) = box["from_offset_emu"], box["to_offset_emu"]
+    width = sum(geometry["cols"].get(c, geometry["col_width"]) for c in range(c0, c1))
+    height = sum(geometry["rows"].get(r, geometry["row_height"]) for r in range(r0, r1))
+    width += (cx1 - cx0) / _EMU_PER_PT
+    height += (ry1 - ry0) / _EMU_PER_PT
+    return round(width, 1), round(height, 1)
+
+
+def _with_sizes(zf: zipfile.ZipFile, sheet_part: str, charts: List[dict]) -> List[dict]:
+    """Add ``size`` (points) to each chart; cell geometry is read only if needed."""
+    geometry = None
+    cell_anchored = [c["anchor"] for c in charts if c["anchor"] and "to" in c["anchor"]]
+    if cell_anchored:
+        geometry = _sheet_geometry(zf, sheet_part, max(a["to"][1] for a in cell_anchored))
+    for chart in charts:
+        chart["size"] = _anchor_size(chart["anchor"], geometry)
+    return charts
+
+
+def range_shape(ref: Optional[str]) -> tuple:
+    """Return ``(rows, cols)`` of an A1-style range such as ``"A1:E20"``."""
+    cells = _CELL_RE.findall(ref or "")
+    if not cells:
+        return 0, 0
+
+    def col_number(letters: str) -> int:
+        n = 0
+        for ch in letters:
+            n = n * 26 + ord(ch) - 64
+        return n
+
+    first, last = cells[0], cells[-1]
+    rows = int(last[1]) - int(first[1]) + 1
+    cols = col_number(last[0]) - col_number(first[0]) + 1
+    return rows, cols
+
+
+def _sheet_charts(zf: zipfile.ZipFile, sheet_part: str) -> List[dict]:
+    charts = []
+    for rel in _read_rels(zf, sheet_part).values():
+        if rel["type"] == "drawing":
+            charts.extend(_drawing_charts(zf, rel["target"]))
+    return _with_sizes(zf, sheet_part, charts)
+
+
+def _open(path: str) -> zipfile.ZipFile:
+    try:
+        return zipfile.ZipFile(path)
+    except zipfile.BadZipFile as e:
+        raise ValueError(f"Not an .xlsx/.xlsm workbook: {path}") from e
+
+
+def _sheets(zf: zipfile.ZipFile, path: str):
+    """Yield ``(name, kind, part, state)`` per sheet in workbook order.
+
+    *kind* is the relationship type (``worksheet``, ``chartsheet``, ...) and
+    *state* is ``visible``, ``hidden`` or ``veryHidden``.
+    """
+    workbook_part = "xl/workbook.xml"
+    try:
+        root = ET.fromstring(zf.read(workbook_part))
+    except KeyError as e:
+        raise ValueError(f"Not an .xlsx/.xlsm workbook: {path}") from e
+    rels = _read_rels(zf, workbook_part)
+    for sheet in root.findall("main:sheets/main:sheet", _NS):
+        rel = rels.get(sheet.get(_R_ID))
+        if rel is not None:
+            yield sheet.get("name", ""), rel["type"], rel["target"], sheet.get("state", "visible")
+
+
+def read_inventory(path: str) -> dict:
+    """Inventory a workbook without COM.
+
+    Returns:
+        ``{"worksheets": [{"name", "part", "state", "dimension", "charts": [...]}],
+        "chartsheets": [{"name", "part", "state", "chart": {...} | None}]}``
+        in workbook order, where each chart is
+        ``{"name", "type", "part", "anchor", "size"}`` and ``size`` is
+        ``(width, height)`` in points (``None`` if the anchor has none).
+
+    Raises:
+        ValueError: *path* is not an OOXML workbook (e.g. legacy ``.xls``).
+    """
+    with _open(path) as zf:
+        worksheets, chartsheets = [], []
+        for name, kind, part, state in _sheets(zf, path):
+            if kind == "worksheet":
+                worksheets.append({
+                    "name": name,
+                    "part": part,
+                    "state": state,
+                    "dimension": _sheet_dimension(zf, part),
+                    "charts": _sheet_charts(zf, part),
+                })
+            elif kind == "chartsheet":
+                charts = _sheet_charts(zf, part)
+                chartsheets.append({
+                    "name": name,
+                    "part": part,
+                    "state": state,
+                    "chart": charts[0] if charts else None,
+                })
+    return {"worksheets": worksheets, "chartsheets": chartsheets}
+
+
+def _render_parts(zf: zipfile.ZipFile, part: str) -> List[str]:
+    """*part* plus the drawings, charts and chart sub-parts it pulls in."""
+    parts, queue = [], [part]
+    while queue:
+        current = queue.pop(0)
+        if current in parts:
+            continue
+        parts.append(current)
+        queue.extend(
+            rel["target"] for rel in _read_rels(zf, current).values()
+            if rel["type"] in _RENDER_RELS
+        )
+    return parts
+
+
+def sheet_digests(path: str) -> Dict[str, Dict[str, str]]:
+    """Fingerprint the parts each sheet is drawn from.
+
+    A worksheet or chart sheet's digest covers its own part and every
+    drawing, chart and chart style part it references; a worksheet without
+    charts (captured as a cell range) also covers the shared strings and
+    styles.  Content is identified by the CRC-32 and size stored in the zip
+    directory, so nothing is decompressed.
+
+    Returns:
+        ``{"worksheet": {name: digest}, "chartsheet": {name: digest}}``.
+
+    Raises:
+        ValueError: *path* is not an OOXML workbook, or is only partly
+            written (e.g. read while Excel is still saving it).
+    """
+    digests = {"worksheet": {}, "chartsheet": {}}
+    with _open(path) as zf:
+        for name, kind, part, _state in _sheets(zf, path):
+            if kind not in digests:
+                continue
+            parts = _render_parts(zf, part)
+            if kind == "worksheet" and not any(p.startswith("xl/charts/") for p in parts):
+                parts += _RANGE_SHARED_PARTS
+            h = hashlib.sha1()
+            for p in parts:
+                try:
+                    info = zf.getinfo(p)
+                except KeyError:
+                    continue
+                h.update(f"{p}:{info.CRC:08x}:{info.file_size};".encode())
+            digests[kind][name] = h.hexdigest()
+    return digests
+
+
+def excel_info_from_inventory(inventory: dict) -> dict:
+    """Shape an inventory like :func:`app.services.excel_service.get_excel_info`."""
+    return {
+        "worksheets": [
+            {
+                "name": ws["name"],
+                "type": "worksheet",
+                "has_charts": bool(ws["charts"]),
+                "chart_count": len(ws["charts"]),
+                "charts": [chart["name"] for chart in ws["charts"]],
+            }
+            for ws in inventory["worksheets"]
+        ],
+        "chartsheets": [
+            {"name": cs["name"], "type": "chartsheet"} for cs in inventory["chartsheets"]
+        ],
+    }
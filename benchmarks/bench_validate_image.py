@@ -0,0 +1,189 @@
+"""
+Benchmark: validate_image (histogram + subsampling) vs the legacy
+per-pixel implementation.
+
+Builds a corpus of blank and chart-like PNGs at typical ``Chart.Export``
+sizes (optionally plus a directory of real captures), checks that both
+implementations agree on every image, and reports the timings.
+
+Usage:
+    python -m benchmarks.bench_validate_image
+    python -m benchmarks.bench_validate_image --corpus path/to/pngs --repeat 5 --json out.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import statistics
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from PIL import Image, ImageDraw
+
+from app.config import IMAGE_MIN_SIZE_BYTES, IMAGE_MIN_UNIQUE_COLORS, IMAGE_MIN_STDEV
+from app.utils.image_validator import validate_image
+
+SIZES = [(800, 600), (1600, 960), (3000, 1800)]
+
+
+def legacy_validate_image(path: str, min_size: int = None) -> bool:
+    """The pre-histogram implementation, kept as the benchmark reference."""
+    if min_size is None:
+        min_size = IMAGE_MIN_SIZE_BYTES
+    if not os.path.exists(path) or os.path.getsize(path) < min_size:
+        return False
+    try:
+        img = Image.open(path)
+        pixels = list(img.convert("L").getdata())
+        img.close()
+        if len(set(pixels)) < IMAGE_MIN_UNIQUE_COLORS:
+            return False
+        try:
+            if statistics.stdev(pixels) < IMAGE_MIN_STDEV:
+                return False
+        except statistics.StatisticsError:
+            pass
+    except Exception:
+        pass
+    return True
+
+
+# ---------------------------------------------------------------------------
+# Corpus
+# ---------------------------------------------------------------------------
+def _blank(size, color):
+    return Image.new("RGB", size, color)
+
+
+def _bar_chart(size):
+    img = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(img)
+    w, h = size
+    for i in range(12):
+        x0 = int(w * (0.08 + i * 0.07))
+        bar_h = int(h * (0.15 + 0.05 * ((i * 7) % 13)))
+        draw.rectangle([x0, h - bar_h, x0 + int(w * 0.045), int(h * 0.92)],
+                       fill=(30 + 18 * i, 90, 220 - 15 * i))
+    draw.line([int(w * 0.06), int(h * 0.05), int(w * 0.06), int(h * 0.92)], fill="black", width=3)
+    draw.line([int(w * 0.06), int(h * 0.92), int(w * 0.97), int(h * 0.92)], fill="black", width=3)
+    return img
+
+
+def _line_chart(size):
+    img = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(img)
+    w, h = size
+    for series in range(4):
+        points = [
+            (int(w * (0.05 + 0.9 * i / 49)),
+             int(h * (0.5 + 0.35 * ((i * (series + 3)) % 17 - 8) / 8)))
+            for i in range(50)
+        ]
+        draw.line(points, fill=(60 * series, 200 - 40 * series, 80 + 40 * series), width=4)
+    # Smooth edges like an anti-aliased export
+    return img.resize((w // 2, h // 2), Image.Resampling.LANCZOS).resize(size)
+
+
+def build_corpus(directory: str):
+    """Write the synthetic corpus; return ``[(name, path, kind)]``."""
+    corpus = []
+    for w, h in SIZES:
+        images = {
+            "blank_white": (_blank((w, h), "white"), "blank"),
+            "blank_gray": (_blank((w, h), (242, 242, 242)), "blank"),
+            "bar_chart": (_bar_chart((w, h)), "chart"),
+            "line_chart": (_line_chart((w, h)), "chart"),
+        }
+        for name, (img, kind) in images.items():
+            path = os.path.join(directory, f"{name}_{w}x{h}.png")
+            img.save(path)
+            corpus.append((f"{name}_{w}x{h}", path, kind))
+    return corpus
+
+
+def load_corpus_dir(directory: str):
+    return [
+        (f"real/{name}", os.path.join(directory, name), "real")
+        for name in sorted(os.listdir(directory))
+        if name.lower().endswith(".png")
+    ]
+
+
+# ---------------------------------------------------------------------------
+# Benchmark
+# ---------------------------------------------------------------------------
+def _time(fn, path, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn(path)
+        best = min(best, time.perf_counter() - t0)
+    return result, best
+
+
+def run(corpus, repeat: int):
+    rows = []
+    for name, path, kind in corpus:
+        legacy_ok, legacy_s = _time(legacy_validate_image, path, repeat)
+        new_ok, new_s = _time(validate_image, path, repeat)
+        rows.append({
+            "image": name,
+            "kind": kind,
+            "bytes": os.path.getsize(path),
+            "legacy_ms": round(legacy_s * 1000, 2),
+            "new_ms": round(new_s * 1000, 2),
+            "speedup": round(legacy_s / new_s, 1) if new_s else None,
+            "legacy_valid": legacy_ok,
+            "new_valid": new_ok,
+            "agree": legacy_ok == new_ok,
+        })
+    return rows
+
+
+def print_table(rows):
+    print(f"\n  {'image':<28} {'kind':<6} {'legacy ms':>10} {'new ms':>8} {'speedup':>8}  valid")
+    print("  " + "-" * 72)
+    for r in rows:
+        flag = "" if r["agree"] else "  <-- MISMATCH"
+        print(
+            f"  {r['image']:<28} {r['kind']:<6} {r['legacy_ms']:>10.2f} {r['new_ms']:>8.2f} "
+            f"{r['speedup']:>7.1f}x  {r['new_valid']}{flag}"
+        )
+    legacy_total = sum(r["legacy_ms"] for r in rows)
+    new_total = sum(r["new_ms"] for r in rows)
+    print("  " + "-" * 72)
+    print(f"  {'total':<35} {legacy_total:>10.2f} {new_total:>8.2f} {legacy_total / new_total:>7.1f}x")
+
+
+def main():
+    p = argparse.ArgumentParser(description="validate_image benchmark")
+    p.add_argument("--corpus", help="Directory of real chart PNGs to include")
+    p.add_argument("--repeat", type=int, default=3, help="Runs per image (best is kept)")
+    p.add_argument("--json", help="Write results to this JSON file")
+    args = p.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench_validate_")
+    try:
+        corpus = build_corpus(tmp)
+        if args.corpus:
+            corpus += load_corpus_dir(args.corpus)
+        rows = run(corpus, args.repeat)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    print_table(rows)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+
+    if not all(r["agree"] for r in rows):
+        print("\n  ERROR: implementations disagree")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
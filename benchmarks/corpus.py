@@ -0,0 +1,187 @@
+"""
+Synthetic workbook and template corpus for the end-to-end benchmarks.
+
+Builds ``.xlsx`` workbooks scaled by sheet count, embedded charts per
+sheet, data rows and chart types (plus chart sheets and chart-less data
+sheets, which take the UsedRange capture path), and ``.pptx`` templates
+scaled by slide count.  Generation is deterministic for a given seed.
+
+Usage:
+    python -m benchmarks.corpus --out bench_corpus --profile medium
+    python -m benchmarks.corpus --out bench_corpus --sheets 10 --charts-per-sheet 3 --rows 5000
+"""
+import os
+import sys
+import json
+import argparse
+from random import Random
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from openpyxl import Workbook
+from openpyxl.chart import BarChart, LineChart, PieChart, ScatterChart, Reference, Series
+from pptx import Presentation
+
+CHART_TYPES = ("bar", "line", "pie", "scatter")
+
+# Named corpus sizes: worksheets with charts, charts on each, data rows,
+# chart sheets, chart-less data sheets and template slides
+PROFILES = {
+    "small": {"sheets": 2, "charts_per_sheet": 1, "rows": 20, "chartsheets": 1,
+              "data_sheets": 1, "slides": 5},
+    "medium": {"sheets": 6, "charts_per_sheet": 2, "rows": 200, "chartsheets": 2,
+               "data_sheets": 2, "slides": 12},
+    "large": {"sheets": 20, "charts_per_sheet": 4, "rows": 2000, "chartsheets": 4,
+              "data_sheets": 4, "slides": 40},
+}
+SERIES_PER_CHART = 4
+
+
+def _chart(chart_type: str, ws, rows: int):
+    """Build an openpyxl chart of *chart_type* over the data block of *ws*."""
+    categories = Reference(ws, min_col=1, min_row=2, max_row=rows + 1)
+    if chart_type == "scatter":
+        chart = ScatterChart()
+        for col in range(2, SERIES_PER_CHART + 2):
+            values = Reference(ws, min_col=col, min_row=1, max_row=rows + 1)
+            chart.series.append(Series(values, categories, title_from_data=True))
+    else:
+        chart = {"bar": BarChart, "line": LineChart, "pie": PieChart}[chart_type]()
+        last_col = 2 if chart_type == "pie" else SERIES_PER_CHART + 1
+        data = Reference(ws, min_col=2, max_col=last_col, min_row=1, max_row=rows + 1)
+        chart.add_data(data, titles_from_data=True)
+        chart.set_categories(categories)
+    chart.title = f"{ws.title} {chart_type}"
+    return chart
+
+
+def _fill_data(ws, rows: int, rng: Random):
+    ws.append(["Category"] + [f"Series {i + 1}" for i in range(SERIES_PER_CHART)])
+    for r in range(rows):
+        ws.append([f"Item {r + 1}"] + [rng.randint(1, 1000) for _ in range(SERIES_PER_CHART)])
+
+
+def make_workbook(
+    path: str,
+    sheets: int = 2,
+    charts_per_sheet: int = 1,
+    rows: int = 20,
+    chart_types=CHART_TYPES,
+    chartsheets: int = 0,
+    data_sheets: int = 0,
+    seed: int = 0,
+) -> list:
+    """Write a synthetic workbook.
+
+    Args:
+        sheets: Worksheets with embedded charts.
+        charts_per_sheet: Embedded charts on each of those worksheets.
+        rows: Data rows per sheet.
+        chart_types: Chart types to cycle through.
+        chartsheets: Chart sheets (each charts the first worksheet's data).
+        data_sheets: Worksheets without charts (captured via UsedRange).
+
+    Returns:
+        The capturable items as ``[{"name", "type"}]``, in workbook order.
+    """
+    rng = Random(seed)
+    wb = Workbook()
+    wb.remove(wb.active)
+    items = []
+    n_chart = 0
+
+    for s in range(sheets):
+        ws = wb.create_sheet(f"Data {s + 1}")
+        _fill_data(ws, rows, rng)
+        for c in range(charts_per_sheet):
+            chart = _chart(chart_types[n_chart % len(chart_types)], ws, rows)
+            ws.add_chart(chart, f"H{2 + c * 16}")
+            n_chart += 1
+        items.append({"name": ws.title, "type": "worksheet"})
+
+    for s in range(data_sheets):
+        ws = wb.create_sheet(f"Table {s + 1}")
+        _fill_data(ws, min(rows, 60), rng)
+        items.append({"name": ws.title, "type": "worksheet"})
+
+    source = wb.worksheets[0] if wb.worksheets else None
+    if chartsheets and source is None:
+        source = wb.create_sheet("Data")
+        _fill_data(source, rows, rng)
+    for s in range(chartsheets):
+        cs = wb.create_chartsheet(f"Chart {s + 1}")
+        cs.add_chart(_chart(chart_types[n_chart % len(chart_types)], source, rows))
+        n_chart += 1
+        items.append({"name": cs.title, "type": "chartsheet"})
+
+    wb.save(path)
+    return items
+
+
+def make_template(path: str, slides: int = 5):
+    """Write a 16:9 template with *slides* title-only slides."""
+    prs = Presentation()
+    prs.slide_width, prs.slide_height = 12192000, 6858000
+    layout = prs.slide_layouts[5]  # Title Only
+    for i in range(slides):
+        slide = prs.slides.add_slide(layout)
+        slide.shapes.title.text = f"Slide {i + 1}"
+    prs.save(path)
+
+
+def build_corpus(directory: str, profile: str = "small", seed: int = 0, **overrides) -> dict:
+    """Write one workbook and one template for *profile* into *directory*.
+
+    Keyword overrides replace individual profile parameters.
+
+    Returns:
+        ``{"profile", "params", "excel", "template", "items"}``.
+    """
+    params = dict(PROFILES[profile])
+    params.update({k: v for k, v in overrides.items() if v is not None})
+    os.makedirs(directory, exist_ok=True)
+
+    excel_path = os.path.join(directory, f"corpus_{profile}.xlsx")
+    template_path = os.path.join(directory, f"corpus_{profile}.pptx")
+    items = make_workbook(
+        excel_path,
+        sheets=params["sheets"],
+        charts_per_sheet=params["charts_per_sheet"],
+        rows=params["rows"],
+        chartsheets=params["chartsheets"],
+        data_sheets=params["data_sheets"],
+        seed=seed,
+    )
+    make_template(template_path, params["slides"])
+    return {
+        "profile": profile,
+        "params": params,
+        "excel": excel_path,
+        "template": template_path,
+        "items": items,
+    }
+
+
+def main():
+    p = argparse.ArgumentParser(description="Generate a synthetic benchmark corpus")
+    p.add_argument("--out", required=True, help="Output directory")
+    p.add_argument("--profile", choices=sorted(PROFILES), default="small")
+    p.add_argument("--sheets", type=int, help="Worksheets with charts")
+    p.add_argument("--charts-per-sheet", type=int)
+    p.add_argument("--rows", type=int, help="Data rows per sheet")
+    p.add_argument("--chartsheets", type=int)
+    p.add_argument("--data-sheets", type=int, help="Worksheets without charts")
+    p.add_argument("--slides", type=int, help="Template slide count")
+    p.add_argument("--seed", type=int, default=0)
+    args = p.parse_args()
+
+    corpus = build_corpus(
+        args.out, args.profile, seed=args.seed,
+        sheets=args.sheets, charts_per_sheet=args.charts_per_sheet, rows=args.rows,
+        chartsheets=args.chartsheets, data_sheets=args.data_sheets, slides=args.slides,
+    )
+    print(json.dumps(corpus, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
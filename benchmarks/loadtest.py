@@ -0,0 +1,315 @@
+"""
+HTTP load test for the FastAPI app on the COM-free backend.
+
+Drives ``app.main:app`` in-process (``httpx`` ASGI transport, no network)
+with a mix of concurrent uploads, generates and downloads, while the fake
+Excel / PowerPoint backend simulates Office latency
+(``--latency-scale``; 1.0 approximates a local Office install).  Reports
+per endpoint p50/p95/p99 latency, errors and throughput, plus:
+
+* thread-pool saturation — sync (``def``) handlers and
+  ``run_in_threadpool`` work share AnyIO's default limiter; the share of
+  samples with every token borrowed shows when ``--threads`` is too small;
+* event-loop lag — how late a 10 ms timer fires.  A blocking call inside an
+  ``async def`` handler stalls the loop for the whole call, so a large max
+  lag flags it; ``--max-loop-lag-ms`` turns that into a failing exit code.
+
+Usage:
+    python -m benchmarks.loadtest --uploads 20 --generates 40 --downloads 40 --concurrency 8
+    python -m benchmarks.loadtest --threads 8 --latency-scale 1 --json load.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import asyncio
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import anyio
+import httpx
+
+from app.config import OUTPUT_DIR
+from app.main import app
+from app.services import excel_service, fake_com
+from app.services.file_manager import file_manager
+from app.utils import tracing
+from benchmarks.corpus import PROFILES, build_corpus
+
+XLSX_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+PPTX_TYPE = "application/vnd.openxmlformats-officedocument.presentationml.presentation"
+LAG_INTERVAL = 0.01  # seconds between event-loop lag probes
+POOL_SAMPLE_INTERVAL = 0.005
+
+
+def percentile(values, q: float) -> float:
+    """Linear-interpolated percentile (*q* in 0..100) of *values*."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    pos = (len(ordered) - 1) * q / 100
+    lo = int(pos)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (pos - lo)
+
+
+class Recorder:
+    """Latency samples and error counts per endpoint."""
+
+    def __init__(self):
+        self.samples = {}
+        self.errors = {}
+
+    def record(self, endpoint: str, seconds: float, ok: bool):
+        self.samples.setdefault(endpoint, []).append(seconds)
+        if not ok:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def summary(self, wall: float) -> dict:
+        result = {}
+        for endpoint, values in sorted(self.samples.items()):
+            ms = [v * 1000 for v in values]
+            result[endpoint] = {
+                "requests": len(values),
+                "errors": self.errors.get(endpoint, 0),
+                "p50_ms": round(percentile(ms, 50), 1),
+                "p95_ms": round(percentile(ms, 95), 1),
+                "p99_ms": round(percentile(ms, 99), 1),
+                "max_ms": round(max(ms), 1),
+                "throughput_rps": round(len(values) / wall, 2) if wall else 0.0,
+            }
+        return result
+
+
+# ---------------------------------------------------------------------------
+# Monitors
+# ---------------------------------------------------------------------------
+async def _monitor_loop_lag(lags: list, stop: asyncio.Event):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(LAG_INTERVAL)
+        lags.append(max(0.0, time.perf_counter() - start - LAG_INTERVAL))
+
+
+async def _monitor_pool(limiter, samples: list, stop: asyncio.Event):
+    while not stop.is_set():
+        samples.append(limiter.borrowed_tokens)
+        await asyncio.sleep(POOL_SAMPLE_INTERVAL)
+
+
+# ---------------------------------------------------------------------------
+# Operations
+# ---------------------------------------------------------------------------
+class LoadTest:
+    def __init__(self, client: httpx.AsyncClient, corpus: dict, recorder: Recorder):
+        self.client = client
+        self.corpus = corpus
+        self.recorder = recorder
+        self.template_id = None
+        self.excel_ids = []
+        self.download_urls = []
+        self.job_ids = set()
+        self._seq = 0
+
+    async def _request(self, endpoint: str, method: str, url: str, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+            ok = response.status_code < 400
+        except Exception:
+            response, ok = None, False
+        self.recorder.record(endpoint, time.perf_counter() - start, ok)
+        return response if ok else None
+
+    async def upload_excel(self):
+        with open(self.corpus["excel"], "rb") as f:
+            content = f.read()
+        r = await self._request(
+            "upload-excel", "POST", "/api/upload-excel",
+            files={"file": ("corpus.xlsx", content, XLSX_TYPE)},
+        )
+        if r is not None:
+            self.excel_ids.append(r.json()["file_id"])
+
+    async def upload_ppt(self):
+        with open(self.corpus["template"], "rb") as f:
+            content = f.read()
+        r = await self._request(
+            "upload-ppt", "POST", "/api/upload-ppt",
+            files={"file": ("corpus.pptx", content, PPTX_TYPE)},
+        )
+        if r is not None:
+            self.template_id = r.json()["file_id"]
+
+    async def generate(self):
+        excel_id = random.choice(self.excel_ids)
+        self._seq += 1
+        mappings = [
+            {"excel_id": excel_id, "name": item["name"], "type": item["type"],
+             "page": i % self.corpus["params"]["slides"] + 1}
+            for i, item in enumerate(self.corpus["items"])
+        ]
+        body = {
+            "template_id": self.template_id,
+            # A distinct name per request, so the result cache does not answer it
+            "output_name": f"load_{self._seq}",
+            "mappings": mappings,
+        }
+        r = await self._request("generate", "POST", "/api/generate", json=body)
+        if r is not None:
+            data = r.json()
+            self.job_ids.add(data["job_id"])
+            self.download_urls.append(data["download_url"])
+
+    async def download(self):
+        await self._request("download", "GET", random.choice(self.download_urls))
+
+    async def health(self):
+        await self._request("health", "GET", "/api/health")
+
+    def cleanup(self):
+        for file_id in self.excel_ids + [self.template_id]:
+            if file_id:
+                file_manager.remove(file_id)
+        for job_id in self.job_ids:
+            shutil.rmtree(OUTPUT_DIR / job_id, ignore_errors=True)
+
+
+async def run(args, corpus: dict) -> dict:
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    if args.threads:
+        limiter.total_tokens = args.threads
+
+    recorder = Recorder()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest",
+                                 timeout=None) as client:
+        test = LoadTest(client, corpus, recorder)
+
+        # Warm-up: one template, one workbook, one deck to download
+        await test.upload_ppt()
+        await test.upload_excel()
+        if test.template_id is None or not test.excel_ids:
+            raise RuntimeError("warm-up uploads failed")
+        await test.generate()
+        recorder.samples.clear()
+        recorder.errors.clear()
+
+        ops = (["upload_excel"] * args.uploads + ["generate"] * args.generates
+               + ["download"] * args.downloads + ["health"] * args.health)
+        random.shuffle(ops)
+        queue = asyncio.Queue()
+        for op in ops:
+            queue.put_nowait(op)
+
+        async def worker():
+            while not queue.empty():
+                op = queue.get_nowait()
+                if op == "download" and not test.download_urls:
+                    op = "generate"
+                await getattr(test, op)()
+
+        lags, pool = [], []
+        stop = asyncio.Event()
+        monitors = [
+            asyncio.create_task(_monitor_loop_lag(lags, stop)),
+            asyncio.create_task(_monitor_pool(limiter, pool, stop)),
+        ]
+        start = time.perf_counter()
+        try:
+            await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        finally:
+            wall = time.perf_counter() - start
+            stop.set()
+            await asyncio.gather(*monitors)
+            test.cleanup()
+
+    total = sum(len(v) for v in recorder.samples.values())
+    lag_ms = [v * 1000 for v in lags]
+    return {
+        "wall_s": round(wall, 2),
+        "requests": total,
+        "throughput_rps": round(total / wall, 2) if wall else 0.0,
+        "endpoints": recorder.summary(wall),
+        "threadpool": {
+            "tokens": int(limiter.total_tokens),
+            "peak_busy": max(pool, default=0),
+            "mean_busy": round(sum(pool) / len(pool), 2) if pool else 0.0,
+            "saturated_pct": round(
+                100 * sum(1 for b in pool if b >= limiter.total_tokens) / len(pool), 1
+            ) if pool else 0.0,
+        },
+        "event_loop_lag": {
+            "p50_ms": round(percentile(lag_ms, 50), 1),
+            "p99_ms": round(percentile(lag_ms, 99), 1),
+            "max_ms": round(max(lag_ms, default=0.0), 1),
+        },
+    }
+
+
+def print_report(report: dict):
+    print(f"\n  {'endpoint':<14} {'reqs':>5} {'err':>4} {'p50 ms':>9} {'p95 ms':>9} "
+          f"{'p99 ms':>9} {'max ms':>9} {'req/s':>7}")
+    print("  " + "-" * 72)
+    for endpoint, r in report["endpoints"].items():
+        print(f"  {endpoint:<14} {r['requests']:>5} {r['errors']:>4} {r['p50_ms']:>9.1f} "
+              f"{r['p95_ms']:>9.1f} {r['p99_ms']:>9.1f} {r['max_ms']:>9.1f} "
+              f"{r['throughput_rps']:>7.2f}")
+    pool, lag = report["threadpool"], report["event_loop_lag"]
+    print("  " + "-" * 72)
+    print(f"  {report['requests']} requests in {report['wall_s']} s "
+          f"({report['throughput_rps']} req/s)")
+    print(f"  thread pool: {pool['tokens']} tokens, peak {pool['peak_busy']} busy, "
+          f"mean {pool['mean_busy']}, saturated {pool['saturated_pct']}% of samples")
+    print(f"  event-loop lag: p50 {lag['p50_ms']} ms, p99 {lag['p99_ms']} ms, "
+          f"max {lag['max_ms']} ms")
+
+
+def main():
+    p = argparse.ArgumentParser(description="Load test the API on the fake COM backend")
+    p.add_argument("--uploads", type=int, default=10, help="Excel uploads")
+    p.add_argument("--generates", type=int, default=20, help="Generate requests")
+    p.add_argument("--downloads", type=int, default=20, help="Downloads of generated decks")
+    p.add_argument("--health", type=int, default=10, help="Health checks")
+    p.add_argument("--concurrency", type=int, default=8, help="Concurrent clients")
+    p.add_argument("--threads", type=int, help="Thread-pool size (AnyIO default: 40)")
+    p.add_argument("--profile", choices=sorted(PROFILES), default="small",
+                   help="Corpus size (see benchmarks.corpus)")
+    p.add_argument("--latency-scale", type=float, default=1.0,
+                   help="Simulated Office latency multiplier (0 = none)")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--json", help="Write the report to this JSON file")
+    p.add_argument("--max-loop-lag-ms", type=float,
+                   help="Exit non-zero if the event loop ever stalled longer than this")
+    args = p.parse_args()
+
+    random.seed(args.seed)
+    excel_service.use_com_backend("fake")
+    fake_com.configure(latency_scale=args.latency_scale)
+    tracing.configure(enabled=False)  # keep load-test spans out of logs/trace.jsonl
+
+    corpus_dir = tempfile.mkdtemp(prefix="loadtest_corpus_")
+    try:
+        corpus = build_corpus(corpus_dir, args.profile, seed=args.seed)
+        report = asyncio.run(run(args, corpus))
+    finally:
+        shutil.rmtree(corpus_dir, ignore_errors=True)
+
+    report["config"] = {k: v for k, v in vars(args).items() if k != "json"}
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.max_loop_lag_ms is not None and report["event_loop_lag"]["max_ms"] > args.max_loop_lag_ms:
+        print(f"\n  ERROR: event loop stalled for {report['event_loop_lag']['max_ms']} ms "
+              f"(limit {args.max_loop_lag_ms} ms) — look for blocking calls in async handlers")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
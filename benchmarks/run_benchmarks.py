@@ -0,0 +1,254 @@
+"""
+End-to-end benchmark: workbook inspection, capture, validation, insertion
+and save on a synthetic corpus (see :mod:`benchmarks.corpus`).
+
+Stages timed per backend:
+
+* ``get_excel_info``         — open the workbook and list sheets / charts
+* ``capture``                — ``capture_image_mappings`` for every item
+* ``validate_image``         — ``validate_image`` over the captured PNGs
+* ``process_image_mappings`` — capture + optimize + insert into the template
+* ``prs_save``               — ``Presentation.save`` of the finished deck
+
+``--backend fake`` runs everywhere (COM-free simulator, optionally with
+``--latency-scale`` Office delays); ``win32`` drives real Office and needs
+Windows with pywin32.  Results can be written as JSON and compared against
+a stored baseline; a stage slower than the baseline by more than
+``--threshold`` exits non-zero.
+
+Usage:
+    python -m benchmarks.run_benchmarks --profile medium --json bench.json
+    python -m benchmarks.run_benchmarks --backend all --baseline benchmarks/baseline.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import statistics
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from pptx import Presentation
+
+from app.models.schemas import ChartMapping, GenerateRequest
+from app.services import excel_service, fake_com
+from app.services.ppt_service import (
+    capture_image_mappings, get_ppt_info, process_image_mappings, release_captures,
+)
+from app.utils import tracing
+from app.utils.image_validator import validate_image
+from benchmarks.corpus import PROFILES, build_corpus
+
+STAGES = ("get_excel_info", "capture", "validate_image", "process_image_mappings", "prs_save")
+EXCEL_ID = "bench"
+
+
+def win32_available() -> bool:
+    try:
+        import win32com.client  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _request(corpus: dict, slides: int) -> GenerateRequest:
+    mappings = [
+        ChartMapping(excel_id=EXCEL_ID, name=item["name"], type=item["type"],
+                     page=i % slides + 1)
+        for i, item in enumerate(corpus["items"])
+    ]
+    return GenerateRequest(template_id="bench", output_name="bench", mappings=mappings)
+
+
+def _timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def run_once(corpus: dict, work_dir: Path) -> dict:
+    """Time every stage once; return ``{stage: seconds}``."""
+    excel_path = os.path.abspath(corpus["excel"])
+    uploaded_files = {EXCEL_ID: {"path": excel_path, "filename": os.path.basename(excel_path)}}
+    slide_info = get_ppt_info(corpus["template"])
+    slide_titles = {s["page"]: s["title"] for s in slide_info["slides"]}
+    request = _request(corpus, slide_info["total_slides"])
+    seconds = {}
+
+    seconds["get_excel_info"] = _timed(lambda: excel_service.get_excel_info(excel_path))
+
+    capture_dir = work_dir / "capture"
+    capture_dir.mkdir()
+    start = time.perf_counter()
+    extracted = capture_image_mappings(request.mappings, capture_dir, uploaded_files)
+    seconds["capture"] = time.perf_counter() - start
+    release_captures(extracted)
+    if len(extracted) != len(corpus["items"]):
+        raise RuntimeError(f"captured {len(extracted)} of {len(corpus['items'])} items")
+
+    pngs = sorted(str(p) for p in capture_dir.glob("*.png"))
+    seconds["validate_image"] = _timed(lambda: [validate_image(p) for p in pngs])
+
+    job_dir = work_dir / "job"
+    job_dir.mkdir()
+    prs = Presentation(corpus["template"])
+    start = time.perf_counter()
+    results = process_image_mappings(
+        request.mappings, prs, request, job_dir, slide_titles, uploaded_files
+    )
+    seconds["process_image_mappings"] = time.perf_counter() - start
+    failed = [r for r in results if r["status"] != "success"]
+    if failed:
+        raise RuntimeError(f"{len(failed)} mapping(s) failed, e.g. {failed[0]}")
+
+    seconds["prs_save"] = _timed(lambda: prs.save(str(work_dir / "out.pptx")))
+    return seconds
+
+
+def run(corpus: dict, backend: str, repeat: int) -> dict:
+    """Run the stages *repeat* times on *backend*; summarize per stage."""
+    excel_service.use_com_backend(backend)
+    runs = {stage: [] for stage in STAGES}
+    for _ in range(repeat):
+        work_dir = Path(tempfile.mkdtemp(prefix="bench_e2e_"))
+        try:
+            for stage, s in run_once(corpus, work_dir).items():
+                runs[stage].append(s)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return {
+        stage: {
+            "median_ms": round(statistics.median(values) * 1000, 2),
+            "min_ms": round(min(values) * 1000, 2),
+            "runs": len(values),
+        }
+        for stage, values in runs.items()
+    }
+
+
+# ---------------------------------------------------------------------------
+# Baseline comparison
+# ---------------------------------------------------------------------------
+def compare(results: dict, baseline: dict, threshold: float, min_delta_ms: float) -> list:
+    """Return one row per (backend, stage) present in both result sets.
+
+    A stage regresses when its median is more than *threshold* (a fraction)
+    and more than *min_delta_ms* slower than the baseline median.
+    """
+    rows = []
+    base_results = baseline.get("results", {})
+    for backend, stages in results.items():
+        for stage, current in stages.items():
+            base = base_results.get(backend, {}).get(stage)
+            if not base:
+                continue
+            delta = current["median_ms"] - base["median_ms"]
+            ratio = current["median_ms"] / base["median_ms"] if base["median_ms"] else None
+            rows.append({
+                "backend": backend,
+                "stage": stage,
+                "baseline_ms": base["median_ms"],
+                "current_ms": current["median_ms"],
+                "ratio": round(ratio, 2) if ratio is not None else None,
+                "regression": ratio is not None and ratio > 1 + threshold and delta > min_delta_ms,
+            })
+    return rows
+
+
+def print_results(results: dict):
+    for backend, stages in results.items():
+        print(f"\n  backend: {backend}")
+        print(f"  {'stage':<26} {'median ms':>10} {'min ms':>10} {'runs':>5}")
+        print("  " + "-" * 54)
+        for stage, r in stages.items():
+            print(f"  {stage:<26} {r['median_ms']:>10.2f} {r['min_ms']:>10.2f} {r['runs']:>5}")
+
+
+def print_comparison(rows: list):
+    print(f"\n  {'backend':<8} {'stage':<26} {'baseline':>10} {'current':>10} {'ratio':>7}")
+    print("  " + "-" * 66)
+    for r in rows:
+        flag = "  <-- REGRESSION" if r["regression"] else ""
+        ratio = f"{r['ratio']:.2f}x" if r["ratio"] is not None else "-"
+        print(
+            f"  {r['backend']:<8} {r['stage']:<26} {r['baseline_ms']:>10.2f} "
+            f"{r['current_ms']:>10.2f} {ratio:>7}{flag}"
+        )
+
+
+def main():
+    p = argparse.ArgumentParser(description="End-to-end capture/insert benchmark")
+    p.add_argument("--profile", choices=sorted(PROFILES), default="small")
+    p.add_argument("--backend", choices=("fake", "win32", "all"), default="fake",
+                   help="'all' runs win32 too when pywin32 is available")
+    p.add_argument("--repeat", type=int, default=3, help="Runs per stage (median is compared)")
+    p.add_argument("--latency-scale", type=float, default=0.0,
+                   help="Simulated Office latency multiplier for the fake backend")
+    p.add_argument("--json", help="Write results to this JSON file")
+    p.add_argument("--baseline", help="Compare against results from an earlier --json run")
+    p.add_argument("--threshold", type=float, default=0.2,
+                   help="Allowed slowdown vs. the baseline (0.2 = 20%%)")
+    p.add_argument("--min-delta-ms", type=float, default=5.0,
+                   help="Ignore slowdowns smaller than this (timer noise)")
+    args = p.parse_args()
+
+    backends = ["fake"] if args.backend == "fake" else [args.backend]
+    if args.backend == "all":
+        backends = ["fake"] + (["win32"] if win32_available() else [])
+        if "win32" not in backends:
+            print("  pywin32 not available: skipping the win32 backend")
+    elif args.backend == "win32" and not win32_available():
+        print("  ERROR: the win32 backend needs Windows with pywin32")
+        sys.exit(1)
+
+    tracing.configure(enabled=False)  # keep benchmark spans out of logs/trace.jsonl
+    fake_com.configure(latency_scale=args.latency_scale)
+
+    corpus_dir = tempfile.mkdtemp(prefix="bench_corpus_")
+    try:
+        corpus = build_corpus(corpus_dir, args.profile)
+        results = {backend: run(corpus, backend, args.repeat) for backend in backends}
+    finally:
+        shutil.rmtree(corpus_dir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "profile": args.profile,
+            "params": corpus["params"],
+            "items": len(corpus["items"]),
+            "repeat": args.repeat,
+            "latency_scale": args.latency_scale,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+    print_results(results)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("meta", {}).get("profile") != args.profile:
+            print(f"\n  WARNING: baseline profile is {baseline.get('meta', {}).get('profile')!r}")
+        rows = compare(results, baseline, args.threshold, args.min_delta_ms)
+        report["comparison"] = rows
+        print_comparison(rows)
+        regressions = [r for r in rows if r["regression"]]
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if regressions:
+        print(f"\n  ERROR: {len(regressions)} stage(s) regressed beyond {args.threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
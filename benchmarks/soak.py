@@ -0,0 +1,186 @@
+"""
+Soak test: thousands of generate cycles on the fake COM backend, watching
+for memory that is never given back.
+
+Each cycle streams one deck through ``POST /api/generate`` and deletes its
+job directory.  Every ``--sample-every`` cycles the harness collects
+garbage and samples traced Python memory (``tracemalloc``) and RSS.  After
+``--warmup`` cycles (caches, imports and pools settle) it fits a line
+through the samples; a traced-memory slope above ``--leak-kb-per-cycle``
+is reported as a leak, with the allocation sites that grew most, and the
+run exits non-zero.  RSS is reported alongside (it also moves with
+allocator fragmentation, so it is only flagged past ``--rss-kb-per-cycle``).
+
+Usage:
+    python -m benchmarks.soak --cycles 2000
+    python -m benchmarks.soak --cycles 500 --profile medium --json soak.json
+"""
+import os
+import sys
+import gc
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from fastapi.testclient import TestClient
+
+from app.config import OUTPUT_DIR
+from app.main import app
+from app.services import excel_service, fake_com
+from app.services.file_manager import file_manager
+from app.utils import tracing
+from app.utils.memory import rss_bytes
+from benchmarks.corpus import PROFILES, build_corpus
+
+XLSX_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+PPTX_TYPE = "application/vnd.openxmlformats-officedocument.presentationml.presentation"
+
+
+def slope(points) -> float:
+    """Least-squares slope of ``[(x, y)]`` (0 for fewer than two points)."""
+    if len(points) < 2:
+        return 0.0
+    n = len(points)
+    mean_x = sum(x for x, _ in points) / n
+    mean_y = sum(y for _, y in points) / n
+    var_x = sum((x - mean_x) ** 2 for x, _ in points)
+    if not var_x:
+        return 0.0
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / var_x
+
+
+def _upload(client, kind: str, path: str, content_type: str) -> str:
+    with open(path, "rb") as f:
+        resp = client.post(f"/api/upload-{kind}", files={"file": (os.path.basename(path), f.read(), content_type)})
+    resp.raise_for_status()
+    return resp.json()["file_id"]
+
+
+def run(args, corpus: dict) -> dict:
+    samples = []  # (cycle, traced_bytes, rss_bytes)
+    failures = 0
+    baseline_snapshot = None
+
+    with TestClient(app) as client:
+        template_id = _upload(client, "ppt", corpus["template"], PPTX_TYPE)
+        excel_id = _upload(client, "excel", corpus["excel"], XLSX_TYPE)
+        body = {
+            "template_id": template_id,
+            "output_name": "soak",
+            "stream": True,  # bypasses the result cache; nothing kept on disk
+            "keep_copy": False,
+            "mappings": [
+                {"excel_id": excel_id, "name": item["name"], "type": item["type"],
+                 "page": i % corpus["params"]["slides"] + 1}
+                for i, item in enumerate(corpus["items"])
+            ],
+        }
+
+        start = time.perf_counter()
+        try:
+            for cycle in range(1, args.cycles + 1):
+                resp = client.post("/api/generate", json=body)
+                if resp.status_code != 200 or resp.headers.get("X-Results-Failed", "0") != "0":
+                    failures += 1
+                job_id = resp.headers.get("X-Job-Id")
+                if job_id:
+                    shutil.rmtree(OUTPUT_DIR / job_id, ignore_errors=True)
+                del resp
+
+                if cycle % args.sample_every == 0 or cycle == args.warmup:
+                    gc.collect()
+                    samples.append((cycle, tracemalloc.get_traced_memory()[0], rss_bytes() or 0))
+                    if cycle == args.warmup:
+                        baseline_snapshot = tracemalloc.take_snapshot()
+                    if cycle % (args.sample_every * 10) == 0:
+                        print(f"  cycle {cycle}: traced {samples[-1][1] / 1024 / 1024:.1f} MB, "
+                              f"RSS {samples[-1][2] / 1024 / 1024:.1f} MB")
+        finally:
+            wall = time.perf_counter() - start
+            file_manager.remove(template_id)
+            file_manager.remove(excel_id)
+
+    steady = [s for s in samples if s[0] >= args.warmup]
+    traced_slope = slope([(c, t) for c, t, _ in steady]) / 1024
+    rss_slope = slope([(c, r) for c, _, r in steady]) / 1024
+
+    growth = []
+    if baseline_snapshot is not None:
+        end = tracemalloc.take_snapshot()
+        growth = [
+            {"site": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+             "size_diff_kb": round(stat.size_diff / 1024, 1), "count_diff": stat.count_diff}
+            for stat in end.compare_to(baseline_snapshot, "lineno")[:10]
+            if stat.size_diff > 0
+        ]
+
+    return {
+        "cycles": args.cycles,
+        "failures": failures,
+        "wall_s": round(wall, 1),
+        "cycles_per_s": round(args.cycles / wall, 2) if wall else 0.0,
+        "traced_kb_per_cycle": round(traced_slope, 3),
+        "rss_kb_per_cycle": round(rss_slope, 3),
+        "traced_leak": traced_slope > args.leak_kb_per_cycle,
+        "rss_leak": rss_slope > args.rss_kb_per_cycle,
+        "samples": [{"cycle": c, "traced_bytes": t, "rss_bytes": r} for c, t, r in samples],
+        "top_growth": growth,
+    }
+
+
+def main():
+    p = argparse.ArgumentParser(description="Generate soak test with leak detection")
+    p.add_argument("--cycles", type=int, default=2000)
+    p.add_argument("--warmup", type=int, default=100, help="Cycles excluded from the fit")
+    p.add_argument("--sample-every", type=int, default=20)
+    p.add_argument("--profile", choices=sorted(PROFILES), default="small")
+    p.add_argument("--data-sheets", type=int, default=0,
+                   help="Chart-less sheets (UsedRange capture sleeps on the clipboard)")
+    p.add_argument("--leak-kb-per-cycle", type=float, default=1.0,
+                   help="Traced-memory growth per cycle reported as a leak")
+    p.add_argument("--rss-kb-per-cycle", type=float, default=16.0,
+                   help="RSS growth per cycle reported as a leak")
+    p.add_argument("--json", help="Write the report to this JSON file")
+    args = p.parse_args()
+    if args.warmup >= args.cycles:
+        p.error("--warmup must be smaller than --cycles")
+
+    excel_service.use_com_backend("fake")
+    fake_com.configure(latency_scale=0)
+    tracing.configure(enabled=False)  # keep soak spans out of logs/trace.jsonl
+    tracemalloc.start(1)
+
+    corpus_dir = tempfile.mkdtemp(prefix="soak_corpus_")
+    try:
+        corpus = build_corpus(corpus_dir, args.profile, data_sheets=args.data_sheets)
+        report = run(args, corpus)
+    finally:
+        tracemalloc.stop()
+        shutil.rmtree(corpus_dir, ignore_errors=True)
+
+    print(f"\n  {report['cycles']} cycles in {report['wall_s']} s "
+          f"({report['cycles_per_s']}/s), {report['failures']} failed")
+    print(f"  traced memory: {report['traced_kb_per_cycle']:+.3f} KB/cycle"
+          f"{'  <-- LEAK' if report['traced_leak'] else ''}")
+    print(f"  RSS:           {report['rss_kb_per_cycle']:+.3f} KB/cycle"
+          f"{'  <-- LEAK' if report['rss_leak'] else ''}")
+    if report["traced_leak"] and report["top_growth"]:
+        print("\n  Largest growth since warm-up:")
+        for g in report["top_growth"]:
+            print(f"    {g['size_diff_kb']:>10.1f} KB  {g['count_diff']:>+7}  {g['site']}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if report["traced_leak"] or report["rss_leak"] or report["failures"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -14,16 +14,35 @@ Usage:
     # Direct mode with inline mappings
     python -m cli.report_cli --excel data.xlsm --template report.pptx \\
         --output result.pptx --map "Metric DUT vs REF#1:8:worksheet" --map "BI:9:chartsheet"
+
+    # Any mode + --profile writes result.profile.folded next to the output
+
+    # Batch: a manifest of jobs, or every workbook matching a glob x one config
+    python -m cli.report_cli --batch nightly.json --jobs 4
+    python -m cli.report_cli --excel-glob "reports/*.xlsm" --config report_config.json \
+        --output-dir out --jobs 4
+
+    # Watch: regenerate a folder's decks whenever a workbook is saved
+    python -m cli.report_cli --watch results/ --config report_config.json --output-dir out
+
+    # Server: run on a running web server (config, --map and batch modes)
+    python -m cli.report_cli --config report_config.json --server http://reports:8000
 """
 import os
 import sys
+import glob
 import json
+import time
+import shutil
 import argparse
+import tempfile
+from typing import Optional
 
 # Add project root to path for imports
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 
 from app.config import logger, DEFAULT_IMAGE_LAYOUT
+from app.utils.xlsx_inventory import sheet_digests
 
 
 def parse_args():
@@ -37,12 +56,49 @@ def parse_args():
         "--map",
         action="append",
         default=[],
-        help="Mapping in format 'name:page:type' (can be repeated)",
+        help="Mapping in format 'name:page:type' (can be repeated); name may be "
+             "glob:/re:/@chartsheets, page may be title~text",
     )
     p.add_argument("--img-left", type=float, default=DEFAULT_IMAGE_LAYOUT["left"])
     p.add_argument("--img-top", type=float, default=DEFAULT_IMAGE_LAYOUT["top"])
     p.add_argument("--img-width", type=float, default=DEFAULT_IMAGE_LAYOUT["width"])
     p.add_argument("--img-height", type=float, default=DEFAULT_IMAGE_LAYOUT["height"])
+    p.add_argument(
+        "--profile",
+        action="store_true",
+        help="Sample the run and write <output>.profile.folded (flamegraph input)",
+    )
+    p.add_argument("--batch", help="JSON manifest of report jobs (batch mode)")
+    p.add_argument(
+        "--excel-glob",
+        help="Batch mode: one report per matching workbook, using --config's template and mappings",
+    )
+    p.add_argument("--output-dir", help="Batch mode: directory for --excel-glob outputs")
+    p.add_argument(
+        "--jobs", type=int, default=1,
+        help="Batch mode: worker processes, each keeping one Excel instance warm",
+    )
+    p.add_argument(
+        "--watch", metavar="DIR",
+        help="Regenerate decks whenever a workbook in DIR is saved "
+             "(jobs from --batch, or --config applied to every workbook in DIR)",
+    )
+    p.add_argument(
+        "--debounce", type=float, default=2.0,
+        help="Watch mode: seconds a workbook must stay unchanged before it is processed",
+    )
+    p.add_argument("--poll-interval", type=float, default=1.0,
+                   help="Watch mode: seconds between folder scans")
+    p.add_argument("--no-cache", action="store_true",
+                   help="Capture every item again instead of reusing cached captures")
+    p.add_argument("--cache-dir", help="Capture cache directory (default: data/capture_cache)")
+    p.add_argument("--cache-max-mb", type=float,
+                   help="Capture cache size cap; least recently used captures are evicted")
+    p.add_argument(
+        "--server", metavar="URL",
+        help="Run the report(s) on a running server instead of a local Excel "
+             "(inputs it already holds are not re-uploaded)",
+    )
     return p.parse_args()
 
 
@@ -52,21 +108,58 @@ def load_config(config_path: str) -> dict:
         return json.load(f)
 
 
-def list_available_items(excel_path: str):
-    """List all available worksheets and chart sheets."""
-    from app.services.excel_service import ExcelCOM
+def workbook_metadata(excel_path: str) -> dict:
+    """Sheet metadata (``get_excel_info`` shape), read without COM when possible.
 
-    with ExcelCOM() as (excel_app, _):
-        workbook = excel_app.Workbooks.Open(os.path.abspath(excel_path))
-        worksheets = [sheet.Name for sheet in workbook.Worksheets]
-        chartsheets = []
-        try:
-            for chart in workbook.Charts:
-                chartsheets.append(chart.Name)
-        except Exception:
-            pass
-        workbook.Close(SaveChanges=False)
+    ``.xlsx`` / ``.xlsm`` packages are inventoried directly; legacy ``.xls``
+    files fall back to opening Excel.
+    """
+    from app.utils.xlsx_inventory import excel_info_from_inventory, read_inventory
 
+    try:
+        return excel_info_from_inventory(read_inventory(excel_path))
+    except ValueError:
+        from app.services.excel_service import get_excel_info
+        return get_excel_info(excel_path)
+
+
+def resolve_rules(excel_path: str, template_path: str, mappings: list) -> list:
+    """Expand pattern mappings (``glob:``, ``re:``, ``@chartsheets``, ``title~``).
+
+    See :mod:`app.services.mapping_resolver`.  Plain mappings are returned
+    as they are, without reading the workbook or template.
+
+    Raises:
+        ValueError: A rule cannot be evaluated (bad regex or page selector).
+    """
+    from app.services.mapping_resolver import (
+        TemplateIndex, WorkbookIndex, is_rule, resolve_mappings,
+    )
+    from app.services.ppt_service import get_ppt_info
+
+    if not any(is_rule(m) for m in mappings):
+        return mappings
+    result = resolve_mappings(
+        mappings,
+        {None: WorkbookIndex(workbook_metadata(excel_path))},
+        TemplateIndex(get_ppt_info(template_path)),
+    )
+    for warning in result["warnings"]:
+        logger.warning("Mapping rule: %s", warning)
+    if result["errors"]:
+        raise ValueError("; ".join(result["errors"]))
+    return result["mappings"]
+
+
+def list_available_items(excel_path: str):
+    """List all available worksheets and chart sheets.
+
+    Read from the workbook package (see :func:`workbook_metadata`), so
+    interactive sessions start without waiting for Excel.
+    """
+    info = workbook_metadata(excel_path)
+    worksheets = [ws["name"] for ws in info["worksheets"]]
+    chartsheets = [cs["name"] for cs in info["chartsheets"]]
     return worksheets, chartsheets
 
 
@@ -156,100 +249,985 @@ def interactive_mode(excel_path: str, template_path: str, output_path: str, args
     run_generation(excel_path, template_path, output_path, selections, args)
 
 
-def run_generation(excel_path, template_path, output_path, mappings, args):
-    """Execute the actual extraction and insertion."""
-    from app.services.excel_service import ExcelCOM, capture_item
-    from pptx import Presentation
-    from pptx.util import Inches
+def run_generation(excel_path, template_path, output_path, mappings, args, excel_app=None):
+    """Execute the actual extraction and insertion, profiled with ``--profile``.
+
+    Args:
+        excel_app: A running Excel instance to reuse (batch workers keep one
+            warm); a new one is started and quit when omitted.
+
+    Returns:
+        ``{"captured": n, "cached": n, "inserted": n, "failed": [names]}``.
+
+    Raises:
+        ValueError: A pattern mapping cannot be resolved.
+    """
+    mappings = resolve_rules(excel_path, template_path, mappings)
+    if not getattr(args, "profile", False):
+        return _generate(excel_path, template_path, output_path, mappings, args, excel_app)
+
+    from app.utils.profiler import SamplingProfiler
+
+    with SamplingProfiler() as profiler:
+        outcome = _generate(excel_path, template_path, output_path, mappings, args, excel_app)
+    report = os.path.splitext(output_path)[0] + ".profile.folded"
+    profiler.write_folded(report)
+    print(f"  Profile: {report} ({profiler.samples} samples)")
+    return outcome
+
+
+def _capture_cache(args):
+    """Return the :class:`CaptureCache` selected by *args*, or ``None`` with ``--no-cache``."""
+    if getattr(args, "no_cache", False):
+        return None
+    from app.services.capture_cache import CaptureCache
+
+    return CaptureCache(getattr(args, "cache_dir", None), getattr(args, "cache_max_mb", None))
 
-    temp_dir = os.path.join(os.path.dirname(output_path), "_temp_charts")
-    os.makedirs(temp_dir, exist_ok=True)
+
+def _generate(excel_path, template_path, output_path, mappings, args, excel_app=None):
+    """Extract every mapping from Excel and insert it into the template.
+
+    Items already in the capture cache for this workbook content are not
+    captured again; Excel is not touched at all when every item is cached.
+    """
+    from app.services.excel_service import ExcelCOM
+
+    say = print if getattr(args, "verbose", True) else (lambda *a, **k: None)
+    out_dir = os.path.dirname(os.path.abspath(output_path))
+    os.makedirs(out_dir, exist_ok=True)
+    temp_dir = tempfile.mkdtemp(prefix="_temp_charts_", dir=out_dir)
 
     # Step 1: Extract
-    print("\n" + "=" * 60)
-    print("  Step 1: Extracting from Excel")
-    print("=" * 60)
+    say("\n" + "=" * 60)
+    say("  Step 1: Extracting from Excel")
+    say("=" * 60)
 
+    cache = _capture_cache(args)
     extracted = {}
-    with ExcelCOM() as (excel_app, _):
-        workbook = excel_app.Workbooks.Open(os.path.abspath(excel_path))
+    try:
+        if cache is not None:
+            from app.services.file_manager import sha256_file
+
+            workbook_hash = sha256_file(excel_path)
+            for sel in mappings:
+                for key, _ in _capture_units(sel):
+                    if key not in extracted:
+                        capture = cache.get(workbook_hash, key, sel["type"])
+                        if capture is not None:
+                            extracted[key] = capture
+            say(f"\n  Cache: {len(extracted)} item(s) reused from {cache.directory}")
+        cached = len(extracted)
+
+        misses = [
+            sel for sel in mappings
+            if any(key not in extracted for key, _ in _capture_units(sel))
+        ]
+        if misses:
+            if excel_app is not None:
+                fresh = _extract(excel_app, excel_path, misses, temp_dir, say, skip=extracted)
+            else:
+                with ExcelCOM() as (app, _):
+                    fresh = _extract(app, excel_path, misses, temp_dir, say, skip=extracted)
+            if cache is not None:
+                types = {key: sel["type"] for sel in misses for key, _ in _capture_units(sel)}
+                for key, capture in fresh.items():
+                    cache.put(workbook_hash, key, types[key], capture)
+                cache.trim()
+            extracted.update(fresh)
+
+        # Step 2: Insert into PPT
+        say("\n" + "=" * 60)
+        say("  Step 2: Inserting into PowerPoint")
+        say("=" * 60)
+
+        inserted, failed = _insert_captures(
+            template_path, output_path, mappings, extracted, args, say
+        )
+        for capture in extracted.values():
+            capture.close()
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
 
-        for sel in mappings:
-            name = sel["name"]
-            safe_name = name.replace(" ", "_").replace("#", "_").replace("/", "_")
-            img_path = os.path.join(temp_dir, f"{safe_name}.png")
+    say("\n" + "=" * 60)
+    say(f"  Done! Output: {output_path}")
+    say("=" * 60)
+    return {"captured": len(extracted) - cached, "cached": cached, "inserted": inserted, "failed": failed}
 
-            print(f"\n  Extracting: {name}")
-            if capture_item(excel_app, workbook, name, sel["type"], img_path):
-                extracted[name] = img_path
-                print(f"    OK ({os.path.getsize(img_path)} bytes)")
-            else:
-                print(f"    FAILED")
 
-        workbook.Close(SaveChanges=False)
+def _insert_captures(template_path, output_path, mappings, extracted, args, say):
+    """Place every captured mapping on its slide and save the deck.
 
-    # Step 2: Insert into PPT
-    print("\n" + "=" * 60)
-    print("  Step 2: Inserting into PowerPoint")
-    print("=" * 60)
+    Several charts of one mapping share the ``--img-*`` box, arranged by
+    the mapping's ``layout``.
+
+    Returns:
+        ``(inserted, failed_names)``.
+    """
+    from pptx import Presentation
+    from pptx.util import Inches
+    from app.utils.chart_layout import fit_in, layout_positions
 
     prs = Presentation(template_path)
+    box = (args.img_left, args.img_top, args.img_width, args.img_height)
+    failed = []
+    inserted = 0
 
     for sel in mappings:
-        name = sel["name"]
         page = sel["page"]
         slide_idx = page - 1
+        units = _capture_units(sel)
+        if units[0][1] is None:
+            cells = [box]
+        else:
+            cells = layout_positions(len(units), sel.get("layout", "grid"), box)
+
+        for (key, chart), cell in zip(units, cells):
+            label = sel["name"] if chart is None else f"{sel['name']} [{chart}]"
+            if key not in extracted:
+                say(f"\n  SKIP: {label} — no image")
+                failed.append(label)
+                continue
+
+            if slide_idx >= len(prs.slides):
+                say(f"\n  SKIP: Page {page} doesn't exist")
+                failed.append(label)
+                continue
 
-        if name not in extracted:
-            print(f"\n  SKIP: {name} — no image")
-            continue
+            say(f"\n  {label} -> Page {page}")
+            slide = prs.slides[slide_idx]
+            capture = extracted[key]
+            left, top, width, height = cell if chart is None else fit_in(cell, capture.stats()[:2])
+
+            slide.shapes.add_picture(
+                capture.open(),
+                Inches(left),
+                Inches(top),
+                width=Inches(width),
+                height=Inches(height),
+            )
+            inserted += 1
+            say(f"    OK")
 
-        if slide_idx >= len(prs.slides):
-            print(f"\n  SKIP: Page {page} doesn't exist")
-            continue
+    prs.save(output_path)
+    return inserted, failed
 
-        print(f"\n  {name} -> Page {page}")
-        slide = prs.slides[slide_idx]
 
-        slide.shapes.add_picture(
-            extracted[name],
-            Inches(args.img_left),
-            Inches(args.img_top),
-            width=Inches(args.img_width),
-            height=Inches(args.img_height),
-        )
-        print(f"    OK")
+def _capture_units(sel: dict) -> list:
+    """``(capture key, chart)`` for every image of a mapping dict.
+
+    The key is the item name, or ``name#chart`` for each chart a worksheet
+    mapping selects (see :func:`app.services.ppt_service.capture_units`).
+    """
+    from app.utils.chart_layout import chart_key
+
+    charts = sel.get("charts")
+    if sel["type"] != "worksheet" or not isinstance(charts, list):
+        return [(sel["name"], None)]
+    return [(chart_key(sel["name"], chart), chart) for chart in charts]
+
+
+def _extract(excel_app, excel_path, mappings, temp_dir, say, index=None, skip=()) -> dict:
+    """Capture every mapping of one workbook; return ``{capture key: CaptureResult}``.
+
+    Args:
+        index: Perceptual-hash index to check clipboard captures against
+            (a fresh one when omitted).
+        skip: Capture keys that are already available.
+    """
+    from app.services.excel_service import capture_item_result
+    from app.utils.phash import CaptureIndex
+
+    extracted = {}
+    if index is None:
+        index = CaptureIndex()
+    workbook = excel_app.Workbooks.Open(os.path.abspath(excel_path))
+    try:
+        for sel, name, chart in (
+            (sel, key, chart) for sel in mappings for key, chart in _capture_units(sel)
+        ):
+            if name in extracted or name in skip:
+                continue
+            safe_name = name.replace(" ", "_").replace("#", "_").replace("/", "_")
+            img_path = os.path.join(temp_dir, f"{safe_name}.png")
+
+            say(f"\n  Extracting: {name}")
+            capture = capture_item_result(
+                excel_app, workbook, sel["name"], sel["type"], img_path,
+                index=index, key=name, chart=chart,
+            )
+            if capture is not None and capture.stale_of:
+                say(f"    FAILED (same image as '{capture.stale_of}')")
+                capture.close()
+            elif capture is not None:
+                extracted[name] = capture
+                say(f"    OK ({capture.size} bytes)")
+            else:
+                say(f"    FAILED")
+    finally:
+        workbook.Close(SaveChanges=False)
+    return extracted
 
-    prs.save(output_path)
 
-    # Cleanup temp
-    import shutil
-    shutil.rmtree(temp_dir, ignore_errors=True)
+# ---------------------------------------------------------------------------
+# Batch mode
+# ---------------------------------------------------------------------------
+def _parse_mappings(entries) -> list:
+    """Mapping dicts from config entries.
 
+    An entry is ``[name, page, type]``, optionally followed by ``charts``
+    and ``layout``, or a dict with those keys.
+
+    Raises:
+        ValueError: An invalid ``charts`` selector or ``layout``.
+    """
+    from app.services.mapping_resolver import page_value
+    from app.utils.chart_layout import LAYOUTS, normalize_charts
+
+    mappings = []
+    for entry in entries:
+        if not isinstance(entry, dict):
+            entry = dict(zip(("name", "page", "type", "charts", "layout"), entry))
+        mapping = {"name": entry["name"], "page": page_value(entry["page"]), "type": entry["type"]}
+        if entry.get("charts") is not None:
+            layout = entry.get("layout") or "grid"
+            if layout not in LAYOUTS:
+                raise ValueError(f"{entry['name']}: layout must be one of {', '.join(LAYOUTS)}")
+            mapping["charts"] = normalize_charts(entry["charts"])
+            mapping["layout"] = layout
+        mappings.append(mapping)
+    return mappings
+
+
+def load_batch_jobs(args) -> list:
+    """Build the job list for ``--batch`` or ``--excel-glob``.
+
+    A manifest is ``{"defaults": {...}, "jobs": [{...}, ...]}`` (or just the
+    list of jobs); each job takes ``excel_file``, ``ppt_template``,
+    ``output_ppt`` and ``mappings`` like a ``--config`` file, falling back to
+    ``defaults`` for any key it omits.  ``--excel-glob`` instead applies one
+    ``--config`` to every matching workbook, writing ``<stem>.pptx`` into
+    ``--output-dir``.
+
+    Raises:
+        ValueError: A job is missing its workbook, template, output or mappings.
+    """
+    if args.batch:
+        with open(args.batch, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if isinstance(manifest, list):
+            manifest = {"jobs": manifest}
+        defaults = manifest.get("defaults", {})
+        base = os.path.dirname(os.path.abspath(args.batch))
+        entries = [{**defaults, **job} for job in manifest.get("jobs", [])]
+    else:
+        if not args.config:
+            raise ValueError("--excel-glob needs --config for the template and mappings")
+        cfg = load_config(args.config)
+        base = os.getcwd()
+        out_dir = args.output_dir or os.path.dirname(cfg.get("output_ppt", "")) or "."
+        entries = [
+            {
+                **cfg,
+                "excel_file": path,
+                "output_ppt": os.path.join(
+                    out_dir, os.path.splitext(os.path.basename(path))[0] + ".pptx"
+                ),
+            }
+            for path in sorted(glob.glob(args.excel_glob))
+            if not os.path.basename(path).startswith("~$")  # Excel lock files
+        ]
+
+    jobs = []
+    for n, entry in enumerate(entries, 1):
+        missing = [k for k in ("excel_file", "ppt_template", "output_ppt", "mappings") if not entry.get(k)]
+        if missing:
+            raise ValueError(f"job {n}: missing {', '.join(missing)}")
+        layout = entry.get("layout", {})
+        jobs.append({
+            "excel": os.path.join(base, entry["excel_file"]),
+            "template": os.path.join(base, entry["ppt_template"]),
+            "output": os.path.join(base, entry["output_ppt"]),
+            "mappings": _parse_mappings(entry["mappings"]),
+            "options": argparse.Namespace(
+                img_left=layout.get("left", args.img_left),
+                img_top=layout.get("top", args.img_top),
+                img_width=layout.get("width", args.img_width),
+                img_height=layout.get("height", args.img_height),
+                profile=args.profile,
+                no_cache=args.no_cache,
+                cache_dir=args.cache_dir,
+                cache_max_mb=args.cache_max_mb,
+                verbose=False,
+            ),
+        })
+    return jobs
+
+
+# One Excel instance per worker process, kept for the worker's lifetime
+_worker_excel = None  # (ExcelCOM context, excel_app)
+
+
+def _worker_init(backend: str = None):
+    """Process-pool initializer: select the COM backend and start Excel."""
+    from multiprocessing import util
+    from app.services.excel_service import use_com_backend
+
+    if backend:
+        use_com_backend(backend)
+    _warm_excel()
+    # Pool workers skip atexit handlers; a finalizer still runs on clean exit
+    util.Finalize(None, _release_excel, exitpriority=10)
+
+
+def _warm_excel():
+    global _worker_excel
+    if _worker_excel is None:
+        from app.services.excel_service import ExcelCOM
+        context = ExcelCOM()
+        excel_app, _ = context.__enter__()
+        _worker_excel = (context, excel_app)
+    return _worker_excel[1]
+
+
+def _release_excel():
+    global _worker_excel
+    if _worker_excel is not None:
+        context, _worker_excel = _worker_excel[0], None
+        context.__exit__(None, None, None)
+
+
+def _run_batch_job(job: dict) -> dict:
+    """Generate one report on this worker's warm Excel instance."""
+    start = time.perf_counter()
+    result = {"excel": job["excel"], "output": job["output"], "pid": os.getpid()}
+    try:
+        outcome = run_generation(
+            job["excel"], job["template"], job["output"], job["mappings"],
+            job["options"], excel_app=_warm_excel(),
+        )
+        result.update(outcome, status="failed" if outcome["failed"] else "ok")
+    except Exception as e:
+        logger.error("Batch job %s failed: %s", job["excel"], e, exc_info=True)
+        result.update(status="error", error=str(e), captured=0, inserted=0,
+                      failed=[m["name"] for m in job["mappings"]])
+        _release_excel()  # Excel may be wedged; the next job starts a fresh one
+    result["seconds"] = round(time.perf_counter() - start, 2)
+    result["items"] = len(job["mappings"])
+    return result
+
+
+def run_batch(jobs: list, workers: int = 1) -> list:
+    """Run *jobs* on *workers* processes; return results in job order."""
+    from app.services.excel_service import com_backend
+
+    if workers <= 1 or len(jobs) <= 1:
+        try:
+            results = []
+            for n, job in enumerate(jobs, 1):
+                results.append(_run_batch_job(job))
+                _print_progress(n, len(jobs), results[-1])
+            return results
+        finally:
+            _release_excel()
+
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    results = [None] * len(jobs)
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(jobs)),
+        initializer=_worker_init,
+        initargs=(com_backend(),),
+    ) as pool:
+        futures = {pool.submit(_run_batch_job, job): i for i, job in enumerate(jobs)}
+        for n, future in enumerate(as_completed(futures), 1):
+            i = futures[future]
+            try:
+                results[i] = future.result()
+            except Exception as e:  # worker process died
+                results[i] = {
+                    "excel": jobs[i]["excel"], "output": jobs[i]["output"],
+                    "status": "error", "error": str(e), "seconds": 0.0,
+                    "captured": 0, "inserted": 0, "items": len(jobs[i]["mappings"]),
+                    "failed": [m["name"] for m in jobs[i]["mappings"]],
+                }
+            _print_progress(n, len(jobs), results[i])
+    return results
+
+
+def _print_progress(n: int, total: int, result: dict):
+    print(f"  [{n}/{total}] {result['status']:<6} {os.path.basename(result['excel'])} "
+          f"({result['seconds']:.1f} s)")
+
+
+def print_batch_summary(results: list, wall: float):
+    """Print per-report timings and failures, then totals."""
+    print("\n" + "=" * 78)
+    print(f"  {'report':<36} {'status':<7} {'items':>7} {'seconds':>9}  failures")
+    print("  " + "-" * 74)
+    for r in results:
+        name = os.path.basename(r["output"])
+        items = f"{r['inserted']}/{r['items']}"
+        failures = r.get("error") or ", ".join(r["failed"])
+        print(f"  {name[:36]:<36} {r['status']:<7} {items:>7} {r['seconds']:>9.1f}  {failures}")
+    busy = sum(r["seconds"] for r in results)
+    ok = sum(1 for r in results if r["status"] == "ok")
+    print("  " + "-" * 74)
+    print(f"  {ok}/{len(results)} reports complete; wall {wall:.1f} s, "
+          f"job time {busy:.1f} s ({busy / wall if wall else 0:.1f}x parallel)")
+    print("=" * 78)
+
+
+def batch_mode(args) -> int:
+    """Run ``--batch`` / ``--excel-glob``; return the process exit code."""
+    try:
+        jobs = load_batch_jobs(args)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        return 2
+    if not jobs:
+        print("Error: no jobs to run")
+        return 2
+
+    print(f"  Batch: {len(jobs)} report(s) on {min(args.jobs, len(jobs))} worker(s)")
+    start = time.perf_counter()
+    results = run_batch(jobs, args.jobs)
+    print_batch_summary(results, time.perf_counter() - start)
+    return 0 if all(r["status"] == "ok" for r in results) else 1
+
+
+# ---------------------------------------------------------------------------
+# Server client mode
+# ---------------------------------------------------------------------------
+class ServerError(Exception):
+    """The report server could not be reached or rejected a request."""
+
+
+class ServerClient:
+    """Run report jobs on a running server (``--server URL``).
+
+    Inputs are uploaded only when the server holds no file with the same
+    SHA-256; jobs go through ``/api/jobs`` so they share the server's warm
+    caches, and their progress is read from the NDJSON event stream.
+
+    Args:
+        base_url: Server root, e.g. ``http://reports:8000``.
+        client: An ``httpx.Client`` to use instead of a new one (tests
+            pass a ``TestClient``).
+    """
+
+    def __init__(self, base_url: str, client=None, timeout: float = 600.0):
+        import httpx
+
+        self._http_error = httpx.HTTPError
+        self.http = client or httpx.Client(base_url=base_url.rstrip("/"), timeout=timeout)
+        self._file_ids = {}  # (kind, sha256) -> server file id, for this session
+
+    def close(self):
+        self.http.close()
+
+    def _request(self, method: str, url: str, **kwargs):
+        try:
+            return self.http.request(method, url, **kwargs)
+        except self._http_error as e:
+            raise ServerError(f"{method} {url}: {e}") from e
+
+    @staticmethod
+    def _json(response) -> dict:
+        if response.status_code >= 400:
+            try:
+                detail = response.json().get("detail")
+            except ValueError:
+                detail = response.text
+            raise ServerError(f"HTTP {response.status_code}: {detail}")
+        return response.json()
+
+    def upload(self, path: str, kind: str):
+        """Return ``(file_id, uploaded)`` for *path* (*kind* ``excel`` or ``ppt``).
+
+        The file is sent only if the server has no upload with its content.
+        """
+        from app.services.file_manager import sha256_file
+
+        digest = sha256_file(path)
+        key = (kind, digest)
+        if key in self._file_ids:
+            return self._file_ids[key], False
+
+        response = self._request("GET", f"/api/files/by-hash/{digest}", params={"kind": kind})
+        uploaded = response.status_code == 404
+        if uploaded:
+            with open(path, "rb") as f:
+                response = self._request(
+                    "POST", f"/api/upload-{kind}", files={"file": (os.path.basename(path), f)}
+                )
+        self._file_ids[key] = self._json(response)["file_id"]
+        return self._file_ids[key], uploaded
+
+    def submit(self, job: dict, excel_id: str, template_id: str) -> str:
+        """Queue *job* (a :func:`load_batch_jobs` entry); return the server job id."""
+        options = job["options"]
+        body = {
+            "template_id": template_id,
+            "output_name": os.path.splitext(os.path.basename(job["output"]))[0],
+            "mappings": [{**m, "excel_id": excel_id} for m in job["mappings"]],
+            "img_left": options.img_left,
+            "img_top": options.img_top,
+            "img_width": options.img_width,
+            "img_height": options.img_height,
+            "profile": getattr(options, "profile", False),
+        }
+        return self._json(self._request("POST", "/api/jobs", json=body))["id"]
+
+    def follow(self, job_id: str, on_event=None) -> dict:
+        """Read the job's progress events until it finishes; return the final one.
+
+        *on_event* is called with each new event.  A dropped stream is
+        resumed from the last event seen.
+        """
+        seq = 0
+        while True:
+            last = seq
+            try:
+                with self.http.stream(
+                    "GET", f"/api/jobs/{job_id}/events", params={"after": seq}
+                ) as response:
+                    if response.status_code >= 400:
+                        response.read()
+                        self._json(response)
+                    for line in response.iter_lines():
+                        if not line:
+                            continue
+                        event = json.loads(line)
+                        if event["seq"] <= seq:
+                            continue  # keep-alive repeat
+                        seq = event["seq"]
+                        if on_event:
+                            on_event(event)
+                        if event["state"] in ("success", "error"):
+                            return event
+            except self._http_error as e:
+                logger.warning("Progress stream of job %s dropped: %s", job_id, e)
+            if seq == last:
+                raise ServerError(f"progress stream of job {job_id} ended early")
+
+    def download(self, url: str, path: str):
+        """Save the file at server *url* to *path* (replaced atomically)."""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        temp = path + ".part"
+        try:
+            with self.http.stream("GET", url) as response:
+                if response.status_code >= 400:
+                    response.read()
+                    self._json(response)
+                with open(temp, "wb") as f:
+                    for chunk in response.iter_bytes():
+                        f.write(chunk)
+            os.replace(temp, path)
+        except self._http_error as e:
+            raise ServerError(f"GET {url}: {e}") from e
+        finally:
+            if os.path.exists(temp):
+                os.remove(temp)
+
+
+def _print_remote_event(event: dict, last: dict):
+    """Print a progress event when its phase or count moved on."""
+    key = (event["phase"], event["done"])
+    if key == last.get("key") or event["state"] in ("success", "error"):
+        return
+    last["key"] = key
+    count = f"{event['done']}/{event['total']} " if event["phase"] in ("capture", "embed") else ""
+    print(f"  [{event['elapsed_ms'] / 1000:6.1f} s] {event['phase']:<13} {count}{event['item'] or ''}")
+
+
+def run_remote(jobs: list, server: str, client=None, verbose: bool = False) -> list:
+    """Run *jobs* on the server at *server*; return results like :func:`run_batch`.
+
+    All jobs are submitted before any is followed, so the server can run
+    them side by side; decks (and ``--profile`` reports) are downloaded to
+    each job's output path.
+    """
+    remote = ServerClient(server, client)
+    try:
+        submitted = []
+        for job in jobs:
+            start = time.perf_counter()
+            try:
+                excel_id, sent_excel = remote.upload(job["excel"], "excel")
+                template_id, sent_template = remote.upload(job["template"], "ppt")
+                if verbose:
+                    print(f"  Excel:    {os.path.basename(job['excel'])} "
+                          f"({'uploaded' if sent_excel else 'already on server'})")
+                    print(f"  Template: {os.path.basename(job['template'])} "
+                          f"({'uploaded' if sent_template else 'already on server'})")
+                submitted.append((job, remote.submit(job, excel_id, template_id), start))
+            except (OSError, ServerError) as e:
+                submitted.append((job, e, start))
+
+        results = []
+        for n, (job, ticket, start) in enumerate(submitted, 1):
+            result = {"excel": job["excel"], "output": job["output"], "items": len(job["mappings"])}
+            try:
+                if isinstance(ticket, Exception):
+                    raise ticket
+                last = {}
+                final = remote.follow(
+                    ticket, (lambda e: _print_remote_event(e, last)) if verbose else None
+                )
+                if final["state"] == "error":
+                    raise ServerError(final["error"])
+                outcome = final["result"]
+                remote.download(outcome["download_url"], job["output"])
+                if outcome.get("profile_url"):
+                    remote.download(
+                        outcome["profile_url"],
+                        os.path.splitext(job["output"])[0] + ".profile.folded",
+                    )
+                failed = [r["name"] for r in outcome["results"] if r["status"] != "success"]
+                result.update(
+                    status="failed" if failed else "ok",
+                    inserted=len(outcome["results"]) - len(failed),
+                    failed=failed,
+                    cached=outcome.get("cached", False),
+                )
+            except (OSError, ServerError) as e:
+                logger.error("Remote job %s failed: %s", job["excel"], e)
+                result.update(status="error", error=str(e), inserted=0,
+                              failed=[m["name"] for m in job["mappings"]])
+            result["seconds"] = round(time.perf_counter() - start, 2)
+            results.append(result)
+            if not verbose:
+                _print_progress(n, len(jobs), result)
+        return results
+    finally:
+        remote.close()
+
+
+def _single_job(excel_path, template_path, output_path, mappings, args) -> dict:
+    return {
+        "excel": excel_path, "template": template_path, "output": output_path,
+        "mappings": mappings, "options": args,
+    }
+
+
+def server_mode(args, job: Optional[dict] = None) -> int:
+    """Run one job (or the ``--batch`` / ``--excel-glob`` jobs) on ``--server``."""
+    if job is None:
+        try:
+            jobs = load_batch_jobs(args)
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}")
+            return 2
+        if not jobs:
+            print("Error: no jobs to run")
+            return 2
+        print(f"  Batch: {len(jobs)} report(s) on {args.server}")
+        start = time.perf_counter()
+        results = run_remote(jobs, args.server)
+        print_batch_summary(results, time.perf_counter() - start)
+        return 0 if all(r["status"] == "ok" for r in results) else 1
+
+    print(f"  Server: {args.server}")
+    result = run_remote([job], args.server, verbose=True)[0]
+    if result["status"] == "error":
+        print(f"Error: {result['error']}")
+        return 1
     print("\n" + "=" * 60)
-    print(f"  Done! Output: {output_path}")
+    print(f"  Done! Output: {result['output']}"
+          + (" (reused an identical server job)" if result["cached"] else ""))
+    if result["failed"]:
+        print(f"  Failed: {', '.join(result['failed'])}")
     print("=" * 60)
+    return 0 if result["status"] == "ok" else 1
+
+
+# ---------------------------------------------------------------------------
+# Watch mode
+# ---------------------------------------------------------------------------
+class DebouncedScanner:
+    """Report files whose size and mtime have settled after a change.
+
+    A save shows up as a new ``(mtime, size)`` signature; the file is
+    reported once that signature has held for *debounce* seconds, so the
+    several writes of one Excel save produce one regeneration.
+    """
+
+    def __init__(self, debounce: float):
+        self.debounce = debounce
+        self._seen = {}      # path -> signature already handled
+        self._pending = {}   # path -> (signature, first seen)
+
+    def poll(self, paths, now: float = None) -> list:
+        """Return the *paths* that changed and have since settled."""
+        now = time.monotonic() if now is None else now
+        settled = []
+        for path in paths:
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            signature = (st.st_mtime_ns, st.st_size)
+            if self._seen.get(path) == signature:
+                self._pending.pop(path, None)
+                continue
+            pending = self._pending.get(path)
+            if pending is None or pending[0] != signature:
+                self._pending[path] = (signature, now)
+            elif now - pending[1] >= self.debounce:
+                del self._pending[path]
+                self._seen[path] = signature
+                settled.append(path)
+        for path in set(self._seen).union(self._pending).difference(paths):
+            self._seen.pop(path, None)
+            self._pending.pop(path, None)
+        return settled
+
+    def forget(self, path: str):
+        """Treat *path* as unseen, so it is reported again once settled."""
+        self._seen.pop(path, None)
+
+
+def _digest_of(digests: dict, sel: dict):
+    return digests.get(sel["type"], {}).get(sel["name"])
+
+
+class WatchedReport:
+    """One deck kept in sync with its workbook.
+
+    Captures are kept between saves together with the digest of the sheet
+    parts they were taken from (:func:`app.utils.xlsx_inventory.sheet_digests`);
+    a save re-captures only the mappings whose parts changed and rebuilds
+    the deck from the template.
+    """
+
+    def __init__(self, job: dict, work_dir: str):
+        self.job = job
+        self.mappings = None  # mappings the deck was last built from (rules resolved)
+        self.digests = {}    # mapping name -> digest its capture was taken at
+        self.captures = {}   # capture key (see _capture_units) -> CaptureResult
+        self.capture_dir = tempfile.mkdtemp(prefix="_watch_", dir=work_dir)
+
+    def changed_mappings(self, mappings: list, digests: dict) -> list:
+        """Mappings with a capture missing, or whose sheet parts changed."""
+        changed, seen = [], set()
+        for sel in mappings:
+            keys = {key for key, _ in _capture_units(sel)}
+            if keys <= seen:
+                continue
+            if (
+                not keys <= self.captures.keys()
+                or self.digests.get(sel["name"]) != _digest_of(digests, sel)
+            ):
+                changed.append(sel)
+                seen |= keys
+        return changed
+
+    def refresh(self, excel_app, digests: dict) -> Optional[dict]:
+        """Re-capture what changed and rewrite the deck.
+
+        Pattern mappings are re-resolved first, so sheets added to the
+        workbook are picked up.
+
+        Returns:
+            ``{"recaptured": [names], "inserted": n, "failed": [names]}``, or
+            ``None`` when no mapped sheet changed.
+        """
+        from app.utils.phash import CaptureIndex
+
+        mappings = resolve_rules(self.job["excel"], self.job["template"], self.job["mappings"])
+        changed = self.changed_mappings(mappings, digests)
+        if not changed and mappings == self.mappings:
+            return None
+        self.mappings = mappings
+        for sel in changed:
+            for key, _ in _capture_units(sel):
+                old = self.captures.pop(key, None)
+                if old is not None:
+                    old.close()
+
+        options = self.job["options"]
+        say = print if getattr(options, "verbose", True) else (lambda *a, **k: None)
+        if changed:
+            # Unchanged captures stay in the index, so a stale paste of one
+            # of them is still recognized
+            index = CaptureIndex()
+            for name, capture in self.captures.items():
+                index.add(name, capture.phash())
+            fresh = _extract(excel_app, self.job["excel"], changed, self.capture_dir, say, index=index)
+            self.captures.update(fresh)
+            for sel in changed:
+                if any(key in fresh for key, _ in _capture_units(sel)):
+                    self.digests[sel["name"]] = _digest_of(digests, sel)
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.job["output"])), exist_ok=True)
+        inserted, failed = _insert_captures(
+            self.job["template"], self.job["output"], mappings, self.captures, options, say,
+        )
+        return {"recaptured": [sel["name"] for sel in changed],
+                "inserted": inserted, "failed": failed}
+
+    def close(self):
+        for capture in self.captures.values():
+            capture.close()
+        self.captures.clear()
+        shutil.rmtree(self.capture_dir, ignore_errors=True)
+
+
+class Watcher:
+    """Poll a folder and keep every workbook's deck up to date.
+
+    Jobs come from ``--batch`` (those whose workbook is inside the folder)
+    or from ``--config`` applied to every ``.xlsx`` / ``.xlsm`` in it; the
+    job list is re-read on every scan, so new workbooks are picked up.  On
+    first sight a deck newer than its workbook is left alone.
+    """
+
+    def __init__(self, args):
+        self.directory = os.path.abspath(args.watch)
+        self.args = argparse.Namespace(**vars(args))
+        if not self.args.batch and not self.args.excel_glob:
+            self.args.excel_glob = os.path.join(self.directory, "*.xls[xm]")
+        if not self.args.batch and not self.args.output_dir:
+            self.args.output_dir = self.directory
+        self.scanner = DebouncedScanner(args.debounce)
+        self.reports = {}  # workbook path -> WatchedReport
+        self.work_dir = tempfile.mkdtemp(prefix="_watch_captures_")
+
+    def _jobs(self) -> dict:
+        jobs = {}
+        for job in load_batch_jobs(self.args):
+            path = os.path.abspath(job["excel"])
+            if os.path.commonpath([self.directory, path]) == self.directory:
+                jobs[path] = job
+        return jobs
+
+    def poll(self) -> list:
+        """Scan once; regenerate the decks of workbooks that settled.
+
+        Returns:
+            One result per workbook processed (see :meth:`_refresh`).
+        """
+        try:
+            jobs = self._jobs()
+        except (OSError, ValueError) as e:
+            logger.warning("Watch: cannot load jobs: %s", e)
+            return []
+        for path in set(self.reports).difference(jobs):
+            self.reports.pop(path).close()
+
+        results = []
+        for path in self.scanner.poll(list(jobs)):
+            report = self.reports.get(path)
+            if report is None:
+                report = self.reports[path] = WatchedReport(jobs[path], self.work_dir)
+                output = jobs[path]["output"]
+                if os.path.exists(output) and os.path.getmtime(output) >= os.path.getmtime(path):
+                    continue
+            report.job = jobs[path]
+            results.append(self._refresh(path, report))
+        return results
+
+    def _refresh(self, path: str, report: WatchedReport) -> dict:
+        start = time.perf_counter()
+        result = {"excel": path, "output": report.job["output"], "status": "ok"}
+        try:
+            digests = sheet_digests(path)
+        except (OSError, ValueError) as e:  # still being written, or not a workbook
+            self.scanner.forget(path)
+            result.update(status="error", error=str(e))
+        else:
+            try:
+                outcome = report.refresh(_warm_excel(), digests)
+            except Exception as e:
+                logger.error("Watch: regenerating %s failed: %s", path, e, exc_info=True)
+                result.update(status="error", error=str(e))
+                _release_excel()  # Excel may be wedged; the next save starts a fresh one
+            else:
+                if outcome is None:
+                    result["status"] = "unchanged"
+                else:
+                    result.update(outcome, status="failed" if outcome["failed"] else "ok")
+        result["seconds"] = round(time.perf_counter() - start, 2)
+        _print_watch_result(result)
+        return result
+
+    def close(self):
+        for report in self.reports.values():
+            report.close()
+        self.reports.clear()
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+
+def _print_watch_result(result: dict):
+    stamp = time.strftime("%H:%M:%S")
+    name = os.path.basename(result["excel"])
+    if result["status"] == "unchanged":
+        print(f"  [{stamp}] {name}: no mapped sheet changed")
+    elif result["status"] == "error":
+        print(f"  [{stamp}] {name}: ERROR {result['error']}")
+    else:
+        line = (f"  [{stamp}] {name} -> {os.path.basename(result['output'])}: "
+                f"re-captured {len(result['recaptured'])}, inserted {result['inserted']} "
+                f"({result['seconds']:.1f} s)")
+        if result["failed"]:
+            line += f"; failed: {', '.join(result['failed'])}"
+        print(line)
+
+
+def watch_mode(args) -> int:
+    """Run ``--watch`` until interrupted; return the process exit code."""
+    if not os.path.isdir(args.watch):
+        print(f"Error: {args.watch} is not a directory")
+        return 2
+    if not args.batch and not args.config:
+        print("Error: --watch needs --config (or --batch) for the template and mappings")
+        return 2
+
+    watcher = Watcher(args)
+    print(f"  Watching {watcher.directory} (debounce {args.debounce:g} s) — Ctrl+C to stop")
+    try:
+        while True:
+            watcher.poll()
+            time.sleep(args.poll_interval)
+    except KeyboardInterrupt:
+        print("\n  Stopped.")
+    finally:
+        watcher.close()
+        _release_excel()
+    return 0
 
 
 def main():
     args = parse_args()
 
+    if args.watch:
+        if args.server:
+            print("Error: --watch runs locally and cannot be combined with --server")
+            sys.exit(2)
+        sys.exit(watch_mode(args))
+
+    if args.batch or args.excel_glob:
+        sys.exit(server_mode(args) if args.server else batch_mode(args))
+
     # Load config file if provided
     if args.config:
         cfg = load_config(args.config)
         excel_path = cfg.get("excel_file", args.excel)
         template_path = cfg.get("ppt_template", args.template)
         output_path = cfg.get("output_ppt", args.output)
-        mappings = [
-            {"name": m[0], "page": m[1], "type": m[2]}
-            for m in cfg.get("mappings", [])
-        ]
+        mappings = _parse_mappings(cfg.get("mappings", []))
 
         if not excel_path or not template_path or not output_path:
             print("Error: config must include excel_file, ppt_template, output_ppt")
             return
 
-        run_generation(excel_path, template_path, output_path, mappings, args)
+        if args.server:
+            sys.exit(server_mode(args, _single_job(excel_path, template_path, output_path, mappings, args)))
+        try:
+            run_generation(excel_path, template_path, output_path, mappings, args)
+        except ValueError as e:
+            print(f"Error: {e}")
         return
 
     # Validate required paths
@@ -270,13 +1248,19 @@ def main():
 
     mappings = []
     for m in args.map:
-        parts = m.split(":")
+        # Split from the right: selectors such as "glob:Data *" contain ':'
+        parts = m.rsplit(":", 2)
         if len(parts) != 3:
             print(f"Error: invalid mapping format '{m}'. Use 'name:page:type'")
             return
-        mappings.append({"name": parts[0], "page": int(parts[1]), "type": parts[2]})
-
-    run_generation(args.excel, args.template, output, mappings, args)
+        mappings.extend(_parse_mappings([parts]))
+
+    if args.server:
+        sys.exit(server_mode(args, _single_job(args.excel, args.template, output, mappings, args)))
+    try:
+        run_generation(args.excel, args.template, output, mappings, args)
+    except ValueError as e:
+        print(f"Error: {e}")
 
 
 if __name__ == "__main__":
@@ -9,12 +9,37 @@ Tests cover:
 5. File manager operations
 6. PPT service helpers
 7. FastAPI app routes (TestClient)
+8. Batch generation
+9. Streaming download
+10. Image optimization
+11. Dry-run planning
+12. Idempotent generate
+13. In-memory capture buffers
+14. Stale clipboard capture detection
+15. Stage timings and /api/metrics
+16. On-demand profiling
+17. Trace spans
+18. Instrumented COM proxy
+19. Learned capture-strategy order
+20. COM-free backend and benchmark corpus
+21. HTTP load test
+22. Per-job memory accounting
+23. CLI batch mode
+24. CLI watch mode
+25. Pattern-based mappings
+26. COM-free workbook inventory
+27. CLI server client mode
+28. CLI capture cache
+29. Multi-chart capture
+30. Template placeholder filling
+31. Streaming chart extraction
 """
 import os
 import sys
 import time
 import tempfile
 import shutil
+from pathlib import Path
 
 # Ensure project root is on the path
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -41,6 +66,19 @@ def test(name):
     return decorator
 
 
+# =====================================================================
+# Test environment
+# =====================================================================
+# Keep learned strategies and cached captures out of the real data/ directory
+# (read by app.config at import, so set before the first app import)
+os.environ["EXCEL2PPT_DATA_DIR"] = tempfile.mkdtemp()
+
+# Keep trace spans written by the tests out of the working tree
+from app.utils import tracing as _tracing
+_TRACE_FILE = Path(tempfile.mkdtemp()) / "trace.jsonl"
+_tracing.configure(path=_TRACE_FILE)
+
+
 # =====================================================================
 # 1. Module imports
 # =====================================================================
@@ -217,6 +255,52 @@ def _():
     assert result is False
 
 
+def _make_valid_chart_png(path, size=(400, 300), seed=0):
+    """Write a 12-bar chart PNG with enough gray levels to pass validate_image."""
+    from PIL import Image, ImageDraw
+    img = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(img)
+    w, h = size
+    for i in range(12):
+        bar_h = int(h * (0.2 + 0.05 * ((i + seed) % 13)))
+        x0 = 20 + i * (w - 40) // 12
+        draw.rectangle([x0, h - bar_h, x0 + (w - 40) // 16, h - 10],
+                       fill=(20 * i, 120, 240 - 15 * i))
+    draw.line([15, 10, 15, h - 10], fill="black", width=2)
+    img.save(path)
+    return path
+
+@test("analyze_image matches per-pixel statistics")
+def _():
+    import statistics
+    from PIL import Image
+    from app.utils.image_validator import analyze_image
+    tmp = tempfile.mkdtemp()
+    try:
+        path = _make_valid_chart_png(os.path.join(tmp, "c.png"), size=(120, 80))
+        with Image.open(path) as img:
+            pixels = list(img.convert("L").getdata())
+            unique, stdev = analyze_image(img, max_pixels=0)
+        assert unique == len(set(pixels))
+        assert abs(stdev - statistics.stdev(pixels)) < 1e-6
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+@test("validate_image: large captures are subsampled and still classified")
+def _():
+    from PIL import Image
+    from app.utils.image_validator import validate_image
+    tmp = tempfile.mkdtemp()
+    try:
+        chart = _make_valid_chart_png(os.path.join(tmp, "chart.png"), size=(3000, 1800))
+        blank = os.path.join(tmp, "blank.png")
+        Image.new("RGB", (3000, 1800), (250, 250, 250)).save(blank)
+        assert validate_image(chart) is True
+        assert validate_image(blank, min_size=1) is False
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
 # =====================================================================
 # 5. File manager
 # =====================================================================
@@ -408,6 +492,2401 @@ def _():
     assert resp.status_code == 404
 
 
+# =====================================================================
+# Shared fixtures for the sections below
+# =====================================================================
+def _make_template(path, titles):
+    """Write a .pptx with one titled slide per entry in *titles*."""
+    from pptx import Presentation
+    prs = Presentation()
+    for title in titles:
+        slide = prs.slides.add_slide(prs.slide_layouts[5])  # Title Only
+        slide.shapes.title.text = title
+    prs.save(path)
+    return path
+
+
+def _make_chart_png(path, size=(400, 300), seed=0):
+    """Write a chart-like PNG (bars on a white background)."""
+    from PIL import Image, ImageDraw
+    img = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(img)
+    w, h = size
+    for i in range(6):
+        bar_h = int(h * (0.2 + 0.1 * ((i + seed) % 7)))
+        x0 = 20 + i * (w - 40) // 6
+        draw.rectangle([x0, h - bar_h, x0 + (w - 40) // 8, h - 10],
+                       fill=(40 * i % 256, 120, 200 - 20 * i))
+    draw.line([15, 10, 15, h - 10], fill="black", width=2)
+    img.save(path)
+    return path
+
+
+# =====================================================================
+# 8. Batch generation
+# =====================================================================
+print("\n=== 8. Batch Generation Tests ===")
+
+@test("GenerateBatchRequest requires at least one output")
+def _():
+    from pydantic import ValidationError
+    from app.models.schemas import GenerateBatchRequest
+    try:
+        GenerateBatchRequest(template_id="t", outputs=[])
+    except ValidationError:
+        return
+    raise AssertionError("empty outputs accepted")
+
+@test("generate_batch captures shared items once and builds every deck")
+def _():
+    from pptx import Presentation
+    from app.models.schemas import GenerateBatchRequest
+    from app.utils.capture_result import CaptureResult
+    import app.services.batch_service as batch_service
+
+    tmp = tempfile.mkdtemp()
+    try:
+        template = _make_template(os.path.join(tmp, "tpl.pptx"), ["Cover", "Mesh Backhaul DL"])
+        captured = []
+
+        def fake_capture(mappings, job_dir, uploaded_files):
+            keys = {f"{m.excel_id}|{m.name}" for m in mappings}
+            captured.append(keys)
+            return {
+                k: CaptureResult.from_file(_make_chart_png(os.path.join(tmp, f"{i}.png"), seed=i))
+                for i, k in enumerate(sorted(keys))
+            }
+
+        request = GenerateBatchRequest(template_id="tpl", outputs=[
+            {"output_name": f"DUT{i}", "mappings": [
+                {"excel_id": "e1", "name": "Shared", "page": 2, "type": "chartsheet"},
+                {"excel_id": "e1", "name": f"Only{i}", "page": 1, "type": "worksheet"},
+            ]} for i in range(3)
+        ])
+        uploaded = {"e1": {"path": "x.xlsx", "filename": "x.xlsx"}}
+        original = batch_service.capture_image_mappings
+        batch_service.capture_image_mappings = fake_capture
+        try:
+            outputs = batch_service.generate_batch(request, template, uploaded, Path(tmp))
+        finally:
+            batch_service.capture_image_mappings = original
+
+        assert len(captured) == 1
+        assert captured[0] == {"e1|Shared", "e1|Only0", "e1|Only1", "e1|Only2"}
+        assert [o["status"] for o in outputs] == ["success"] * 3
+        for out in outputs:
+            prs = Presentation(out["output_file"])
+            assert sum(len(s.shapes) for s in prs.slides) == 4  # 2 titles + 2 pictures
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+@test("generate_batch: a failed embedded step fails its deck with its own code")
+def _():
+    from app.models.schemas import GenerateBatchRequest
+    import app.services.batch_service as batch_service
+
+    def broken_embedded(*args):
+        raise OSError("PowerPoint is not installed")
+
+    tmp = tempfile.mkdtemp()
+    original = batch_service.process_embedded_mappings
+    try:
+        template = _make_template(os.path.join(tmp, "tpl.pptx"), ["A"])
+        request = GenerateBatchRequest(template_id="tpl", outputs=[
+            {"output_name": "DUT", "mappings": [
+                {"excel_id": "e1", "name": "Chart", "page": 1, "type": "chartsheet",
+                 "chart_mode": "embedded"},
+            ]},
+        ])
+        batch_service.process_embedded_mappings = broken_embedded
+        outputs = batch_service.generate_batch(
+            request, template, {"e1": {"path": "x.xlsx", "filename": "x.xlsx"}}, Path(tmp)
+        )
+        assert outputs[0]["status"] == "failed" and outputs[0]["code"] == "embedded_failed"
+    finally:
+        batch_service.process_embedded_mappings = original
+        shutil.rmtree(tmp, ignore_errors=True)
+
+@test("write_batch_archive bundles successful decks only")
+def _():
+    import zipfile
+    from app.services.batch_service import write_batch_archive
+    tmp = tempfile.mkdtemp()
+    try:
+        ok = _make_template(os.path.join(tmp, "A.pptx"), ["A"])
+        outputs = [
+            {"status": "success", "output_file": ok},
+            {"status": "failed", "reason": "x", "results": []},
+        ]
+        archive = write_batch_archive(outputs, Path(tmp) / "batch.zip")
+        with zipfile.ZipFile(archive) as zf:
+            assert zf.namelist() == ["A.pptx"]
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+@test("TestClient: POST /api/generate-batch with bad template_id returns 404")
+def _():
+    from fastapi.testclient import TestClient
+    from app.main import app
+    client = TestClient(app)
+    resp = client.post("/api/generate-batch", json={
+        "template_id": "nonexistent",
+        "outputs": [{"output_name": "a", "mappings": []}],
+    })
+    assert resp.status_code == 404
+
+
+@test("TestClient: generate-batch reports partial / failed decks and counts them")
+def _():
+    from fastapi.testclient import TestClient
+    from app.main import app
+    import app.services.batch_service as batch_service
+    from app.services.file_manager import file_manager
+    from app.services.ppt_service import get_ppt_info
+    from app.config import OUTPUT_DIR
+    from app.utils.metrics import BATCH_DECKS, JOBS, MAPPING_FAILURES
+    tmp = tempfile.mkdtemp()
+    original = batch_service._build_deck
+
+    def build_deck(spec, *args):
+        if spec.output_name.startswith("bad"):
+            raise OSError("disk full")
+        return original(spec, *args)
+
+    try:
+        tpl = _make_template(os.path.join(tmp, "t.pptx"), ["A"])
+        file_manager.register("b_tpl", "ppt", tpl, "t.pptx", metadata=get_ppt_info(tpl))
+        batch_service._build_deck = build_deck
+        client = TestClient(app)
+        built = BATCH_DECKS.value(outcome="success")
+        failures = BATCH_DECKS.value(outcome="deck_failed")
+        mapping_failures = MAPPING_FAILURES.value(reason="deck_failed")
+        partial = JOBS.value(endpoint="generate_batch", status="partial")
+        failed = JOBS.value(endpoint="generate_batch", status="failed")
+        for names, status in ((["good", "bad1"], "partial"), (["bad1", "bad2"], "failed")):
+            data = client.post("/api/generate-batch", json={
+                "template_id": "b_tpl",
+                "outputs": [{"output_name": n, "mappings": []} for n in names],
+            }).json()
+            shutil.rmtree(OUTPUT_DIR / data["job_id"], ignore_errors=True)
+            assert data["status"] == status, data
+            assert [o["status"] for o in data["outputs"]] == [
+                "failed" if n.startswith("bad") else "success" for n in names
+            ]
+        assert BATCH_DECKS.value(outcome="success") == built + 1
+        assert BATCH_DECKS.value(outcome="deck_failed") == failures + 3
+        assert MAPPING_FAILURES.value(reason="deck_failed") == mapping_failures  # per-mapping only
+        assert JOBS.value(endpoint="generate_batch", status="partial") == partial + 1
+        assert JOBS.value(endpoint="generate_batch", status="failed") == failed + 1
+    finally:
+        batch_service._build_deck = original
+        file_manager._files.pop("b_tpl", None)
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+# =====================================================================
+# 9. Streaming download
+# =====================================================================
+print("\n=== 9. Streaming Download Tests ===")
+
+@test("iter_presentation yields a complete package and keeps a copy")
+def _():
+    import io
+    from pptx import Presentation
+    from app.utils.pptx_stream import iter_presentation
+    tmp = tempfile.mkdtemp()
+    try:
+        template = _make_template(os.path.join(tmp, "tpl.pptx"), ["A", "B", "C"])
+        keep = Path(tmp) / "kept.pptx"
+        chunks = list(iter_presentation(Presentation(template), tee_path=keep, chunk_size=4096))
+        assert len(chunks) > 1
+        data = b"".join(chunks)
+        assert len(Presentation(io.BytesIO(data)).slides) == 3
+        assert keep.read_bytes() == data
+        assert not Path(f"{keep}.part").exists()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+@test("iter_presentation: abandoned stream leaves no partial copy")
+def _():
+    from pptx import Presentation
+    from app.utils.pptx_stream import iter_presentation
+    tmp = tempfile.mkdtemp()
+    try:
+        template = _make_template(os.path.join(tmp, "tpl.pptx"), ["A"] * 20)
+        keep = Path(tmp) / "kept.pptx"
+        stream = iter_presentation(Presentation(template), tee_path=keep, chunk_size=1024)
+        next(stream)
+        stream.close()
+        deadline = time.time() + 5
+        while Path(f"{keep}.part").exists() and time.time() < deadline:
+            time.sleep(0.05)
+        assert not keep.exists()
+        assert not Path(f"{keep}.part").exists()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+@test("TestClient: a streamed generate is finished only once its body has been sent")
+def _():
+    from types import SimpleNamespace
+    from fastapi.testclient import TestClient
+    from app.main import app
+    import app.routers.api as api
+    import app.services.excel_service as excel_service
+    import app.utils.metrics as metrics
+    from app.services.file_manager import file_manager
+    from app.config import OUTPUT_DIR
+    from benchmarks.corpus import build_corpus
+    tmp = tempfile.mkdtemp()
+    backend = excel_service.com_backend()
+    excel_service.use_com_backend("fake")
+    real_iter, real_seconds = api.iter_presentation, metrics.JOB_SECONDS
+    observed = []
+    metrics.JOB_SECONDS = SimpleNamespace(observe=lambda seconds, **labels: observed.append(seconds))
+    client = TestClient(app)
+    ids = []
+
+    def slow_stream(prs, tee_path=None):
+        chunks = real_iter(prs, tee_path=tee_path)
+        def body():
+            yield from chunks
+            time.sleep(0.3)
+        return body()
+
+    def broken_stream(prs, tee_path=None):
+        chunks = real_iter(prs, tee_path=tee_path)
+        def body():
+            yield next(chunks)
+            raise RuntimeError("disk full")
+        return body()
+
+    try:
+        corpus = build_corpus(tmp, "small", data_sheets=0)
+        for kind, path in (("ppt", corpus["template"]), ("excel", corpus["excel"])):
+            with open(path, "rb") as f:
+                resp = client.post(f"/api/upload-{kind}", files={"file": (os.path.basename(path), f.read(), "application/octet-stream")})
+            ids.append(resp.json()["file_id"])
+        body = {
+            "template_id": ids[0], "output_name": "streamed", "stream": True, "memory": True,
+            "mappings": [{"excel_id": ids[1], "name": i["name"], "type": i["type"], "page": 1}
+                         for i in corpus["items"]],
+        }
+        success = metrics.JOBS.value(endpoint="generate", status="success")
+        errors = metrics.JOBS.value(endpoint="generate", status="error")
+
+        api.iter_presentation = slow_stream
+        resp = client.post("/api/generate", json=body)
+        assert resp.status_code == 200 and resp.content[:2] == b"PK"
+        assert metrics.JOBS.value(endpoint="generate", status="success") == success + 1
+        assert observed and observed[-1] >= 0.3
+        memory = client.get(resp.headers["X-Memory-Url"]).json()
+        assert memory["traced_peak_bytes"] > 0 and memory["pptx_package"]["parts"] > 0
+        shutil.rmtree(OUTPUT_DIR / resp.headers["X-Job-Id"], ignore_errors=True)
+
+        api.iter_presentation = broken_stream
+        job_dirs = set(OUTPUT_DIR.iterdir())
+        try:
+            client.post("/api/generate", json=body)
+            assert False, "stream error should reach the client"
+        except RuntimeError as e:
+            assert "disk full" in str(e)
+        assert metrics.JOBS.value(endpoint="generate", status="success") == success + 1
+        assert metrics.JOBS.value(endpoint="generate", status="error") == errors + 1
+        assert len(observed) == 2
+        for job_dir in set(OUTPUT_DIR.iterdir()) - job_dirs:
+            shutil.rmtree(job_dir, ignore_errors=True)
+    finally:
+        api.iter_presentation, metrics.JOB_SECONDS = real_iter, real_seconds
+        for file_id in ids:
+            file_manager.remove(file_id)
+        excel_service.use_com_backend(backend)
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+# =====================================================================
+# 10. Image optimization
+# =====================================================================
+print("\n=== 10. Image Optimization Tests ===")
+
+@test("optimize_image_bytes downsamples to the placement box at target DPI")
+def _():
+    import io
+    from PIL import Image
+    from app.utils.image_optimizer import optimize_image_bytes
+    tmp = tempfile.mkdtemp()
+    try:
+        path = _make_chart_png(os.path.join(tmp, "big.png"), size=(3000, 1800))
+        data = open(path, "rb").read()
+        out = optimize_image_bytes(data, 4.0, 2.0, target_dpi=100)
+        assert len(out) < len(data)
+        with Image.open(io.BytesIO(out)) as img:
+            assert img.width >= 400 and img.height >= 200
+            assert img.width < 3000
+            assert img.mode == "P"  # flat chart is palettized
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+@test("optimize_image_bytes keeps flat images pixel-exact when not resized")
+def _():
+    import io
+    from PIL import Image
+    from app.utils.image_optimizer import optimize_image_bytes
+    tmp = tempfile.mkdtemp()
+    try:
+        path = _make_chart_png(os.path.join(tmp, "small.png"), size=(300, 200))
+        data = open(path, "rb").read()
+        out = optimize_image_bytes(data, 12.0, 5.6)
+        with Image.open(io.BytesIO(data)) as a, Image.open(io.BytesIO(out)) as b:
+            assert a.size == b.size
+            assert list(a.convert("RGB").getdata()) == list(b.convert("RGB").getdata())
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+@test("collect_placement_boxes keeps the largest box per capture")
+def _():
+    from app.models.schemas import GenerateRequest
+    from app.services.ppt_service import collect_placement_boxes
+    from app.config import MESH_FRONTHAUL_LAYOUT
+    req = GenerateRequest(template_id="t", output_name="o", mappings=[
+        {"excel_id": "e", "name": "A", "page": 1, "type": "worksheet"},
+        {"excel_id": "e", "name": "A", "page": 2, "type": "worksheet"},
+        {"excel_id": "e", "name": "B", "page": 1, "type": "worksheet"},
+    ], img_width=6.0, img_height=3.0)
+    boxes = collect_placement_boxes(
+        req.mappings, req, {"e|A": "a.png"}, {1: "Summary", 2: "Mesh Fronthaul"}
+    )
+    assert boxes == {"e|A": (MESH_FRONTHAUL_LAYOUT["width"], MESH_FRONTHAUL_LAYOUT["height"])}
+
+
+# =====================================================================
+# 11. Dry-run planning
+# =====================================================================
+print("\n=== 11. Dry-run Planning Tests ===")
+
+_PLAN_EXCEL = {
+    "type": "excel", "path": "/tmp/x.xlsx", "filename": "x.xlsx",
+    "metadata": {
+        "worksheets": [
+            {"name": "Metric", "type": "worksheet", "has_charts": True, "chart_count": 2},
+            {"name": "Raw", "type": "worksheet", "has_charts": False, "chart_count": 0},
+        ],
+        "chartsheets": [{"name": "BI", "type": "chartsheet"}],
+    },
+}
+_PLAN_TEMPLATE = {
+    "type": "ppt", "path": "/tmp/t.pptx", "filename": "t.pptx",
+    "metadata": {
+        "total_slides": 3, "width": 13.333, "height": 7.5,
+        "slides": [{"page": 1, "title": "Cover"}, {"page": 2, "title": "Mesh Backhaul"},
+                   {"page": 3, "title": "Summary"}],
+    },
+}
+
+@test("plan_generate reports page, item, type and chart-presence errors")
+def _():
+    from app.models.schemas import GenerateRequest
+    from app.services.plan_service import plan_generate
+    req = GenerateRequest(template_id="t", output_name="o", mappings=[
+        {"excel_id": "e", "name": "metric", "page": 2, "type": "worksheet"},
+        {"excel_id": "e", "name": "BI", "page": 9, "type": "chartsheet"},
+        {"excel_id": "e", "name": "Nope", "page": 1, "type": "worksheet"},
+        {"excel_id": "e", "name": "BI", "page": 1, "type": "worksheet"},
+        {"excel_id": "e", "name": "Raw", "page": 3, "type": "worksheet", "chart_mode": "embedded"},
+        {"excel_id": "gone", "name": "Raw", "page": 3, "type": "worksheet"},
+    ])
+    plan = plan_generate(req, _PLAN_TEMPLATE, {"e": _PLAN_EXCEL, "gone": None})
+    errs = [e["errors"] for e in plan["mappings"]]
+    assert plan["valid"] is False
+    assert errs[0] == []
+    assert plan["mappings"][0]["strategy"] == "capture_worksheet_chart"
+    assert errs[1] == ["第 9 頁不存在"]
+    assert errs[2] == ["找不到項目: Nope"]
+    assert "chartsheet" in errs[3][0]
+    assert errs[4] == ["工作表中沒有圖表"]
+    assert errs[5] == ["Excel 檔案不存在: gone"]
+
+@test("plan_generate estimates cost, reuses captures and flags overlaps")
+def _():
+    from app.models.schemas import GenerateRequest
+    from app.services.plan_service import plan_generate
+    from app.config import PLAN_COST_MS
+    req = GenerateRequest(template_id="t", output_name="o", mappings=[
+        {"excel_id": "e", "name": "BI", "page": 1, "type": "chartsheet"},
+        {"excel_id": "e", "name": "BI", "page": 3, "type": "chartsheet"},
+        {"excel_id": "e", "name": "Raw", "page": 3, "type": "worksheet"},
+    ])
+    plan = plan_generate(req, _PLAN_TEMPLATE, {"e": _PLAN_EXCEL})
+    assert plan["valid"] is True
+    first, second, third = plan["mappings"]
+    assert first["strategy"] == "capture_chartsheet"
+    assert second["strategy"] == "reuse"
+    assert second["estimated_ms"] < first["estimated_ms"]
+    assert third["strategy"] == "capture_worksheet_range"
+    assert any("重疊" in w for w in plan["warnings"])
+    assert plan["estimated_total_ms"] == sum(s["estimated_ms"] for s in plan["steps"])
+    assert [s["step"] for s in plan["steps"]].count("workbook_open") == 1
+    assert plan["estimated_total_ms"] >= PLAN_COST_MS["excel_start"]
+
+@test("TestClient: POST /api/plan with unknown files returns an invalid plan")
+def _():
+    from fastapi.testclient import TestClient
+    from app.main import app
+    client = TestClient(app)
+    resp = client.post("/api/plan", json={
+        "template_id": "nonexistent", "output_name": "x",
+        "mappings": [{"excel_id": "nope", "name": "S", "page": 1, "type": "worksheet"}],
+    })
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["valid"] is False
+    assert data["errors"] and data["mappings"][0]["errors"]
+
+# =====================================================================
+# 12. Idempotent generate
+# =====================================================================
+print("\n=== 12. Idempotent Generate Tests ===")
+
+@test("request_fingerprint depends on content, not upload IDs or delivery")
+def _():
+    from app.models.schemas import GenerateRequest
+    from app.services.result_cache import request_fingerprint
+
+    def req(tpl, xls, **kw):
+        return GenerateRequest(template_id=tpl, output_name="R", mappings=[
+            {"excel_id": xls, "name": "S", "page": 1, "type": "worksheet"}], **kw)
+
+    a = request_fingerprint(req("t1", "e1"), {"t1": "T", "e1": "E"})
+    b = request_fingerprint(req("t2", "e2", stream=True), {"t2": "T", "e2": "E"})
+    c = request_fingerprint(req("t1", "e1"), {"t1": "T", "e1": "E2"})
+    d = request_fingerprint(req("t1", "e1", img_left=1.0), {"t1": "T", "e1": "E"})
+    assert a == b
+    assert a != c and a != d
+
+@test("ResultCache runs concurrent identical jobs once (single-flight)")
+def _():
+    import threading
+    from app.services.result_cache import ResultCache
+    cache = ResultCache()
+    calls = []
+
+    def job():
+        calls.append(1)
+        time.sleep(0.2)
+        return {"job_id": "j1"}
+
+    out = []
+    threads = [threading.Thread(target=lambda: out.append(cache.run("k", job))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert sorted(reused for _, reused in out) == [False, True, True, True, True]
+    assert cache.run("k", job) == ({"job_id": "j1"}, True)
+
+@test("ResultCache reruns invalid or unstored results and shares errors")
+def _():
+    from app.services.result_cache import ResultCache
+    cache = ResultCache()
+    cache.run("a", lambda: {"n": 1})
+    assert cache.run("a", lambda: {"n": 2}, is_valid=lambda r: False) == ({"n": 2}, False)
+    cache.run("b", lambda: {"n": 1}, should_store=lambda r: False)
+    assert cache.run("b", lambda: {"n": 3}) == ({"n": 3}, False)
+
+    def boom():
+        raise ValueError("x")
+    try:
+        cache.run("c", boom)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("error swallowed")
+    assert cache.run("c", lambda: {"n": 4}) == ({"n": 4}, False)
+
+@test("FileManager.content_hash hashes once and tolerates missing files")
+def _():
+    import hashlib
+    from app.services.file_manager import FileManager
+    fm = FileManager()
+    tmp = tempfile.NamedTemporaryFile(delete=False)
+    tmp.write(b"payload")
+    tmp.close()
+    try:
+        fm.register("h", "excel", tmp.name, "h.xlsx")
+        assert fm.content_hash("h") == hashlib.sha256(b"payload").hexdigest()
+        assert fm.get("h")["sha256"] == hashlib.sha256(b"payload").hexdigest()
+        fm.register("m", "excel", "/nonexistent/file.xlsx", "m.xlsx")
+        assert fm.content_hash("m") is None
+        assert fm.content_hash("unknown") is None
+    finally:
+        os.unlink(tmp.name)
+
+
+# =====================================================================
+# 13. In-memory capture buffers
+# =====================================================================
+print("\n=== 13. In-memory Capture Buffer Tests ===")
+
+@test("CaptureResult reads once; validation, optimization and insertion stay in memory")
+def _():
+    from pptx import Presentation
+    from pptx.util import Inches
+    from app.utils.capture_result import CaptureResult
+    from app.utils.image_validator import validate_capture
+    from app.utils.image_optimizer import optimize_images
+    tmp = tempfile.mkdtemp()
+    try:
+        png = _make_valid_chart_png(os.path.join(tmp, "c.png"), size=(2400, 1200))
+        capture = CaptureResult.from_file(png)
+        os.unlink(png)  # nothing below may go back to disk
+        assert validate_capture(capture) is True
+        width, height, _unique, _stdev = capture.stats()
+        assert (width, height) == (2400, 1200)
+        before = capture.size
+        optimize_images([(capture, 4.0, 2.0)], target_dpi=100)
+        assert capture.size < before
+        prs = Presentation(_make_template(os.path.join(tmp, "t.pptx"), ["A"]))
+        pic = prs.slides[0].shapes.add_picture(
+            capture.open(), Inches(1), Inches(1), width=Inches(4), height=Inches(2))
+        assert pic.image.size[0] < 2400
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+@test("CaptureResult memory-maps large files with independent readers")
+def _():
+    import mmap
+    from PIL import Image
+    from app.utils.capture_result import CaptureResult
+    tmp = tempfile.mkdtemp()
+    try:
+        png = _make_chart_png(os.path.join(tmp, "c.png"))
+        capture = CaptureResult.from_file(png, mmap_threshold=1)
+        assert isinstance(capture.data, mmap.mmap)
+        a, b = capture.open(), capture.open()
+        assert a.read(8) == b"\x89PNG\r\n\x1a\n"
+        assert b.tell() == 0
+        with Image.open(b) as img:
+            assert img.size == (400, 300)
+        a.close()
+        b.close()
+        capture.close()
+        assert capture.data.closed
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+@test("validate_capture rejects blank and undersized captures")
+def _():
+    import io
+    from PIL import Image
+    from app.utils.capture_result import CaptureResult
+    from app.utils.image_validator import validate_capture
+    buf = io.BytesIO()
+    Image.new("RGB", (300, 300), "white").save(buf, format="PNG")
+    assert validate_capture(CaptureResult(buf.getvalue()), min_size=1) is False
+    assert validate_capture(CaptureResult(b"x" * 10)) is False
+
+
+# =====================================================================
+# 14. Stale clipboard capture detection
+# =====================================================================
+print("\n=== 14. Stale Capture Detection Tests ===")
+
+@test("dhash is stable across re-encoding and differs between charts")
+def _():
+    import io
+    from PIL import Image
+    from app.utils.phash import dhash
+    tmp = tempfile.mkdtemp()
+    try:
+        a = _make_valid_chart_png(os.path.join(tmp, "a.png"), seed=1)
+        b = _make_valid_chart_png(os.path.join(tmp, "b.png"), seed=2)
+        with Image.open(a) as img:
+            h_a = dhash(img)
+            buf = io.BytesIO()
+            img.resize((200, 150)).save(buf, format="PNG")
+        with Image.open(buf) as small:
+            assert dhash(small) == h_a
+        with Image.open(b) as img:
+            assert dhash(img) != h_a
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+@test("capture_item_result re-pastes a stale clipboard capture and records it as a failure")
+def _():
+    from types import SimpleNamespace as NS
+    from PIL import Image
+    import app.services.excel_service as excel_service
+    from app.services.capture_strategy import StrategyLearner
+    from app.utils.phash import CaptureIndex, stale_capture_stats
+    tmp = tempfile.mkdtemp()
+    first = _make_valid_chart_png(os.path.join(tmp, "first.png"), seed=1)
+    second = _make_valid_chart_png(os.path.join(tmp, "second.png"), seed=2)
+    blank = os.path.join(tmp, "blank.png")
+    Image.new("RGB", (400, 300), "white").save(blank)
+    pastes, exports = [], []
+
+    def export_blank(path, fmt):
+        exports.append(path)
+        shutil.copy(blank, path)
+
+    chart_sheet = NS(Export=export_blank, ChartArea=NS(CopyPicture=lambda Appearance, Format: None))
+    temp_sheet = NS(Paste=lambda: None, Delete=lambda: None,
+                    Export=lambda path, fmt: shutil.copy(pastes.pop(0), path))
+
+    class Charts:
+        Add = staticmethod(lambda: temp_sheet)
+
+        def __call__(self, name):
+            return chart_sheet
+
+    workbook = NS(Charts=Charts())
+    original = (excel_service.strategy_learner, excel_service.COM_RETRY_DELAY,
+                excel_service.COM_CLIPBOARD_DELAY)
+    learner = StrategyLearner(Path(tmp) / "s.json", explore_every=0)
+    excel_service.strategy_learner = learner
+    excel_service.COM_RETRY_DELAY = excel_service.COM_CLIPBOARD_DELAY = 0
+    try:
+        before = stale_capture_stats.snapshot()
+        index = CaptureIndex()
+
+        def capture(name):
+            return excel_service.capture_item_result(
+                NS(), workbook, name, "chartsheet", os.path.join(tmp, f"{name}.png"),
+                index=index, key=f"x|{name}", fingerprint="fp",
+            )
+
+        pastes[:] = [first]
+        a = capture("A")
+        pastes[:] = [first, first, second]  # the clipboard lags behind
+        b = capture("B")
+        assert a.stale_of is None and b.stale_of is None and not pastes
+        assert a.phash() != b.phash()
+        assert len(exports) == 1  # only the paste was repeated, not the direct export
+        after = stale_capture_stats.snapshot()
+        assert after["stale"] - before["stale"] == 2
+        assert after["recovered"] - before["recovered"] == 1
+
+        pastes[:] = [first] * 3
+        c = capture("C")
+        assert c.stale_of == "x|A" and c.strategy == "copypicture"
+        assert learner.snapshot()["fp|chartsheet"] == {"export": [0, 1], "copypicture": [2, 1]}
+    finally:
+        (excel_service.strategy_learner, excel_service.COM_RETRY_DELAY,
+         excel_service.COM_CLIPBOARD_DELAY) = original
+        shutil.rmtree(tmp, ignore_errors=True)
+
+@test("A capture that stays stale is flagged and never inserted")
+def _():
+    from pptx import Presentation
+    from app.models.schemas import GenerateRequest
+    from app.services.ppt_service import insert_image_mappings
+    from app.utils.capture_result import CaptureResult
+    tmp = tempfile.mkdtemp()
+    try:
+        png = _make_chart_png(os.path.join(tmp, "c.png"))
+        prs = Presentation(_make_template(os.path.join(tmp, "t.pptx"), ["A", "B"]))
+        request = GenerateRequest(template_id="t", output_name="out", mappings=[
+            {"excel_id": "x", "name": "A", "page": 1, "type": "worksheet"},
+            {"excel_id": "x", "name": "B", "page": 2, "type": "worksheet"},
+        ])
+        stale = CaptureResult.from_file(png)
+        stale.stale_of = "x|A"
+        extracted = {"x|A": CaptureResult.from_file(png), "x|B": stale}
+        results = insert_image_mappings(
+            request.mappings, prs, request, extracted, {},
+            {"x": {"filename": "x.xlsx"}},
+        )
+        assert [r["status"] for r in results] == ["success", "failed"]
+        assert "A" in results[1]["reason"]
+        assert len(prs.slides[1].shapes) == 1  # only the title
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+# =====================================================================
+# 15. Stage timings and /api/metrics
+# =====================================================================
+print("\n=== 15. Metrics Tests ===")
+
+@test("MetricsRegistry renders counters and cumulative histograms")
+def _():
+    from app.utils.metrics import MetricsRegistry
+    reg = MetricsRegistry()
+    c = reg.counter("t_total", "Test counter.", ["reason"])
+    h = reg.histogram("t_seconds", "Test histogram.", ["stage"], buckets=(0.1, 1))
+    c.inc(reason='say "hi"')
+    c.inc(2, reason='say "hi"')
+    for v in (0.05, 0.5, 5):
+        h.observe(v, stage="x")
+    text = reg.render()
+    assert '# TYPE t_total counter' in text
+    assert 't_total{reason="say \\"hi\\""} 3' in text
+    assert 't_seconds_bucket{stage="x",le="0.1"} 1' in text
+    assert 't_seconds_bucket{stage="x",le="1"} 2' in text
+    assert 't_seconds_bucket{stage="x",le="+Inf"} 3' in text
+    assert 't_seconds_count{stage="x"} 3' in text
+
+@test("stage_timer feeds the job breakdown, including pooled work")
+def _():
+    import contextvars
+    from concurrent.futures import ThreadPoolExecutor
+    from app.utils.metrics import STAGE_SECONDS, job_timings, stage_timer
+
+    def work():
+        with stage_timer("t_pooled"):
+            time.sleep(0.01)
+
+    before = STAGE_SECONDS.count(stage="t_pooled")
+    with job_timings("test") as timings:
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            for f in [pool.submit(contextvars.copy_context().run, work) for _ in range(3)]:
+                f.result()
+    work()  # outside the job: histogram only
+    stages = timings.as_dict()["stages"]
+    assert stages["t_pooled"]["count"] == 3
+    assert stages["t_pooled"]["total_ms"] >= 30
+    assert STAGE_SECONDS.count(stage="t_pooled") - before == 4
+    assert "t_pooled;dur=" in timings.server_timing()
+
+def _register_fake_excel(file_id, tmp):
+    """Register a workbook with one chart sheet ("Chart 1") for the fake COM backend."""
+    from benchmarks.corpus import make_workbook
+    from app.services.excel_service import get_excel_info
+    from app.services.file_manager import file_manager
+    path = os.path.join(tmp, "x.xlsx")
+    make_workbook(path, sheets=1, chartsheets=1)
+    file_manager.register(file_id, "excel", path, "x.xlsx", metadata=get_excel_info(path))
+
+@test("TestClient: generate returns timings and /api/metrics counts the job")
+def _():
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.services.file_manager import file_manager
+    from app.services.ppt_service import get_ppt_info
+    from app.utils.metrics import JOBS, MAPPING_FAILURES
+    import app.services.excel_service as excel_service
+    tmp = tempfile.mkdtemp()
+    backend = excel_service.com_backend()
+    excel_service.use_com_backend("fake")
+    try:
+        tpl = _make_template(os.path.join(tmp, "t.pptx"), ["A"])
+        file_manager.register("m_tpl", "ppt", tpl, "t.pptx", metadata=get_ppt_info(tpl))
+        _register_fake_excel("m_xls", tmp)
+        jobs = JOBS.value(endpoint="generate", status="success")
+        missing = MAPPING_FAILURES.value(reason="page_missing")
+        client = TestClient(app)
+        resp = client.post("/api/generate", json={
+            "template_id": "m_tpl", "output_name": "m_out",
+            "mappings": [{"excel_id": "m_xls", "name": "Chart 1", "page": 9, "type": "chartsheet"}],
+        })
+        assert resp.status_code == 200, resp.text
+        data = resp.json()
+        shutil.rmtree(Path(data["output_file"]).parent, ignore_errors=True)
+        assert data["results"][0]["code"] == "page_missing"
+        assert "template_load" in data["timings"]["stages"]
+        assert data["timings"]["total_ms"] >= 0
+        assert JOBS.value(endpoint="generate", status="success") == jobs + 1
+        assert MAPPING_FAILURES.value(reason="page_missing") == missing + 1
+
+        metrics = client.get("/api/metrics")
+        assert metrics.status_code == 200
+        assert metrics.headers["content-type"].startswith("text/plain")
+        assert 'excel2ppt_stage_seconds_count{stage="template_load"}' in metrics.text
+        assert 'excel2ppt_stale_captures_total{outcome="checked"}' in metrics.text
+    finally:
+        file_manager._files.pop("m_tpl", None)
+        file_manager._files.pop("m_xls", None)
+        excel_service.use_com_backend(backend)
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+# =====================================================================
+# 16. On-demand profiling
+# =====================================================================
+print("\n=== 16. Profiling Tests ===")
+
+@test("SamplingProfiler records folded stacks of the profiled thread")
+def _():
+    from app.utils.profiler import SamplingProfiler
+
+    def busy_profiled_work():
+        end = time.perf_counter() + 0.2
+        while time.perf_counter() < end:
+            sum(range(1000))
+
+    tmp = tempfile.mkdtemp()
+    try:
+        with SamplingProfiler(interval=0.002) as profiler:
+            busy_profiled_work()
+        assert profiler.samples > 10
+        path = profiler.write_folded(Path(tmp) / "p.folded")
+        lines = path.read_text(encoding="utf-8").splitlines()
+        stack, count = lines[0].rsplit(" ", 1)
+        assert int(count) > 0
+        assert any("busy_profiled_work (test_refactored.py:" in line for line in lines)
+        assert "_run" not in stack  # the sampler never samples itself
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+@test("SamplingProfiler merges pool workers running under the job's context")
+def _():
+    import contextvars
+    from concurrent.futures import ThreadPoolExecutor
+    from app.utils.profiler import SamplingProfiler, sampled_thread
+
+    def busy_pooled_work():
+        with sampled_thread():
+            end = time.perf_counter() + 0.2
+            while time.perf_counter() < end:
+                sum(range(1000))
+
+    def unrelated_pooled_work():
+        end = time.perf_counter() + 0.2
+        while time.perf_counter() < end:
+            sum(range(1000))
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        with SamplingProfiler(interval=0.002) as profiler:
+            joined = pool.submit(contextvars.copy_context().run, busy_pooled_work)
+            other = pool.submit(unrelated_pooled_work)  # not under the job's context
+            joined.result(), other.result()
+        busy_pooled_work()  # after the profile: sampled_thread is a no-op
+    stacks = profiler._stacks
+    assert sum(n for st, n in stacks.items() if "busy_pooled_work" in st) > 10
+    assert not any("unrelated_pooled_work" in st for st in stacks)
+    assert not profiler._threads
+
+@test("A profiled batch includes deck building and image optimization on pool threads")
+def _():
+    from app.models.schemas import GenerateBatchRequest
+    from app.utils.capture_result import CaptureResult
+    from app.utils.profiler import SamplingProfiler
+    import app.services.batch_service as batch_service
+    import app.utils.image_optimizer as image_optimizer
+
+    def spin():
+        end = time.perf_counter() + 0.1
+        while time.perf_counter() < end:
+            sum(range(1000))
+
+    tmp = tempfile.mkdtemp()
+    originals = (batch_service.capture_image_mappings, batch_service._build_deck,
+                 image_optimizer.optimize_image_bytes)
+
+    def fake_capture(mappings, job_dir, uploaded_files):
+        return {f"{m.excel_id}|{m.name}": CaptureResult.from_file(
+            _make_chart_png(os.path.join(tmp, f"{m.name}.png"))) for m in mappings}
+
+    def slow_build_deck(*args):
+        spin()
+        return originals[1](*args)
+
+    def slow_optimize(data, *args):
+        spin()
+        return data
+
+    try:
+        template = _make_template(os.path.join(tmp, "tpl.pptx"), ["A"])
+        request = GenerateBatchRequest(template_id="tpl", outputs=[
+            {"output_name": f"D{i}", "mappings": [
+                {"excel_id": "e1", "name": f"S{i}", "page": 1, "type": "chartsheet"}]}
+            for i in range(2)
+        ])
+        batch_service.capture_image_mappings = fake_capture
+        batch_service._build_deck = slow_build_deck
+        image_optimizer.optimize_image_bytes = slow_optimize
+        with SamplingProfiler(interval=0.002) as profiler:
+            outputs = batch_service.generate_batch(
+                request, template, {"e1": {"path": "x.xlsx", "filename": "x.xlsx"}}, Path(tmp))
+        assert [o["status"] for o in outputs] == ["success"] * 2
+        stacks = "\n".join(profiler._stacks)
+        assert "slow_build_deck" in stacks and "slow_optimize" in stacks
+    finally:
+        (batch_service.capture_image_mappings, batch_service._build_deck,
+         image_optimizer.optimize_image_bytes) = originals
+        shutil.rmtree(tmp, ignore_errors=True)
+
+@test("TestClient: generate with profile=true links a downloadable report")
+def _():
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.services.file_manager import file_manager
+    from app.services.ppt_service import get_ppt_info
+    import app.services.excel_service as excel_service
+    tmp = tempfile.mkdtemp()
+    backend = excel_service.com_backend()
+    excel_service.use_com_backend("fake")
+    try:
+        tpl = _make_template(os.path.join(tmp, "t.pptx"), ["A"])
+        file_manager.register("p_tpl", "ppt", tpl, "t.pptx", metadata=get_ppt_info(tpl))
+        _register_fake_excel("p_xls", tmp)
+        client = TestClient(app)
+        body = {
+            "template_id": "p_tpl", "output_name": "p_out",
+            "mappings": [{"excel_id": "p_xls", "name": "Chart 1", "page": 9, "type": "chartsheet"}],
+        }
+        plain = client.post("/api/generate", json=body).json()
+        shutil.rmtree(Path(plain["output_file"]).parent, ignore_errors=True)
+        assert "profile_url" not in plain
+
+        data = client.post("/api/generate", json={**body, "profile": True}).json()
+        job_dir = Path(data["output_file"]).parent
+        try:
+            assert data["profile_url"].endswith("/profile.folded")
+            resp = client.get(data["profile_url"])
+            assert resp.status_code == 200
+            assert resp.headers["content-type"].startswith("text/plain")
+        finally:
+            shutil.rmtree(job_dir, ignore_errors=True)
+    finally:
+        file_manager._files.pop("p_tpl", None)
+        file_manager._files.pop("p_xls", None)
+        excel_service.use_com_backend(backend)
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+# =====================================================================
+# 17. Trace spans
+# =====================================================================
+print("\n=== 17. Trace Span Tests ===")
+
+def _read_spans(path):
+    import json
+    spans = []
+    for line in Path(path).read_text(encoding="utf-8").splitlines():
+        for rs in json.loads(line)["resourceSpans"]:
+            for ss in rs["scopeSpans"]:
+                spans.extend(ss["spans"])
+    return spans
+
+@test("Spans nest, inherit job.id and record errors in OTLP/JSON shape")
+def _():
+    from app.utils import tracing
+    tmp = tempfile.mkdtemp()
+    try:
+        tracing.configure(path=Path(tmp) / "t.jsonl")
+        with tracing.span("job", {"job.id": "j1"}) as root:
+            with tracing.span("child", {"n": 2, "ok": True}):
+                pass
+            try:
+                with tracing.span("broken"):
+                    raise ValueError("boom")
+            except ValueError:
+                pass
+        child, broken, job = _read_spans(Path(tmp) / "t.jsonl")
+        assert job["parentSpanId"] == "" and len(job["traceId"]) == 32
+        assert child["traceId"] == job["traceId"] == root.trace_id
+        assert child["parentSpanId"] == job["spanId"]
+        attrs = {a["key"]: a["value"] for a in child["attributes"]}
+        assert attrs == {"job.id": {"stringValue": "j1"}, "n": {"intValue": "2"}, "ok": {"boolValue": True}}
+        assert broken["status"] == {"code": 2, "message": "ValueError: boom"}
+        assert int(job["endTimeUnixNano"]) >= int(child["endTimeUnixNano"])
+    finally:
+        tracing.configure(path=_TRACE_FILE)
+        shutil.rmtree(tmp, ignore_errors=True)
+
+@test("Concurrent first spans attach one trace handler and write each span once")
+def _():
+    import logging
+    import threading
+    from app.utils import tracing
+    tmp = tempfile.mkdtemp()
+    original = tracing.RotatingFileHandler
+
+    class SlowHandler(original):
+        def __init__(self, *args, **kwargs):
+            time.sleep(0.05)  # widen the window between the check and the attach
+            super().__init__(*args, **kwargs)
+
+    try:
+        tracing.configure(path=Path(tmp) / "t.jsonl")
+        tracing.RotatingFileHandler = SlowHandler
+        barrier = threading.Barrier(4)
+
+        def job(n):
+            barrier.wait()
+            with tracing.span("job", {"job.id": f"j{n}"}):
+                pass
+
+        threads = [threading.Thread(target=job, args=(n,)) for n in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        with tracing.span("after"):
+            pass
+        assert len(logging.getLogger("excel-to-ppt.trace").handlers) == 1
+        assert len(_read_spans(Path(tmp) / "t.jsonl")) == 5
+    finally:
+        tracing.RotatingFileHandler = original
+        tracing.configure(path=_TRACE_FILE)
+        shutil.rmtree(tmp, ignore_errors=True)
+
+@test("Disabled tracing writes nothing")
+def _():
+    from app.utils import tracing
+    tmp = tempfile.mkdtemp()
+    try:
+        tracing.configure(path=Path(tmp) / "t.jsonl", enabled=False)
+        with tracing.span("job") as s:
+            s.set_attribute("x", 1)
+        assert not (Path(tmp) / "t.jsonl").exists()
+    finally:
+        tracing.configure(path=_TRACE_FILE, enabled=True)
+        shutil.rmtree(tmp, ignore_errors=True)
+
+@test("TestClient: a generate job is one trace with stage spans under its root")
+def _():
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.services.file_manager import file_manager
+    from app.services.ppt_service import get_ppt_info
+    import app.services.excel_service as excel_service
+    tmp = tempfile.mkdtemp()
+    backend = excel_service.com_backend()
+    excel_service.use_com_backend("fake")
+    try:
+        tpl = _make_template(os.path.join(tmp, "t.pptx"), ["A"])
+        file_manager.register("s_tpl", "ppt", tpl, "t.pptx", metadata=get_ppt_info(tpl))
+        _register_fake_excel("s_xls", tmp)
+        client = TestClient(app)
+        data = client.post("/api/generate", json={
+            "template_id": "s_tpl", "output_name": "s_out",
+            "mappings": [{"excel_id": "s_xls", "name": "Chart 1", "page": 9, "type": "chartsheet"}],
+        }).json()
+        shutil.rmtree(Path(data["output_file"]).parent, ignore_errors=True)
+        spans = [s for s in _read_spans(_TRACE_FILE) if s["traceId"] == data["trace_id"]]
+        root = next(s for s in spans if s["name"] == "generate")
+        job_id = {"key": "job.id", "value": {"stringValue": data["job_id"]}}
+        assert job_id in root["attributes"]
+        stages = [s for s in spans if s["parentSpanId"] == root["spanId"]]
+        assert "template_load" in {s["name"] for s in stages}
+        assert all(job_id in s["attributes"] for s in stages)
+    finally:
+        file_manager._files.pop("s_tpl", None)
+        file_manager._files.pop("s_xls", None)
+        excel_service.use_com_backend(backend)
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+# =====================================================================
+# 18. Instrumented COM proxy
+# =====================================================================
+print("\n=== 18. COM Proxy Tests ===")
+
+class _FakeCom:
+    """Minimal stand-in for a win32com object (the proxy keys on ``_oleobj_``)."""
+    _oleobj_ = None
+
+    def __init__(self, **members):
+        self.__dict__.update(members)
+
+
+def _fake_excel(png_path):
+    """A fake Excel app with one chart-less worksheet "Data" whose range exports *png_path*."""
+    def export(path, fmt):
+        shutil.copy(png_path, path)
+
+    def add_chart():
+        return _FakeCom(Paste=lambda: None, Export=export, Delete=lambda: None)
+
+    used_range = _FakeCom(
+        Rows=_FakeCom(Count=40), Columns=_FakeCom(Count=6),
+        CopyPicture=lambda Appearance, Format: None,
+    )
+    sheet = _FakeCom(Name="Data", UsedRange=used_range)
+
+    class Sheets(_FakeCom):
+        def __call__(self, name):
+            return sheet
+
+        def __iter__(self):
+            return iter([sheet])
+
+    workbook = _FakeCom(Worksheets=Sheets(), Charts=_FakeCom(Add=add_chart))
+    return _FakeCom(
+        Visible=True,
+        Workbooks=_FakeCom(Open=lambda path: workbook),
+    ), sheet
+
+@test("ComProxy counts property gets, puts, calls and iteration per member")
+def _():
+    from app.utils.com_proxy import ComCallStats, ComProxy, stats_of
+    from app.utils.metrics import job_timings
+    tmp = tempfile.mkdtemp()
+    try:
+        raw, _sheet = _fake_excel(_make_chart_png(os.path.join(tmp, "c.png")))
+        stats = ComCallStats()
+        with job_timings("test") as timings:
+            excel = ComProxy(raw, "Excel", stats)
+            excel.Visible = False
+            wb = excel.Workbooks.Open("x.xlsx")
+            names = [s.Name for s in wb.Worksheets]
+            sheet = wb.Worksheets("Data")
+            rows = sheet.UsedRange.Rows.Count
+        assert raw.Visible is False
+        assert names == ["Data"] and rows == 40
+        assert isinstance(sheet, ComProxy)
+        assert stats_of(excel) is stats
+        for member, n in [("Excel.Visible=", 1), ("Excel.Workbooks", 1), ("Workbooks.Open", 1),
+                          ("Workbook.Worksheets", 2), ("Worksheets[iter]", 3), ("Worksheet.Name", 1),
+                          ("Worksheets()", 1), ("Worksheet.UsedRange", 1), ("UsedRange.Rows", 1),
+                          ("Rows.Count", 1)]:
+            assert stats.count(member) == n, (member, stats.count(member))
+        com = timings.as_dict()["com_calls"]
+        assert com["count"] == stats.total_calls == 13
+        assert com["members"]["Workbooks.Open"]["count"] == 1
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+@test("UsedRange capture reads Rows/Columns.Count once per attempt")
+def _():
+    import app.services.excel_service as excel_service
+    from app.utils.com_proxy import ComCallStats, ComProxy
+    tmp = tempfile.mkdtemp()
+    original_delay = excel_service.COM_CLIPBOARD_DELAY
+    excel_service.COM_CLIPBOARD_DELAY = 0
+    try:
+        raw, _sheet = _fake_excel(_make_valid_chart_png(os.path.join(tmp, "c.png")))
+        stats = ComCallStats()
+        excel = ComProxy(raw, "Excel", stats)
+        wb = excel.Workbooks.Open("x.xlsx")
+        result = excel_service._capture_worksheet_range(
+            excel, wb, wb.Worksheets("Data"), "Data", os.path.join(tmp, "out.png"), 3
+        )
+        assert result is not None and result.method == "clipboard"
+        assert stats.count("Rows.Count") == 1
+        assert stats.count("Columns.Count") == 1
+    finally:
+        excel_service.COM_CLIPBOARD_DELAY = original_delay
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+# =====================================================================
+# 19. Learned capture-strategy order
+# =====================================================================
+print("\n=== 19. Capture Strategy Learning Tests ===")
+
+@test("workbook_fingerprint tracks sheet structure, not data")
+def _():
+    from app.services.capture_strategy import workbook_fingerprint
+    meta = _PLAN_EXCEL["metadata"]
+    same = {
+        "worksheets": [dict(w, chart_count=w["chart_count"] * 2) for w in reversed(meta["worksheets"])],
+        "chartsheets": meta["chartsheets"],
+    }
+    other = {"worksheets": meta["worksheets"], "chartsheets": []}
+    assert workbook_fingerprint(meta) == workbook_fingerprint(same)
+    assert workbook_fingerprint(meta) != workbook_fingerprint(other)
+    assert workbook_fingerprint(None) is None
+
+@test("StrategyLearner promotes the strategy that works and persists it")
+def _():
+    from app.services.capture_strategy import StrategyLearner
+    tmp = tempfile.mkdtemp()
+    try:
+        path = Path(tmp) / "s.json"
+        learner = StrategyLearner(path, history_max=10, explore_every=0)
+        assert learner.order("fp", "worksheet_chart") == ["export", "copypicture", "usedrange"]
+        for _ in range(3):
+            learner.record("fp", "worksheet_chart", "export", False)
+            learner.record("fp", "worksheet_chart", "copypicture", True)
+        assert learner.order("fp", "worksheet_chart") == ["copypicture", "export", "usedrange"]
+        assert learner.order("other", "worksheet_chart")[0] == "export"
+        assert learner.order(None, "chartsheet") == ["export", "copypicture"]
+        learner.save()
+        reloaded = StrategyLearner(path)
+        assert reloaded.order("fp", "worksheet_chart")[0] == "copypicture"
+        for _ in range(20):
+            learner.record("fp", "worksheet_chart", "copypicture", True)
+        assert sum(learner.snapshot()["fp|worksheet_chart"]["copypicture"]) <= 10
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+@test("StrategyLearner keeps the used-range fallback last and retries demoted strategies")
+def _():
+    from app.services.capture_strategy import StrategyLearner
+    tmp = tempfile.mkdtemp()
+    try:
+        learner = StrategyLearner(Path(tmp) / "s.json", explore_every=3)
+        learner.record("fp", "worksheet_chart", "export", False)
+        learner.record("fp", "worksheet_chart", "copypicture", False)
+        for _ in range(5):
+            learner.record("fp", "worksheet_chart", "usedrange", True)
+        assert learner.order("fp", "worksheet_chart") == ["export", "copypicture", "usedrange"]
+
+        learner.record("fp", "worksheet_chart", "export", False)
+        orders = [learner.order("fp", "worksheet_chart") for _ in range(6)]
+        assert [o[0] for o in orders] == ["copypicture", "copypicture", "export"] * 2
+        assert all(o[-1] == "usedrange" for o in orders)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+@test("Chart sheet capture goes straight to the strategy that worked last time")
+def _():
+    from PIL import Image
+    import app.services.excel_service as excel_service
+    from app.services.capture_strategy import StrategyLearner
+    tmp = tempfile.mkdtemp()
+    good = _make_valid_chart_png(os.path.join(tmp, "good.png"))
+    blank = os.path.join(tmp, "blank.png")
+    Image.new("RGB", (400, 300), "white").save(blank)
+    exports = []
+
+    def export_blank(path, fmt):
+        exports.append(path)
+        shutil.copy(blank, path)
+
+    temp_sheet = _FakeCom(Paste=lambda: None, Delete=lambda: None,
+                          Export=lambda path, fmt: shutil.copy(good, path))
+    chart_sheet = _FakeCom(Export=export_blank,
+                           ChartArea=_FakeCom(CopyPicture=lambda Appearance, Format: None))
+
+    class Charts(_FakeCom):
+        def __call__(self, name):
+            return chart_sheet
+
+    workbook = _FakeCom(Charts=Charts(Add=lambda: temp_sheet))
+    original = excel_service.strategy_learner, excel_service.COM_CLIPBOARD_DELAY
+    excel_service.strategy_learner = StrategyLearner(Path(tmp) / "s.json")
+    excel_service.COM_CLIPBOARD_DELAY = 0
+    try:
+        out = os.path.join(tmp, "out.png")
+        first = excel_service._capture_chartsheet(_FakeCom(), workbook, "BI", out, 3, fingerprint="fp")
+        assert first.strategy == "copypicture" and len(exports) == 1
+        second = excel_service._capture_chartsheet(_FakeCom(), workbook, "BI", out, 3, fingerprint="fp")
+        assert second.strategy == "copypicture"
+        assert len(exports) == 1  # the failing direct export was skipped
+    finally:
+        excel_service.strategy_learner, excel_service.COM_CLIPBOARD_DELAY = original
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+# =====================================================================
+# 20. COM-free backend and benchmark corpus
+# =====================================================================
+print("\n=== 20. Fake COM Backend & Benchmark Tests ===")
+
+@test("Corpus workbooks scale as requested and inventory without COM")
+def _():
+    from benchmarks.corpus import build_corpus
+    from app.utils.xlsx_inventory import range_shape, read_inventory
+    tmp = tempfile.mkdtemp()
+    try:
+        corpus = build_corpus(tmp, "small", sheets=3, charts_per_sheet=2, rows=30, slides=7)
+        inv = read_inventory(corpus["excel"])
+        assert [len(ws["charts"]) for ws in inv["worksheets"]] == [2, 2, 2, 0]
+        assert [ws["charts"][1]["type"] for ws in inv["worksheets"][:2]] == ["line", "scatter"]
+        assert range_shape(inv["worksheets"][0]["dimension"]) == (31, 5)
+        assert [cs["name"] for cs in inv["chartsheets"]] == ["Chart 1"]
+        assert inv["chartsheets"][0]["chart"]["type"] == "pie"
+        assert len(corpus["items"]) == 5
+        from pptx import Presentation
+        assert len(Presentation(corpus["template"]).slides) == 7
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+@test("Fake backend: get_excel_info and capture work end to end off Windows")
+def _():
+    import app.services.excel_service as excel_service
+    from benchmarks.corpus import build_corpus
+    from app.models.schemas import ChartMapping
+    from app.services.ppt_service import capture_image_mappings, release_captures
+    tmp = tempfile.mkdtemp()
+    original = excel_service.com_backend(), excel_service.COM_CLIPBOARD_DELAY
+    excel_service.use_com_backend("fake")
+    excel_service.COM_CLIPBOARD_DELAY = 0
+    try:
+        corpus = build_corpus(tmp, "small")
+        info = excel_service.get_excel_info(corpus["excel"])
+        assert [w["chart_count"] for w in info["worksheets"]] == [1, 1, 0]
+        assert info["chartsheets"] == [{"name": "Chart 1", "type": "chartsheet"}]
+
+        mappings = [ChartMapping(excel_id="x", name=i["name"], type=i["type"], page=1)
+                    for i in corpus["items"]]
+        files = {"x": {"path": corpus["excel"], "filename": "corpus.xlsx"}}
+        job_dir = Path(tmp) / "job"
+        job_dir.mkdir()
+        extracted = capture_image_mappings(mappings, job_dir, files)
+        try:
+            assert len(extracted) == 4
+            methods = {k.split("|", 1)[1]: c.method for k, c in extracted.items()}
+            assert methods["Table 1"] == "clipboard" and methods["Chart 1"] == "export"
+            assert len({c.phash() for c in extracted.values()}) == 4
+            assert not any(c.stale_of for c in extracted.values())
+        finally:
+            release_captures(extracted)
+        try:
+            excel_service.use_com_backend("excel")
+            assert False, "unknown backend accepted"
+        except ValueError:
+            pass
+    finally:
+        excel_service.use_com_backend(original[0])
+        excel_service.COM_CLIPBOARD_DELAY = original[1]
+        shutil.rmtree(tmp, ignore_errors=True)
+
+@test("Fake renderer: line and scatter charts pass image validation for any seed")
+def _():
+    from app.services.fake_com import render_chart
+    from app.utils.image_validator import validate_image
+    tmp = tempfile.mkdtemp()
+    try:
+        for seed in range(30):  # seeds 0, 10, 22, ... used to render as "blank"
+            for chart_type in ("line", "scatter"):
+                path = os.path.join(tmp, f"{chart_type}{seed}.png")
+                render_chart(path, seed, chart_type)
+                assert validate_image(path), (chart_type, seed)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+@test("Benchmark comparison flags only slowdowns beyond threshold and noise floor")
+def _():
+    from benchmarks.run_benchmarks import compare
+    base = {"results": {"fake": {
+        "capture": {"median_ms": 100.0}, "prs_save": {"median_ms": 2.0},
+        "validate_image": {"median_ms": 50.0},
+    }}}
+    current = {"fake": {
+        "capture": {"median_ms": 130.0}, "prs_save": {"median_ms": 4.0},
+        "validate_image": {"median_ms": 55.0}, "get_excel_info": {"median_ms": 9.0},
+    }}
+    rows = {r["stage"]: r for r in compare(current, base, threshold=0.2, min_delta_ms=5.0)}
+    assert set(rows) == {"capture", "prs_save", "validate_image"}
+    assert rows["capture"]["regression"] and rows["capture"]["ratio"] == 1.3
+    assert not rows["prs_save"]["regression"]  # 2x, but within timer noise
+    assert not rows["validate_image"]["regression"]
+
+
+# =====================================================================
+# 21. HTTP load test
+# =====================================================================
+print("\n=== 21. Load Test Tests ===")
+
+@test("Load-test percentiles interpolate and summarize per endpoint")
+def _():
+    from benchmarks.loadtest import Recorder, percentile
+    assert percentile([], 50) == 0.0
+    assert percentile([10, 20, 30, 40], 50) == 25
+    assert percentile([10, 20, 30, 40], 100) == 40
+    rec = Recorder()
+    for s, ok in [(0.1, True), (0.2, True), (0.3, False)]:
+        rec.record("generate", s, ok)
+    summary = rec.summary(wall=1.5)["generate"]
+    assert summary["requests"] == 3 and summary["errors"] == 1
+    assert summary["p50_ms"] == 200.0 and summary["throughput_rps"] == 2.0
+
+@test("TestClient: upload-excel runs COM work off the event loop")
+def _():
+    import asyncio
+    from fastapi.testclient import TestClient
+    from app.main import app
+    import app.routers.api as api
+    from app.services.file_manager import file_manager
+    from benchmarks.corpus import build_corpus
+    tmp = tempfile.mkdtemp()
+    original = api.get_excel_info
+    seen = {}
+
+    def probe(path):
+        try:
+            asyncio.get_running_loop()
+            seen["on_loop"] = True
+        except RuntimeError:
+            seen["on_loop"] = False
+        return original(path)
+
+    import app.services.excel_service as excel_service
+    backend = excel_service.com_backend()
+    excel_service.use_com_backend("fake")
+    api.get_excel_info = probe
+    try:
+        corpus = build_corpus(tmp, "small")
+        with open(corpus["excel"], "rb") as f:
+            resp = TestClient(app).post(
+                "/api/upload-excel", files={"file": ("corpus.xlsx", f.read(), "application/octet-stream")}
+            )
+        assert resp.status_code == 200, resp.text
+        assert seen == {"on_loop": False}
+        assert [w["name"] for w in resp.json()["worksheets"]] == ["Data 1", "Data 2", "Table 1"]
+        file_manager.remove(resp.json()["file_id"])
+    finally:
+        api.get_excel_info = original
+        excel_service.use_com_backend(backend)
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+# =====================================================================
+# 22. Per-job memory accounting
+# =====================================================================
+print("\n=== 22. Memory Accounting Tests ===")
+
+@test("MemoryTracker reports growth sites, package size and stops tracemalloc")
+def _():
+    import tracemalloc
+    from pptx import Presentation
+    from app.utils.memory import MemoryTracker, note_package
+    assert not tracemalloc.is_tracing()
+    with MemoryTracker("test", top=5) as tracker:
+        hoard = [bytearray(256 * 1024) for _ in range(8)]
+        note_package(Presentation())
+    report = tracker.as_dict()
+    assert not tracemalloc.is_tracing()
+    assert report["traced_peak_bytes"] >= 2 * 1024 * 1024
+    assert report["top_allocations"][0]["site"].endswith(".py:" + report["top_allocations"][0]["site"].rsplit(":", 1)[1])
+    assert any("test_refactored.py" in a["site"] for a in report["top_allocations"])
+    pkg = report["pptx_package"]
+    assert pkg["parts"] > 10 and pkg["bytes"] == pkg["media_bytes"] + pkg["xml_bytes"]
+    note_package(Presentation())  # no active tracker: no-op
+    del hoard
+
+@test("TestClient: generate with memory=true returns a memory report and RSS is exported")
+def _():
+    from fastapi.testclient import TestClient
+    from app.main import app
+    import app.services.excel_service as excel_service
+    from app.services.file_manager import file_manager
+    from app.config import OUTPUT_DIR
+    from benchmarks.corpus import build_corpus
+    tmp = tempfile.mkdtemp()
+    backend = excel_service.com_backend()
+    excel_service.use_com_backend("fake")
+    client = TestClient(app)
+    ids = []
+    try:
+        corpus = build_corpus(tmp, "small", data_sheets=0)
+        for kind, path in (("ppt", corpus["template"]), ("excel", corpus["excel"])):
+            with open(path, "rb") as f:
+                resp = client.post(f"/api/upload-{kind}", files={"file": (os.path.basename(path), f.read(), "application/octet-stream")})
+            ids.append(resp.json()["file_id"])
+        body = {
+            "template_id": ids[0], "output_name": "mem", "memory": True,
+            "mappings": [{"excel_id": ids[1], "name": i["name"], "type": i["type"], "page": 1}
+                         for i in corpus["items"]],
+        }
+        data = client.post("/api/generate", json=body).json()
+        shutil.rmtree(OUTPUT_DIR / data["job_id"], ignore_errors=True)
+        assert all(r["status"] == "success" for r in data["results"]), data["results"]
+        mem = data["memory"]
+        assert mem["traced_peak_bytes"] > 0 and mem["pptx_package"]["media_bytes"] > 0
+        text = client.get("/api/metrics").text
+        assert "excel2ppt_job_traced_memory_peak_bytes_count" in text
+        assert "excel2ppt_process_peak_resident_memory_bytes" in text
+    finally:
+        for file_id in ids:
+            file_manager.remove(file_id)
+        excel_service.use_com_backend(backend)
+        shutil.rmtree(tmp, ignore_errors=True)
+
+@test("Soak leak fit: flat series has ~zero slope, growing series does not")
+def _():
+    from benchmarks.soak import slope
+    assert slope([(1, 5.0)]) == 0.0
+    assert abs(slope([(c, 1000 + (c % 2)) for c in range(100)])) < 0.01
+    assert round(slope([(c, 1024 * c) for c in range(10, 100, 10)])) == 1024
+
+
+# =====================================================================
+# 23. CLI batch mode
+# =====================================================================
+print("\n=== 23. CLI Batch Mode Tests ===")
+
+def _batch_args(**kwargs):
+    import argparse
+    from app.config import DEFAULT_IMAGE_LAYOUT
+    base = dict(batch=None, excel_glob=None, output_dir=None, config=None, jobs=1, profile=False,
+                no_cache=True, cache_dir=None, cache_max_mb=None,
+                img_left=DEFAULT_IMAGE_LAYOUT["left"], img_top=DEFAULT_IMAGE_LAYOUT["top"],
+                img_width=DEFAULT_IMAGE_LAYOUT["width"], img_height=DEFAULT_IMAGE_LAYOUT["height"])
+    base.update(kwargs)
+    return argparse.Namespace(**base)
+
+@test("Batch manifest: defaults merge into jobs, paths resolve, missing keys rejected")
+def _():
+    import json
+    from cli.report_cli import load_batch_jobs
+    tmp = tempfile.mkdtemp()
+    try:
+        manifest = os.path.join(tmp, "nightly.json")
+        with open(manifest, "w") as f:
+            json.dump({
+                "defaults": {"ppt_template": "t.pptx", "mappings": [["BI", 9, "chartsheet"]]},
+                "jobs": [{"excel_file": "a.xlsx", "output_ppt": "out/a.pptx"},
+                         {"excel_file": "b.xlsx", "output_ppt": "out/b.pptx",
+                          "layout": {"left": 1.0}, "mappings": [["X", "2", "worksheet"]]}],
+            }, f)
+        jobs = load_batch_jobs(_batch_args(batch=manifest))
+        assert [os.path.relpath(j["excel"], tmp) for j in jobs] == ["a.xlsx", "b.xlsx"]
+        assert jobs[0]["template"] == os.path.join(tmp, "t.pptx")
+        assert jobs[0]["mappings"] == [{"name": "BI", "page": 9, "type": "chartsheet"}]
+        assert jobs[1]["mappings"] == [{"name": "X", "page": 2, "type": "worksheet"}]
+        assert jobs[1]["options"].img_left == 1.0 and jobs[0]["options"].img_left != 1.0
+        with open(manifest, "w") as f:
+            json.dump([{"excel_file": "a.xlsx", "output_ppt": "a.pptx"}], f)
+        try:
+            load_batch_jobs(_batch_args(batch=manifest))
+            assert False, "job without template accepted"
+        except ValueError as e:
+            assert "ppt_template" in str(e) and "mappings" in str(e)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+@test("Batch run: glob x config on two warm workers, failures summarized per report")
+def _():
+    import json
+    import app.services.excel_service as excel_service
+    from benchmarks.corpus import make_template, make_workbook
+    from cli.report_cli import load_batch_jobs, run_batch
+    from pptx import Presentation
+    tmp = tempfile.mkdtemp()
+    backend = excel_service.com_backend()
+    excel_service.use_com_backend("fake")
+    try:
+        for i in range(3):
+            items = make_workbook(os.path.join(tmp, f"dut{i}.xlsx"), sheets=1, chartsheets=1, seed=i)
+        make_template(os.path.join(tmp, "t.pptx"), 3)
+        mappings = [[it["name"], n + 1, it["type"]] for n, it in enumerate(items)]
+        config = os.path.join(tmp, "cfg.json")
+        with open(config, "w") as f:
+            json.dump({"ppt_template": os.path.join(tmp, "t.pptx"),
+                       "mappings": mappings + [["Nope", 3, "chartsheet"]]}, f)
+        jobs = load_batch_jobs(_batch_args(
+            excel_glob=os.path.join(tmp, "dut*.xlsx"), config=config,
+            output_dir=os.path.join(tmp, "out"),
+        ))
+        assert len(jobs) == 3
+        results = run_batch(jobs, workers=2)
+        assert [os.path.basename(r["output"]) for r in results] == ["dut0.pptx", "dut1.pptx", "dut2.pptx"]
+        assert all(r["status"] == "failed" and r["failed"] == ["Nope"] for r in results)
+        assert all(r["inserted"] == 2 and r["items"] == 3 for r in results)
+        assert len({r["pid"] for r in results}) <= 2
+        prs = Presentation(results[0]["output"])
+        assert sum(1 for s in prs.slides for sh in s.shapes if sh.shape_type == 13) == 2
+        assert not [d for d in os.listdir(os.path.join(tmp, "out")) if d.startswith("_temp")]
+    finally:
+        excel_service.use_com_backend(backend)
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+# =====================================================================
+# 24. CLI watch mode
+# =====================================================================
+print("\n=== 24. CLI Watch Mode Tests ===")
+
+
+def _rewrite_part(path, part, extra=b"<!-- edited -->"):
+    """Rewrite the workbook zip at *path* with *extra* appended to *part*."""
+    import zipfile
+    with zipfile.ZipFile(path) as zf:
+        entries = [(info, zf.read(info)) for info in zf.infolist()]
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for info, data in entries:
+            zf.writestr(info, data + extra if info.filename == part else data)
+
+
+@test("sheet_digests: a chart edit changes only its own sheet's digest")
+def _():
+    from benchmarks.corpus import make_workbook
+    from app.utils.xlsx_inventory import read_inventory, sheet_digests
+
+    tmp = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp, "d.xlsx")
+        make_workbook(path, sheets=2, chartsheets=1, data_sheets=1)
+        before = sheet_digests(path)
+        assert sorted(before["worksheet"]) == ["Data 1", "Data 2", "Table 1"]
+        assert list(before["chartsheet"]) == ["Chart 1"]
+
+        inventory = read_inventory(path)
+        _rewrite_part(path, inventory["worksheets"][1]["charts"][0]["part"])
+        after = sheet_digests(path)
+        changed = {name for kind in after for name in after[kind]
+                   if after[kind][name] != before[kind][name]}
+        assert changed == {"Data 2"}, changed
+
+        # Chart-less sheets are drawn with the workbook's cell styles as well
+        _rewrite_part(path, "xl/styles.xml")
+        again = sheet_digests(path)
+        assert again["worksheet"]["Table 1"] != after["worksheet"]["Table 1"]
+        assert again["worksheet"]["Data 1"] == after["worksheet"]["Data 1"]
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+@test("DebouncedScanner reports a save once, after it settles")
+def _():
+    from cli.report_cli import DebouncedScanner
+
+    tmp = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp, "a.xlsx")
+        Path(path).write_bytes(b"one")
+        scanner = DebouncedScanner(debounce=2.0)
+        assert scanner.poll([path], now=0.0) == []
+        assert scanner.poll([path], now=1.0) == []
+        assert scanner.poll([path], now=2.5) == [path]
+        assert scanner.poll([path], now=9.0) == []
+        Path(path).write_bytes(b"second save")
+        assert scanner.poll([path], now=10.0) == []
+        Path(path).write_bytes(b"third save, still writing")
+        assert scanner.poll([path], now=11.0) == []  # changed again: timer restarts
+        assert scanner.poll([path], now=12.5) == []
+        assert scanner.poll([path], now=13.0) == [path]
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+@test("Watcher: a save re-captures only the mappings whose sheet changed")
+def _():
+    import json
+    from pptx import Presentation
+    from app.services import excel_service
+    from app.utils.xlsx_inventory import read_inventory
+    from benchmarks.corpus import make_template, make_workbook
+    from cli.report_cli import Watcher
+
+    backend = excel_service.com_backend()
+    excel_service.use_com_backend("fake")
+    tmp = tempfile.mkdtemp()
+    watcher = None
+    try:
+        results_dir = os.path.join(tmp, "results")
+        os.makedirs(results_dir)
+        path = os.path.join(results_dir, "dut.xlsx")
+        items = make_workbook(path, sheets=2, chartsheets=1)
+        make_template(os.path.join(tmp, "t.pptx"), 3)
+        config = os.path.join(tmp, "cfg.json")
+        with open(config, "w") as f:
+            json.dump({"ppt_template": os.path.join(tmp, "t.pptx"),
+                       "mappings": [[it["name"], n + 1, it["type"]] for n, it in enumerate(items)]}, f)
+        Path(results_dir, "~$dut.xlsx").write_bytes(b"lock")
+
+        watcher = Watcher(_batch_args(watch=results_dir, config=config, debounce=0.0,
+                                      output_dir=os.path.join(tmp, "out")))
+        assert watcher.poll() == []  # first sight: waiting for the file to settle
+        [first] = watcher.poll()
+        assert first["status"] == "ok" and sorted(first["recaptured"]) == ["Chart 1", "Data 1", "Data 2"]
+        output = os.path.join(tmp, "out", "dut.pptx")
+        assert sum(1 for s in Presentation(output).slides for sh in s.shapes if sh.shape_type == 13) == 3
+        assert watcher.poll() == []
+
+        _rewrite_part(path, read_inventory(path)["chartsheets"][0]["part"])
+        assert watcher.poll() == []
+        [second] = watcher.poll()
+        assert second["recaptured"] == ["Chart 1"] and second["inserted"] == 3, second
+        assert sum(1 for s in Presentation(output).slides for sh in s.shapes if sh.shape_type == 13) == 3
+
+        st = os.stat(path)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))  # saved, nothing changed
+        watcher.poll()
+        [third] = watcher.poll()
+        assert third["status"] == "unchanged"
+    finally:
+        if watcher is not None:
+            watcher.close()
+        from cli.report_cli import _release_excel
+        _release_excel()
+        excel_service.use_com_backend(backend)
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+# =====================================================================
+# 25. Pattern-based mappings
+# =====================================================================
+print("\n=== 25. Pattern-Based Mapping Tests ===")
+
+_RULE_WORKBOOK = {
+    "worksheets": [
+        {"name": "Metric DUT vs REF#1", "type": "worksheet", "has_charts": True, "chart_count": 1},
+        {"name": "Metric DUT vs REF#2", "type": "worksheet", "has_charts": True, "chart_count": 1},
+        {"name": "Raw", "type": "worksheet", "has_charts": False, "chart_count": 0},
+    ],
+    "chartsheets": [{"name": "BI", "type": "chartsheet"}, {"name": "BO", "type": "chartsheet"}],
+}
+_RULE_TEMPLATE = {
+    "total_slides": 6, "width": 13.333, "height": 7.5,
+    "slides": [{"page": 1, "title": "Cover"}, {"page": 2, "title": "Mesh Backhaul BI"},
+               {"page": 3, "title": "Mesh Backhaul BO"}, {"page": 4, "title": "Summary"},
+               {"page": 5, "title": "mesh fronthaul"}, {"page": 6, "title": "Appendix"}],
+}
+
+
+@test("Mapping rules: glob/regex/groups expand, titles match, problems are reported")
+def _():
+    from app.services.mapping_resolver import TemplateIndex, WorkbookIndex, resolve_mappings
+
+    wb, tpl = WorkbookIndex(_RULE_WORKBOOK), TemplateIndex(_RULE_TEMPLATE)
+    rules = [
+        {"name": "Raw", "page": "4", "type": "worksheet"},                      # plain
+        {"name": "glob:Metric DUT*", "page": 5, "type": "worksheet"},            # consecutive pages
+        {"name": "@chartsheets", "page": "title~Mesh Backhaul {name}", "type": "any"},
+        {"name": "re:^B", "page": "title=SUMMARY", "type": "any"},               # 2 items, 1 slide
+        {"name": "@charts", "page": "title~fronthaul", "type": "any"},
+        {"name": "glob:Nothing*", "page": 1, "type": "any"},
+        {"name": "re:(", "page": 1, "type": "any"},
+        {"name": "Raw", "page": "slide 3", "type": "worksheet"},
+    ]
+    result = resolve_mappings(rules, {None: wb}, tpl)
+    got = [(m["name"], m["type"], m["page"]) for m in result["mappings"]]
+    assert got == [
+        ("Raw", "worksheet", 4),
+        ("Metric DUT vs REF#1", "worksheet", 5), ("Metric DUT vs REF#2", "worksheet", 6),
+        ("BI", "chartsheet", 2), ("BO", "chartsheet", 3),
+        ("BI", "chartsheet", 4),
+        ("Metric DUT vs REF#1", "worksheet", 5),
+    ], got
+    assert len(result["warnings"]) == 3, result["warnings"]  # BO unplaced, @charts 1 unplaced, no match
+    assert len(result["errors"]) == 2 and "正規表示式" in result["errors"][0]
+
+    # Title rules need the template; pattern names need the workbook
+    result = resolve_mappings(rules[2:3], {None: None}, None)
+    assert result["errors"] and not result["mappings"]
+
+
+@test("Mapping rules: hundreds of rules expand in milliseconds")
+def _():
+    from app.services.mapping_resolver import TemplateIndex, WorkbookIndex, resolve_mappings
+
+    wb = WorkbookIndex({
+        "worksheets": [{"name": f"Metric {i}", "has_charts": True} for i in range(300)],
+        "chartsheets": [{"name": f"BI {i}"} for i in range(300)],
+    })
+    tpl = TemplateIndex({"total_slides": 400,
+                         "slides": [{"page": i + 1, "title": f"Result BI {i}"} for i in range(400)]})
+    rules = ([{"name": f"glob:Metric {i}", "page": i + 1, "type": "worksheet"} for i in range(300)]
+             + [{"name": f"re:^BI {i}$", "page": "title=Result {name}", "type": "chartsheet"} for i in range(300)])
+    start = time.perf_counter()
+    result = resolve_mappings(rules, {None: wb}, tpl)
+    elapsed = time.perf_counter() - start
+    assert len(result["mappings"]) == 600 and not result["warnings"] and not result["errors"]
+    assert elapsed < 0.5, f"{elapsed:.3f} s"
+
+
+@test("CLI: config rules resolve from the workbook package, plain mappings untouched")
+def _():
+    from benchmarks.corpus import make_template, make_workbook
+    from cli.report_cli import _parse_mappings, resolve_rules
+
+    tmp = tempfile.mkdtemp()
+    try:
+        excel, template = os.path.join(tmp, "d.xlsx"), os.path.join(tmp, "t.pptx")
+        make_workbook(excel, sheets=3, chartsheets=2)
+        make_template(template, 6)
+        plain = _parse_mappings([["Data 1", "2", "worksheet"]])
+        assert resolve_rules(excel, template, plain) is plain and plain[0]["page"] == 2
+        rules = _parse_mappings([["glob:Data [23]", 3, "worksheet"], ["@chartsheets", "title=slide 6", "any"]])
+        got = [(m["name"], m["page"]) for m in resolve_rules(excel, template, rules)]
+        assert got == [("Data 2", 3), ("Data 3", 4), ("Chart 1", 6)], got
+        try:
+            resolve_rules(excel, template, _parse_mappings([["Data 1", "page two", "worksheet"]]))
+            raise AssertionError("bad page selector accepted")
+        except ValueError as e:
+            assert "page two" in str(e)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+@test("TestClient: /plan expands pattern mappings against upload metadata")
+def _():
+    from fastapi.testclient import TestClient
+    from app.main import app
+    import app.services.excel_service as excel_service
+    from app.services.file_manager import file_manager
+    from benchmarks.corpus import build_corpus
+    tmp = tempfile.mkdtemp()
+    backend = excel_service.com_backend()
+    excel_service.use_com_backend("fake")
+    client = TestClient(app)
+    ids = []
+    try:
+        corpus = build_corpus(tmp, "small")
+        for kind, path in (("ppt", corpus["template"]), ("excel", corpus["excel"])):
+            with open(path, "rb") as f:
+                resp = client.post(f"/api/upload-{kind}", files={"file": (os.path.basename(path), f.read(), "application/octet-stream")})
+            ids.append(resp.json()["file_id"])
+        body = {"template_id": ids[0], "output_name": "rules", "mappings": [
+            {"excel_id": ids[1], "name": "glob:Data *", "type": "worksheet", "page": "title~Slide 2"},
+            {"excel_id": ids[1], "name": "@chartsheets", "type": "any", "page": 4},
+        ]}
+        plan = client.post("/api/plan", json=body).json()
+        assert plan["valid"], plan
+        assert [(m["name"], m["page"]) for m in plan["mappings"]] == [("Data 1", 2), ("Chart 1", 4)]
+        assert plan["warnings"]  # two sheets match "glob:Data *", one slide "Slide 2"
+
+        body["mappings"][0]["name"] = "re:["
+        assert client.post("/api/plan", json=body).json()["valid"] is False
+        assert client.post("/api/generate", json=body).status_code == 400
+    finally:
+        for file_id in ids:
+            file_manager.remove(file_id)
+        excel_service.use_com_backend(backend)
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+@test("WorkbookIndex answers groups from per-kind lists and caches each pattern")
+def _():
+    import app.services.mapping_resolver as resolver
+    wb = resolver.WorkbookIndex(_RULE_WORKBOOK)
+    assert wb.select("@chartsheets", "any") == [("BI", "chartsheet"), ("BO", "chartsheet")]
+    assert wb.select("@charts", "any") == [("Metric DUT vs REF#1", "worksheet"),
+                                           ("Metric DUT vs REF#2", "worksheet")]
+    compiled = []
+    original = resolver._compile
+    resolver._compile = lambda kind, pattern: compiled.append(pattern) or original(kind, pattern)
+    try:
+        for _ in range(50):
+            first = wb.select("glob:*", "chartsheet")
+            first.clear()  # callers get a copy
+        assert wb.select("glob:*", "chartsheet") == [("BI", "chartsheet"), ("BO", "chartsheet")]
+        assert wb.select("glob:*", "worksheet")[-1] == ("Raw", "worksheet")
+        assert wb.select("glob:*", "bogus") == []
+        assert compiled == ["*", "*", "*"]  # once per (pattern, type)
+    finally:
+        resolver._compile = original
+
+
+# =====================================================================
+# 26. COM-free workbook inventory
+# =====================================================================
+print("\n=== 26. COM-Free Workbook Inventory Tests ===")
+
+
+@test("Inventory: chart sizes from cell anchors and column/row geometry, sheet visibility")
+def _():
+    from openpyxl import Workbook
+    from openpyxl.chart import BarChart, Reference
+    from openpyxl.drawing.spreadsheet_drawing import AnchorMarker, TwoCellAnchor
+    from app.utils.xlsx_inventory import read_inventory
+
+    tmp = tempfile.mkdtemp()
+    try:
+        wb = Workbook()
+        ws = wb.active
+        ws.title = "Results"
+        for r in range(12):
+            ws.append([r, r * 2])
+        chart = BarChart()
+        chart.add_data(Reference(ws, min_col=2, min_row=1, max_row=12))
+        # B2 to F12 plus 10 pt into row 12
+        chart.anchor = TwoCellAnchor(_from=AnchorMarker(col=1, row=1),
+                                     to=AnchorMarker(col=5, row=11, rowOff=127000))
+        ws.add_chart(chart)
+        ws.column_dimensions["B"].width = 20   # 140 px
+        ws.row_dimensions[3].height = 30
+        wb.create_sheet("Scratch").sheet_state = "hidden"
+        path = os.path.join(tmp, "sized.xlsx")
+        wb.save(path)
+
+        inventory = read_inventory(path)
+        results, scratch = inventory["worksheets"]
+        [info] = results["charts"]
+        assert info["anchor"]["from"] == (1, 1) and info["anchor"]["to"] == (5, 11)
+        # width: 105 pt (B) + 3 x 48 pt default; height: 9 x 15 pt + 30 pt + 10 pt
+        assert info["size"] == (249.0, 175.0), info["size"]
+        assert results["state"] == "visible" and scratch["state"] == "hidden"
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+@test("CLI item listing and find_charts read the package without starting Excel")
+def _():
+    import io
+    import contextlib
+    from app.services import excel_service
+    from benchmarks.corpus import make_workbook
+    from cli.report_cli import list_available_items
+    sys.path.insert(0, os.path.join(PROJECT_ROOT, "tools"))
+    import find_charts
+
+    tmp = tempfile.mkdtemp()
+    backend = excel_service.com_backend()
+    original = excel_service.ExcelCOM.__enter__
+
+    def no_excel(self):
+        raise AssertionError("Excel was started")
+    try:
+        path = os.path.join(tmp, "d.xlsx")
+        make_workbook(path, sheets=2, chartsheets=1, data_sheets=1)
+        excel_service.ExcelCOM.__enter__ = no_excel
+        assert list_available_items(path) == (["Data 1", "Data 2", "Table 1"], ["Chart 1"])
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            find_charts.print_inventory(find_charts.read_inventory(path))
+        assert "Name: 'Chart 1' (line)" in out.getvalue() and "Size: 425 x 213" in out.getvalue()
+        excel_service.ExcelCOM.__enter__ = original
+
+        # The COM path (for .xls) reports the same sheets and sizes
+        excel_service.use_com_backend("fake")
+        com = find_charts.com_inventory(path)
+        package = find_charts.read_inventory(path)
+        assert [(w["name"], [c["size"] for c in w["charts"]]) for w in com["worksheets"]] == \
+               [(w["name"], [c["size"] for c in w["charts"]]) for w in package["worksheets"]]
+        assert [c["name"] for c in com["chartsheets"]] == ["Chart 1"]
+    finally:
+        excel_service.ExcelCOM.__enter__ = original
+        excel_service.use_com_backend(backend)
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+# =====================================================================
+# 27. CLI server client mode
+# =====================================================================
+print("\n=== 27. CLI Server Client Mode Tests ===")
+
+@test("Jobs API: progress events end in success; bad requests rejected before queueing")
+def _():
+    import json
+    from fastapi.testclient import TestClient
+    from app.config import OUTPUT_DIR
+    from app.main import app
+    import app.services.excel_service as excel_service
+    from app.services.file_manager import file_manager
+    from benchmarks.corpus import build_corpus
+    tmp = tempfile.mkdtemp()
+    backend = excel_service.com_backend()
+    excel_service.use_com_backend("fake")
+    client = TestClient(app)
+    try:
+        corpus = build_corpus(tmp, "small", seed=27)
+        with open(corpus["excel"], "rb") as f:
+            excel_id = client.post("/api/upload-excel", files={"file": ("c.xlsx", f.read())}).json()["file_id"]
+        with open(corpus["template"], "rb") as f:
+            template_id = client.post("/api/upload-ppt", files={"file": ("c.pptx", f.read())}).json()["file_id"]
+        body = {"template_id": template_id, "output_name": "jobs",
+                "mappings": [{"excel_id": excel_id, "name": "@all", "page": 2, "type": "any"}]}
+
+        bad = client.post("/api/jobs", json={**body, "template_id": "missing"})
+        assert bad.status_code == 404
+        assert client.get("/api/jobs/missing").status_code == 404
+
+        submitted = client.post("/api/jobs", json=body).json()
+        lines = client.get(submitted["events_url"]).text.splitlines()
+        events = [json.loads(line) for line in lines]
+        assert [e["seq"] for e in events] == list(range(1, len(events) + 1))
+        phases = [e["phase"] for e in events]
+        assert phases[:2] == ["queued", "start"] and phases[-1] == "done"
+        assert phases.index("capture") < phases.index("insert") < phases.index("save")
+        assert max(e["done"] for e in events if e["phase"] == "capture") == 4
+        final = events[-1]
+        assert final["state"] == "success", final
+        assert [r["status"] for r in final["result"]["results"]] == ["success"] * 4
+        assert client.get(submitted["status_url"]).json()["seq"] == final["seq"]
+        # Resuming after the last event returns just the final state
+        resumed = client.get(submitted["events_url"], params={"after": final["seq"] - 1}).text
+        assert json.loads(resumed)["state"] == "success"
+        shutil.rmtree(OUTPUT_DIR / final["result"]["job_id"], ignore_errors=True)
+        file_manager.remove(excel_id)
+        file_manager.remove(template_id)
+    finally:
+        excel_service.use_com_backend(backend)
+        shutil.rmtree(tmp, ignore_errors=True)
+
+@test("report_cli --server: uploads skipped by hash, repeat run reuses the server result")
+def _():
+    import argparse
+    from fastapi.testclient import TestClient
+    from pptx import Presentation
+    from app.config import OUTPUT_DIR
+    from app.main import app
+    import app.services.excel_service as excel_service
+    from app.services.file_manager import file_manager, sha256_file
+    from benchmarks.corpus import build_corpus
+    from cli.report_cli import ServerClient, run_remote
+    tmp = tempfile.mkdtemp()
+    backend = excel_service.com_backend()
+    excel_service.use_com_backend("fake")
+    outputs_before = set(OUTPUT_DIR.iterdir())
+    try:
+        corpus = build_corpus(tmp, "small", seed=28)
+        options = argparse.Namespace(profile=False, img_left=0.5, img_top=1.0, img_width=8.0, img_height=5.0)
+        job = {"excel": corpus["excel"], "template": corpus["template"],
+               "output": os.path.join(tmp, "out", "deck.pptx"),
+               "mappings": [{"name": "@chartsheets", "page": 2, "type": "any"},
+                            {"name": "Data 1", "page": 3, "type": "worksheet"},
+                            {"name": "Nope", "page": 4, "type": "worksheet"}],
+               "options": options}
+
+        remote = ServerClient("http://testserver", client=TestClient(app))
+        excel_id, uploaded = remote.upload(corpus["excel"], "excel")
+        assert uploaded
+        again = ServerClient("http://testserver", client=TestClient(app))
+        assert again.upload(corpus["excel"], "excel") == (excel_id, False)
+
+        first = run_remote([job], "http://testserver", client=TestClient(app))[0]
+        assert first["status"] == "failed" and first["failed"] == ["Nope"], first
+        assert first["inserted"] == 2 and not first["cached"]
+        slides = Presentation(job["output"]).slides
+        assert sum(1 for s in slides[1].shapes if s.shape_type == 13) == 1  # picture
+
+        os.remove(job["output"])
+        job["mappings"] = job["mappings"][:2]
+        second = run_remote([job], "http://testserver", client=TestClient(app))[0]
+        assert second["status"] == "ok" and os.path.exists(job["output"])
+        third = run_remote([job], "http://testserver", client=TestClient(app))[0]
+        assert third["cached"], third
+
+        job["template"] = os.path.join(tmp, "missing.pptx")
+        broken = run_remote([job], "http://testserver", client=TestClient(app))[0]
+        assert broken["status"] == "error" and "missing.pptx" in broken["error"]
+        file_manager.remove(excel_id)
+        file_manager.remove(file_manager.find_by_hash(sha256_file(corpus["template"]), "ppt")[0])
+    finally:
+        for job_dir in set(OUTPUT_DIR.iterdir()) - outputs_before:
+            shutil.rmtree(job_dir, ignore_errors=True)
+        excel_service.use_com_backend(backend)
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+# =====================================================================
+# 28. CLI capture cache
+# =====================================================================
+print("\n=== 28. CLI Capture Cache Tests ===")
+
+@test("CaptureCache: keyed by workbook hash and item; trim evicts least recently used")
+def _():
+    from app.services.capture_cache import CaptureCache
+    from app.utils.capture_result import CaptureResult
+    tmp = tempfile.mkdtemp()
+    try:
+        cache = CaptureCache(tmp, max_mb=0.01)  # ~10 KB
+        blob = CaptureResult(b"x" * 4000)
+        cache.put("h1", "Data 1", "worksheet", blob)
+        assert cache.get("h1", "Data 1", "worksheet").data == blob.data
+        assert cache.get("h2", "Data 1", "worksheet") is None
+        assert cache.get("h1", "Data 1", "chartsheet") is None
+        assert (cache.hits, cache.misses) == (1, 2)
+
+        for n, name in enumerate(["A", "B", "C"]):
+            cache.put("h1", name, "worksheet", blob)
+            path = cache.directory / f"{cache.key('h1', name, 'worksheet')}.png"
+            os.utime(path, ns=(n * 10**9, n * 10**9))  # A oldest, C newest
+        os.utime(cache.directory / f"{cache.key('h1', 'Data 1', 'worksheet')}.png", ns=(0, 0))
+        assert cache.get("h1", "A", "worksheet") is not None  # hit: A is now the newest
+        assert cache.trim() == 2
+        assert [n for n in ["Data 1", "A", "B", "C"] if cache.get("h1", n, "worksheet")] == ["A", "C"]
+        assert not list(cache.directory.glob("*.tmp"))
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+@test("report_cli: rerun reuses cached captures without Excel; edits and --no-cache recapture")
+def _():
+    from benchmarks.corpus import make_workbook, make_template
+    import app.services.excel_service as excel_service
+    from cli.report_cli import run_generation
+    tmp = tempfile.mkdtemp()
+    backend = excel_service.com_backend()
+    excel_service.use_com_backend("fake")
+    original_com = excel_service.ExcelCOM
+    try:
+        excel = os.path.join(tmp, "dut.xlsx")
+        items = make_workbook(excel, sheets=2, charts_per_sheet=1, rows=20, chartsheets=1, data_sheets=0)
+        make_template(os.path.join(tmp, "t.pptx"), 4)
+        mappings = [{"name": it["name"], "page": n + 1, "type": it["type"]} for n, it in enumerate(items)]
+        args = _batch_args(no_cache=False, cache_dir=os.path.join(tmp, "cache"), verbose=False)
+        out = os.path.join(tmp, "out.pptx")
+
+        first = run_generation(excel, os.path.join(tmp, "t.pptx"), out, mappings, args)
+        assert (first["captured"], first["cached"], first["inserted"]) == (3, 0, 3), first
+
+        def no_excel(*a, **k):
+            raise AssertionError("Excel started for a fully cached run")
+        excel_service.ExcelCOM = no_excel
+        args.img_width = 6.0
+        second = run_generation(excel, os.path.join(tmp, "t.pptx"), out, mappings, args)
+        assert (second["captured"], second["cached"], second["inserted"]) == (0, 3, 3), second
+        excel_service.ExcelCOM = original_com
+
+        _rewrite_part(excel, "docProps/app.xml")  # any content change => new workbook hash
+        third = run_generation(excel, os.path.join(tmp, "t.pptx"), out, mappings, args)
+        assert (third["captured"], third["cached"]) == (3, 0), third
+        args.no_cache = True
+        fourth = run_generation(excel, os.path.join(tmp, "t.pptx"), out, mappings, args)
+        assert (fourth["captured"], fourth["cached"]) == (3, 0), fourth
+        assert not [d for d in os.listdir(tmp) if d.startswith("_temp")]
+    finally:
+        excel_service.ExcelCOM = original_com
+        excel_service.use_com_backend(backend)
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+# =====================================================================
+# 29. Multi-chart capture
+# =====================================================================
+print("\n=== 29. Multi-Chart Capture Tests ===")
+
+@test("Chart layout: grid/horizontal/vertical cells, fitting and selector validation")
+def _():
+    from app.models.schemas import ChartMapping
+    from app.utils.chart_layout import fit_in, layout_positions
+    box = (1.0, 1.0, 10.3, 4.3)
+    assert layout_positions(1, "grid", box) == (box,)
+    grid = layout_positions(3, "grid", box, gap=0.3)
+    assert [tuple(round(v, 3) for v in c) for c in grid] == [
+        (1.0, 1.0, 5.0, 2.0), (6.3, 1.0, 5.0, 2.0), (1.0, 3.3, 5.0, 2.0)]
+    assert len({c[0] for c in layout_positions(6, "grid", box)}) == 3  # 3 columns beyond 4
+    row = layout_positions(2, "horizontal", box, gap=0.3)
+    assert row[0][1] == row[1][1] == 1.0 and round(row[1][0], 3) == 6.3
+    col = layout_positions(2, "vertical", box, gap=0.3)
+    assert col[0][0] == col[1][0] == 1.0 and round(col[1][1], 3) == 3.3
+    assert layout_positions(3, "grid", box, gap=0.3) is grid  # cached per slide layout
+    assert fit_in((0, 0, 4, 2), (100, 100)) == (1.0, 0.0, 2.0, 2.0)
+
+    m = ChartMapping(excel_id="e", name="S", page=1, type="worksheet", charts=["2", "Sales", 1], layout="vertical")
+    assert m.charts == [2, "Sales", 1]
+    assert ChartMapping(excel_id="e", name="S", page=1, type="worksheet", charts="ALL").charts == "all"
+    assert ChartMapping(excel_id="e", name="S", page=1, type="worksheet", charts=3).charts == [3]
+    for bad in ({"charts": 0}, {"charts": []}, {"layout": "diagonal"}):
+        try:
+            ChartMapping(excel_id="e", name="S", page=1, type="worksheet", **bad)
+            assert False, f"accepted {bad}"
+        except ValueError:
+            pass
+
+@test("charts 'all' expands from metadata; plan checks indices, names and modes")
+def _():
+    from app.models.schemas import GenerateRequest
+    from app.services.mapping_resolver import WorkbookIndex, resolve_mappings
+    from app.services.plan_service import plan_generate
+    from app.config import PLAN_COST_MS
+    meta = {**_RULE_WORKBOOK, "worksheets": _RULE_WORKBOOK["worksheets"] + [
+        {"name": "Multi", "type": "worksheet", "has_charts": True, "chart_count": 3,
+         "charts": ["Tput", "Rssi", "Loss"]}]}
+    result = resolve_mappings([
+        {"name": "Multi", "page": 1, "type": "worksheet", "charts": "all", "layout": "horizontal"},
+        {"name": "Raw", "page": 2, "type": "worksheet", "charts": "all"},
+        {"name": "@chartsheets", "page": 3, "type": "any", "charts": "all"},
+    ], {None: WorkbookIndex(meta)}, None)
+    got = [(m["name"], m["page"], m["charts"]) for m in result["mappings"]]
+    assert got == [("Multi", 1, [1, 2, 3]), ("BI", 3, None), ("BO", 4, None)], got
+    assert result["mappings"][0]["layout"] == "horizontal"
+    assert len(result["warnings"]) == 1 and "Raw" in result["warnings"][0]
+
+    excel = {**_PLAN_EXCEL, "metadata": meta}
+    req = GenerateRequest(template_id="t", output_name="o", mappings=[
+        {"excel_id": "e", "name": "Multi", "page": 1, "type": "worksheet", "charts": [1, "rssi"]},
+        {"excel_id": "e", "name": "Multi", "page": 2, "type": "worksheet", "charts": [4, "Nope"]},
+        {"excel_id": "e", "name": "BI", "page": 3, "type": "chartsheet", "charts": [1]},
+        {"excel_id": "e", "name": "Multi", "page": 3, "type": "worksheet", "charts": [1],
+         "chart_mode": "embedded"},
+        {"excel_id": "e", "name": "Multi", "page": 2, "type": "worksheet", "charts": ["rssi", 1]},
+    ])
+    plan = plan_generate(req, _PLAN_TEMPLATE, {"e": excel})
+    errs = [e["errors"] for e in plan["mappings"]]
+    assert errs[0] == [] and plan["mappings"][0]["strategy"] == "capture_worksheet_chart"
+    assert len(errs[1]) == 2 and "3 個圖表" in errs[1][0] and "Nope" in errs[1][1]
+    assert errs[2] == ["圖表工作表不能選擇圖表 (charts)"]
+    assert "圖片模式" in errs[3][0]
+    last = plan["mappings"][4]
+    assert last["strategy"] == "reuse" and last["estimated_ms"] == 2 * PLAN_COST_MS["insert"]
+
+@test("A selected chart that cannot be captured is not replaced by the used range")
+def _():
+    from types import SimpleNamespace as NS
+    import app.services.excel_service as excel_service
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("chart is busy")
+
+    used = []
+
+    class Sheet:
+        @property
+        def UsedRange(self):
+            used.append(1)
+            raise RuntimeError("used range touched")
+
+        def ChartObjects(self, index=None):
+            return NS(Name=f"Chart {index}", Chart=NS(Export=fail), CopyPicture=fail)
+
+    original = excel_service.COM_CLIPBOARD_DELAY, excel_service.COM_RETRY_DELAY
+    excel_service.COM_CLIPBOARD_DELAY = excel_service.COM_RETRY_DELAY = 0
+    tmp = tempfile.mkdtemp()
+    try:
+        out = os.path.join(tmp, "c.png")
+        workbook = NS(Worksheets=lambda name: Sheet())
+        assert excel_service._capture_worksheet(NS(), workbook, "S", out, 2, chart=2) is None
+        assert used == []
+        excel_service._capture_worksheet_chart(NS(), workbook, Sheet(), "S", out, 2)
+        assert used == [1]  # the default chart still falls back to the used range
+    finally:
+        excel_service.COM_CLIPBOARD_DELAY, excel_service.COM_RETRY_DELAY = original
+        shutil.rmtree(tmp, ignore_errors=True)
+
+@test("report_cli: charts 'all' captures every chart in one pass and tiles the box")
+def _():
+    from benchmarks.corpus import make_workbook, make_template
+    import app.services.excel_service as excel_service
+    from cli.report_cli import _parse_mappings, run_generation
+    from pptx import Presentation
+    from pptx.util import Emu
+    tmp = tempfile.mkdtemp()
+    backend = excel_service.com_backend()
+    excel_service.use_com_backend("fake")
+    try:
+        excel = os.path.join(tmp, "dut.xlsx")
+        items = make_workbook(excel, sheets=1, charts_per_sheet=4, rows=20, chartsheets=1, data_sheets=0)
+        sheet = next(it["name"] for it in items if it["type"] == "worksheet")
+        chartsheet = next(it["name"] for it in items if it["type"] == "chartsheet")
+        make_template(os.path.join(tmp, "t.pptx"), 2)
+        mappings = _parse_mappings([[sheet, 1, "worksheet", "all", "grid"],
+                                    {"name": chartsheet, "page": 2, "type": "chartsheet"}])
+        assert mappings[0] == {"name": sheet, "page": 1, "type": "worksheet", "charts": "all", "layout": "grid"}
+        try:
+            _parse_mappings([[sheet, 1, "worksheet", "all", "diagonal"]])
+            assert False, "bad layout accepted"
+        except ValueError:
+            pass
+
+        args = _batch_args(verbose=False, img_left=1.0, img_top=1.0, img_width=10.0, img_height=5.0)
+        out = os.path.join(tmp, "out.pptx")
+        result = run_generation(excel, os.path.join(tmp, "t.pptx"), out, mappings, args)
+        assert (result["captured"], result["inserted"], result["failed"]) == (5, 5, []), result
+
+        prs = Presentation(out)
+        pics = [sh for sh in prs.slides[0].shapes if sh.shape_type == 13]
+        assert len(pics) == 4
+        inch = lambda v: Emu(v).inches
+        lefts = sorted({round(inch(p.left)) for p in pics})
+        tops = sorted({round(inch(p.top)) for p in pics})
+        assert len(lefts) == 2 and len(tops) == 2  # 2 x 2 grid
+        for p in pics:
+            assert 1.0 - 1e-3 <= inch(p.left) and inch(p.left + p.width) <= 11.0 + 1e-3
+            assert 1.0 - 1e-3 <= inch(p.top) and inch(p.top + p.height) <= 6.0 + 1e-3
+        assert len({p.image.sha1 for p in pics}) == 4
+        assert sum(1 for sh in prs.slides[1].shapes if sh.shape_type == 13) == 1
+    finally:
+        excel_service.use_com_backend(backend)
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+# =====================================================================
+# 30. Template placeholder filling
+# =====================================================================
+print("\n=== 30. Template Placeholder Tests ===")
+
+@test("PPTGenerator: placeholders indexed at load and filled in one pass, keeping aspect ratio")
+def _():
+    from PIL import Image
+    from pptx import Presentation
+    from pptx.util import Inches
+    from app.ppt_generator import PPTGenerator
+    tmp = tempfile.mkdtemp()
+    try:
+        prs = Presentation()
+        for n in range(50):
+            slide = prs.slides.add_slide(prs.slide_layouts[6])
+            for k in range(2):  # adjacent placeholders on one slide
+                box = slide.shapes.add_shape(1, Inches(1 + 5 * k), Inches(1), Inches(4), Inches(3))
+                box.name = f"{{{{CHART_{n}_{k}}}}}"
+            slide.shapes.add_textbox(Inches(1), Inches(5), Inches(4), Inches(1)).name = "Notes"
+        template = os.path.join(tmp, "t.pptx")
+        prs.save(template)
+        image = os.path.join(tmp, "c.png")
+        Image.new("RGB", (400, 100), "navy").save(image)
+
+        gen = PPTGenerator(template)
+        assert len(gen._placeholders("{{CHART_")) == 100
+        mapping = {f"{n}_{k}": image for n in range(50) for k in range(2) if (n, k) != (7, 1)}
+        mapping["missing"] = image
+        mapping["7_1"] = os.path.join(tmp, "nope.png")
+        assert gen.fill_template_placeholders(mapping) == 99
+        assert gen.fill_template_placeholders(mapping) == 0  # already filled
+
+        out = gen.save(os.path.join(tmp, "out.pptx"))
+        slides = Presentation(out).slides
+        pics = [sh for sh in slides[0].shapes if sh.shape_type == 13]
+        assert [(p.left, p.top, p.width, p.height) for p in pics] == [
+            (Inches(1), Inches(1), Inches(4), Inches(1)), (Inches(6), Inches(1), Inches(4), Inches(1))]
+        assert [sh.name for sh in slides[7].shapes if "CHART_" in sh.name] == ["{{CHART_7_1}}"]
+        assert sum(1 for sl in slides for sh in sl.shapes if sh.shape_type == 13) == 99
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+# =====================================================================
+# 31. Streaming chart extraction
+# =====================================================================
+print("\n=== 31. Streaming Chart Extraction Tests ===")
+
+@test("ExcelChartExtractor streams charts in workbook order; sheet filter skips the rest")
+def _():
+    import app.services.excel_service as excel_service
+    from app.excel_chart_extractor import ExcelChartExtractor
+    from benchmarks.corpus import make_workbook
+    tmp = tempfile.mkdtemp()
+    backend = excel_service.com_backend()
+    excel_service.use_com_backend("fake")
+    try:
+        excel = os.path.join(tmp, "dut.xlsx")
+        make_workbook(excel, sheets=2, charts_per_sheet=2, chartsheets=1, data_sheets=0)
+        out = os.path.join(tmp, "out")
+        with ExcelChartExtractor() as extractor:
+            charts = extractor.extract_charts_from_file(excel, out)
+            assert [(c["sheet"], c["name"], c["type"]) for c in charts] == [
+                ("Data 1", "Chart 1", "embedded"), ("Data 1", "Chart 2", "embedded"),
+                ("Data 2", "Chart 1", "embedded"), ("Data 2", "Chart 2", "embedded"),
+                ("Chart 1", "Chart 1", "chart_sheet")]
+            assert all(os.path.exists(c["image_path"]) for c in charts)
+
+            picked = extractor.iter_charts_from_file(
+                excel, out, ["Chart 1", "Data 2", "Data 2", "Nope"])
+            assert [(c["sheet"], c["name"]) for c in picked] == [
+                ("Data 2", "Chart 1"), ("Data 2", "Chart 2"), ("Chart 1", "Chart 1")]
+
+            stream = extractor.iter_charts_from_file(excel, out)
+            assert next(stream)["sheet"] == "Data 1"
+            assert extractor.excel_app.Workbooks.Count == 1
+            stream.close()
+            assert extractor.excel_app.Workbooks.Count == 0  # closed early
+    finally:
+        excel_service.use_com_backend(backend)
+        shutil.rmtree(tmp, ignore_errors=True)
+
+@test("iter_all_charts: parallel workers stream every file; errors and startup failures reported")
+def _():
+    import app.excel_chart_extractor as extractor_module
+    import app.services.excel_service as excel_service
+    from benchmarks.corpus import make_workbook
+    tmp = tempfile.mkdtemp()
+    backend = excel_service.com_backend()
+    excel_service.use_com_backend("fake")
+    original_com = extractor_module.ExcelCOM
+    try:
+        files = [os.path.join(tmp, f"f{i}.xlsx") for i in range(3)]
+        for i, path in enumerate(files):
+            make_workbook(path, sheets=1, charts_per_sheet=2, chartsheets=1, data_sheets=0, seed=i)
+        missing = os.path.join(tmp, "missing.xlsx")
+
+        got = list(extractor_module.iter_all_charts(files + [missing], os.path.join(tmp, "out"),
+                                                    max_workers=2))
+        charts = [(f, c) for f, c in got if "error" not in c]
+        assert len(charts) == 9 and {f for f, _ in charts} == {"f0.xlsx", "f1.xlsx", "f2.xlsx"}
+        assert [f for f, c in got if "error" in c] == ["missing.xlsx"]
+        assert {os.path.dirname(c["image_path"]) for f, c in charts if f == "f1.xlsx"} == {
+            os.path.join(tmp, "out", "f1")}
+
+        results = extractor_module.extract_all_charts(files, os.path.join(tmp, "all"))
+        assert {name: len(charts) for name, charts in results.items()} == {
+            "f0.xlsx": 3, "f1.xlsx": 3, "f2.xlsx": 3}
+
+        class NoExcel:
+            def __enter__(self):
+                raise OSError("Excel is not installed")
+
+            def __exit__(self, *exc):
+                return False
+
+        extractor_module.ExcelCOM = NoExcel
+        got = list(extractor_module.iter_all_charts(files[:2], os.path.join(tmp, "none")))
+        assert [f for f, _ in got] == ["f0.xlsx", "f1.xlsx"]
+        assert all("Excel is not installed" in c["error"] for _, c in got)
+    finally:
+        extractor_module.ExcelCOM = original_com
+        excel_service.use_com_backend(backend)
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
 # =====================================================================
 # Summary
 # =====================================================================
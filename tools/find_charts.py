@@ -1,52 +1,118 @@
 """
 Find all charts in Excel workbook
+
+Reads the .xlsx / .xlsm package directly, so Excel is not needed and it
+runs on any OS: every sheet with its visibility, the charts on each
+worksheet (name, type, anchor cells, size in points) and the standalone
+chart sheets.  Legacy .xls files are listed through Excel (Windows only).
+
+Usage:
+    python tools/find_charts.py report.xlsm
+    python tools/find_charts.py report.xlsm --json
 """
-import pythoncom
-import win32com.client as win32
+import os
+import sys
+import json
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from openpyxl.utils import get_column_letter
+
+from app.utils.xlsx_inventory import read_inventory
 
 EXCEL_FILE = r"C:\Netgear Projects\NRH testing\RBE770v2\NRH Test Result\RBE773v2 vs RBE773 vs Eero Pro 7_3Pack Test\NRH_RBE773v2 vs RBE773 vs Eero Pro 7_auto channle_Intel BE200_20251016.xlsm"
 
-pythoncom.CoInitialize()
+_VISIBILITY = {-1: "visible", 0: "hidden", 2: "veryHidden"}  # XlSheetVisibility
+
+
+def com_inventory(path: str) -> dict:
+    """Inventory a workbook through Excel (for legacy .xls files).
+
+    Returns the :func:`read_inventory` shape; chart types and anchors are
+    not read.
+    """
+    from app.services.excel_service import ExcelCOM
 
-excel_app = win32.DispatchEx('Excel.Application')
-excel_app.Visible = False
-excel_app.DisplayAlerts = False
+    worksheets, chartsheets = [], []
+    with ExcelCOM() as (excel_app, _):
+        workbook = excel_app.Workbooks.Open(os.path.abspath(path))
+        try:
+            for sheet in workbook.Worksheets:
+                charts = []
+                chart_objects = sheet.ChartObjects()
+                for i in range(1, chart_objects.Count + 1):
+                    chart_obj = sheet.ChartObjects(i)
+                    charts.append({
+                        "name": chart_obj.Name, "type": None, "anchor": None,
+                        "size": (round(chart_obj.Width, 1), round(chart_obj.Height, 1)),
+                    })
+                worksheets.append({
+                    "name": sheet.Name,
+                    "state": _VISIBILITY.get(sheet.Visible, "visible"),
+                    "charts": charts,
+                })
+            for chart_sheet in workbook.Charts:
+                chartsheets.append({"name": chart_sheet.Name, "state": "visible", "chart": None})
+        finally:
+            workbook.Close(SaveChanges=False)
+    return {"worksheets": worksheets, "chartsheets": chartsheets}
 
-workbook = excel_app.Workbooks.Open(EXCEL_FILE)
 
-print("=" * 60)
-print("All Sheets and Charts in Workbook")
-print("=" * 60)
+def _cell(col_row) -> str:
+    col, row = col_row
+    return f"{get_column_letter(col + 1)}{row + 1}"
+
+
+def print_inventory(inventory: dict):
+    print("=" * 60)
+    print("All Sheets and Charts in Workbook")
+    print("=" * 60)
+
+    for sheet in inventory["worksheets"]:
+        print(f"\nSheet: {sheet['name']}")
+        print(f"  Visible: {sheet['state']}")
+        if sheet["charts"]:
+            print(f"  Charts ({len(sheet['charts'])}):")
+            for chart in sheet["charts"]:
+                print(f"    - Name: '{chart['name']}'" + (f" ({chart['type']})" if chart["type"] else ""))
+                if chart["size"]:
+                    print(f"      Size: {chart['size'][0]:.0f} x {chart['size'][1]:.0f}")
+                anchor = chart["anchor"] or {}
+                if "from" in anchor:
+                    print(f"      Cells: {_cell(anchor['from'])}:{_cell(anchor['to'])}")
+
+    print("\n" + "=" * 60)
+    print("Chart Sheets (standalone)")
+    print("=" * 60)
+    if not inventory["chartsheets"]:
+        print("  (none)")
+    for chart_sheet in inventory["chartsheets"]:
+        chart = chart_sheet["chart"]
+        kind = f" ({chart['type']})" if chart and chart["type"] else ""
+        hidden = "" if chart_sheet["state"] == "visible" else f" [{chart_sheet['state']}]"
+        print(f"  Chart Sheet: {chart_sheet['name']}{kind}{hidden}")
+
+
+def main():
+    p = argparse.ArgumentParser(description="List the sheets and charts of a workbook")
+    p.add_argument("excel", nargs="?", default=EXCEL_FILE, help="Workbook path")
+    p.add_argument("--json", action="store_true", help="Print the inventory as JSON")
+    args = p.parse_args()
 
-# Check all worksheets
-for sheet in workbook.Worksheets:
-    print(f"\nSheet: {sheet.Name}")
-    print(f"  Visible: {sheet.Visible}")
-    
-    # Check for chart objects
     try:
-        chart_count = sheet.ChartObjects().Count
-        if chart_count > 0:
-            print(f"  Charts ({chart_count}):")
-            for i in range(1, chart_count + 1):
-                chart_obj = sheet.ChartObjects(i)
-                print(f"    - Name: '{chart_obj.Name}'")
-                print(f"      Size: {chart_obj.Width:.0f} x {chart_obj.Height:.0f}")
-    except Exception as e:
-        print(f"  Error reading charts: {e}")
-
-# Check for chart sheets (standalone chart sheets)
-print("\n" + "=" * 60)
-print("Chart Sheets (standalone)")
-print("=" * 60)
-try:
-    for chart_sheet in workbook.Charts:
-        print(f"  Chart Sheet: {chart_sheet.Name}")
-except Exception as e:
-    print(f"  No chart sheets or error: {e}")
-
-workbook.Close(SaveChanges=False)
-excel_app.Quit()
-pythoncom.CoUninitialize()
+        inventory = read_inventory(args.excel)
+    except ValueError:
+        inventory = com_inventory(args.excel)  # legacy .xls
+    except OSError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    if args.json:
+        print(json.dumps(inventory, indent=2, ensure_ascii=False))
+    else:
+        print_inventory(inventory)
 
 
+if __name__ == "__main__":
+    main()